@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+各阶段规模基准测试
+
+对每个规模先用synthetic_corpus生成（或复用缓存的）确定性语料，再在新的Python子进程中分别执行
+预处理（preprocess_data）、合并（merge_classification_results）和验证（verify_results），
+记录墙钟耗时、CPU时间、峰值内存（RSS，含验证阶段的并行子进程）和吞吐。
+子进程只修改各阶段模块中的路径变量指向语料目录，不影响项目data/目录
+
+结果保存为JSON（含git提交、Python版本和语料参数），可用--compare与旧结果比较，耗时或峰值内存
+超出阈值的项标记为退化，并以退出码1结束，便于在CI中发现性能回归
+
+用法:
+    python benchmark/stage_benchmark.py
+    python benchmark/stage_benchmark.py --scales 10000,100000,1000000,10000000 --repeat 3
+    python benchmark/stage_benchmark.py --stages verify --compare logs/benchmarks/stage_benchmark_abc1234.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from benchmark import synthetic_corpus
+
+# 结果文件格式版本（字段变化时递增）
+RESULT_SCHEMA_VERSION = 1
+STAGES = ["preprocess", "merge", "verify"]
+DEFAULT_SCALES = [10000, 100000, 1000000]
+DEFAULT_WORK_DIR = os.path.join(PROJECT_ROOT, "logs", "benchmarks", "corpus")
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "logs", "benchmarks")
+# 比较时超过该比例视为退化
+DEFAULT_THRESHOLD = 0.1
+
+
+def _max_rss_mb(who):
+    """进程（或已回收子进程中最大者）的峰值RSS（MB），Linux单位为KB，macOS为字节"""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _count_data_lines(path):
+    """统计CSV文件的数据行数（不含表头）"""
+    with open(path, "rb") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+def _run_stage_in_process(stage, corpus_dir):
+    """
+    在当前进程执行一个阶段（由子进程调用），返回测量结果
+
+    各阶段在模块导入后修改路径变量，输出写入语料目录下的独立子目录
+    """
+    if stage == "preprocess":
+        from script import data_preprocess as module
+        module.RAW_FILES_PATH = os.path.join(corpus_dir, synthetic_corpus.RAW_DIR_NAME)
+        module.BATCH_SAVE_PATH = os.path.join(corpus_dir, "preprocessed_batches")
+        run = module.preprocess_data
+    elif stage == "merge":
+        from script import llm_classify as module
+        module.CLASSIFY_SAVE_PATH = os.path.join(corpus_dir, synthetic_corpus.RESULT_DIR_NAME)
+        module.MERGED_RESULTS_PATH = os.path.join(corpus_dir, "merged", "merged_results.csv")
+        run = module.merge_classification_results
+    elif stage == "verify":
+        from script import result_verify as module
+        module.CLASSIFY_SAVE_PATH = os.path.join(corpus_dir, synthetic_corpus.RESULT_DIR_NAME)
+        module.PROBLEM_SAVE_PATH = os.path.join(corpus_dir, "problematic_fields")
+        module.RESULT_STORE_ENABLED = False
+        run = module.verify_results
+    else:
+        raise ValueError(f"未知阶段：{stage}（可选：{', '.join(STAGES)}）")
+
+    baseline_rss_mb = _max_rss_mb(resource.RUSAGE_SELF)
+    cpu_started = os.times()
+    started = time.perf_counter()
+    # 各阶段的进度输出不计入测量结果
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        run()
+    wall = time.perf_counter() - started
+    cpu_finished = os.times()
+
+    # 输出记录数：预处理为去重后的字段数，合并为总表行数，验证为问题字段数
+    if stage == "preprocess":
+        output_paths = [os.path.join(module.BATCH_SAVE_PATH, name) for name in os.listdir(module.BATCH_SAVE_PATH)]
+    elif stage == "merge":
+        output_paths = [module.MERGED_RESULTS_PATH]
+    else:
+        output_paths = [os.path.join(module.PROBLEM_SAVE_PATH, module.PROBLEM_FILE_NAME)]
+    output_records = sum(_count_data_lines(path) for path in output_paths if os.path.exists(path))
+    return {
+        "wall_seconds": wall,
+        # 包含已回收子进程（验证阶段的并行进程）的CPU时间
+        "cpu_seconds": (cpu_finished.user - cpu_started.user + cpu_finished.system - cpu_started.system
+                        + cpu_finished.children_user - cpu_started.children_user
+                        + cpu_finished.children_system - cpu_started.children_system),
+        "baseline_rss_mb": baseline_rss_mb,
+        "peak_rss_mb": max(_max_rss_mb(resource.RUSAGE_SELF), _max_rss_mb(resource.RUSAGE_CHILDREN)),
+        "output_records": output_records,
+    }
+
+
+def run_stage(stage, corpus_dir):
+    """在新的Python子进程中执行一个阶段，返回测量结果（阶段失败时抛出RuntimeError）"""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--corpus-dir", corpus_dir],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"阶段 {stage} 执行失败：{completed.stderr.strip()[-2000:]}")
+    measurement = json.loads(completed.stdout.strip().splitlines()[-1])
+    if measurement["output_records"] == 0:
+        raise RuntimeError(f"阶段 {stage} 没有产生任何输出，请检查日志")
+    return measurement
+
+
+def summarize(stage, scale, measurements, manifest):
+    """汇总同一阶段、同一规模的多次测量"""
+    walls = [m["wall_seconds"] for m in measurements]
+    median_wall = statistics.median(walls)
+    input_records = manifest["spec"]["fields"] if stage == "preprocess" else manifest["spec"]["result_rows"]
+    return {
+        "stage": stage,
+        "scale": scale,
+        "input_records": input_records,
+        "output_records": measurements[-1]["output_records"],
+        "repeat": len(measurements),
+        "wall_seconds_median": round(median_wall, 3),
+        "wall_seconds_min": round(min(walls), 3),
+        "cpu_seconds_median": round(statistics.median(m["cpu_seconds"] for m in measurements), 3),
+        "records_per_second": round(input_records / median_wall, 1) if median_wall > 0 else None,
+        "baseline_rss_mb": max(m["baseline_rss_mb"] for m in measurements),
+        "peak_rss_mb": max(m["peak_rss_mb"] for m in measurements),
+    }
+
+
+def _git_commit():
+    try:
+        completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                   capture_output=True, text=True, check=True)
+        return completed.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    按(阶段, 规模)比较两次结果的耗时中位数和峰值内存
+
+    返回:
+        list: 比较行（stage、scale、wall_ratio、rss_ratio、regressed），仅包含两边都有的项
+    """
+    if current.get("corpus") != baseline.get("corpus"):
+        print("警告：两次结果的语料参数不同，比较结果仅供参考")
+    baseline_rows = {(row["stage"], row["scale"]): row for row in baseline["results"]}
+    rows = []
+    for row in current["results"]:
+        old = baseline_rows.get((row["stage"], row["scale"]))
+        if old is None:
+            continue
+        wall_ratio = row["wall_seconds_median"] / old["wall_seconds_median"] if old["wall_seconds_median"] else None
+        rss_ratio = row["peak_rss_mb"] / old["peak_rss_mb"] if old["peak_rss_mb"] else None
+        regressed = any(ratio is not None and ratio > 1 + threshold for ratio in (wall_ratio, rss_ratio))
+        rows.append({"stage": row["stage"], "scale": row["scale"], "wall_ratio": wall_ratio,
+                     "rss_ratio": rss_ratio, "regressed": regressed})
+    return rows
+
+
+def _parse_scales(text):
+    return [int(float(value)) for value in text.split(",") if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按规模测量预处理、合并和验证阶段的耗时与峰值内存")
+    parser.add_argument("--scales", type=_parse_scales, default=DEFAULT_SCALES,
+                        help="字段规模，逗号分隔（支持1e6写法），默认10000,100000,1000000")
+    parser.add_argument("--stages", default=",".join(STAGES), help="要测量的阶段，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=1, help="每个阶段的重复次数（取耗时中位数、内存最大值）")
+    parser.add_argument("--seed", type=int, default=0, help="语料随机种子")
+    parser.add_argument("--mix", help="字段构成比例（见synthetic_corpus.py）")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="语料缓存目录（参数不变时复用已生成的语料）")
+    parser.add_argument("--json", dest="json_path", help="结果JSON路径，默认logs/benchmarks/stage_benchmark_<提交>_<时间>.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="与之前保存的结果JSON比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定退化的增幅比例，默认0.1")
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # 子进程：执行单个阶段并输出测量结果
+    if args.run_stage:
+        print(json.dumps(_run_stage_in_process(args.run_stage, args.corpus_dir)))
+        return 0
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"未知阶段：{', '.join(unknown)}（可选：{', '.join(STAGES)}）")
+    mix = synthetic_corpus.parse_weights(args.mix, synthetic_corpus.DEFAULT_MIX) if args.mix else None
+
+    results = []
+    corpus_stats = {}
+    print(f"{'阶段':<12}{'规模':>12}{'耗时(秒)':>12}{'CPU(秒)':>10}{'记录/秒':>14}{'峰值内存(MB)':>14}")
+    for scale in args.scales:
+        corpus_dir = os.path.join(args.work_dir, f"corpus_{scale}_seed{args.seed}")
+        spec = synthetic_corpus.corpus_spec(scale, seed=args.seed, mix=mix)
+        started = time.perf_counter()
+        manifest, generated = synthetic_corpus.ensure_corpus(corpus_dir, spec)
+        corpus_stats[str(scale)] = {
+            "raw_files": manifest["raw"]["files"], "raw_bytes": manifest["raw_bytes"],
+            "result_files": manifest["results"]["files"],
+            "generate_seconds": round(time.perf_counter() - started, 3) if generated else None,
+        }
+        for stage in stages:
+            measurements = [run_stage(stage, corpus_dir) for _ in range(args.repeat)]
+            row = summarize(stage, scale, measurements, manifest)
+            results.append(row)
+            print(f"{stage:<12}{scale:>12}{row['wall_seconds_median']:>12.2f}{row['cpu_seconds_median']:>10.2f}"
+                  f"{row['records_per_second'] or 0:>14.0f}{row['peak_rss_mb']:>14.1f}")
+
+    commit = _git_commit()
+    report = {
+        "schema": RESULT_SCHEMA_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "corpus": {"seed": args.seed, "mix": synthetic_corpus.normalize_weights(mix or synthetic_corpus.DEFAULT_MIX),
+                   "generator_version": synthetic_corpus.GENERATOR_VERSION},
+        "corpus_stats": corpus_stats,
+        "results": results,
+    }
+    json_path = args.json_path or os.path.join(
+        DEFAULT_OUTPUT_DIR, f"stage_benchmark_{commit or 'unknown'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到：{json_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_results(report, baseline, args.threshold)
+        print(f"\n与 {baseline.get('git_commit') or args.compare} 比较（超过{args.threshold:.0%}视为退化）：")
+        print(f"{'阶段':<12}{'规模':>12}{'耗时比':>10}{'内存比':>10}")
+        for row in rows:
+            wall = f"{row['wall_ratio']:.2f}" if row["wall_ratio"] is not None else "-"
+            rss = f"{row['rss_ratio']:.2f}" if row["rss_ratio"] is not None else "-"
+            print(f"{row['stage']:<12}{row['scale']:>12}{wall:>10}{rss:>10}{'  退化' if row['regressed'] else ''}")
+        if any(row["regressed"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试
+
+每个场景在新的Python子进程中重复执行若干次，统计墙钟耗时的中位数和最小值；
+可选用 -X importtime 列出指定场景中累计耗时最高的模块，用于定位拖慢启动的导入
+
+用法:
+    python benchmark/startup_benchmark.py
+    python benchmark/startup_benchmark.py --repeat 10 --json logs/startup_benchmark.json
+    python benchmark/startup_benchmark.py --importtime "import script.llm_classify"
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 场景名称 -> 子进程参数（在项目根目录执行）
+SCENARIOS = {
+    "空解释器": ["-c", "pass"],
+    "import config.config": ["-c", "import config.config"],
+    "import script": ["-c", "import script"],
+    "sens_finder --help": ["script/sens_finder.py", "--help"],
+    "import script.result_store": ["-c", "import script.result_store"],
+    "import script.result_verify": ["-c", "import script.result_verify"],
+    "import script.llm_classify": ["-c", "import script.llm_classify"],
+}
+
+
+def time_scenario(args, repeat):
+    """在新子进程中执行repeat次，返回每次的墙钟耗时（秒）"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=PROJECT_ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def top_imports(statement, limit):
+    """用 -X importtime 执行语句，返回累计耗时最高的模块 [(模块, 累计微秒)]"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=PROJECT_ROOT,
+                               check=True, capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+        if match:
+            rows.append((match.group(4), int(match.group(2))))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="测量各入口的启动耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的重复次数")
+    parser.add_argument("--json", dest="json_path", help="将结果保存为JSON文件")
+    parser.add_argument("--importtime", metavar="STATEMENT", help="列出该语句导入耗时最高的模块")
+    parser.add_argument("--top", type=int, default=15, help="--importtime列出的模块数")
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        print(f"{'累计耗时(ms)':>12}  模块")
+        for module, cumulative_us in top_imports(args.importtime, args.top):
+            print(f"{cumulative_us / 1000:>12.1f}  {module}")
+        return
+
+    results = {}
+    print(f"{'场景':<32}{'中位数(ms)':>12}{'最小值(ms)':>12}")
+    for name, scenario_args in SCENARIOS.items():
+        durations = time_scenario(scenario_args, args.repeat)
+        results[name] = {
+            "median_ms": round(statistics.median(durations) * 1000, 1),
+            "min_ms": round(min(durations) * 1000, 1),
+            "repeat": args.repeat,
+        }
+        print(f"{name:<32}{results[name]['median_ms']:>12.1f}{results[name]['min_ms']:>12.1f}")
+
+    if args.json_path:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json_path)), exist_ok=True)
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到：{args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
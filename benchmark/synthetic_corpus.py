@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+确定性合成语料生成器
+
+按给定的随机种子生成原始字段文件（input_raw/）和模拟的分类结果文件（classification_results/result_batch_*.csv），
+用于在任意规模下测试预处理、合并和验证阶段。相同的参数总是生成逐字节相同的文件
+
+字段构成（--mix，按比例）：
+    entity     实体名（人名、公司名、地名、组织缩写、产品型号），按序号生成，互不重复
+    noise      噪声（纯符号、单字符、无意义字母数字串），部分会被预处理过滤
+    email      邮箱地址（含少量格式错误的地址）
+    phone      电话号码（多种写法，含少量格式错误的号码）
+    duplicate  重复字段（从近期生成的字段中随机抽取，测试去重）
+原始文件编码（--encodings，按文件比例）：utf-8、latin-1、cp1252，非utf-8文件会走预处理的编码回退路径
+
+用法:
+    python benchmark/synthetic_corpus.py /tmp/corpus --fields 1000000
+    python benchmark/synthetic_corpus.py /tmp/corpus --fields 100000 --mix entity=0.6,noise=0.1,email=0.1,phone=0.1,duplicate=0.1
+"""
+import os
+import sys
+import csv
+import json
+import random
+import shutil
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from config.config import BATCH_SIZE, LOW_CONFIDENCE_THRESHOLD
+
+# 生成规则变化时递增，已缓存的语料会被重新生成
+GENERATOR_VERSION = 1
+MANIFEST_FILE_NAME = "manifest.json"
+RAW_DIR_NAME = "input_raw"
+RESULT_DIR_NAME = "classification_results"
+
+DEFAULT_MIX = {"entity": 0.5, "noise": 0.12, "email": 0.08, "phone": 0.08, "duplicate": 0.22}
+DEFAULT_ENCODINGS = {"utf-8": 0.8, "latin-1": 0.15, "cp1252": 0.05}
+# 每个原始文件的字段数
+DEFAULT_FIELDS_PER_FILE = 50000
+# 每行字段数范围（原始文件按空白分割字段）
+FIELDS_PER_LINE = (1, 6)
+# 重复字段的候选池大小（保存最近生成的不重复字段）
+DUPLICATE_POOL_SIZE = 50000
+# 带重音/非ASCII字符的字段比例（测试编码回退）
+ACCENT_SHARE = 0.05
+
+# 分类结果中各类问题的比例
+LOW_CONFIDENCE_SHARE = 0.1
+INVALID_CATEGORY_SHARE = 0.03
+MALFORMED_SHARE = 0.05
+
+SYLLABLES = ["al", "ob", "ar", "ba", "bel", "cor", "da", "del", "en", "er", "fa", "gan",
+             "hal", "in", "ka", "kel", "la", "lin", "ma", "mor", "na", "nor", "o", "pa",
+             "per", "qu", "ra", "ren", "sa", "sel", "ta", "tor", "u", "val", "ve", "vin",
+             "wa", "xi", "ya", "zel", "zu", "bri", "cla", "dro", "fle", "gri", "pro", "stra"]
+COMPANY_SUFFIXES = ["", "Tech", "Semi", "Systems", "Micro", "Corp", "Inc", "Labs"]
+PLACE_SUFFIXES = ["", "ville", "burg", "port", "shire", "ton", "field"]
+EMAIL_DOMAINS = ["example.com", "mail.com", "company.cn", "corp.net", "semi.org", "lab.io"]
+NOISE_SYMBOLS = ["#", "$", "%", "&", "*", "-", "_", "/", "|", "~", "!", "?", "+", "="]
+# 各编码可表示的非ASCII装饰
+ACCENTS = {
+    "utf-8": ["é", "ü", "ñ", "ø", "東京", "株式会社", "ß"],
+    "latin-1": ["é", "ü", "ñ", "ø", "ç", "ß", "å"],
+    "cp1252": ["é", "ü", "’s", "€", "–", "ç"],
+}
+
+# 实体类型 -> 模拟分类结果的类别
+ENTITY_CATEGORIES = {
+    "person": "人名",
+    "company": "公司名及简称",
+    "place": "地名",
+    "org": "组织名及简称",
+    "product": "产品/技术名",
+}
+KIND_CATEGORIES = dict(ENTITY_CATEGORIES, email="邮箱地址", phone="电话号码", noise="通用词")
+INVALID_CATEGORIES = ["", "未分类", "无法识别"]
+
+
+def parse_weights(text, allowed):
+    """
+    解析"name=weight,..."格式的比例配置并归一化
+
+    参数:
+        text (str): 比例配置
+        allowed (iterable): 允许的名称
+
+    返回:
+        dict: 名称 -> 归一化后的比例（未列出的名称为0）
+    """
+    weights = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name not in allowed:
+            raise ValueError(f"未知的名称：{name}（可选：{', '.join(allowed)}）")
+        weights[name] = float(value)
+    return normalize_weights(weights)
+
+
+def normalize_weights(weights):
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("比例之和必须大于0")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def _word(index):
+    """序号转为可读的单词（按音节进制编码，不同序号生成的单词互不相同）"""
+    index += len(SYLLABLES)  # 至少两个音节
+    parts = []
+    while index:
+        index, digit = divmod(index, len(SYLLABLES))
+        parts.append(SYLLABLES[digit])
+    return "".join(reversed(parts)).capitalize()
+
+
+def _acronym(index):
+    """序号转为3位及以上的大写缩写"""
+    index += 26 * 26
+    letters = []
+    while index:
+        index, digit = divmod(index, 26)
+        letters.append(chr(ord("A") + digit))
+    return "".join(reversed(letters))
+
+
+class FieldGenerator:
+    """
+    按比例逐个生成(字段, 类型)，实体按类型各自的序号生成保证唯一，重复字段从近期字段池中抽取
+    """
+    def __init__(self, seed, mix=None):
+        self.rng = random.Random(seed)
+        mix = normalize_weights(mix or DEFAULT_MIX)
+        self.kinds = list(mix)
+        self.cumulative = []
+        total = 0.0
+        for kind in self.kinds:
+            total += mix[kind]
+            self.cumulative.append(total)
+        self.entity_kinds = list(ENTITY_CATEGORIES)
+        self.counters = {}
+        self.pool = []
+
+    def _next_index(self, kind):
+        index = self.counters.get(kind, 0)
+        self.counters[kind] = index + 1
+        return index
+
+    def _entity(self):
+        kind = self.rng.choice(self.entity_kinds)
+        index = self._next_index(kind)
+        if kind == "person":
+            return _word(index), kind
+        if kind == "company":
+            return _word(index) + self.rng.choice(COMPANY_SUFFIXES), kind
+        if kind == "place":
+            return _word(index) + self.rng.choice(PLACE_SUFFIXES), kind
+        if kind == "org":
+            return _acronym(index), kind
+        return f"{_word(index)}-{self.rng.randint(1, 9999)}", kind
+
+    def _noise(self):
+        roll = self.rng.random()
+        if roll < 0.3:
+            return "".join(self.rng.choice(NOISE_SYMBOLS) for _ in range(self.rng.randint(1, 4)))
+        if roll < 0.5:
+            return self.rng.choice("abcdefghijklmnopqrstuvwxyz0123456789")
+        return "".join(self.rng.choice("bcdfghjklmnpqrstvwxz0123456789_") for _ in range(self.rng.randint(3, 8)))
+
+    def _email(self):
+        local = f"{_word(self.rng.randrange(100000)).lower()}{self.rng.randint(1, 999)}"
+        if self.rng.random() < MALFORMED_SHARE:
+            return self.rng.choice([f"{local}@@{EMAIL_DOMAINS[0]}", f"{local}@", f"{local}.{EMAIL_DOMAINS[1]}"])
+        return f"{local}@{self.rng.choice(EMAIL_DOMAINS)}"
+
+    def _phone(self):
+        digits = [self.rng.randint(100, 999), self.rng.randint(100, 999), self.rng.randint(1000, 9999)]
+        if self.rng.random() < MALFORMED_SHARE:
+            return f"{digits[0]}x{digits[2]}"
+        style = self.rng.randrange(4)
+        if style == 0:
+            return f"+1-{digits[0]}-{digits[1]}-{digits[2]}"
+        if style == 1:
+            return f"({digits[0]}){digits[1]}-{digits[2]}"
+        if style == 2:
+            return f"{digits[0]}.{digits[1]}.{digits[2]}"
+        return f"+86{self.rng.randint(13000000000, 18999999999)}"
+
+    def next_field(self):
+        """返回(字段, 类型)，类型为实体子类型或noise/email/phone/duplicate"""
+        roll = self.rng.random()
+        kind = self.kinds[-1]
+        for candidate, bound in zip(self.kinds, self.cumulative):
+            if roll < bound:
+                kind = candidate
+                break
+        if kind == "duplicate":
+            if self.pool:
+                return self.rng.choice(self.pool), "duplicate"
+            kind = "entity"
+        if kind == "entity":
+            field, kind = self._entity()
+        elif kind == "noise":
+            field = self._noise()
+        elif kind == "email":
+            field = self._email()
+        else:
+            field = self._phone()
+        if len(self.pool) < DUPLICATE_POOL_SIZE:
+            self.pool.append(field)
+        else:
+            self.pool[self.rng.randrange(DUPLICATE_POOL_SIZE)] = field
+        return field, kind
+
+
+def _decorate(field, encoding, rng):
+    """按比例给字段加上目标编码可表示的非ASCII字符"""
+    if rng.random() >= ACCENT_SHARE:
+        return field
+    return field + rng.choice(ACCENTS[encoding])
+
+
+def _next_encoding(encodings, counts, file_index):
+    """按比例轮流分配文件编码（选择实际文件数落后于目标比例最多的编码），少量文件时也能覆盖各编码"""
+    return max(encodings, key=lambda name: encodings[name] * file_index - counts.get(name, 0))
+
+
+def write_raw_files(raw_dir, fields, seed, mix=None, encodings=None, fields_per_file=DEFAULT_FIELDS_PER_FILE):
+    """
+    生成原始字段文件（每行若干个空白分隔的字段）
+
+    返回:
+        dict: 文件数、各编码文件数、各类型字段数
+    """
+    generator = FieldGenerator(seed, mix)
+    layout_rng = random.Random(seed + 1)
+    encodings = normalize_weights(encodings or DEFAULT_ENCODINGS)
+    os.makedirs(raw_dir, exist_ok=True)
+
+    kind_counts = {}
+    encoding_counts = {}
+    written = 0
+    file_index = 0
+    while written < fields:
+        file_index += 1
+        encoding = _next_encoding(encodings, encoding_counts, file_index)
+        encoding_counts[encoding] = encoding_counts.get(encoding, 0) + 1
+        file_fields = min(fields_per_file, fields - written)
+        path = os.path.join(raw_dir, f"raw_{file_index:05d}.txt")
+        with open(path, "w", encoding=encoding, errors="replace", newline="\n") as f:
+            remaining = file_fields
+            while remaining:
+                line = []
+                for _ in range(min(remaining, layout_rng.randint(*FIELDS_PER_LINE))):
+                    field, kind = generator.next_field()
+                    kind_counts[kind] = kind_counts.get(kind, 0) + 1
+                    line.append(_decorate(field, encoding, layout_rng))
+                remaining -= len(line)
+                f.write(" ".join(line) + "\n")
+        written += file_fields
+    return {"files": file_index, "encodings": encoding_counts, "kinds": kind_counts}
+
+
+def write_result_files(result_dir, rows, seed, mix=None, batch_size=BATCH_SIZE):
+    """
+    生成模拟的分类结果文件（result_batch_*.csv，列与LLM分类结果一致）
+
+    结果中按比例混入低置信度、无效类别和格式不符的记录，使各条验证规则都有命中；不生成重复字段
+
+    返回:
+        dict: 文件数、各类别记录数
+    """
+    mix = dict(mix or DEFAULT_MIX)
+    mix.pop("duplicate", None)
+    generator = FieldGenerator(seed + 2, mix)
+    rng = random.Random(seed + 3)
+    os.makedirs(result_dir, exist_ok=True)
+
+    category_counts = {}
+    written = 0
+    batch_index = 0
+    while written < rows:
+        batch_index += 1
+        batch_rows = min(batch_size, rows - written)
+        path = os.path.join(result_dir, f"result_batch_{batch_index}.csv")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["raw_text", "category", "confidence", "reason"])
+            for _ in range(batch_rows):
+                field, kind = generator.next_field()
+                category = KIND_CATEGORIES[kind]
+                confidence = str(rng.randint(LOW_CONFIDENCE_THRESHOLD + 5, 99))
+                roll = rng.random()
+                if roll < INVALID_CATEGORY_SHARE:
+                    category = rng.choice(INVALID_CATEGORIES)
+                    confidence = rng.choice(["", str(rng.randint(30, 60))])
+                elif roll < INVALID_CATEGORY_SHARE + LOW_CONFIDENCE_SHARE:
+                    confidence = str(rng.randint(40, LOW_CONFIDENCE_THRESHOLD - 1))
+                category_counts[category] = category_counts.get(category, 0) + 1
+                writer.writerow([field, category, confidence, f"合成数据（{kind}）"])
+        written += batch_rows
+    return {"files": batch_index, "categories": category_counts}
+
+
+def corpus_spec(fields, result_rows=None, seed=0, mix=None, encodings=None, fields_per_file=DEFAULT_FIELDS_PER_FILE):
+    """返回描述一份语料的参数（写入manifest.json，用于判断缓存的语料是否可复用）"""
+    return {
+        "version": GENERATOR_VERSION,
+        "fields": fields,
+        "result_rows": fields if result_rows is None else result_rows,
+        "seed": seed,
+        "mix": normalize_weights(mix or DEFAULT_MIX),
+        "encodings": normalize_weights(encodings or DEFAULT_ENCODINGS),
+        "fields_per_file": fields_per_file,
+        "batch_size": BATCH_SIZE,
+    }
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate_corpus(out_dir, spec):
+    """
+    生成一份完整语料（会清空out_dir下的原始文件和结果文件）
+
+    参数:
+        out_dir (str): 输出目录
+        spec (dict): corpus_spec()返回的参数
+
+    返回:
+        dict: manifest（参数与生成统计）
+    """
+    raw_dir = os.path.join(out_dir, RAW_DIR_NAME)
+    result_dir = os.path.join(out_dir, RESULT_DIR_NAME)
+    for directory in (raw_dir, result_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(out_dir, exist_ok=True)
+
+    raw_stats = write_raw_files(raw_dir, spec["fields"], spec["seed"], spec["mix"], spec["encodings"], spec["fields_per_file"])
+    result_stats = write_result_files(result_dir, spec["result_rows"], spec["seed"], spec["mix"], spec["batch_size"])
+    manifest = {"spec": spec, "raw": raw_stats, "results": result_stats,
+                "raw_bytes": sum(os.path.getsize(os.path.join(raw_dir, name)) for name in os.listdir(raw_dir))}
+    with open(os.path.join(out_dir, MANIFEST_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def ensure_corpus(out_dir, spec):
+    """
+    语料不存在或参数不一致时重新生成
+
+    返回:
+        tuple: (manifest, 是否重新生成)
+    """
+    manifest = load_manifest(out_dir)
+    if manifest is not None and manifest.get("spec") == spec:
+        return manifest, False
+    return generate_corpus(out_dir, spec), True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成确定性的合成原始字段和分类结果文件")
+    parser.add_argument("out_dir", help="输出目录（生成input_raw/、classification_results/和manifest.json）")
+    parser.add_argument("--fields", type=int, default=100000, help="原始字段数")
+    parser.add_argument("--result-rows", type=int, help="分类结果记录数，默认与字段数相同")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--mix", help="字段构成比例，如entity=0.5,noise=0.12,email=0.08,phone=0.08,duplicate=0.22")
+    parser.add_argument("--encodings", help="原始文件编码比例，如utf-8=0.8,latin-1=0.15,cp1252=0.05")
+    parser.add_argument("--fields-per-file", type=int, default=DEFAULT_FIELDS_PER_FILE, help="每个原始文件的字段数")
+    args = parser.parse_args(argv)
+
+    mix = parse_weights(args.mix, DEFAULT_MIX) if args.mix else None
+    encodings = parse_weights(args.encodings, DEFAULT_ENCODINGS) if args.encodings else None
+    spec = corpus_spec(args.fields, args.result_rows, args.seed, mix, encodings, args.fields_per_file)
+    manifest = generate_corpus(args.out_dir, spec)
+    print(f"已生成 {manifest['raw']['files']} 个原始文件（{spec['fields']} 个字段，{manifest['raw_bytes']} 字节）、"
+          f"{manifest['results']['files']} 个分类结果文件（{spec['result_rows']} 条记录）：{args.out_dir}")
+    print(f"字段类型：{manifest['raw']['kinds']}")
+    print(f"文件编码：{manifest['raw']['encodings']}")
+
+
+if __name__ == "__main__":
+    main()
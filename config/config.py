@@ -40,6 +40,14 @@ CLASSIFY_SAVE_PATH = os.path.join(PROJECT_ROOT, "data/classification_results/")
 PROBLEM_SAVE_PATH = os.path.join(PROJECT_ROOT, "data/problematic_fields/")
 # 提示词模板文件路径
 PROMPT_TEMPLATE_PATH = os.path.join(PROJECT_ROOT, "config/prompt_template.txt")
+# 问题字段复核提示词（追加在提示词模板之前的复核说明）
+RECLASSIFY_PROMPT_PATH = os.path.join(PROJECT_ROOT, "config/reclassify_prompt_template.txt")
+# 合并后的分类结果文件路径（同时作为本地蒸馏模型的训练语料）
+MERGED_RESULTS_PATH = os.path.join(PROJECT_ROOT, "data/merged_results.csv")
+# 分类结果库路径（SQLite，按字段、类别、置信度和运行ID索引）
+RESULT_STORE_PATH = os.path.join(PROJECT_ROOT, "data/results.db")
+# 本地蒸馏模型保存目录（按版本号保存模型文件）
+LOCAL_MODEL_DIR = os.path.join(PROJECT_ROOT, "data/models/")
 
 # -------------------------- 2. 预处理参数 --------------------------
 # 每批次行数（建议1000-2000，避免LLM上下文超量）
@@ -69,6 +77,14 @@ DEEPSEEK_MODEL = get_env_variable("DEEPSEEK_MODEL")  # 默认使用deepseek-chat
 LOCAL_LLM_URL = get_env_variable("LOCAL_LLM_URL")  # 默认本地URL
 LOCAL_LLM_MODEL = get_env_variable("LOCAL_LLM_MODEL")  # 默认模型名称
 LOCAL_LLM_MAX_TOKENS = BATCH_SIZE*8  # 单次响应的最大令牌数
+# 本地LLM批量请求模式："CONCURRENT"（并发提交多个chat请求）或 "COMPLETIONS"（单个多prompt的completions请求，需服务端支持，如vLLM）
+LOCAL_LLM_BATCH_MODE = "CONCURRENT"
+# 本地LLM completions接口URL（为空时由LOCAL_LLM_URL中的chat/completions替换得到）
+LOCAL_LLM_COMPLETIONS_URL = get_env_variable("LOCAL_LLM_COMPLETIONS_URL")
+# 本地LLM子批次大小（每个prompt包含的字段数，较小的批次分类更准确）
+LOCAL_LLM_SUB_BATCH_SIZE = 100
+# 每个批次内同时提交的子批次请求数（由服务端连续批处理，提升吞吐）
+LOCAL_LLM_BATCH_CONCURRENCY = 8
 
 # 并发配置
 # 根据不同的LLM服务提供商设置不同的并发数
@@ -77,12 +93,56 @@ LLM_CONCURRENCY = {
     "DEEPSEEK": 5,
     "LOCAL": 3  # 本地LLM并发数较低，考虑本地资源限制
 }
+# 各服务令牌单价（美元/百万令牌，input为提示词、output为生成内容），用于运行结束时的成本估算
+TOKEN_PRICES = {
+    "OPENAI": {"input": 2.50, "output": 10.00},
+    "DEEPSEEK": {"input": 0.27, "output": 1.10},
+    "LOCAL": {"input": 0.0, "output": 0.0}
+}
+# 是否将分类结果写入结果库（验证阶段优先从结果库读取最近一次运行的结果）
+RESULT_STORE_ENABLED = True
+# 是否以流水线模式运行（预处理、分类、验证同时进行，通过有界队列衔接；也可用sens_finder.py --pipeline开启）
+PIPELINE_ENABLED = False
+# 流水线各阶段之间的队列容量（批次数），队列满时上游阶段等待，限制内存占用
+PIPELINE_QUEUE_SIZE = 4
+# 合并分类结果时每次读取的行数（按类别溢写到临时文件，内存占用与结果总量无关）
+MERGE_CHUNK_SIZE = 100000
 
 # -------------------------- 4. 验证参数 --------------------------
 # 低置信度阈值（低于此值的字段需人工复核，建议80）
 LOW_CONFIDENCE_THRESHOLD = 80
 # 公司名关键词（用于规则冲突校验，可补充）
 COMPANY_NAME_KEYWORDS = ["Co., Ltd.", "Corp", "Inc", "LLC", "Group", "Company", "Limited", "Ltd", "株式会社"]
+# 验证规则（按顺序分配问题位掩码，第i条规则对应1<<i，最多64条）
+# 规则类型：
+#   keyword          字段包含任一关键词（keywords列表或keywords_file文件，每行一个；默认不区分大小写）
+#   regex            字段匹配正则（pattern，可设ignore_case）
+#   confidence_floor 置信度低于threshold，per_category可为个别类别设置单独阈值
+#   category_regex   类别匹配pattern（match_empty为True时空类别也计入）
+#   length           字段长度超过max_length或换行数超过max_lines
+# 通用选项：column（默认raw_text）、negate（取反）、only_category（仅对匹配的类别生效）、unless_category（匹配的类别豁免）
+VERIFY_RULES = [
+    {"name": "公司关键词冲突", "type": "keyword", "keywords": COMPANY_NAME_KEYWORDS, "unless_category": "公司名"},
+    {"name": "低置信度", "type": "confidence_floor", "threshold": LOW_CONFIDENCE_THRESHOLD, "per_category": {}},
+    {"name": "无效分类", "type": "category_regex", "pattern": "未分类|无法识别", "match_empty": True},
+    {"name": "格式异常", "type": "length", "max_length": 500, "max_lines": 5},
+    {"name": "邮箱格式不符", "type": "regex", "pattern": r"^[\w.+-]+@[\w-]+(\.[\w-]+)+$", "negate": True, "only_category": "邮箱"},
+    {"name": "电话格式不符", "type": "regex", "pattern": r"^\+?[\d\s().-]{6,}$", "negate": True, "only_category": "电话"},
+]
+# 验证规则并行进程数（0表示使用全部CPU核心，1表示不开子进程）
+VERIFY_WORKERS = 0
+# 验证时每个并行块的行数（数据量不超过一块时在当前进程执行）
+VERIFY_CHUNK_SIZE = 500000
+# 规则耗时分析模式：开启后每条关键词/正则规则单独编译执行，便于精确定位耗时规则
+VERIFY_RULE_PROFILING = False
+# 是否在分类过程中流式验证（每个批次分类完成后立即验证，主流程不再单独执行验证阶段）
+STREAMING_VERIFY_ENABLED = True
+# 是否在验证后自动复核问题字段（按问题类型分组、附带提示重新调用LLM，通过验证的结果写回分类结果；默认关闭，复核会改写分类结果）
+RECLASSIFY_ENABLED = False
+# 复核时每次请求的字段数（小批次便于模型结合提示逐个判断）
+RECLASSIFY_BATCH_SIZE = 30
+# 不自动复核的问题类型（直接留给人工处理）
+RECLASSIFY_SKIP_PROBLEM_TYPES = ["格式异常"]
 
 # -------------------------- 5. 错误处理配置 --------------------------
 # API调用最大重试次数
@@ -91,5 +151,119 @@ MAX_RETRY_COUNT = 3
 INITIAL_RETRY_INTERVAL = 1.0
 # 重试间隔乘数（用于指数退避策略）
 RETRY_INTERVAL_MULTIPLIER = 2.0
+# 单次重试最长等待时间（秒），避免指数退避等待过久
+MAX_RETRY_INTERVAL = 30.0
 # API请求超时时间（秒）
-API_TIMEOUT = 600
\ No newline at end of file
+API_TIMEOUT = 600
+# 全局重试预算：重试次数不超过首次请求数的该比例（所有LLM调用共享）
+RETRY_BUDGET_RATIO = 0.2
+# 重试预算每秒最少补充的令牌数（保证低流量时仍可重试）
+RETRY_BUDGET_MIN_RETRIES_PER_SECOND = 0.5
+# 重试预算令牌上限
+RETRY_BUDGET_MAX_TOKENS = 10
+# 熔断阈值：同一后端连续失败达到此次数后熔断
+CIRCUIT_FAILURE_THRESHOLD = 5
+# 熔断持续时间（秒），之后进入半开状态发送探测请求
+CIRCUIT_RESET_TIMEOUT = 30.0
+
+# -------------------------- 6. 本地蒸馏模型配置 --------------------------
+# 是否在调用LLM前使用本地模型预分类（默认关闭；需先运行script/local_classifier.py训练模型）
+LOCAL_MODEL_ENABLED = False
+# 本地模型预测概率阈值（校准后概率≥此值的字段直接采用本地结果，不再调用LLM）
+LOCAL_MODEL_MIN_PROBA = 0.95
+# 训练语料的最低置信度（仅使用LLM置信度≥此值的标注进行训练）
+LOCAL_MODEL_MIN_LABEL_CONFIDENCE = 85
+# 训练所需的最少样本数（样本不足时不训练）
+LOCAL_MODEL_MIN_SAMPLES = 200
+# 每个类别的最少样本数（样本过少的类别不参与训练）
+LOCAL_MODEL_MIN_CLASS_SAMPLES = 10
+# 留出集上高置信预测的最低准确率（低于此值的模型不会被启用）
+LOCAL_MODEL_MIN_PRECISION = 0.97
+
+# -------------------------- 7. 分布式工作队列配置 --------------------------
+# 工作队列目录（需位于所有工作节点共享的文件系统上，存放租约和完成标记）
+WORK_QUEUE_PATH = os.path.join(PROJECT_ROOT, "data/work_queue/")
+# 租约超时时间（秒）：租约文件超过此时间未续期即视为工作节点已失效，批次可被其他节点回收
+WORK_QUEUE_LEASE_TIMEOUT = 120
+# 租约续期（心跳）间隔（秒），应明显小于租约超时时间
+WORK_QUEUE_HEARTBEAT_INTERVAL = 10
+# 没有可领取批次时的轮询间隔（秒）
+WORK_QUEUE_POLL_INTERVAL = 5
+# 单个批次的最大尝试次数（分类失败超过此次数后标记为失败，不再领取）
+WORK_QUEUE_MAX_ATTEMPTS = 3
+
+# -------------------------- 8. 运行指标与性能分析配置 --------------------------
+# 运行结束时写出Prometheus文本格式指标的文件（供node_exporter textfile collector采集，为空时不写出）
+METRICS_TEXTFILE_PATH = os.path.join(PROJECT_ROOT, "data/metrics/sens_finder.prom")
+# 运行期间提供 /metrics 接口的HTTP端口（0表示不启动）
+METRICS_HTTP_PORT = int(get_env_variable("METRICS_HTTP_PORT", "0"))
+# 指标HTTP服务监听地址
+METRICS_HTTP_HOST = "127.0.0.1"
+# 性能分析输出目录（sens_finder.py --profile，每次运行一个时间戳子目录）
+PROFILE_OUTPUT_PATH = os.path.join(PROJECT_ROOT, "logs/profiles/")
+# 默认性能分析方式："sample"为低开销采样（覆盖所有线程），"cprofile"为确定性分析（合并阶段内所有线程）
+PROFILE_MODE = "sample"
+# 采样间隔（秒）
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+# -------------------------- 9. 在线分类服务配置 --------------------------
+# 分类服务监听地址和端口（sens_finder.py serve）
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = int(get_env_variable("SERVICE_PORT", "8600"))
+# 微批次最大字段数（未命中缓存的字段凑满后立即发送给LLM）
+SERVICE_MAX_BATCH_SIZE = 50
+# 微批次最长等待时间（毫秒）：第一个未命中字段到达后最多等待这么久就发送，兼顾单次延迟与凑批吞吐
+SERVICE_MAX_WAIT_MS = 5
+# 同时发送给LLM的微批次数（全部占用时新到的字段继续凑批，批次自动变大）
+SERVICE_CONCURRENCY = LLM_CONCURRENCY.get(LLM_SERVICE, 3)
+# 单次请求最多包含的字段数
+SERVICE_MAX_FIELDS_PER_REQUEST = 100
+# 进程内结果缓存条数（结果库之前的一级缓存，同时缓存LLM未能分类的字段；两代紧凑存储轮换，近似LRU）
+SERVICE_CACHE_SIZE = 100000
+# 单次请求等待分类结果的最长时间（秒）
+SERVICE_REQUEST_TIMEOUT = 300
+
+# -------------------------- 10. 归档文件读取配置 --------------------------
+# 预处理时直接读取RAW_FILES_PATH下的归档文件（.zip、.tar、.tar.gz、.tar.xz等）成员，不解压到磁盘
+# （默认关闭：开启后归档文件按成员读取，不再按文本文件整体读取）
+ARCHIVE_INGEST_ENABLED = False
+# 单个成员的最大解压大小（字节），超过时跳过该成员
+ARCHIVE_MAX_MEMBER_SIZE = 256 * 1024 * 1024
+# 单个归档（含嵌套归档）累计解压的最大字节数，超过时停止读取该归档剩余成员（防止压缩炸弹）
+ARCHIVE_MAX_TOTAL_SIZE = 8 * 1024 * 1024 * 1024
+# 归档嵌套的最大层数（如firmware.tar.gz中的rootfs.zip为第2层）
+ARCHIVE_MAX_DEPTH = 4
+# 同时读取的归档数（解压在C扩展中进行，多个归档可并行解压）
+ARCHIVE_CONCURRENCY = 4
+# 已读取但尚未被预处理消费的成员数上限（队列满时读取线程等待，限制内存占用）
+ARCHIVE_QUEUE_SIZE = 32
+
+# -------------------------- 11. 已分类字段过滤配置 --------------------------
+# 预处理时跳过之前运行中已分类的字段：先查布隆过滤器，只有命中的字段才查询结果库确认（需开启RESULT_STORE_ENABLED）
+KNOWN_FIELD_FILTER_ENABLED = False
+# 布隆过滤器文件（合并分类结果时加入本次分类的字段；可用script/bloom_filter.py rebuild从merged_results.csv重建）
+KNOWN_FIELD_FILTER_PATH = os.path.join(PROJECT_ROOT, "data/known_fields.bloom")
+# 新建过滤器的设计容量（字段数）和误判率：1千万字段、1%误判率约占11.4MB
+KNOWN_FIELD_FILTER_CAPACITY = 10000000
+KNOWN_FIELD_FILTER_ERROR_RATE = 0.01
+
+# -------------------------- 12. 字段来源索引配置 --------------------------
+# 预处理时记录每个有效字段出现的来源文件和字节偏移（倒排索引，增量编码压缩），供查询"字段出现在哪些文件中"
+PROVENANCE_INDEX_ENABLED = False
+# 来源索引文件（每次预处理重新生成，对应本次读取的原始文件）
+PROVENANCE_INDEX_PATH = os.path.join(PROJECT_ROOT, "data/provenance_index.db")
+# 来源报告：问题字段和敏感字段及其出现位置（script/provenance_index.py report）
+PROVENANCE_REPORT_PATH = os.path.join(PROJECT_ROOT, "data/provenance_report.csv")
+# 来源报告中每个字段最多列出的位置数
+PROVENANCE_REPORT_MAX_LOCATIONS = 100
+
+# -------------------------- 13. 分类批次调度配置 --------------------------
+# 批次按估算耗时从大到小派发（估算令牌数 × 历史耗时）；排队批次少于其他线程数时（运行末尾），
+# 取出的批次拆成子批次交给空闲线程，避免最后一个大批次独占整段尾部时间
+SCHEDULER_SPLIT_ENABLED = True
+# 拆分后每个子批次的最少字段数（字段数不足其两倍的批次不拆分）
+SCHEDULER_MIN_SPLIT_SIZE = 100
+# 历史耗时文件：按LLM服务记录请求耗时与估算令牌数的衰减统计（每次请求的固定开销 + 每令牌耗时）
+SCHEDULER_HISTORY_PATH = os.path.join(PROJECT_ROOT, "data/scheduler_history.json")
+# 历史统计的衰减系数：每记录一次新请求，之前的统计权重乘以该值（越小越偏向最近的请求）
+SCHEDULER_HISTORY_DECAY = 0.98
@@ -1,6 +1,87 @@
 # script包初始化文件
-from .data_preprocess import *
-from .llm_classify import *
-from .local_llm_client import *
-from .result_verify import *
-from .sens_finder import *
\ No newline at end of file
+# 公开接口按需导入（PEP 562）：导入script包本身不会加载pandas、openai等重依赖，
+# 访问script.batch_classify等名称时才导入对应模块
+import importlib
+
+# 公开名称 -> 所在模块
+_EXPORTS = {
+    "data_preprocess": [
+        "read_file_fields", "iter_raw_fields", "iter_raw_sources", "iter_source_fields", "is_valid_field",
+        "new_preprocess_stats", "iter_field_batches", "prepare_batch_dir", "build_batch_frame", "save_batch",
+        "log_preprocess_stats", "preprocess_data",
+    ],
+    "llm_classify": [
+        "merge_classification_results", "load_prompt_template", "build_prompt", "extract_response_content",
+        "parse_llm_output", "request_llm_completion", "classify_fields", "classify_single_batch",
+        "prepare_classify_dir", "save_batch_result", "batch_classify",
+    ],
+    "local_llm_client": ["LocalLLMClient"],
+    "result_verify": [
+        "get_problem_types", "load_results", "evaluate_problems", "problem_mask_to_types", "build_problem_table",
+        "summarize_problems", "report_problem_stats", "report_rule_timings", "prepare_problem_dir",
+        "StreamingVerifier", "verify_results",
+    ],
+    "sens_finder": ["print_separator", "run_script", "main", "cli"],
+    "local_classifier": [
+        "load_training_data", "train_local_classifier", "load_local_classifier", "apply_local_classifier",
+    ],
+    "reclassify": [
+        "load_reclassify_template", "build_hints", "reclassify_group", "write_back_results", "reclassify_problems",
+    ],
+    "result_store": ["ResultStore"],
+    "pipeline": ["StageStats", "run_pipeline"],
+    "retry_policy": [
+        "LLMError", "RetryableLLMError", "LLMResponseFormatError", "FatalLLMError", "CircuitOpenError",
+        "RetryBudgetExhaustedError", "RetryBudget", "CircuitBreaker", "RetryPolicy", "get_retry_policy",
+    ],
+    "verify_rules": ["KeywordMatcher", "RegexMatcher", "load_rule_keywords", "RulesEngine", "get_rules_engine"],
+    "logging_setup": ["setup_logging"],
+    "profiling": ["StackSampler", "ProfileSession"],
+    "token_usage": [
+        "estimate_tokens", "TokenUsage", "TokenUsageLog", "load_usage", "build_usage_report", "report_token_usage",
+    ],
+    "metrics": [
+        "Counter", "Gauge", "Histogram", "MetricsRegistry", "REGISTRY", "record_stage", "write_textfile",
+        "start_http_server",
+    ],
+    "classify_service": ["MicroBatcher", "ClassifyService", "create_server", "serve"],
+    "field_store": ["StringArena", "FieldStore", "FieldResultCache"],
+    "binary_strings": [
+        "detect_executable_format", "is_binary_native", "scan_ranges", "extract_strings_native", "clean_string_runs",
+        "extract_strings_with_offsets", "extract_buffer_strings",
+    ],
+    "archive_ingest": [
+        "ArchiveLimitError", "detect_archive_format", "is_archive", "classify_member", "iter_archive_sources",
+        "iter_path_sources", "iter_sources", "ingest",
+    ],
+    "bloom_filter": [
+        "normalize_field", "BloomFilter", "load_known_filter", "update_known_filter", "rebuild_known_filter",
+        "KnownFieldChecker", "open_known_checker",
+    ],
+    "provenance_index": [
+        "encode_varints", "decode_postings", "ProvenanceIndexBuilder", "ProvenanceIndex", "new_index_builder",
+        "save_index", "build_provenance_report",
+    ],
+    "batch_scheduler": [
+        "PRIORITY_RECHECK", "PRIORITY_NORMAL", "estimate_batch_tokens", "estimate_file_tokens", "LatencyHistory",
+        "BatchTask", "BatchScheduler",
+    ],
+    "work_queue": ["new_worker_id", "Lease", "WorkQueue", "run_worker", "collect_results", "run_distributed"],
+}
+_NAME_TO_MODULE = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_NAME_TO_MODULE)
+
+
+def __getattr__(name):
+    module_name = _NAME_TO_MODULE.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # 缓存到包命名空间，之后访问不再经过__getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
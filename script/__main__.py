@@ -0,0 +1,5 @@
+# 支持 python -m script 运行命令行
+from script.sens_finder import cli
+
+if __name__ == "__main__":
+    cli()
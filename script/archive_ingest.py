@@ -0,0 +1,406 @@
+import io
+import os
+import sys
+import bz2
+import gzip
+import lzma
+import zlib
+import queue
+import tarfile
+import zipfile
+import logging
+import argparse
+import threading
+import traceback
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    ARCHIVE_MAX_MEMBER_SIZE,
+    ARCHIVE_MAX_TOTAL_SIZE,
+    ARCHIVE_MAX_DEPTH,
+    ARCHIVE_CONCURRENCY,
+    ARCHIVE_QUEUE_SIZE
+)
+
+from script.binary_strings import (
+    MAGIC_READ_SIZE,
+    DEFAULT_MIN_STRING_LENGTH,
+    detect_executable_format,
+    extract_buffer_strings,
+    extract_strings_with_offsets
+)
+from script.data_preprocess import RAW_FILE_ENCODINGS
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 成员来源路径中外层归档与成员路径的分隔符，如firmware.tar.gz!/rootfs.zip!/bin/busybox
+MEMBER_SEPARATOR = "!/"
+# 成员类型：文本按空白分词，可执行文件提取可打印字符串
+MEMBER_KINDS = ("text", "binary")
+# 识别归档格式需读取的字节数（tar的ustar标记位于第257字节）
+ARCHIVE_SNIFF_SIZE = 512
+TAR_MAGIC_OFFSET = 257
+# 判断成员是否为文本时检查的字节数（含NUL字节的非可执行成员视为其他二进制数据，如图片，跳过）
+TEXT_SNIFF_SIZE = 8192
+# 单文件压缩格式 -> 解压流
+DECOMPRESSORS = {
+    "gzip": lambda fileobj: gzip.GzipFile(fileobj=fileobj),
+    "xz": lzma.LZMAFile,
+    "bz2": bz2.BZ2File,
+}
+COMPRESSED_SUFFIXES = {"gzip": (".gz", ".tgz"), "xz": (".xz", ".txz"), "bz2": (".bz2", ".tbz2")}
+# 读取归档时可能出现的错误（损坏、截断或格式不符），出现后跳过该归档的剩余成员
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, lzma.LZMAError, zlib.error, EOFError, OSError, ValueError)
+# 打开zip单个成员时可能出现的错误（不支持的压缩方式），出现后只跳过该成员；加密成员在打开前按标志位跳过
+ZIP_MEMBER_ERRORS = (NotImplementedError,)
+# zip成员通用标志位中的加密位
+ZIP_FLAG_ENCRYPTED = 0x1
+
+# 队列结束标记
+_DONE = object()
+
+
+class ArchiveLimitError(Exception):
+    """归档累计解压字节数超过ARCHIVE_MAX_TOTAL_SIZE"""
+
+
+def detect_archive_format(header):
+    """
+    根据文件头识别归档格式
+
+    返回:
+        str: "zip"、"tar"、"gzip"、"xz"、"bz2"之一，不是归档时返回None
+    """
+    if header.startswith(b"PK\x03\x04") or header.startswith(b"PK\x05\x06"):
+        return "zip"
+    if header.startswith(b"\x1f\x8b"):
+        return "gzip"
+    if header.startswith(b"\xfd7zXZ\x00"):
+        return "xz"
+    if header.startswith(b"BZh"):
+        return "bz2"
+    if header[TAR_MAGIC_OFFSET:TAR_MAGIC_OFFSET + 5] == b"ustar":
+        return "tar"
+    return None
+
+
+def is_archive(file_path):
+    """判断文件是否为可读取的归档（按文件头识别，不依赖扩展名）"""
+    try:
+        with open(file_path, "rb") as f:
+            return detect_archive_format(f.read(ARCHIVE_SNIFF_SIZE)) is not None
+    except OSError:
+        return False
+
+
+def classify_member(data):
+    """
+    判断成员类型
+
+    返回:
+        str: "archive"（嵌套归档）、"binary"（可执行文件）、"text"，其他二进制数据返回None
+    """
+    header = bytes(data[:ARCHIVE_SNIFF_SIZE])
+    if detect_archive_format(header) is not None:
+        return "archive"
+    file_format = detect_executable_format(header[:MAGIC_READ_SIZE])
+    # #!脚本本身是文本，按文本分词
+    if file_format is not None and file_format != "script":
+        return "binary"
+    if b"\0" in data[:TEXT_SNIFF_SIZE]:
+        return None
+    return "text"
+
+
+def decode_text(data):
+    """按RAW_FILE_ENCODINGS顺序解码成员内容，与data_preprocess.read_file_fields一致"""
+    for encoding in RAW_FILE_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+class _PrefixedStream:
+    """把已读出的文件头拼回解压流前面，供tarfile以流模式继续读取"""
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        if not self.prefix:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.prefix = self.prefix + self.stream.read(), b""
+            return data
+        data, self.prefix = self.prefix[:size], self.prefix[size:]
+        if len(data) < size:
+            data += self.stream.read(size - len(data))
+        return data
+
+
+def _read_member(stream, size, source, budget):
+    """
+    读取一个成员的内容（声明大小超过ARCHIVE_MAX_MEMBER_SIZE时跳过，实际读取同样受此限制）
+
+    返回:
+        bytes: 成员内容，跳过时返回None
+    """
+    if size is not None and size > ARCHIVE_MAX_MEMBER_SIZE:
+        logger.warning(f"成员 {source} 大小 {size} 字节超过上限 {ARCHIVE_MAX_MEMBER_SIZE}，跳过")
+        return None
+    data = stream.read(ARCHIVE_MAX_MEMBER_SIZE + 1)
+    if len(data) > ARCHIVE_MAX_MEMBER_SIZE:
+        logger.warning(f"成员 {source} 解压后超过上限 {ARCHIVE_MAX_MEMBER_SIZE} 字节，跳过")
+        return None
+    budget["bytes"] += len(data)
+    if budget["bytes"] > ARCHIVE_MAX_TOTAL_SIZE:
+        raise ArchiveLimitError(f"累计解压超过 {ARCHIVE_MAX_TOTAL_SIZE} 字节")
+    return data
+
+
+def _iter_member(data, source, depth, budget, kinds, min_length):
+    """按成员类型产出(source, fields, offsets)，嵌套归档递归展开"""
+    kind = classify_member(data)
+    if kind == "archive":
+        archive_format = detect_archive_format(bytes(data[:ARCHIVE_SNIFF_SIZE]))
+        try:
+            yield from _iter_archive(io.BytesIO(data), archive_format, source, depth + 1, budget, kinds, min_length)
+        except ARCHIVE_ERRORS as e:
+            # 嵌套归档损坏只跳过它自己，外层归档继续读取
+            logger.warning(f"读取嵌套归档 {source} 失败！错误：{type(e).__name__} - {e}，跳过")
+    elif kind == "binary" and "binary" in kinds:
+        offsets = extract_buffer_strings(data, min_length=min_length)
+        yield source, list(offsets), list(offsets.values())
+    elif kind == "text" and "text" in kinds:
+        text = decode_text(data)
+        if text is not None:
+            yield source, text.split(), None
+    elif kind is None:
+        logger.info(f"成员 {source} 不是文本、可执行文件或归档，跳过")
+
+
+def _iter_archive(fileobj, archive_format, source, depth, budget, kinds, min_length):
+    """逐个成员流式读取一个归档（zip需要可随机访问的fileobj，tar及压缩流只顺序读取）"""
+    if depth > ARCHIVE_MAX_DEPTH:
+        logger.warning(f"归档 {source} 嵌套超过 {ARCHIVE_MAX_DEPTH} 层，跳过")
+        return
+    prefix = source + MEMBER_SEPARATOR
+    if archive_format == "zip":
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                member_source = prefix + info.filename
+                if info.flag_bits & ZIP_FLAG_ENCRYPTED:
+                    logger.warning(f"成员 {member_source} 已加密，跳过")
+                    continue
+                try:
+                    with archive.open(info) as stream:
+                        data = _read_member(stream, info.file_size, member_source, budget)
+                except ZIP_MEMBER_ERRORS as e:
+                    logger.warning(f"读取成员 {member_source} 失败！错误：{type(e).__name__} - {e}，跳过")
+                    continue
+                if data is not None:
+                    yield from _iter_member(data, member_source, depth, budget, kinds, min_length)
+    elif archive_format == "tar":
+        # 流模式只顺序读取，不需要随机访问，tar.gz等压缩包在解压的同时逐个成员处理
+        with tarfile.open(fileobj=fileobj, mode="r|") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                member_source = prefix + (member.name[2:] if member.name.startswith("./") else member.name)
+                data = _read_member(archive.extractfile(member), member.size, member_source, budget)
+                if data is not None:
+                    yield from _iter_member(data, member_source, depth, budget, kinds, min_length)
+    else:
+        # gzip/xz/bz2：解压后是tar时按tar读取，否则整体作为一个成员（名称去掉压缩扩展名）
+        stream = DECOMPRESSORS[archive_format](fileobj)
+        header = stream.read(ARCHIVE_SNIFF_SIZE)
+        if detect_archive_format(header) == "tar":
+            yield from _iter_archive(_PrefixedStream(header, stream), "tar", source, depth, budget, kinds,
+                                     min_length)
+            return
+        name = os.path.basename(source.rsplit(MEMBER_SEPARATOR, 1)[-1])
+        for suffix in COMPRESSED_SUFFIXES[archive_format]:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        member_source = prefix + name
+        data = _read_member(_PrefixedStream(header, stream), None, member_source, budget)
+        if data is not None:
+            yield from _iter_member(data, member_source, depth, budget, kinds, min_length)
+
+
+def iter_archive_sources(file_path, kinds=MEMBER_KINDS, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    流式读取一个归档文件（含嵌套归档）的全部成员，不解压到磁盘
+
+    参数:
+        file_path (str): 归档文件路径
+        kinds (tuple): 需要产出的成员类型（"text"、"binary"）
+        min_length (int): 可执行文件成员的最短可打印字符序列长度
+
+    返回:
+        generator: 逐个产出(source, fields, offsets)，source为"归档路径!/成员路径"；
+            可执行文件的offsets为各字符串在成员中首次出现的偏移，文本成员为None
+    """
+    budget = {"bytes": 0}
+    try:
+        with open(file_path, "rb") as f:
+            archive_format = detect_archive_format(f.read(ARCHIVE_SNIFF_SIZE))
+            f.seek(0)
+            if archive_format is None:
+                logger.warning(f"{file_path} 不是可识别的归档文件，跳过")
+                return
+            yield from _iter_archive(f, archive_format, file_path, 1, budget, kinds, min_length)
+    except ArchiveLimitError as e:
+        logger.warning(f"归档 {file_path} {e}，停止读取剩余成员")
+    except ARCHIVE_ERRORS as e:
+        logger.warning(f"读取归档 {file_path} 失败！错误：{type(e).__name__} - {e}，跳过剩余成员")
+
+
+def iter_path_sources(file_path, kinds=MEMBER_KINDS, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """单个文件：归档按成员展开，可执行文件直接提取字符串，文本文件按空白分词"""
+    if is_archive(file_path):
+        yield from iter_archive_sources(file_path, kinds, min_length)
+        return
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(ARCHIVE_SNIFF_SIZE)
+    except OSError as e:
+        logger.error(f"读取文件 {file_path} 失败！错误：{e}，跳过该文件")
+        return
+    if "binary" in kinds and classify_member(header) == "binary":
+        offsets = extract_strings_with_offsets(file_path, min_length=min_length)
+        yield file_path, list(offsets), list(offsets.values())
+    elif "text" in kinds and classify_member(header) == "text":
+        try:
+            with open(file_path, "rb") as f:
+                text = decode_text(f.read())
+        except OSError as e:
+            logger.error(f"读取文件 {file_path} 失败！错误：{e}，跳过该文件")
+            return
+        if text is not None:
+            yield file_path, text.split(), None
+
+
+def _iter_input_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in sorted(files):
+                    file_path = os.path.join(root, filename)
+                    if not os.path.islink(file_path):
+                        yield file_path
+        else:
+            yield path
+
+
+def iter_sources(paths, kinds=MEMBER_KINDS, concurrency=ARCHIVE_CONCURRENCY, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    读取多个文件或目录（目录递归遍历）中的全部内容，多个归档由concurrency个线程同时读取
+
+    解压在zlib/lzma/bz2的C实现中进行，多个归档可以并行解压；读出的成员经有界队列交给调用方，
+    调用方消费较慢时读取线程等待，内存占用受ARCHIVE_QUEUE_SIZE和ARCHIVE_MAX_MEMBER_SIZE约束
+
+    返回:
+        generator: 逐个产出(source, fields, offsets)，格式同iter_archive_sources，
+            可直接作为run_pipeline(sources=...)或iter_field_batches(sources=...)的输入；
+            不同归档的成员交错产出，同一归档内保持成员顺序
+    """
+    files = list(_iter_input_files(paths))
+    if concurrency <= 1 or len(files) <= 1:
+        for file_path in files:
+            yield from iter_path_sources(file_path, kinds, min_length)
+        return
+
+    pending = queue.Queue()
+    for file_path in files:
+        pending.put(file_path)
+    results = queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE)
+    stop_event = threading.Event()
+
+    def put(item):
+        # 调用方提前结束迭代时放弃等待，避免读取线程永久阻塞
+        while not stop_event.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_files():
+        try:
+            while not stop_event.is_set():
+                try:
+                    file_path = pending.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    for item in iter_path_sources(file_path, kinds, min_length):
+                        if not put(item):
+                            return
+                except Exception as e:
+                    logger.error(f"读取 {file_path} 时发生异常：{e}")
+                    logger.error(traceback.format_exc())
+        finally:
+            put(_DONE)
+
+    threads = [threading.Thread(target=read_files, name=f"archive-{index}", daemon=True)
+               for index in range(min(concurrency, len(files)))]
+    for thread in threads:
+        thread.start()
+    try:
+        finished = 0
+        while finished < len(threads):
+            item = results.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            yield item
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+
+def ingest(paths, kinds=MEMBER_KINDS, concurrency=ARCHIVE_CONCURRENCY):
+    """
+    读取归档（及普通文件、目录）并在同一进程内直接送入流水线，不解压到磁盘；
+    批次和分类结果的source列记录成员路径（如firmware.tar.gz!/bin/busybox），offset列记录可执行文件中的偏移
+    """
+    from script.pipeline import run_pipeline
+
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        error_msg = f"错误：{', '.join(missing)} 不存在"
+        logger.error(error_msg)
+        print(error_msg)
+        return
+    logger.info(f"开始读取归档：{', '.join(paths)}，并发数：{concurrency}")
+    run_pipeline(iter_sources(paths, kinds, concurrency), description=f"归档读取：{', '.join(paths)}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="流式读取归档文件（zip、tar、tar.gz、tar.xz等，支持嵌套）并送入分类流水线")
+    parser.add_argument("paths", nargs="+", help="归档文件、普通文件或目录")
+    parser.add_argument("--concurrency", type=int, default=ARCHIVE_CONCURRENCY,
+                        help=f"同时读取的归档数，默认ARCHIVE_CONCURRENCY（{ARCHIVE_CONCURRENCY}）")
+    parser.add_argument("--binary-only", action="store_true", help="只提取可执行文件中的字符串，忽略文本成员")
+    return parser
+
+
+# 执行归档读取
+if __name__ == "__main__":
+    setup_logging("archive_ingest")
+    args = build_parser().parse_args()
+    ingest(args.paths, ("binary",) if args.binary_only else MEMBER_KINDS, args.concurrency)
@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import heapq
+import logging
+import itertools
+import threading
+import traceback
+from datetime import datetime
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    LLM_SERVICE,
+    SCHEDULER_SPLIT_ENABLED,
+    SCHEDULER_MIN_SPLIT_SIZE,
+    SCHEDULER_HISTORY_PATH,
+    SCHEDULER_HISTORY_DECAY
+)
+
+logger = logging.getLogger(__name__)
+
+# 优先级类别（数值越小越先派发）：问题字段复核排在所有普通分类批次之前
+PRIORITY_RECHECK = 0
+PRIORITY_NORMAL = 1
+# 批次文件表头"raw_text\n"的字节数，按文件大小估算令牌数时扣除
+_HEADER_BYTES = len("raw_text\n")
+# 历史统计项：权重、令牌数、耗时、令牌数平方、令牌数×耗时（加权最小二乘所需的累加量）
+_STAT_KEYS = ("weight", "tokens", "seconds", "tokens_sq", "tokens_seconds")
+
+
+def estimate_batch_tokens(fields):
+    """按UTF-8字节数估算一组字段的令牌数（约4字节1个令牌），与按批次文件大小估算的口径一致"""
+    return sum(len(str(field).encode("utf-8")) + 1 for field in fields) // 4
+
+
+def estimate_file_tokens(path):
+    """按批次文件大小估算令牌数（不读取文件内容），文件不存在时返回0"""
+    try:
+        return max(0, os.path.getsize(path) - _HEADER_BYTES) // 4
+    except OSError:
+        return 0
+
+
+class LatencyHistory:
+    """
+    按LLM服务记录的请求耗时历史：拟合 耗时 ≈ 每次请求的固定开销 + 每令牌耗时 × 估算令牌数
+    （指数衰减加权最小二乘，近期请求权重更高），跨运行保存在SCHEDULER_HISTORY_PATH；线程安全
+    """
+
+    def __init__(self, backend=None, path=None, decay=None):
+        self.backend = backend or LLM_SERVICE
+        self.path = path or SCHEDULER_HISTORY_PATH
+        self.decay = decay or SCHEDULER_HISTORY_DECAY
+        self._lock = threading.Lock()
+        self._history = self._load()
+        stats = self._history.get(self.backend, {})
+        self._stats = {key: float(stats.get(key, 0.0)) for key in _STAT_KEYS}
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+            return history if isinstance(history, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取调度历史 {self.path} 失败，按令牌数估算批次耗时：{e}")
+            return {}
+
+    def observe(self, tokens, seconds):
+        """记录一次请求的估算令牌数和耗时"""
+        with self._lock:
+            stats = self._stats
+            for key in _STAT_KEYS:
+                stats[key] *= self.decay
+            stats["weight"] += 1.0
+            stats["tokens"] += tokens
+            stats["seconds"] += seconds
+            stats["tokens_sq"] += tokens * tokens
+            stats["tokens_seconds"] += tokens * seconds
+
+    def coefficients(self):
+        """
+        返回(每次请求固定开销秒数, 每令牌秒数)，没有历史时返回None
+
+        令牌数变化不足以拟合固定开销（如全部为同样大小的批次）或拟合结果为负时，固定开销取0
+        """
+        with self._lock:
+            weight, tokens, seconds, tokens_sq, tokens_seconds = (self._stats[key] for key in _STAT_KEYS)
+        if weight <= 0 or tokens <= 0:
+            return None
+        variance = weight * tokens_sq - tokens * tokens
+        if weight >= 2 and variance > 1e-6 * weight * tokens_sq:
+            slope = (weight * tokens_seconds - tokens * seconds) / variance
+            intercept = (seconds - slope * tokens) / weight
+            if slope > 0 and intercept >= 0:
+                return intercept, slope
+        return 0.0, seconds / tokens
+
+    def estimate(self, tokens):
+        """估算一个批次的耗时（秒）；没有历史时返回令牌数本身（只用于排序）"""
+        coefficients = self.coefficients()
+        if coefficients is None:
+            return float(tokens)
+        return coefficients[0] + coefficients[1] * tokens
+
+    def save(self):
+        """保存历史（先写临时文件再替换），失败时只记录错误"""
+        with self._lock:
+            stats = dict(self._stats)
+        if stats["weight"] <= 0:
+            return
+        self._history[self.backend] = dict(stats, updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._history, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"保存调度历史 {self.path} 失败！错误：{e}")
+
+
+class BatchTask:
+    """调度单元：一个提交的批次（根任务）或拆分出的子批次，子批次的结果汇总到根任务"""
+
+    def __init__(self, name, frame=None, path=None, priority=PRIORITY_NORMAL, tokens=0, root=None, part=0):
+        self.name = name
+        self.frame = frame
+        self.path = path
+        self.priority = priority
+        self.tokens = tokens
+        self.root = root or self
+        self.part = part
+        self.estimated_seconds = None
+        # 以下只在根任务上使用
+        self.remaining = 1
+        self.results = {}
+        self.failed = False
+
+
+class BatchScheduler:
+    """
+    分类批次调度器：按(优先级, 估算耗时从大到小)派发批次，排队批次不足时把批次拆成子批次交给空闲线程
+
+    - handler(task)在工作线程中调用，处理task.frame（含raw_text列）并返回结果数据框，失败返回None
+    - 根任务的全部子批次完成后调用on_complete(task, result)，result为按子批次顺序合并的结果，
+      任一子批次失败时为None；on_complete返回False表示该批次失败（如保存失败）
+    - 运行期间可以继续submit（如插队的复核批次），run在全部批次完成后返回
+    """
+
+    def __init__(self, handler, on_complete=None, workers=1, history=None, split=None, min_split_size=None):
+        self.handler = handler
+        self.on_complete = on_complete
+        self.workers = max(1, workers)
+        self.history = history or LatencyHistory()
+        self.split_enabled = SCHEDULER_SPLIT_ENABLED if split is None else split
+        self.min_split_size = min_split_size or SCHEDULER_MIN_SPLIT_SIZE
+        self.succeeded = 0
+        self.failed = 0
+        self.splits = 0
+        self._heap = []
+        self._sequence = itertools.count()
+        self._unfinished = 0
+        self._condition = threading.Condition()
+
+    def submit(self, name, frame=None, path=None, priority=PRIORITY_NORMAL):
+        """
+        提交一个批次
+
+        参数:
+            name (str): 批次名称（如batch_1.csv）
+            frame (pd.DataFrame): 批次数据（含raw_text列）
+            path (str): 批次CSV文件路径（未传frame时使用，派发时才读取）
+            priority (int): 优先级类别，PRIORITY_RECHECK先于PRIORITY_NORMAL派发
+
+        返回:
+            BatchTask: 提交的任务
+        """
+        tokens = estimate_batch_tokens(frame["raw_text"]) if frame is not None else estimate_file_tokens(path)
+        task = BatchTask(name, frame, path, priority, tokens)
+        with self._condition:
+            self._unfinished += 1
+            self._push(task)
+            self._condition.notify()
+        return task
+
+    def _push(self, task):
+        task.estimated_seconds = self.history.estimate(task.tokens)
+        heapq.heappush(self._heap, (task.priority, -task.estimated_seconds, next(self._sequence), task))
+
+    def _take(self):
+        """取出下一个任务，队列为空时等待；全部任务完成时返回None"""
+        with self._condition:
+            while not self._heap:
+                if self._unfinished == 0:
+                    return None
+                self._condition.wait()
+            return heapq.heappop(self._heap)[-1]
+
+    def _split(self, task):
+        """
+        排队批次少于其他线程数（运行末尾或批次数少于线程数）时，把根任务按字段拆成子批次，
+        其余子批次放回队列由空闲线程领取，返回当前线程先处理的子批次
+        """
+        if not self.split_enabled or task.root is not task:
+            return task
+        count = len(task.frame)
+        with self._condition:
+            spare = self.workers - 1 - len(self._heap)
+            parts = min(spare + 1, count // self.min_split_size)
+            if parts < 2:
+                return task
+            bounds = [count * index // parts for index in range(parts + 1)]
+            pieces = [
+                BatchTask(f"{task.name}#{index + 1}", task.frame.iloc[start:end], priority=task.priority,
+                          tokens=task.tokens * (end - start) // count, root=task, part=index)
+                for index, (start, end) in enumerate(zip(bounds, bounds[1:]))
+            ]
+            task.remaining = parts
+            self._unfinished += parts - 1
+            for piece in pieces[1:]:
+                self._push(piece)
+            self.splits += 1
+            self._condition.notify_all()
+        logger.info(f"{task.name} 拆分为 {parts} 个子批次（{count} 个字段），由空闲线程并行处理")
+        return pieces[0]
+
+    def _finish(self, task, result):
+        """记录子批次结果，根任务全部完成时合并结果并调用on_complete"""
+        root = task.root
+        with self._condition:
+            root.results[task.part] = result
+            root.failed = root.failed or result is None
+            root.remaining -= 1
+            done = root.remaining == 0
+        if done:
+            merged = None
+            if not root.failed:
+                results = [root.results[part] for part in sorted(root.results)]
+                merged = results[0] if len(results) == 1 else pd.concat(results, ignore_index=True)
+            root.results = {}
+            succeeded = merged is not None
+            if self.on_complete is not None:
+                try:
+                    succeeded = self.on_complete(root, merged) is not False and succeeded
+                except Exception as e:
+                    logger.error(f"处理{root.name}的结果时发生异常：{e}")
+                    logger.error(traceback.format_exc())
+                    succeeded = False
+            with self._condition:
+                if succeeded:
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+        with self._condition:
+            self._unfinished -= 1
+            self._condition.notify_all()
+
+    def _worker(self):
+        while True:
+            task = self._take()
+            if task is None:
+                return
+            if task.frame is None:
+                try:
+                    task.frame = pd.read_csv(task.path, encoding="utf-8")
+                except Exception as e:
+                    logger.error(f"读取批次文件 {task.path} 失败！错误：{e}")
+                    self._finish(task, None)
+                    continue
+            task = self._split(task)
+            started = time.perf_counter()
+            try:
+                result = self.handler(task)
+            except Exception as e:
+                logger.error(f"处理{task.name}时发生异常：{e}")
+                logger.error(traceback.format_exc())
+                result = None
+            if result is not None:
+                self.history.observe(task.tokens, time.perf_counter() - started)
+            self._finish(task, result)
+
+    def run(self):
+        """
+        启动工作线程处理全部批次（含运行期间提交的批次），结束后保存耗时历史
+
+        返回:
+            tuple: (成功批次数, 失败批次数)
+        """
+        coefficients = self.history.coefficients()
+        with self._condition:
+            queued = len(self._heap)
+            estimated = sum(-item[1] for item in self._heap)
+        if coefficients is not None and queued:
+            logger.info(f"共 {queued} 个批次，按历史耗时（每次请求 {coefficients[0]:.2f} 秒 + 每千令牌 "
+                        f"{coefficients[1] * 1000:.2f} 秒）估算LLM总耗时约 {estimated:.0f} 秒，"
+                        f"{self.workers} 个线程约 {estimated / self.workers:.0f} 秒")
+        threads = [threading.Thread(target=self._worker, name=f"batch-scheduler-{index}", daemon=True)
+                   for index in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.history.save()
+        if self.splits:
+            logger.info(f"调度完成：{self.splits} 个批次在运行末尾拆分为子批次")
+        return self.succeeded, self.failed
@@ -0,0 +1,283 @@
+import os
+import re
+import mmap
+import struct
+
+# 二进制字符串的进程内提取：按魔数识别可执行文件格式，解析节表确定扫描范围，
+# 直接在内存映射（或内存中的字节串）上匹配可打印字符序列，不调用file/strip/strings命令；
+# 清洗规则与test/binary_strings_extractor.py中的process_string_output一致
+
+# Bytes read to detect the executable format
+MAGIC_READ_SIZE = 64
+# Same default minimum run length and character set as GNU strings (printable ASCII and tab)
+DEFAULT_MIN_STRING_LENGTH = 4
+_printable_run_patterns = {}
+# Byte-level versions of the process_string_output cleanup, applied to all runs of a file at once
+NON_ALPHA_BYTES_PATTERN = re.compile(rb'[^a-zA-Z]+')
+REPEATED_LETTER_BYTES_PATTERN = re.compile(rb'([a-zA-Z])\1{2,}')
+LETTER_RUN_BYTES_PATTERN = re.compile(rb'[a-zA-Z]+')
+
+ELF_MAGIC = b'\x7fELF'
+MACHO_MAGICS = {
+    b'\xfe\xed\xfa\xce': ('>', 32), b'\xce\xfa\xed\xfe': ('<', 32),
+    b'\xfe\xed\xfa\xcf': ('>', 64), b'\xcf\xfa\xed\xfe': ('<', 64),
+}
+MACHO_FAT_MAGIC = b'\xca\xfe\xba\xbe'
+# Java class files share the fat Mach-O magic; real fat binaries have only a few architectures
+MACHO_FAT_MAX_ARCHS = 20
+
+ELF_SHT_SYMTAB = 2
+ELF_SHT_NOBITS = 8
+MACHO_LC_SEGMENT = 0x1
+MACHO_LC_SYMTAB = 0x2
+MACHO_LC_SEGMENT_64 = 0x19
+MACHO_S_ZEROFILL = 0x1
+
+# Section names given on the command line also match the equivalent sections of other formats
+SECTION_ALIASES = {
+    '.rodata': {'.rodata', '.rdata', '__cstring', '__const'},
+    '.data': {'.data', '__data'},
+    '.text': {'.text', '__text'},
+}
+
+def detect_executable_format(header):
+    """
+    Return 'elf', 'pe', 'macho', 'macho-fat' or 'script' from the first bytes of a file, or None.
+    Scripts with a #! line are included because file reports them as "text executable"
+    """
+    if header.startswith(ELF_MAGIC):
+        return 'elf'
+    if header[:4] in MACHO_MAGICS:
+        return 'macho'
+    if header.startswith(MACHO_FAT_MAGIC) and len(header) >= 8:
+        if 0 < struct.unpack('>I', header[4:8])[0] <= MACHO_FAT_MAX_ARCHS:
+            return 'macho-fat'
+    if header.startswith(b'MZ'):
+        return 'pe'
+    if header.startswith(b'#!'):
+        return 'script'
+    return None
+
+def is_binary_native(file_path):
+    """Check if the file is an executable (ELF, PE/DOS, Mach-O or #! script) by its magic bytes"""
+    try:
+        with open(file_path, 'rb') as f:
+            return detect_executable_format(f.read(MAGIC_READ_SIZE)) is not None
+    except OSError:
+        return False
+
+def _c_string(data, offset):
+    end = data.find(b'\0', offset)
+    return bytes(data[offset:end if end >= 0 else len(data)]).decode('ascii', 'replace')
+
+def _elf_sections(data):
+    """Return ([(name, offset, size)], [(start, end) ranges removed by strip -s]) for an ELF file"""
+    is_64 = data[4] == 2
+    endian = '<' if data[5] == 1 else '>'
+    if is_64:
+        shoff, = struct.unpack_from(endian + 'Q', data, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + 'HHH', data, 0x3A)
+        header_format = endian + 'IIQQQQIIQQ'
+    else:
+        shoff, = struct.unpack_from(endian + 'I', data, 0x20)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + 'HHH', data, 0x2E)
+        header_format = endian + 'IIIIIIIIII'
+    headers = []
+    for index in range(shnum):
+        name, sh_type, _, _, offset, size, link, _, _, _ = struct.unpack_from(
+            header_format, data, shoff + index * shentsize)
+        headers.append((name, sh_type, offset, size, link))
+    names_offset = headers[shstrndx][2] if shstrndx < len(headers) else None
+
+    sections, stripped = [], []
+    stripped_indexes = set()
+    for index, (_, sh_type, _, _, link) in enumerate(headers):
+        if sh_type == ELF_SHT_SYMTAB:
+            stripped_indexes.update((index, link))
+    for index, (name, sh_type, offset, size, _) in enumerate(headers):
+        if sh_type == ELF_SHT_NOBITS or size == 0:
+            continue
+        section_name = _c_string(data, names_offset + name) if names_offset is not None else ''
+        sections.append((section_name, offset, size))
+        # strip -s removes the symbol table, its string table and debug sections
+        if index in stripped_indexes or section_name.startswith(('.debug', '.zdebug')):
+            stripped.append((offset, offset + size))
+    return sections, stripped
+
+def _pe_sections(data):
+    """Return ([(name, offset, size)], [COFF symbol table range]) for a PE file (none for plain DOS executables)"""
+    pe_offset, = struct.unpack_from('<I', data, 0x3C)
+    if data[pe_offset:pe_offset + 4] != b'PE\0\0':
+        return [], []
+    number_of_sections, = struct.unpack_from('<H', data, pe_offset + 6)
+    symbol_table, number_of_symbols = struct.unpack_from('<II', data, pe_offset + 12)
+    optional_header_size, = struct.unpack_from('<H', data, pe_offset + 20)
+    table_offset = pe_offset + 24 + optional_header_size
+    sections = []
+    for index in range(number_of_sections):
+        name, _, _, raw_size, raw_offset = struct.unpack_from('<8sIIII', data, table_offset + index * 40)
+        if raw_size:
+            sections.append((name.rstrip(b'\0').decode('ascii', 'replace'), raw_offset, raw_size))
+    stripped = []
+    if symbol_table and number_of_symbols:
+        # COFF symbols (18 bytes each) are followed by the string table, which starts with its own length
+        string_table = symbol_table + number_of_symbols * 18
+        string_table_size, = struct.unpack_from('<I', data, string_table)
+        stripped.append((symbol_table, string_table + string_table_size))
+    return sections, stripped
+
+def _macho_sections(data, base=0):
+    """Return ([(name, offset, size)], [symbol string table range]) for a thin Mach-O image starting at base"""
+    endian, bits = MACHO_MAGICS[bytes(data[base:base + 4])]
+    ncmds, = struct.unpack_from(endian + 'I', data, base + 16)
+    offset = base + (32 if bits == 64 else 28)
+    sections, stripped = [], []
+    for _ in range(ncmds):
+        cmd, cmdsize = struct.unpack_from(endian + 'II', data, offset)
+        if cmd in (MACHO_LC_SEGMENT, MACHO_LC_SEGMENT_64):
+            is_64 = cmd == MACHO_LC_SEGMENT_64
+            nsects, = struct.unpack_from(endian + 'I', data, offset + (64 if is_64 else 48))
+            section_offset = offset + (72 if is_64 else 56)
+            for _ in range(nsects):
+                if is_64:
+                    name, _, _, size, file_offset, _, _, _, flags = struct.unpack_from(
+                        endian + '16s16sQQIIIII', data, section_offset)
+                    section_offset += 80
+                else:
+                    name, _, _, size, file_offset, _, _, _, flags = struct.unpack_from(
+                        endian + '16s16sIIIIIII', data, section_offset)
+                    section_offset += 68
+                if size and file_offset and (flags & 0xff) != MACHO_S_ZEROFILL:
+                    sections.append((name.rstrip(b'\0').decode('ascii', 'replace'), base + file_offset, size))
+        elif cmd == MACHO_LC_SYMTAB:
+            _, _, string_offset, string_size = struct.unpack_from(endian + 'IIII', data, offset + 8)
+            stripped.append((base + string_offset, base + string_offset + string_size))
+        offset += cmdsize
+    return sections, stripped
+
+def _macho_fat_sections(data):
+    """Return sections and stripped ranges of every architecture in a fat Mach-O file"""
+    nfat_arch, = struct.unpack_from('>I', data, 4)
+    sections, stripped = [], []
+    for index in range(nfat_arch):
+        _, _, arch_offset, _, _ = struct.unpack_from('>IIIII', data, 8 + index * 20)
+        arch_sections, arch_stripped = _macho_sections(data, arch_offset)
+        sections.extend(arch_sections)
+        stripped.extend(arch_stripped)
+    return sections, stripped
+
+SECTION_PARSERS = {'elf': _elf_sections, 'pe': _pe_sections, 'macho': _macho_sections, 'macho-fat': _macho_fat_sections}
+
+def _subtract_ranges(size, removed):
+    """Return the parts of [0, size) not covered by the removed ranges"""
+    ranges, position = [], 0
+    for start, end in sorted(removed):
+        start, end = max(start, 0), min(end, size)
+        if start > position:
+            ranges.append((position, start))
+        position = max(position, end)
+    if position < size:
+        ranges.append((position, size))
+    return ranges
+
+def scan_ranges(data, file_format, sections=None):
+    """
+    Return the (start, end) byte ranges to scan: the named sections when given,
+    otherwise the whole file minus what strip -s would remove.
+    Falls back to the whole file when the headers cannot be parsed
+    """
+    size = len(data)
+    try:
+        found, stripped = SECTION_PARSERS[file_format](data)
+    except (struct.error, IndexError, KeyError, ValueError):
+        return [(0, size)]
+    if sections:
+        wanted = set()
+        for name in sections:
+            wanted.update(SECTION_ALIASES.get(name, {name}))
+        return [(offset, min(offset + length, size)) for name, offset, length in found
+                if name in wanted and offset < size]
+    return _subtract_ranges(size, stripped)
+
+def _printable_run_pattern(min_length):
+    pattern = _printable_run_patterns.get(min_length)
+    if pattern is None:
+        pattern = re.compile(rb'[\t\x20-\x7e]{%d,}' % min_length)
+        _printable_run_patterns[min_length] = pattern
+    return pattern
+
+def extract_strings_native(binary_path, sections=None, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    Extract strings from an executable in-process: printable runs are matched directly on a
+    memory-mapped copy of the file and cleaned the same way as process_string_output
+
+    Args:
+        binary_path: path of the executable
+        sections: optional section names to scan (e.g. ['.rodata', '.data']), default all but symbols/debug info
+        min_length: minimum printable run length (same as strings -n)
+    """
+    try:
+        with open(binary_path, 'rb') as f:
+            file_format = detect_executable_format(f.read(MAGIC_READ_SIZE))
+            if os.fstat(f.fileno()).st_size == 0:
+                return set()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                pattern = _printable_run_pattern(min_length)
+                runs = set()
+                for start, end in scan_ranges(data, file_format, sections):
+                    runs.update(pattern.findall(data, start, end))
+    except (OSError, ValueError):
+        return set()
+    return clean_string_runs(runs)
+
+def clean_string_runs(runs):
+    """
+    Same result as process_string_output for a collection of printable runs (bytes), but cleaned in
+    two regex passes over all unique runs joined together instead of line by line.
+    Runs are separated by spaces, so letter sequences never span two runs
+    """
+    blob = NON_ALPHA_BYTES_PATTERN.sub(b' ', b' '.join(runs))
+    blob = REPEATED_LETTER_BYTES_PATTERN.sub(b' ', blob)
+    return {part.decode('ascii') for part in set(blob.split()) if len(part) > 1 and len(set(part)) > 1}
+
+def extract_strings_with_offsets(binary_path, sections=None, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    Same strings as extract_strings_native, each with the file offset of its first occurrence
+
+    Returns:
+        dict mapping each string to its byte offset in binary_path
+    """
+    try:
+        with open(binary_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return {}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return extract_buffer_strings(data, sections, min_length)
+    except (OSError, ValueError):
+        return {}
+
+def extract_buffer_strings(data, sections=None, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    extract_strings_with_offsets for an executable already in memory (bytes or mmap),
+    e.g. an archive member read without unpacking to disk
+
+    Returns:
+        dict mapping each string to the offset of its first occurrence in data
+    """
+    file_format = detect_executable_format(bytes(data[:MAGIC_READ_SIZE]))
+    pattern = _printable_run_pattern(min_length)
+    offsets = {}
+    seen_runs = set()
+    for start, end in scan_ranges(data, file_format, sections):
+        for match in pattern.finditer(data, start, end):
+            run = match.group()
+            if run in seen_runs:
+                continue
+            seen_runs.add(run)
+            # Blank out repeated letters without changing positions, then take the letter runs
+            run = REPEATED_LETTER_BYTES_PATTERN.sub(lambda m: b' ' * len(m.group()), run)
+            for word in LETTER_RUN_BYTES_PATTERN.finditer(run):
+                part = word.group()
+                if len(part) > 1 and len(set(part)) > 1:
+                    offsets.setdefault(part.decode('ascii'), match.start() + word.start())
+    return offsets
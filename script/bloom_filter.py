@@ -0,0 +1,346 @@
+import os
+import sys
+import math
+import struct
+import hashlib
+import logging
+import argparse
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    MERGED_RESULTS_PATH,
+    RESULT_STORE_ENABLED,
+    RESULT_STORE_PATH,
+    MERGE_CHUNK_SIZE,
+    KNOWN_FIELD_FILTER_ENABLED,
+    KNOWN_FIELD_FILTER_PATH,
+    KNOWN_FIELD_FILTER_CAPACITY,
+    KNOWN_FIELD_FILTER_ERROR_RATE
+)
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 过滤器文件格式：魔数 + 头部（位数、哈希函数数、已加入的不同字段数、设计容量、设计误判率） + 位数组
+FILE_MAGIC = b"SFBLOOM1"
+HEADER_FORMAT = "<QIQQd"
+# 批量查询/添加时每次向量化处理的字段数（控制k×n位置矩阵的内存）
+VECTOR_CHUNK_SIZE = 100000
+
+
+def normalize_field(field):
+    """过滤器使用的规范化字段：去除首尾空白并做Unicode NFC规范化（只影响哈希，结果库仍按原始字段查询）"""
+    return unicodedata.normalize("NFC", field.strip())
+
+
+def _field_hashes(fields):
+    """每个字段两个64位哈希（blake2b，跨进程稳定），返回形状为(n, 2)的uint64数组"""
+    digest = b"".join(hashlib.blake2b(normalize_field(field).encode("utf-8"), digest_size=16).digest()
+                      for field in fields)
+    return np.frombuffer(digest, dtype="<u8").reshape(-1, 2)
+
+
+class BloomFilter:
+    """
+    持久化、可合并的布隆过滤器：判断字段是否在之前的运行中分类过
+
+    contains返回False时字段一定没有加入过；返回True时以约error_rate的概率误判，需再查询结果库确认。
+    位置由两个64位哈希按h1 + i*h2（i < k）生成，批量查询和添加用numpy向量化；
+    参数（位数和哈希函数数）相同的过滤器可按位或合并。
+    count为已加入的不同字段数：重复加入的字段不计数（误判为已存在的新字段也不计数，count略偏小）
+    """
+
+    def __init__(self, capacity=None, error_rate=None, num_bits=None, num_hashes=None):
+        # 容量和误判率默认取配置值（调用时读取）
+        self.capacity = max(1, int(capacity or KNOWN_FIELD_FILTER_CAPACITY))
+        self.error_rate = error_rate or KNOWN_FIELD_FILTER_ERROR_RATE
+        # 最优位数m = -n·ln(p)/(ln2)²，哈希函数数k = m/n·ln2
+        self.num_bits = num_bits or max(64, math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2))
+        self.num_hashes = num_hashes or max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, hashes):
+        h1 = hashes[:, 0:1]
+        h2 = hashes[:, 1:2]
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        # uint64按2^64回绕后再取模，与逐个计算结果一致
+        return (h1 + steps * h2) % np.uint64(self.num_bits)
+
+    def _present(self, positions):
+        """每行位置是否已全部置位"""
+        present = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return present.all(axis=1)
+
+    def update(self, fields):
+        """
+        批量添加字段（同一字段重复添加不影响位数组，也不增加count）
+
+        返回:
+            int: 本次新加入的字段数
+        """
+        fields = list(fields)
+        added = 0
+        for start in range(0, len(fields), VECTOR_CHUNK_SIZE):
+            hashes = np.unique(_field_hashes(fields[start:start + VECTOR_CHUNK_SIZE]), axis=0)
+            positions = self._positions(hashes)
+            new_positions = positions[~self._present(positions)]
+            if not len(new_positions):
+                continue
+            flat = new_positions.ravel()
+            np.bitwise_or.at(self.bits, flat >> np.uint64(3), np.left_shift(1, flat & np.uint64(7)).astype(np.uint8))
+            added += len(new_positions)
+        self.count += added
+        return added
+
+    def add(self, field):
+        self.update([field])
+
+    def contains_many(self, fields):
+        """批量查询，返回与fields对应的布尔数组（True表示可能已分类）"""
+        fields = list(fields)
+        result = np.zeros(len(fields), dtype=bool)
+        for start in range(0, len(fields), VECTOR_CHUNK_SIZE):
+            positions = self._positions(_field_hashes(fields[start:start + VECTOR_CHUNK_SIZE]))
+            result[start:start + len(positions)] = self._present(positions)
+        return result
+
+    def __contains__(self, field):
+        return bool(self.contains_many([field])[0])
+
+    def __len__(self):
+        return self.count
+
+    def compatible(self, other):
+        return self.num_bits == other.num_bits and self.num_hashes == other.num_hashes
+
+    def merge(self, other):
+        """
+        合并另一个参数相同的过滤器（按位或）；两者可能含有相同字段，合并后的字段数按置位比例估计
+        """
+        if not self.compatible(other):
+            raise ValueError(f"过滤器参数不同，无法合并：{self.num_bits}位/{self.num_hashes}个哈希 与 "
+                             f"{other.num_bits}位/{other.num_hashes}个哈希")
+        np.bitwise_or(self.bits, other.bits, out=self.bits)
+        self.count = max(self.count, other.count, self.estimated_count())
+        return self
+
+    def _fill_ratio(self):
+        return float(np.unpackbits(self.bits)[:self.num_bits].mean()) if self.num_bits else 0.0
+
+    def estimated_count(self):
+        """按置位比例估计的不同字段数：n ≈ -m/k·ln(1 - 置位比例)"""
+        fill = self._fill_ratio()
+        if fill >= 1.0:
+            return self.capacity
+        return round(-self.num_bits / self.num_hashes * math.log(1.0 - fill))
+
+    def estimated_error_rate(self):
+        """按当前已置位比例估计的误判率"""
+        return self._fill_ratio() ** self.num_hashes
+
+    def save(self, path):
+        """写入文件（先写临时文件再替换，写入中断不会损坏已有过滤器）"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(FILE_MAGIC)
+            f.write(struct.pack(HEADER_FORMAT, self.num_bits, self.num_hashes, self.count, self.capacity,
+                                self.error_rate))
+            f.write(self.bits.tobytes())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"{path} 不是布隆过滤器文件")
+            num_bits, num_hashes, count, capacity, error_rate = struct.unpack(
+                HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+            bits = np.frombuffer(f.read(), dtype=np.uint8).copy()
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError(f"{path} 位数组长度与头部不符，文件可能已损坏")
+        bloom = cls(capacity, error_rate, num_bits, num_hashes)
+        bloom.bits = bits
+        bloom.count = count
+        return bloom
+
+
+def load_known_filter(path=None):
+    """加载已分类字段过滤器（默认KNOWN_FIELD_FILTER_PATH），文件不存在或损坏时返回None"""
+    path = path or KNOWN_FIELD_FILTER_PATH
+    if not os.path.exists(path):
+        return None
+    try:
+        return BloomFilter.load(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.error(f"加载已分类字段过滤器 {path} 失败！错误：{e}")
+        return None
+
+
+def update_known_filter(fields, path=None):
+    """把新分类的字段加入已分类字段过滤器（文件不存在时按配置容量新建）"""
+    path = path or KNOWN_FIELD_FILTER_PATH
+    bloom = load_known_filter(path) or BloomFilter()
+    bloom.update(fields)
+    bloom.save(path)
+    if bloom.count > bloom.capacity:
+        logger.warning(f"已分类字段过滤器已加入 {bloom.count} 个字段，超过设计容量 {bloom.capacity}，"
+                       f"误判率约 {bloom.estimated_error_rate():.4f}，建议以更大容量重建")
+    return bloom
+
+
+def rebuild_known_filter(merged_path=None, path=None, capacity=None, error_rate=None, store_path=None):
+    """
+    重建已分类字段过滤器（默认KNOWN_FIELD_FILTER_PATH）
+
+    默认从结果库（默认RESULT_STORE_PATH）读取所有运行中分类过的字段；指定merged_path时改为读取合并结果文件。
+    开启过滤后合并结果文件只含本次运行新分类的字段，因此从合并结果文件读取时加入已有过滤器，不丢失之前运行的字段
+
+    参数:
+        merged_path (str): 合并结果文件，不指定时从结果库重建
+        capacity (int): 设计容量，默认取KNOWN_FIELD_FILTER_CAPACITY与字段数两倍中的较大值
+        error_rate (float): 设计误判率，默认KNOWN_FIELD_FILTER_ERROR_RATE
+        store_path (str): 结果库路径，默认RESULT_STORE_PATH
+
+    返回:
+        BloomFilter: 重建后的过滤器，结果库或合并结果文件不存在时返回None
+    """
+    path = path or KNOWN_FIELD_FILTER_PATH
+    if merged_path is None:
+        store_path = store_path or RESULT_STORE_PATH
+        if not os.path.exists(store_path):
+            logger.error(f"结果库 {store_path} 不存在，无法重建过滤器（可用--merged指定合并结果文件）")
+            print(f"结果库 {store_path} 不存在，无法重建过滤器（可用--merged指定合并结果文件）")
+            return None
+        from script.result_store import ResultStore
+        with ResultStore(store_path) as store:
+            if capacity is None:
+                capacity = max(KNOWN_FIELD_FILTER_CAPACITY, store.count_distinct_fields() * 2)
+            bloom = BloomFilter(capacity, error_rate)
+            for fields in store.iter_distinct_fields():
+                bloom.update(fields)
+        source = store_path
+    else:
+        if not os.path.exists(merged_path):
+            logger.error(f"合并结果文件 {merged_path} 不存在，无法重建过滤器")
+            print(f"合并结果文件 {merged_path} 不存在，无法重建过滤器")
+            return None
+        bloom = load_known_filter(path) if capacity is None and error_rate is None else None
+        if bloom is None:
+            if capacity is None:
+                with open(merged_path, "rb") as f:
+                    rows = sum(1 for _ in f) - 1
+                capacity = max(KNOWN_FIELD_FILTER_CAPACITY, rows * 2)
+            bloom = BloomFilter(capacity, error_rate)
+            if os.path.exists(path):
+                logger.warning(f"按新参数重建过滤器，{path} 中之前运行的字段将丢失（可不指定容量和误判率以加入已有过滤器）")
+        for chunk in pd.read_csv(merged_path, usecols=["raw_text"], dtype=str, chunksize=MERGE_CHUNK_SIZE,
+                                 encoding="utf-8-sig"):
+            bloom.update(chunk["raw_text"].dropna())
+        source = merged_path
+    bloom.save(path)
+    logger.info(f"已从 {source} 重建已分类字段过滤器：{bloom.count} 个字段，保存到 {path}")
+    print(f"已从 {source} 重建已分类字段过滤器：{bloom.count} 个字段，保存到 {path}")
+    return bloom
+
+
+class KnownFieldChecker:
+    """
+    预处理阶段跳过已分类字段：先查布隆过滤器，只有过滤器判断可能已分类的字段才查询结果库确认
+
+    非线程安全；positives与confirmed分别记录过滤器命中数和结果库确认数（两者之差为误判数）
+    """
+
+    def __init__(self, bloom, store):
+        self.bloom = bloom
+        self.store = store
+        self.positives = 0
+        self.confirmed = 0
+
+    def split(self, fields):
+        """
+        返回(未分类字段列表, 已分类字段列表)，均保持原顺序
+        """
+        fields = list(fields)
+        if not fields:
+            return [], []
+        maybe_known = self.bloom.contains_many(fields)
+        candidates = [field for field, flag in zip(fields, maybe_known) if flag]
+        if not candidates:
+            return fields, []
+        self.positives += len(candidates)
+        found = self.store.lookup(candidates)
+        self.confirmed += len(found)
+        if not found:
+            return fields, []
+        return [field for field in fields if field not in found], [field for field in candidates if field in found]
+
+
+def open_known_checker():
+    """
+    按配置创建KnownFieldChecker：未开启、过滤器文件不存在或结果库未开启时返回None（不跳过任何字段）
+    """
+    if not KNOWN_FIELD_FILTER_ENABLED:
+        return None
+    if not RESULT_STORE_ENABLED:
+        logger.warning("已分类字段过滤需要结果库确认过滤器命中的字段，RESULT_STORE_ENABLED未开启，不跳过已分类字段")
+        return None
+    bloom = load_known_filter()
+    if bloom is None:
+        logger.info(f"已分类字段过滤器 {KNOWN_FIELD_FILTER_PATH} 不存在，本次不跳过已分类字段")
+        return None
+    from script.result_store import ResultStore
+    logger.info(f"已加载已分类字段过滤器：{bloom.count} 个字段，{bloom.num_bits} 位，{bloom.num_hashes} 个哈希函数")
+    return KnownFieldChecker(bloom, ResultStore())
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="已分类字段布隆过滤器：重建、合并和查看")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="从结果库（所有运行）重建过滤器")
+    rebuild_parser.add_argument("--db", default=RESULT_STORE_PATH, help="结果库路径，默认RESULT_STORE_PATH")
+    rebuild_parser.add_argument("--merged", nargs="?", const=MERGED_RESULTS_PATH,
+                                help="改为读取合并结果文件（不带路径时为MERGED_RESULTS_PATH），字段加入已有过滤器")
+    rebuild_parser.add_argument("--output", default=KNOWN_FIELD_FILTER_PATH, help="过滤器文件，默认KNOWN_FIELD_FILTER_PATH")
+    rebuild_parser.add_argument("--capacity", type=int, help="设计容量，默认取配置值与字段数两倍中的较大值")
+    rebuild_parser.add_argument("--error-rate", type=float, help="设计误判率，默认KNOWN_FIELD_FILTER_ERROR_RATE")
+    merge_parser = subparsers.add_parser("merge", help="按位或合并多个参数相同的过滤器（如多台机器各自的过滤器）")
+    merge_parser.add_argument("inputs", nargs="+", help="待合并的过滤器文件")
+    merge_parser.add_argument("--output", default=KNOWN_FIELD_FILTER_PATH, help="输出文件，默认KNOWN_FIELD_FILTER_PATH")
+    stats_parser = subparsers.add_parser("stats", help="查看过滤器参数和估计误判率")
+    stats_parser.add_argument("path", nargs="?", default=KNOWN_FIELD_FILTER_PATH)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "rebuild":
+        rebuild_known_filter(args.merged, args.output, args.capacity, args.error_rate, args.db)
+    elif args.command == "merge":
+        merged = BloomFilter.load(args.inputs[0])
+        for path in args.inputs[1:]:
+            merged.merge(BloomFilter.load(path))
+        merged.save(args.output)
+        print(f"已合并 {len(args.inputs)} 个过滤器到 {args.output}")
+    else:
+        bloom = BloomFilter.load(args.path)
+        print(f"过滤器文件：{args.path}")
+        print(f"位数：{bloom.num_bits}（{len(bloom.bits) / 1024 / 1024:.1f} MB），哈希函数数：{bloom.num_hashes}")
+        print(f"已加入字段数：{bloom.count}（按置位比例估计：{bloom.estimated_count()}），设计容量：{bloom.capacity}，"
+              f"设计误判率：{bloom.error_rate}")
+        print(f"估计误判率：{bloom.estimated_error_rate():.6f}")
+
+
+# 命令行入口
+if __name__ == "__main__":
+    setup_logging("bloom_filter")
+    main()
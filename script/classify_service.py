@@ -0,0 +1,409 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    LLM_SERVICE,
+    RESULT_STORE_ENABLED,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_MAX_BATCH_SIZE,
+    SERVICE_MAX_WAIT_MS,
+    SERVICE_CONCURRENCY,
+    SERVICE_MAX_FIELDS_PER_REQUEST,
+    SERVICE_CACHE_SIZE,
+    SERVICE_REQUEST_TIMEOUT
+)
+
+# 复用批量分类的提示词路径（与classify_single_batch相同的classify_fields）
+from script.llm_classify import load_prompt_template, classify_fields
+from script.result_store import ResultStore
+from script.field_store import FieldResultCache
+from script.token_usage import TokenUsage
+from script.metrics import (
+    REGISTRY,
+    CONTENT_TYPE,
+    SERVICE_LOOKUPS,
+    SERVICE_BATCH_FIELDS,
+    SERVICE_REQUEST_SECONDS,
+    Timer
+)
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 不视为敏感信息的类别（其余有效类别均为敏感信息）
+NON_SENSITIVE_CATEGORIES = ("通用词", "未分类", "无法识别")
+# 服务写入结果库时的运行ID和来源批次名（不登记为新的运行，不影响验证阶段读取最近一次批量运行的结果）
+SERVICE_RUN_ID = "classify_service"
+SERVICE_SOURCE_BATCH = "classify_service"
+
+
+def _to_confidence(value):
+    try:
+        confidence = float(value)
+    except (TypeError, ValueError):
+        return None
+    return confidence if confidence == confidence else None
+
+
+def _result_record(raw_text, category, confidence, reason, source):
+    """组装单个字段的返回结果"""
+    category = category if isinstance(category, str) and category.strip() else None
+    return {
+        "raw_text": raw_text,
+        "category": category,
+        "confidence": _to_confidence(confidence),
+        "reason": reason if isinstance(reason, str) else None,
+        "sensitive": category is not None and not any(name in category for name in NON_SENSITIVE_CATEGORIES),
+        "source": source,
+    }
+
+
+class MicroBatcher:
+    """
+    动态微批次：把并发调用方提交的字段合并成批次后交给classify_batch
+
+    - 批次在字段数达到max_batch_size或第一个字段等待超过max_wait后发送
+    - 同时最多concurrency个批次在途，全部占用时新字段继续凑批，负载越高批次越大
+    - 同一字段在等待或在途期间重复提交时返回同一个Future，不会重复调用LLM
+
+    classify_batch(fields)返回字段 -> 结果的字典（缺失的字段结果为None），抛出异常时批次内所有Future都设置该异常
+    """
+    def __init__(self, classify_batch, max_batch_size=None, max_wait=None, concurrency=None):
+        self.classify_batch = classify_batch
+        self.max_batch_size = max_batch_size or SERVICE_MAX_BATCH_SIZE
+        self.max_wait = SERVICE_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        concurrency = concurrency or SERVICE_CONCURRENCY
+        self._pending = OrderedDict()
+        self._in_flight = {}
+        self._first_pending_at = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._slots = threading.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="service-batch")
+        self._thread = threading.Thread(target=self._run, name="service-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, field):
+        """
+        提交一个字段
+
+        返回:
+            tuple: (Future, 是否与已有请求合并)
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("分类服务已关闭")
+            future = self._pending.get(field) or self._in_flight.get(field)
+            if future is not None:
+                return future, True
+            future = Future()
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+            self._pending[field] = future
+            self._condition.notify()
+            return future, False
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending), len(self._in_flight)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # 凑批：字段数达到上限或等待超时即发送
+                deadline = self._first_pending_at + self.max_wait
+                while len(self._pending) < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            # 等待空闲的发送槽位，期间到达的字段并入本批次
+            self._slots.acquire()
+            with self._condition:
+                batch = []
+                while self._pending and len(batch) < self.max_batch_size:
+                    field, future = self._pending.popitem(last=False)
+                    self._in_flight[field] = future
+                    batch.append((field, future))
+                # 剩余字段沿用原来的首个等待时间，下一轮立即发送
+            SERVICE_BATCH_FIELDS.observe(len(batch))
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            results = self.classify_batch([field for field, _ in batch])
+        except Exception as e:
+            logger.error(f"分类服务微批次（{len(batch)} 个字段）分类失败：{type(e).__name__} - {e}")
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for field, future in batch:
+                future.set_result(results.get(field))
+        finally:
+            with self._condition:
+                for field, _ in batch:
+                    self._in_flight.pop(field, None)
+            self._slots.release()
+
+    def close(self):
+        """发送剩余字段并等待所有批次完成"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+class ClassifyService:
+    """
+    在线分类：先查进程内缓存和结果库，未命中的字段经MicroBatcher合并后调用classify_fields分类
+
+    LLM分类结果写入进程内缓存和结果库（运行ID为classify_service），LLM未能分类的字段只缓存在进程内
+    """
+    def __init__(self, store=None, cache_size=None, batcher_options=None):
+        self.prompt_template = load_prompt_template()
+        if self.prompt_template is None:
+            raise RuntimeError("提示词模板加载失败，无法启动分类服务")
+        self.store = store
+        self.cache_size = cache_size or SERVICE_CACHE_SIZE
+        # 缓存结果以紧凑形式存放（字段和理由在字符串区中，类别编码、置信度在数组中），同样内存可缓存更多字段
+        self._cache = FieldResultCache(self.cache_size)
+        self._cache_lock = threading.Lock()
+        self.batcher = MicroBatcher(self._classify_batch, **(batcher_options or {}))
+
+    # -------------------------- 缓存 --------------------------
+    def _cache_get(self, field):
+        with self._cache_lock:
+            value = self._cache.get(field)
+        return _result_record(field, *value, "cache") if value is not None else None
+
+    def _cache_put(self, field, record):
+        with self._cache_lock:
+            self._cache.put(field, record["category"], record["confidence"], record["reason"])
+
+    def cache_size_used(self):
+        with self._cache_lock:
+            return len(self._cache)
+
+    # -------------------------- 分类 --------------------------
+    def _classify_batch(self, fields):
+        """微批次分类回调：调用LLM，结果写入缓存和结果库"""
+        usage = TokenUsage(LLM_SERVICE)
+        result_df = classify_fields(fields, self.prompt_template, usage=usage)
+        if result_df is None:
+            raise RuntimeError("LLM调用失败")
+        results = {}
+        for raw_text, category, confidence, reason in zip(
+            result_df["raw_text"].astype(str), result_df["category"], result_df["confidence"], result_df["reason"]
+        ):
+            results[raw_text] = _result_record(raw_text, category, confidence, reason, "llm")
+        for field in fields:
+            # LLM未返回或未能分类的字段同样缓存，避免重复调用
+            record = results.setdefault(field, _result_record(field, None, None, None, "llm"))
+            self._cache_put(field, record)
+        if self.store is not None:
+            try:
+                self.store.insert_dataframe(result_df, SERVICE_RUN_ID, SERVICE_SOURCE_BATCH)
+                if usage.prompts:
+                    self.store.insert_token_usage(usage.to_row(SERVICE_SOURCE_BATCH), SERVICE_RUN_ID)
+            except Exception as e:
+                logger.error(f"分类服务写入结果库失败：{e}")
+        return results
+
+    def classify(self, fields, timeout=None):
+        """
+        分类一组字段（重复字段只查询一次）
+
+        参数:
+            fields (list): 字段列表
+            timeout (float): 等待LLM结果的最长时间（秒），默认SERVICE_REQUEST_TIMEOUT
+
+        返回:
+            list: 与去重后的fields顺序一致的结果字典（raw_text、category、confidence、reason、sensitive、source），
+                  分类失败的字段category为None并带error说明
+        """
+        timeout = SERVICE_REQUEST_TIMEOUT if timeout is None else timeout
+        fields = list(dict.fromkeys(fields))
+        records = {}
+        missing = []
+        for field in fields:
+            record = self._cache_get(field)
+            if record is None:
+                missing.append(field)
+            else:
+                records[field] = record
+        SERVICE_LOOKUPS.labels("memory").inc(len(records))
+
+        if missing and self.store is not None:
+            found = self.store.lookup(missing)
+            for field, (category, confidence, reason) in found.items():
+                record = _result_record(field, category, confidence, reason, "cache")
+                self._cache_put(field, record)
+                records[field] = record
+            SERVICE_LOOKUPS.labels("store").inc(len(found))
+            missing = [field for field in missing if field not in found]
+
+        futures = {}
+        for field in missing:
+            future, coalesced = self.batcher.submit(field)
+            SERVICE_LOOKUPS.labels("coalesced" if coalesced else "llm").inc()
+            futures[field] = future
+        deadline = time.monotonic() + timeout
+        for field, future in futures.items():
+            try:
+                record = future.result(max(0.0, deadline - time.monotonic()))
+                records[field] = record or _result_record(field, None, None, None, "llm")
+            except FutureTimeoutError:
+                SERVICE_LOOKUPS.labels("error").inc()
+                records[field] = dict(_result_record(field, None, None, None, "llm"), error="等待分类结果超时")
+            except Exception as e:
+                SERVICE_LOOKUPS.labels("error").inc()
+                records[field] = dict(_result_record(field, None, None, None, "llm"), error=str(e))
+        return [records[field] for field in fields]
+
+    def close(self):
+        self.batcher.close()
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _classify(self, fields):
+        if not fields or not all(isinstance(field, str) and field for field in fields):
+            self._send_json(400, {"error": "请提供非空字符串字段：field或fields"})
+            return
+        if len(fields) > SERVICE_MAX_FIELDS_PER_REQUEST:
+            self._send_json(413, {"error": f"单次请求最多 {SERVICE_MAX_FIELDS_PER_REQUEST} 个字段"})
+            return
+        with Timer(SERVICE_REQUEST_SECONDS.labels()):
+            results = self.service.classify(fields)
+        self._send_json(200, {"results": results})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/classify":
+            self._classify(parse_qs(url.query).get("field", []))
+        elif url.path == "/health":
+            pending, in_flight = self.service.batcher.pending_count()
+            self._send_json(200, {"status": "ok", "cache_entries": self.service.cache_size_used(),
+                                  "pending_fields": pending, "in_flight_fields": in_flight})
+        elif url.path == "/metrics":
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/classify":
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, UnicodeDecodeError):
+            self._send_json(400, {"error": "请求体不是有效的JSON"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "请求体应为JSON对象"})
+            return
+        fields = payload.get("fields")
+        if fields is None and "field" in payload:
+            fields = [payload["field"]]
+        self._classify(fields if isinstance(fields, list) else None)
+
+    def log_message(self, format, *args):
+        logger.debug("classify_service %s - %s", self.address_string(), format % args)
+
+
+class _ServiceHTTPServer(ThreadingHTTPServer):
+    # 默认监听队列只有5，大量并发调用方同时连接时会被重置
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def create_server(service, host=None, port=None):
+    """创建绑定到分类服务的HTTP服务（port为0时由系统分配端口）"""
+    handler = type("ServiceHandler", (_ServiceHandler,), {"service": service})
+    return _ServiceHTTPServer((host or SERVICE_HOST, SERVICE_PORT if port is None else port), handler)
+
+
+def serve(host=None, port=None):
+    """
+    在线分类服务主函数
+
+    功能：启动本地HTTP服务，接口如下（阻塞运行，Ctrl+C停止）：
+        POST /classify   {"field": "Nvidia"} 或 {"fields": ["Nvidia", "Paris"]}
+        GET  /classify?field=Nvidia&field=Paris
+        GET  /health     缓存条数、等待和在途字段数
+        GET  /metrics    Prometheus文本格式指标
+    每个字段先查进程内缓存和结果库，未命中的字段与其他请求合并成微批次调用LLM
+    """
+    store = ResultStore() if RESULT_STORE_ENABLED else None
+    service = ClassifyService(store)
+    try:
+        server = create_server(service, host, port)
+    except OSError as e:
+        error_msg = f"启动分类服务失败：{e}"
+        logger.error(error_msg)
+        print(error_msg)
+        service.close()
+        if store is not None:
+            store.close()
+        return
+    address = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    logger.info(f"分类服务已启动：{address}（微批次最多 {service.batcher.max_batch_size} 个字段，"
+                f"最长等待 {service.batcher.max_wait * 1000:.0f} 毫秒）")
+    print(f"分类服务已启动：{address}/classify，按Ctrl+C停止")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+        if store is not None:
+            store.close()
+        logger.info("分类服务已停止")
+
+
+# 启动在线分类服务
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在线分类服务")
+    parser.add_argument("--host", help=f"监听地址，默认{SERVICE_HOST}")
+    parser.add_argument("--port", type=int, help=f"监听端口，默认{SERVICE_PORT}")
+    args = parser.parse_args()
+    setup_logging("classify_service")
+    try:
+        serve(args.host, args.port)
+    except KeyboardInterrupt:
+        print("\n分类服务已停止")
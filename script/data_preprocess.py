@@ -3,6 +3,7 @@ import os
 import re
 import logging
 import traceback
+from itertools import repeat
 from datetime import datetime
 
 # 添加项目根目录到Python路径
@@ -15,20 +16,336 @@ from config.config import (
     BATCH_SAVE_PATH,
     BATCH_SIZE,
     MIN_FIELD_LENGTH,
-    PROJECT_ROOT
+    ARCHIVE_INGEST_ENABLED
 )
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(PROJECT_ROOT, 'logs/data_preprocess.log')),
-        logging.StreamHandler()
-    ]
+from script.field_store import FieldStore
+from script.bloom_filter import open_known_checker
+from script.provenance_index import new_index_builder, save_index
+from script.metrics import (
+    FILES_READ,
+    BYTES_INGESTED,
+    FIELDS_SEEN,
+    FIELDS_FILTERED,
+    DEDUP_RATIO,
+    record_stage
 )
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
 logger = logging.getLogger(__name__)
 
+# 有效字段至少包含1个字母或数字
+VALID_FIELD_PATTERN = re.compile(r'[a-zA-Z0-9]')
+# 原始文件尝试的编码顺序
+RAW_FILE_ENCODINGS = ['utf-8', 'latin-1', 'cp1252']
+# 按空白分割出的字段（与str.split()结果相同，可同时取得字段在行内的位置）
+FIELD_TOKEN_PATTERN = re.compile(r'\S+')
+
+def read_file_fields(file_path, with_offsets=False):
+    """
+    读取单个原始文件的全部字段（按行读取非空行，再按空白分割）
+    
+    参数:
+        file_path (str): 文件路径
+        with_offsets (bool): 是否同时返回每个字段在文件中的字节偏移
+    
+    返回:
+        list: 字段列表（with_offsets时为(字段列表, 字节偏移列表)），所有编码均无法解码时返回None
+    """
+    for encoding in RAW_FILE_ENCODINGS:
+        try:
+            if with_offsets:
+                with open(file_path, "rb") as f:
+                    return _split_lines_with_offsets(f, encoding)
+            file_fields = []
+            with open(file_path, "r", encoding=encoding) as f:
+                for line in f:
+                    stripped_line = line.strip()
+                    if stripped_line:
+                        # 按空格分割，获取多个字段
+                        file_fields.extend(stripped_line.split())
+            return file_fields
+        except UnicodeDecodeError:
+            continue
+    return None
+
+def _split_lines_with_offsets(lines, encoding):
+    """逐行解码并按空白分割，返回(字段列表, 字节偏移列表)；lines逐个产出以换行结尾的bytes"""
+    fields, offsets = [], []
+    position = 0
+    for raw_line in lines:
+        line = raw_line.decode(encoding)
+        ascii_line = line.isascii()
+        # 非ASCII行维护行内的字符位置和对应的字节位置，每次只编码上一个字段到当前字段之间的部分（整行线性耗时）
+        char_position = byte_position = 0
+        for match in FIELD_TOKEN_PATTERN.finditer(line):
+            start = match.start()
+            fields.append(match.group())
+            # ASCII行的字符位置即字节位置，其余按编码换算
+            if ascii_line:
+                offsets.append(position + start)
+                continue
+            byte_position += len(line[char_position:start].encode(encoding))
+            char_position = start
+            offsets.append(position + byte_position)
+        position += len(raw_line)
+    return fields, offsets
+
+def iter_raw_fields(stats):
+    """
+    递归遍历原始文件目录，逐个文件产出字段；ARCHIVE_INGEST_ENABLED时归档文件不解压到磁盘，逐个成员产出字段
+    
+    参数:
+        stats (dict): 统计信息（total_files、processed_files、failed_files、raw_fields），遍历过程中原地更新
+    
+    返回:
+        generator: 逐个产出每个文件的字段列表
+    """
+    for _, file_fields, _ in iter_raw_sources(stats):
+        yield file_fields
+
+def iter_raw_sources(stats, with_offsets=False):
+    """
+    与iter_raw_fields相同，但同时产出来源名称和偏移
+    
+    参数:
+        stats (dict): 统计信息，遍历过程中原地更新
+        with_offsets (bool): 是否计算文本文件中每个字段的字节偏移（二进制归档成员总是带偏移）
+    
+    返回:
+        generator: 逐个产出(source, fields, offsets)，source为文件路径（归档成员为"归档路径!/成员路径"），
+            offsets为与fields一一对应的字节偏移，未计算时为None
+    """
+    # archive_ingest从本模块导入RAW_FILE_ENCODINGS，在函数内导入以避免循环导入
+    from script.archive_ingest import is_archive
+    for root, dirs, files in os.walk(RAW_FILES_PATH):
+        for filename in files:
+            stats["total_files"] += 1
+            file_path = os.path.join(root, filename)
+            if ARCHIVE_INGEST_ENABLED and is_archive(file_path):
+                yield from _iter_archive_fields(file_path, stats)
+                continue
+            try:
+                file_fields = read_file_fields(file_path, with_offsets)
+            except Exception as e:
+                logger.error(f"读取文件 {file_path} 失败！错误：{e}，跳过该文件")
+                stats["failed_files"] += 1
+                FILES_READ.labels("failed").inc()
+                continue
+            if file_fields is None:
+                logger.warning(f"无法解码文件：{file_path}，跳过该文件")
+                stats["failed_files"] += 1
+                FILES_READ.labels("failed").inc()
+                continue
+            file_fields, offsets = file_fields if with_offsets else (file_fields, None)
+            stats["processed_files"] += 1
+            stats["raw_fields"] += len(file_fields)
+            FILES_READ.labels("ok").inc()
+            FIELDS_SEEN.inc(len(file_fields))
+            try:
+                BYTES_INGESTED.inc(os.path.getsize(file_path))
+            except OSError:
+                pass
+            logger.info(f"已读取文件：{file_path}，找到 {len(file_fields)} 个字段")
+            yield file_path, file_fields, offsets
+
+def iter_source_fields(sources, stats):
+    """
+    逐个来源产出内存中的字段（与iter_raw_fields统计口径相同），供不经过RAW_FILES_PATH的调用方直接传入字段
+    
+    参数:
+        sources (iterable): 逐个产出(source, fields, offsets)，source为来源名称（如二进制文件路径），
+            offsets为与fields一一对应的位置（可为None）
+        stats (dict): 统计信息，遍历过程中原地更新
+    
+    返回:
+        generator: 逐个产出(source, fields, offsets)，fields和offsets转换为列表（offsets可为None）
+    """
+    for source, fields, offsets in sources:
+        stats["total_files"] += 1
+        stats["processed_files"] += 1
+        fields = list(fields)
+        offsets = list(offsets) if offsets is not None else None
+        stats["raw_fields"] += len(fields)
+        FILES_READ.labels("ok").inc()
+        FIELDS_SEEN.inc(len(fields))
+        logger.info(f"已读取来源：{source}，找到 {len(fields)} 个字段")
+        yield source, fields, offsets
+
+def _iter_archive_fields(file_path, stats):
+    """
+    逐个成员产出归档中的(source, fields, offsets)（文本成员分词、偏移为None，可执行文件成员提取字符串），
+    归档整体计为一个文件
+    """
+    from script.archive_ingest import iter_archive_sources
+    member_count = 0
+    for source, fields, offsets in iter_archive_sources(file_path):
+        member_count += 1
+        stats["raw_fields"] += len(fields)
+        FIELDS_SEEN.inc(len(fields))
+        logger.info(f"已读取归档成员：{source}，找到 {len(fields)} 个字段")
+        yield source, fields, offsets
+    stats["processed_files"] += 1
+    FILES_READ.labels("ok").inc()
+    try:
+        BYTES_INGESTED.inc(os.path.getsize(file_path))
+    except OSError:
+        pass
+    logger.info(f"已读取归档：{file_path}，共 {member_count} 个成员")
+
+def is_valid_field(field):
+    """过滤规则：长度≥MIN_FIELD_LENGTH + 至少含1个字母或数字（排除纯特殊字符）"""
+    return len(field) >= MIN_FIELD_LENGTH and VALID_FIELD_PATTERN.search(field) is not None
+
+def new_preprocess_stats():
+    """返回预处理统计信息的初始值"""
+    return {"total_files": 0, "processed_files": 0, "failed_files": 0,
+            "raw_fields": 0, "valid_fields": 0, "unique_fields": 0, "known_fields": 0}
+
+def iter_field_batches(batch_size=BATCH_SIZE, stats=None, sources=None, provenance=None, known=None, index=None):
+    """
+    流式读取、清洗、去重并按批次产出字段（批次填满即产出，无需等待全部文件读取完成）
+    
+    参数:
+        batch_size (int): 每批次字段数
+        stats (dict): 统计信息，默认新建；遍历过程中原地更新
+        sources (iterable): 内存中的字段来源（格式见iter_source_fields），默认读取RAW_FILES_PATH下的文件
+        provenance (dict): 传入且使用sources时，记录每个去重后字段首次出现的(source, offset)，字段产出前写入
+        known (KnownFieldChecker): 传入时跳过之前运行中已分类的字段（计入stats["known_fields"]，不进入批次）
+        index (ProvenanceIndexBuilder): 传入时记录每个有效字段（含重复和已分类字段）出现的来源和偏移
+    
+    返回:
+        generator: 逐个产出字段列表，每个不超过batch_size个字段
+    """
+    stats = stats if stats is not None else new_preprocess_stats()
+    # 去重后的字段存放在紧凑字段存储中（不为每个字段常驻一个str对象），批次从中按下标切出
+    seen = FieldStore()
+    # 已确认分类过的字段，重复出现时不再查询过滤器和结果库
+    known_fields = FieldStore() if known is not None else None
+    batch_start = 0
+    min_length, valid_search = MIN_FIELD_LENGTH, VALID_FIELD_PATTERN.search
+    # 指标按文件汇总后更新，逐字段循环内不做额外操作
+    invalid_filtered = FIELDS_FILTERED.labels("invalid")
+    duplicate_filtered = FIELDS_FILTERED.labels("duplicate")
+    known_filtered = FIELDS_FILTERED.labels("known")
+    if sources is not None:
+        source_fields = iter_source_fields(sources, stats)
+    else:
+        source_fields = iter_raw_sources(stats, with_offsets=index is not None)
+    for source, file_fields, offsets in source_fields:
+        # 与is_valid_field规则相同，内联以减少逐字段的函数调用
+        if index is None or offsets is None:
+            valid_fields = [field for field in file_fields if len(field) >= min_length and valid_search(field)]
+            if index is not None:
+                index.add(source, valid_fields)
+        else:
+            valid_pairs = [(field, offset) for field, offset in zip(file_fields, offsets)
+                           if len(field) >= min_length and valid_search(field)]
+            valid_fields = [field for field, _ in valid_pairs]
+            index.add(source, valid_fields, [offset for _, offset in valid_pairs])
+        # 先在文件内去重（dict按首次出现顺序保留，随文件释放），再批量加入字段存储，只返回首次出现的字段
+        if known_fields is None:
+            new_fields = seen.add_new(dict.fromkeys(valid_fields))
+            skipped_count = 0
+        else:
+            candidates = seen.missing(known_fields.missing(dict.fromkeys(valid_fields)))
+            unknown, skipped = known.split(candidates)
+            skipped_count = known_fields.update(skipped)
+            new_fields = seen.add_new(unknown)
+            stats["known_fields"] += skipped_count
+            known_filtered.inc(skipped_count)
+        stats["valid_fields"] += len(valid_fields)
+        stats["unique_fields"] += len(new_fields)
+        if provenance is not None and sources is not None:
+            origins = {}
+            for field, offset in zip(file_fields, offsets if offsets is not None else repeat(None)):
+                origins.setdefault(field, (source, offset))
+            for field in new_fields:
+                provenance[field] = origins[field]
+        invalid_filtered.inc(len(file_fields) - len(valid_fields))
+        duplicate_filtered.inc(len(valid_fields) - len(new_fields) - skipped_count)
+        if stats["valid_fields"]:
+            DEDUP_RATIO.set(1 - stats["unique_fields"] / stats["valid_fields"])
+        stored = len(seen)
+        while stored - batch_start >= batch_size:
+            yield seen.slice(batch_start, batch_start + batch_size)
+            batch_start += batch_size
+    if len(seen) > batch_start:
+        yield seen.slice(batch_start)
+
+def prepare_batch_dir():
+    """创建批次文件夹并清空旧文件"""
+    logger.info(f"准备创建输出文件夹：{BATCH_SAVE_PATH}")
+    if not os.path.exists(BATCH_SAVE_PATH):
+        os.makedirs(BATCH_SAVE_PATH)
+        logger.info(f"已创建批次文件保存文件夹：{BATCH_SAVE_PATH}")
+    
+    logger.info(f"清理输出文件夹中的旧文件")
+    files_deleted = 0
+    for filename in os.listdir(BATCH_SAVE_PATH):
+        file_path = os.path.join(BATCH_SAVE_PATH, filename)
+        try:
+            if os.path.isfile(file_path):
+                os.unlink(file_path)
+                files_deleted += 1
+        except Exception as e:
+            logger.error(f"删除文件 {file_path} 失败！错误：{e}")
+    logger.info(f"清理完成，共删除 {files_deleted} 个旧文件")
+
+def build_batch_frame(batch_fields, provenance=None):
+    """
+    构造批次数据框（含raw_text列）
+    
+    参数:
+        batch_fields (list): 批次字段
+        provenance (dict): iter_field_batches记录的字段来源，传入时增加source、offset列，
+            并从provenance中移除本批次字段（已写入批次的来源不再常驻内存）
+    
+    返回:
+        pd.DataFrame: 批次数据框
+    """
+    if provenance is None:
+        return pd.DataFrame({"raw_text": batch_fields})
+    origins = [provenance.pop(field, (None, None)) for field in batch_fields]
+    return pd.DataFrame({
+        "raw_text": batch_fields,
+        "source": [source for source, _ in origins],
+        "offset": pd.array([offset for _, offset in origins], dtype="Int64"),
+    })
+
+def save_batch(batch_fields, batch_index, batch_df=None):
+    """
+    保存一个批次为CSV（含raw_text列）
+    
+    参数:
+        batch_fields (list): 批次字段
+        batch_index (int): 批次序号（从1开始）
+        batch_df (pd.DataFrame): 批次数据框（如build_batch_frame带来源列的结果），默认只含raw_text列
+    
+    返回:
+        str: 批次文件名（如batch_1.csv）
+    """
+    batch_filename = f"batch_{batch_index}.csv"
+    if batch_df is None:
+        batch_df = build_batch_frame(batch_fields)
+    batch_df.to_csv(os.path.join(BATCH_SAVE_PATH, batch_filename), index=False, encoding="utf-8")
+    return batch_filename
+
+def log_preprocess_stats(stats, batches_created, duration):
+    """输出预处理统计信息"""
+    logger.info(f"预处理完成！")
+    logger.info(f"统计信息：")
+    logger.info(f"- 原始字段总数：{stats['raw_fields']}")
+    logger.info(f"- 清理后字段数：{stats['valid_fields']}")
+    logger.info(f"- 去重后字段数：{stats['unique_fields']}")
+    if stats.get("known_fields"):
+        logger.info(f"- 跳过已分类字段数：{stats['known_fields']}")
+    logger.info(f"- 生成批次文件数：{batches_created}")
+    logger.info(f"- 总处理时间：{duration:.2f} 秒")
+    logger.info(f"- 结果保存路径：{BATCH_SAVE_PATH}")
+
 def preprocess_data():
     """
     数据预处理主函数
@@ -38,41 +355,20 @@ def preprocess_data():
     处理流程：
     1. 创建并清空输出文件夹
     2. 检查原始数据目录是否存在
-    3. 递归读取所有文本文件
+    3. 递归读取所有文本文件（逐个文件流式处理）
     4. 处理文件编码问题
     5. 清洗和过滤无效字段
     6. 去重处理
-    7. 分批次保存为CSV文件
+    7. 分批次保存为CSV文件（批次填满即写出）
+    8. 开启PROVENANCE_INDEX_ENABLED时保存字段来源索引
     """
     try:
         start_time = datetime.now()
         logger.info(f"开始数据预处理，原始文件路径：{RAW_FILES_PATH}")
         
-        # 1. 创建输出文件夹（不存在则创建）
-        logger.info(f"准备创建输出文件夹：{BATCH_SAVE_PATH}")
-        if not os.path.exists(BATCH_SAVE_PATH):
-            os.makedirs(BATCH_SAVE_PATH)
-            logger.info(f"已创建批次文件保存文件夹：{BATCH_SAVE_PATH}")
-        
-        # 2. 删除BATCH_SAVE_PATH下所有文件（清空旧文件）
-        logger.info(f"清理输出文件夹中的旧文件")
-        files_deleted = 0
-        for filename in os.listdir(BATCH_SAVE_PATH):
-            file_path = os.path.join(BATCH_SAVE_PATH, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                    files_deleted += 1
-            except Exception as e:
-                logger.error(f"删除文件 {file_path} 失败！错误：{e}")
-        logger.info(f"清理完成，共删除 {files_deleted} 个旧文件")
-
-        # 3. 读取原始文本文件（递归处理目录下所有文件）
-        raw_fields = []
-        total_files = 0
-        processed_files = 0
-        failed_files = 0
-        
+        # 1-2. 创建输出文件夹并清空旧文件
+        prepare_batch_dir()
+
         # 检查路径是否存在
         if not os.path.exists(RAW_FILES_PATH):
             error_msg = f"错误：目录 {RAW_FILES_PATH} 不存在"
@@ -80,107 +376,42 @@ def preprocess_data():
             print(error_msg)
             return
             
-        logger.info(f"开始扫描原始文件目录：{RAW_FILES_PATH}")
-        # 递归遍历目录下所有文件
-        for root, dirs, files in os.walk(RAW_FILES_PATH):
-            for filename in files:
-                total_files += 1
-                file_path = os.path.join(root, filename)
-                try:
-                    # 尝试多种编码处理
-                    file_fields = []
-                    encodings = ['utf-8', 'latin-1', 'cp1252']
-                    content_read = False
-                    
-                    for encoding in encodings:
-                        try:
-                            with open(file_path, "r", encoding=encoding) as f:
-                                # 读取当前文件的所有非空行，并按空格分割获取多个字段
-                                for line in f:
-                                    stripped_line = line.strip()
-                                    if stripped_line:
-                                        # 按空格分割，获取多个字段
-                                        fields = stripped_line.split()
-                                        file_fields.extend(fields)
-                            content_read = True
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    
-                    if not content_read:
-                        logger.warning(f"无法解码文件：{file_path}，跳过该文件")
-                        failed_files += 1
-                        continue
-                    
-                    raw_fields.extend(file_fields)
-                    processed_files += 1
-                    logger.info(f"已读取文件：{file_path}，找到 {len(file_fields)} 个字段")
-                except Exception as e:
-                    logger.error(f"读取文件 {file_path} 失败！错误：{e}，跳过该文件")
-                    failed_files += 1
-        
-        if total_files == 0:
-            warning_msg = f"警告：目录 {RAW_FILES_PATH} 下没有找到可读取的文件"
-            logger.warning(warning_msg)
-            print(warning_msg)
-            return
-            
-        logger.info(f"文件扫描完成 - 总计: {total_files} 个文件, 成功: {processed_files} 个, 失败: {failed_files} 个")
-        logger.info(f"共收集到 {len(raw_fields)} 个原始字段")
-
-        # 4. 清理无效字段（长度＜MIN_FIELD_LENGTH、纯特殊字符）
-        logger.info(f"开始清理无效字段，最小长度要求：{MIN_FIELD_LENGTH}")
-        # 过滤规则：长度≥MIN_FIELD_LENGTH + 至少含1个字母或数字（排除纯特殊字符）
-        valid_fields = []
-        for field in raw_fields:
-            if (len(field) >= MIN_FIELD_LENGTH and 
-                re.search(r'[a-zA-Z0-9]', field)):
-                valid_fields.append(field)
+        logger.info(f"开始扫描原始文件目录：{RAW_FILES_PATH}，最小长度要求：{MIN_FIELD_LENGTH}，每批次大小：{BATCH_SIZE}")
         
-        removed_fields = len(raw_fields) - len(valid_fields)
-        logger.info(f"清理完成 - 有效字段数：{len(valid_fields)}，删除了 {removed_fields} 个无效字段")
-
-        # 5. 去重（确保无重复字段）
-        logger.info("开始去重处理")
-        unique_fields = list(set(valid_fields))
-        duplicate_count = len(valid_fields) - len(unique_fields)
-        logger.info(f"去重完成 - 最终字段数：{len(unique_fields)}，移除了 {duplicate_count} 个重复字段")
-
-        # 6. 分批次保存为CSV
-        logger.info(f"开始分批次保存，每批次大小：{BATCH_SIZE}")
-        total_batches = (len(unique_fields) + BATCH_SIZE - 1) // BATCH_SIZE
+        # 3-7. 流式读取、清洗、去重并分批次保存
+        stats = new_preprocess_stats()
         batches_created = 0
-        
-        for batch_idx in range(total_batches):
+        known = open_known_checker()
+        index = new_index_builder()
+        for batch_fields in iter_field_batches(BATCH_SIZE, stats, known=known, index=index):
             try:
-                # 计算当前批次的字段范围
-                start = batch_idx * BATCH_SIZE
-                end = start + BATCH_SIZE
-                batch_fields = unique_fields[start:end]
-                
-                # 保存为CSV（含raw_text列）
-                batch_df = pd.DataFrame({"raw_text": batch_fields})
-                batch_filename = f"batch_{batch_idx+1}.csv"
-                batch_filepath = os.path.join(BATCH_SAVE_PATH, batch_filename)
-                
-                batch_df.to_csv(batch_filepath, index=False, encoding="utf-8")
+                save_batch(batch_fields, batches_created + 1)
                 batches_created += 1
-                logger.info(f"已保存批次 {batch_idx+1}/{total_batches}：{len(batch_fields)} 个字段")
+                logger.info(f"已保存批次 {batches_created}：{len(batch_fields)} 个字段")
             except Exception as e:
-                logger.error(f"保存批次 {batch_idx+1} 失败！错误：{e}")
-        
-        # 7. 输出统计信息
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
+                logger.error(f"保存批次 {batches_created + 1} 失败！错误：{e}")
         
-        logger.info(f"预处理完成！")
-        logger.info(f"统计信息：")
-        logger.info(f"- 原始字段总数：{len(raw_fields)}")
-        logger.info(f"- 清理后字段数：{len(valid_fields)}")
-        logger.info(f"- 去重后字段数：{len(unique_fields)}")
-        logger.info(f"- 生成批次文件数：{batches_created}/{total_batches}")
-        logger.info(f"- 总处理时间：{duration:.2f} 秒")
-        logger.info(f"- 结果保存路径：{BATCH_SAVE_PATH}")
+        if stats["total_files"] == 0:
+            warning_msg = f"警告：目录 {RAW_FILES_PATH} 下没有找到可读取的文件"
+            logger.warning(warning_msg)
+            print(warning_msg)
+            return
+            
+        logger.info(f"文件扫描完成 - 总计: {stats['total_files']} 个文件, 成功: {stats['processed_files']} 个, 失败: {stats['failed_files']} 个")
+        logger.info(f"清理完成 - 有效字段数：{stats['valid_fields']}，删除了 {stats['raw_fields'] - stats['valid_fields']} 个无效字段")
+        logger.info(f"去重完成 - 最终字段数：{stats['unique_fields']}，移除了 {stats['valid_fields'] - stats['unique_fields'] - stats['known_fields']} 个重复字段")
+        if known is not None:
+            logger.info(f"已分类字段过滤 - 跳过 {stats['known_fields']} 个已分类字段（过滤器命中 {known.positives} 个，"
+                        f"结果库确认 {known.confirmed} 个）")
+            known.store.close()
+        # 8. 保存来源索引
+        if index is not None:
+            save_index(index)
+
+        # 输出统计信息
+        duration = (datetime.now() - start_time).total_seconds()
+        log_preprocess_stats(stats, batches_created, duration)
+        record_stage("preprocess", stats["raw_fields"], duration)
         
         print(f"预处理完成！共生成{batches_created}个批次文件，保存在：{BATCH_SAVE_PATH}")
         print(f"总处理时间：{duration:.2f} 秒")
@@ -193,4 +424,5 @@ def preprocess_data():
 
 # 执行预处理
 if __name__ == "__main__":
-    preprocess_data()
\ No newline at end of file
+    setup_logging("data_preprocess")
+    preprocess_data()
@@ -0,0 +1,321 @@
+from array import array
+
+# 紧凑字段存储：千万级短字段若各自保存为str对象并放入set/list，每个字段的对象头、哈希表槽位和指针开销
+# 是字段文本本身的数倍；这里把全部字段以UTF-8连续存放在一个bytearray中，用array记录偏移和哈希值，
+# 开放寻址哈希表同样是一个array，每个字段的常驻开销约为20字节加文本长度（set中的短str约为80字节），
+# 不再为每个字段保留Python对象
+
+# 哈希表初始槽位数（2的幂）和最大装载率
+_INITIAL_TABLE_SIZE = 1024
+_MAX_LOAD = 0.6
+_EMPTY = -1
+# 哈希表和哈希值只保留32位（字段下标上限约21亿），相同哈希值时再比较字段文本
+_HASH_MASK = 0xFFFFFFFF
+
+
+class StringArena:
+    """只追加的字符串区：文本连续存放，按下标取出时才创建str对象"""
+
+    def __init__(self, values=None):
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+        if values is not None:
+            for value in values:
+                self.append(value)
+
+    def append(self, value):
+        """追加一个字符串，返回其下标"""
+        self._data += value.encode("utf-8")
+        self._offsets.append(len(self._data))
+        return len(self._offsets) - 2
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StringArena index out of range")
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode("utf-8")
+
+    def slice(self, start, end=None):
+        """返回下标[start, end)的字符串列表（如一个批次）"""
+        end = len(self) if end is None else min(end, len(self))
+        data, offsets = self._data, self._offsets
+        return [data[offsets[index]:offsets[index + 1]].decode("utf-8") for index in range(start, end)]
+
+    def __iter__(self):
+        data, offsets = self._data, self._offsets
+        for index in range(len(self)):
+            yield data[offsets[index]:offsets[index + 1]].decode("utf-8")
+
+    @property
+    def nbytes(self):
+        """占用的字节数（文本和偏移数组）"""
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+
+class FieldStore(StringArena):
+    """
+    去重的字段存储：StringArena加开放寻址哈希索引，支持去重添加、成员判断、按下标取值和分批迭代
+
+    字段按首次添加的顺序编号（从0开始），slice/iter_batches按此顺序产出；非线程安全
+    """
+
+    def __init__(self, values=None):
+        self._hashes = array("I")
+        self._table = array("i", [_EMPTY]) * _INITIAL_TABLE_SIZE
+        self._mask = _INITIAL_TABLE_SIZE - 1
+        super().__init__()
+        if values is not None:
+            for value in values:
+                self.add(value)
+
+    def _probe(self, encoded, field_hash):
+        """返回(字段下标, 槽位)，字段不存在时下标为-1，槽位为可插入的空槽"""
+        table, hashes, data, offsets = self._table, self._hashes, self._data, self._offsets
+        mask = self._mask
+        slot = field_hash & mask
+        while True:
+            index = table[slot]
+            if index == _EMPTY:
+                return _EMPTY, slot
+            if hashes[index] == field_hash and data[offsets[index]:offsets[index + 1]] == encoded:
+                return index, slot
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        size = len(self._table) * 2
+        table = array("i", [_EMPTY]) * size
+        mask = size - 1
+        for index, field_hash in enumerate(self._hashes):
+            slot = field_hash & mask
+            while table[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = index
+        self._table, self._mask = table, mask
+
+    def _insert(self, field):
+        """返回(字段下标, 是否为新字段)"""
+        encoded = field.encode("utf-8")
+        field_hash = hash(encoded) & _HASH_MASK
+        index, slot = self._probe(encoded, field_hash)
+        if index != _EMPTY:
+            return index, False
+        index = len(self._hashes)
+        self._data += encoded
+        self._offsets.append(len(self._data))
+        self._hashes.append(field_hash)
+        self._table[slot] = index
+        if index + 1 > _MAX_LOAD * len(self._table):
+            self._grow()
+        return index, True
+
+    def add(self, field):
+        """添加字段，返回True表示新字段，False表示已存在"""
+        return self._insert(field)[1]
+
+    def append(self, value):
+        """追加字段（已存在时不重复存放），返回其下标"""
+        return self._insert(value)[0]
+
+    def index(self, field):
+        """返回字段下标，不存在时返回-1"""
+        encoded = field.encode("utf-8")
+        return self._probe(encoded, hash(encoded) & _HASH_MASK)[0]
+
+    def __contains__(self, field):
+        return self.index(field) != _EMPTY
+
+    def add_new(self, fields):
+        """
+        批量添加，返回其中新字段的列表（保持顺序，已存在或重复的字段不返回）
+
+        与逐个调用add结果相同，查找与插入在同一个循环内完成，批量去重时开销明显更低
+        """
+        table, hashes, offsets, data = self._table, self._hashes, self._offsets, self._data
+        mask = self._mask
+        count = len(hashes)
+        limit = _MAX_LOAD * len(table)
+        new_fields = []
+        for field in fields:
+            encoded = field.encode("utf-8")
+            field_hash = hash(encoded) & _HASH_MASK
+            slot = field_hash & mask
+            index = table[slot]
+            while index != _EMPTY:
+                if hashes[index] == field_hash and data[offsets[index]:offsets[index + 1]] == encoded:
+                    break
+                slot = (slot + 1) & mask
+                index = table[slot]
+            if index != _EMPTY:
+                continue
+            data += encoded
+            offsets.append(len(data))
+            hashes.append(field_hash)
+            table[slot] = count
+            count += 1
+            new_fields.append(field)
+            if count > limit:
+                self._grow()
+                table, mask = self._table, self._mask
+                limit = _MAX_LOAD * len(table)
+        return new_fields
+
+    def append_many(self, fields):
+        """批量追加字段（已存在时不重复存放），返回与fields一一对应的下标数组array('I')"""
+        table, hashes, offsets, data = self._table, self._hashes, self._offsets, self._data
+        mask = self._mask
+        count = len(hashes)
+        limit = _MAX_LOAD * len(table)
+        indexes = array("I")
+        for field in fields:
+            encoded = field.encode("utf-8")
+            field_hash = hash(encoded) & _HASH_MASK
+            slot = field_hash & mask
+            index = table[slot]
+            while index != _EMPTY:
+                if hashes[index] == field_hash and data[offsets[index]:offsets[index + 1]] == encoded:
+                    break
+                slot = (slot + 1) & mask
+                index = table[slot]
+            if index == _EMPTY:
+                index = count
+                data += encoded
+                offsets.append(len(data))
+                hashes.append(field_hash)
+                table[slot] = count
+                count += 1
+                if count > limit:
+                    self._grow()
+                    table, mask = self._table, self._mask
+                    limit = _MAX_LOAD * len(table)
+            indexes.append(index)
+        return indexes
+
+    def missing(self, fields):
+        """返回fields中不在存储里的字段（保持顺序）"""
+        table, hashes, offsets, data = self._table, self._hashes, self._offsets, self._data
+        mask = self._mask
+        missing_fields = []
+        for field in fields:
+            encoded = field.encode("utf-8")
+            field_hash = hash(encoded) & _HASH_MASK
+            slot = field_hash & mask
+            index = table[slot]
+            while index != _EMPTY:
+                if hashes[index] == field_hash and data[offsets[index]:offsets[index + 1]] == encoded:
+                    break
+                slot = (slot + 1) & mask
+                index = table[slot]
+            if index == _EMPTY:
+                missing_fields.append(field)
+        return missing_fields
+
+    def update(self, fields):
+        """批量添加，返回新增字段数"""
+        return len(self.add_new(fields))
+
+    def iter_batches(self, batch_size, start=0):
+        """从下标start开始按batch_size分批产出字段列表"""
+        for batch_start in range(start, len(self), batch_size):
+            yield self.slice(batch_start, batch_start + batch_size)
+
+    @property
+    def nbytes(self):
+        """占用的字节数（文本、偏移、哈希值和哈希表）"""
+        return super().nbytes + self._hashes.itemsize * len(self._hashes) + self._table.itemsize * len(self._table)
+
+
+class _CacheGeneration:
+    """FieldResultCache的一代：字段、类别编码、置信度和理由按字段下标对齐存放"""
+
+    def __init__(self):
+        self.fields = FieldStore()
+        self.categories = array("i")
+        self.confidences = array("d")
+        self.reason_indexes = array("i")
+        self.reasons = StringArena()
+
+
+class FieldResultCache:
+    """
+    有界的字段分类结果缓存（字段 -> (category, confidence, reason)），两代紧凑存储轮换实现近似LRU：
+
+    新结果写入当前代，当前代写满capacity的一半时整体降为上一代（原上一代丢弃）；命中上一代的字段复制回当前代，
+    因此最近用过的字段始终保留。类别名按编码共用，字段和理由存放在StringArena中，非线程安全
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(2, capacity)
+        self._generation_size = self.capacity // 2
+        self._category_names = []
+        self._category_codes = {}
+        self._current = _CacheGeneration()
+        self._previous = None
+
+    def _category_code(self, category):
+        if category is None:
+            return _EMPTY
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self._category_names)
+            self._category_names.append(category)
+        return code
+
+    def _read(self, generation, index):
+        code = generation.categories[index]
+        confidence = generation.confidences[index]
+        reason_index = generation.reason_indexes[index]
+        return (
+            self._category_names[code] if code != _EMPTY else None,
+            confidence if confidence == confidence else None,
+            generation.reasons[reason_index] if reason_index != _EMPTY else None,
+        )
+
+    def get(self, field):
+        """返回(category, confidence, reason)，未缓存时返回None"""
+        index = self._current.fields.index(field)
+        if index != _EMPTY:
+            return self._read(self._current, index)
+        if self._previous is None:
+            return None
+        index = self._previous.fields.index(field)
+        if index == _EMPTY:
+            return None
+        value = self._read(self._previous, index)
+        self.put(field, *value)
+        return value
+
+    def put(self, field, category, confidence, reason):
+        """写入（或覆盖）一个字段的分类结果，confidence为None或数值，reason为None或字符串"""
+        generation = self._current
+        index = generation.fields.append(field)
+        values = (
+            self._category_code(category),
+            float("nan") if confidence is None else float(confidence),
+            generation.reasons.append(reason) if isinstance(reason, str) else _EMPTY,
+        )
+        if index == len(generation.categories):
+            generation.categories.append(values[0])
+            generation.confidences.append(values[1])
+            generation.reason_indexes.append(values[2])
+        else:
+            generation.categories[index], generation.confidences[index], generation.reason_indexes[index] = values
+        if len(generation.fields) >= self._generation_size:
+            self._previous, self._current = generation, _CacheGeneration()
+
+    def __len__(self):
+        return len(self._current.fields) + (len(self._previous.fields) if self._previous is not None else 0)
+
+    @property
+    def nbytes(self):
+        """占用的字节数（不含类别名）"""
+        total = 0
+        for generation in (self._current, self._previous):
+            if generation is not None:
+                total += generation.fields.nbytes + generation.reasons.nbytes + sum(
+                    values.itemsize * len(values)
+                    for values in (generation.categories, generation.confidences, generation.reason_indexes))
+        return total
@@ -1,14 +1,15 @@
 import pandas as pd
 import os
-import concurrent.futures
-import time
-import random
 import glob
+import shutil
+import hashlib
+import tempfile
+import time
 import logging
+import threading
 import traceback
 from datetime import datetime
 import sys
-from openai import OpenAI, APIError, Timeout
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -24,48 +25,80 @@ from config.config import (
     DEEPSEEK_API_KEY,
     DEEPSEEK_BASE_URL,
     DEEPSEEK_MODEL,
-    PROJECT_ROOT,
     LLM_CONCURRENCY,
-    MAX_RETRY_COUNT,
-    INITIAL_RETRY_INTERVAL,
-    RETRY_INTERVAL_MULTIPLIER,
     PROMPT_TEMPLATE_PATH,
-    API_TIMEOUT
+    API_TIMEOUT,
+    MERGED_RESULTS_PATH,
+    LOCAL_MODEL_ENABLED,
+    LOCAL_LLM_SUB_BATCH_SIZE,
+    STREAMING_VERIFY_ENABLED,
+    RECLASSIFY_ENABLED,
+    MERGE_CHUNK_SIZE,
+    RESULT_STORE_ENABLED,
+    KNOWN_FIELD_FILTER_ENABLED,
+    KNOWN_FIELD_FILTER_PATH
 )
 
 # 导入本地LLM客户端
 from script.local_llm_client import LocalLLMClient
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(PROJECT_ROOT, 'logs/llm_classify.log')),
-        logging.StreamHandler()
-    ]
+# 导入统一重试策略和LLM错误类型
+from script.retry_policy import (
+    get_retry_policy,
+    LLMError,
+    RetryableLLMError,
+    LLMResponseFormatError,
+    FatalLLMError
 )
+# 导入本地蒸馏模型（高置信字段无需调用LLM）
+from script.local_classifier import apply_local_classifier
+# 导入流式验证器（批次分类完成后立即验证）
+from script.result_verify import StreamingVerifier
+# 导入结果库（按字段、类别、置信度和运行ID索引分类结果）
+from script.result_store import ResultStore
+# 导入运行指标
+from script.metrics import BATCHES_IN_FLIGHT, PARSE_FAILURE_LINES, record_stage
+# 导入令牌用量统计
+from script.token_usage import TokenUsage, TokenUsageLog, USAGE_FILE_NAME, report_token_usage
+# 导入批次调度器（按估算耗时从大到小派发，运行末尾拆分批次）
+from script.batch_scheduler import BatchScheduler, PRIORITY_RECHECK
+# 导入已分类字段过滤器（合并结果时加入本次分类的字段）
+from script.bloom_filter import BloomFilter, load_known_filter
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
 logger = logging.getLogger(__name__)
 
+def _spill_file_name(category):
+    """返回类别对应的溢写文件名（类别名可能含路径非法字符，使用哈希命名）"""
+    key = "\0nan" if pd.isna(category) else str(category)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".csv"
+
+def _category_sort_key(category):
+    """类别排序键：与sort_values一致，空类别排在最后"""
+    return (1, "") if pd.isna(category) else (0, str(category))
+
 def merge_classification_results():
     """
     合并分类结果文件
     
-    功能：合并分类结果目录下的所有CSV文件到一个总表中，并按category字段排序
+    功能：流式合并分类结果目录下的所有result_*.csv文件到一个总表中，并按category字段排序
+    每个文件只按块读取一次，各行按类别追加到溢写文件，最后按类别顺序拼接输出，内存占用与总行数无关
     结果保存到merged_results.csv文件
     """
+    spill_dir = None
     try:
         input_dir = CLASSIFY_SAVE_PATH
-        output_file = os.path.join(PROJECT_ROOT, 'data', 'merged_results.csv')
+        output_file = MERGED_RESULTS_PATH
         
         logger.info(f"开始合并分类结果文件...")
         print(f"\n开始合并分类结果文件...")
         
-        # 获取所有CSV文件
-        csv_files = glob.glob(os.path.join(input_dir, '*.csv'))
+        # 只合并分类结果文件，忽略目录下的其他CSV
+        csv_files = sorted(glob.glob(os.path.join(input_dir, 'result_*.csv')))
         
         if not csv_files:
-            warning_msg = f"没有找到CSV文件在目录: {input_dir}"
+            warning_msg = f"没有找到分类结果文件在目录: {input_dir}"
             logger.warning(warning_msg)
             print(warning_msg)
             return
@@ -73,67 +106,94 @@ def merge_classification_results():
         logger.info(f"找到 {len(csv_files)} 个CSV文件进行合并...")
         print(f"找到 {len(csv_files)} 个CSV文件进行合并...")
         
-        # 初始化一个空的DataFrame
-        all_data = pd.DataFrame()
+        # 确保输出目录存在，溢写文件放在输出目录下，便于最后整体替换
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        spill_dir = tempfile.mkdtemp(prefix="merge_spill_", dir=os.path.dirname(output_file))
+        
+        columns = None
+        category_counts = {}
+        total_rows = 0
+        # 待溢写的数据块，累计行数达到MERGE_CHUNK_SIZE时统一按类别拆分写出，减少小块写入次数
+        pending = []
+        pending_rows = 0
+        
+        def flush_pending():
+            if not pending:
+                return
+            buffered = pd.concat(pending, ignore_index=True, copy=False)
+            for category, part in buffered.groupby('category', dropna=False, sort=False):
+                spill_path = os.path.join(spill_dir, _spill_file_name(category))
+                part.to_csv(spill_path, mode='a', header=False, index=False, encoding='utf-8')
+                category_counts[category] = category_counts.get(category, 0) + len(part)
+            pending.clear()
+        
+        # 开启已分类字段过滤时，本次分类的字段随合并加入布隆过滤器
+        known_filter = (load_known_filter() or BloomFilter()) if KNOWN_FIELD_FILTER_ENABLED else None
         
-        # 读取并合并所有CSV文件
+        # 逐个文件按块读取，按类别暂存后追加到溢写文件
         for file in csv_files:
             try:
-                # 读取单个CSV文件
-                df = pd.read_csv(file)
-                
-                # 添加源文件信息
-                df['source_file'] = os.path.basename(file)
-                
-                # 合并到总DataFrame
-                all_data = pd.concat([all_data, df], ignore_index=True)
+                for chunk in pd.read_csv(file, dtype=str, chunksize=MERGE_CHUNK_SIZE):
+                    if columns is None:
+                        columns = list(chunk.columns) + ['source_file']
+                    # 添加源文件信息，列与首个文件保持一致
+                    chunk['source_file'] = os.path.basename(file)
+                    pending.append(chunk.reindex(columns=columns))
+                    if known_filter is not None:
+                        known_filter.update(chunk["raw_text"].dropna())
+                    total_rows += len(chunk)
+                    pending_rows += len(chunk)
+                    if pending_rows >= MERGE_CHUNK_SIZE:
+                        flush_pending()
+                        pending_rows = 0
                 logger.info(f"成功合并文件: {os.path.basename(file)}")
             except Exception as e:
                 error_msg = f"处理文件 {file} 时出错: {str(e)}"
                 logger.error(error_msg)
                 print(error_msg)
+        flush_pending()
         
         # 检查是否成功合并了数据
-        if all_data.empty:
+        if total_rows == 0:
             warning_msg = "警告: 没有成功合并任何数据!"
             logger.warning(warning_msg)
             print(warning_msg)
             return
         
-        logger.info(f"合并完成! 总数据行数: {len(all_data)}")
-        print(f"合并完成! 总数据行数: {len(all_data)}")
+        logger.info(f"合并完成! 总数据行数: {total_rows}")
+        print(f"合并完成! 总数据行数: {total_rows}")
         
-        # 按category字段排序
-        if 'category' in all_data.columns:
-            all_data = all_data.sort_values(by='category', ignore_index=True)
+        # 按类别顺序拼接溢写文件（类别内保持文件读取顺序）
+        try:
+            temp_output = os.path.join(spill_dir, "merged.csv.tmp")
+            with open(temp_output, "w", encoding="utf-8-sig", newline="") as out:
+                pd.DataFrame(columns=columns).to_csv(out, index=False)
+            with open(temp_output, "ab") as out:
+                for category in sorted(category_counts, key=_category_sort_key):
+                    with open(os.path.join(spill_dir, _spill_file_name(category)), "rb") as part:
+                        shutil.copyfileobj(part, out)
+            os.replace(temp_output, output_file)
+            if known_filter is not None:
+                known_filter.save(KNOWN_FIELD_FILTER_PATH)
+                logger.info(f"已分类字段过滤器已更新：共 {known_filter.count} 个字段，保存到 {KNOWN_FIELD_FILTER_PATH}")
             logger.info("已按 category 字段排序")
             print("已按 category 字段排序")
-        else:
-            warning_msg = "警告: 数据中没有 'category' 字段，无法排序"
-            logger.warning(warning_msg)
-            print(warning_msg)
-        
-        # 保存合并后的数据
-        try:
-            # 确保输出目录存在
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            
-            all_data.to_csv(output_file, index=False, encoding='utf-8-sig')
             logger.info(f"合并结果已保存到: {output_file}")
             print(f"合并结果已保存到: {output_file}")
             
             # 显示一些基本统计信息
-            logger.info(f"数据统计信息 - 总列数: {len(all_data.columns)}, 总行数: {len(all_data)}")
+            logger.info(f"数据统计信息 - 总列数: {len(columns)}, 总行数: {total_rows}")
             print(f"\n数据统计信息:")
-            print(f"总列数: {len(all_data.columns)}")
-            print(f"总行数: {len(all_data)}")
+            print(f"总列数: {len(columns)}")
+            print(f"总行数: {total_rows}")
             
-            if 'category' in all_data.columns:
-                logger.info(f"唯一 category 数量: {len(all_data['category'].value_counts())}")
-                print(f"\nCategory 分布:")
-                category_counts = all_data['category'].value_counts()
-                print(category_counts)
-                print(f"\n唯一 category 数量: {len(category_counts)}")
+            counts = pd.Series({category: count for category, count in category_counts.items() if not pd.isna(category)},
+                               name="count", dtype="int64").sort_values(ascending=False)
+            counts.index.name = "category"
+            logger.info(f"唯一 category 数量: {len(counts)}")
+            print(f"\nCategory 分布:")
+            print(counts)
+            print(f"\n唯一 category 数量: {len(counts)}")
                 
         except Exception as e:
             error_msg = f"保存文件时出错: {str(e)}"
@@ -144,6 +204,9 @@ def merge_classification_results():
         logger.critical(error_msg)
         logger.error(traceback.format_exc())
         print(error_msg)
+    finally:
+        if spill_dir is not None:
+            shutil.rmtree(spill_dir, ignore_errors=True)
 
 def load_prompt_template():
     """
@@ -175,13 +238,247 @@ def load_prompt_template():
         print(error_msg)
         return None
 
-def classify_single_batch(batch_file_path, prompt_template):
+def build_prompt(fields, prompt_template):
+    """
+    将字段列表填充到提示词模板中
+    
+    参数:
+        fields (list): 待分类字段列表
+        prompt_template (str): 提示词模板
+    
+    返回:
+        str: 填充后的完整提示词
+    """
+    # 格式化字段为"1. 字段1\n2. 字段2"格式
+    fields_text = "\n".join([f"{i+1}. {field}" for i, field in enumerate(fields)])
+    return prompt_template.replace("{{fields_text}}", fields_text)
+
+def extract_response_content(response):
+    """
+    从LLM响应中提取文本内容，兼容OpenAI响应对象和LocalLLMClient返回的字典
+    
+    参数:
+        response: LLM响应对象或字典
+    
+    返回:
+        str: 响应文本内容
+    
+    异常:
+        LLMResponseFormatError: 响应格式无效（无choices、无文本内容等）时抛出，可按统一重试策略重试
+    """
+    try:
+        if isinstance(response, dict):
+            content = response["choices"][0]["message"]["content"]
+        else:
+            content = response.choices[0].message.content
+    except (KeyError, IndexError, AttributeError, TypeError) as e:
+        raise LLMResponseFormatError(f"LLM返回的响应格式无效：{type(e).__name__} - {e}", backend=LLM_SERVICE) from e
+    if not isinstance(content, str):
+        raise LLMResponseFormatError("LLM返回的响应没有文本内容", backend=LLM_SERVICE)
+    return content
+
+def parse_llm_output(content):
+    """
+    解析LLM输出的分类结果（每行：字段\t类别\t置信度\t判断依据）
+    
+    参数:
+        content (str): LLM响应文本
+    
+    返回:
+        list: 分类结果字典列表，格式不符的行会被忽略
+    """
+    classify_data = []
+    failed_lines = 0
+    for line in content.strip().split("\n"):
+        # 按"\t"分割（严格匹配输出格式）
+        parts = line.split("\t")
+        if len(parts) == 1:
+            parts = line.split("\\t")
+        if len(parts) == 4:
+            classify_data.append({
+                "raw_text": parts[0].strip(),
+                "category": parts[1].strip(),
+                "confidence": parts[2].strip(),
+                "reason": parts[3].strip()
+            })
+        elif line.strip():
+            failed_lines += 1
+    if failed_lines:
+        PARSE_FAILURE_LINES.inc(failed_lines)
+    return classify_data
+
+def _openai_chat(client, model, prompt):
+    """
+    通过OpenAI兼容接口发送一次请求（不重试），并将SDK异常转换为统一的LLM错误类型
+    
+    参数:
+        client (OpenAI): OpenAI客户端（已关闭SDK自带重试）
+        model (str): 模型名称
+        prompt (str): 完整提示词
+    
+    返回:
+        tuple: (响应文本内容, usage令牌用量，未返回时为None)
+    """
+    import openai
+
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=TEMPERATURE,
+            timeout=API_TIMEOUT,  # 使用配置的超时时间
+            stream=False
+        )
+    except (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+        raise RetryableLLMError(f"{type(e).__name__} - {str(e)}", backend=LLM_SERVICE) from e
+    except openai.APIError as e:
+        raise FatalLLMError(f"{type(e).__name__} - {str(e)}", backend=LLM_SERVICE) from e
+    return extract_response_content(response), getattr(response, "usage", None)
+
+def request_llm_completion(fields, prompt_template, usage=None):
+    """
+    按LLM_SERVICE配置调用对应的LLM服务，返回响应文本
+    
+    重试、重试预算和熔断统一由retry_policy处理，调用方不再叠加重试循环
+    
+    参数:
+        fields (list): 待分类字段列表
+        prompt_template (str): 提示词模板
+        usage (TokenUsage): 令牌用量累加器，每次请求的prompt/completion令牌数累加到其中，默认不记录
+    
+    返回:
+        str: LLM响应文本
+    
+    异常:
+        LLMError: 调用失败（已按统一策略重试）或服务配置不支持
+    """
+    if LLM_SERVICE in ("OPENAI", "DEEPSEEK"):
+        # openai SDK导入较慢，只在使用对应服务时导入
+        from openai import OpenAI
+
+    if LLM_SERVICE == "OPENAI":
+        logger.info("使用OpenAI服务进行分类...")
+        print("使用OpenAI服务进行分类...")
+        # 关闭SDK自带重试，避免与统一重试策略叠加
+        client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        prompt = build_prompt(fields, prompt_template)
+        content, response_usage = get_retry_policy().call(LLM_SERVICE, _openai_chat, client, OPENAI_MODEL, prompt)
+    elif LLM_SERVICE == "DEEPSEEK":
+        logger.info("使用DeepSeek服务进行分类...")
+        print("使用DeepSeek服务进行分类...")
+        client = OpenAI(
+            api_key=DEEPSEEK_API_KEY,
+            base_url=DEEPSEEK_BASE_URL,
+            max_retries=0
+        )
+        prompt = build_prompt(fields, prompt_template)
+        content, response_usage = get_retry_policy().call(LLM_SERVICE, _openai_chat, client, DEEPSEEK_MODEL, prompt)
+    elif LLM_SERVICE == "LOCAL":
+        logger.info("使用本地LLM服务进行分类...")
+        print("使用本地LLM服务进行分类...")
+        client = LocalLLMClient()
+        # 拆分为较小的子批次批量提交，由服务端并行处理，兼顾准确率和吞吐
+        sub_prompts = [
+            build_prompt(fields[i:i + LOCAL_LLM_SUB_BATCH_SIZE], prompt_template)
+            for i in range(0, len(fields), LOCAL_LLM_SUB_BATCH_SIZE)
+        ]
+        logger.info(f"拆分为 {len(sub_prompts)} 个子批次批量提交")
+        sub_responses = client.batch_chat(sub_prompts)
+        # 子批次响应已由客户端按统一重试策略校验，这里格式无效时同样抛出LLMResponseFormatError，
+        # 由classify_fields按LLM调用失败处理
+        sub_contents = [extract_response_content(sub_response) for sub_response in sub_responses]
+        if usage is not None:
+            for sub_prompt, sub_response, sub_content in zip(sub_prompts, sub_responses, sub_contents):
+                usage.add(sub_response.get("usage"), sub_prompt, sub_content, LLM_SERVICE, prompt_template)
+        # 合并子批次响应，后续按统一格式解析
+        return "\n".join(sub_contents)
+    else:
+        raise FatalLLMError(f"不支持的模型服务: {LLM_SERVICE}", backend=LLM_SERVICE)
+
+    if usage is not None:
+        usage.add(response_usage, prompt, content, LLM_SERVICE, prompt_template)
+    return content
+
+def classify_fields(fields, prompt_template, batch_df=None, usage=None):
+    """
+    调用LLM分类一组字段（重试由统一重试策略处理）
+    
+    参数:
+        fields (list): 待分类字段列表
+        prompt_template (str): 提示词模板
+        batch_df (pd.DataFrame): 字段所在批次的原始数据（含raw_text列），默认由fields构造
+        usage (TokenUsage): 令牌用量累加器（记录令牌数、发送给LLM的字段数和调用耗时），默认不记录
+    
+    返回:
+        pd.DataFrame: 过滤后的分类结果数据框，LLM调用失败返回None
+    """
+    if batch_df is None:
+        batch_df = pd.DataFrame({"raw_text": fields})
+    
+    # 先用本地蒸馏模型预分类，高置信字段不再发送给LLM
+    local_df = None
+    if LOCAL_MODEL_ENABLED:
+        local_df, fields = apply_local_classifier(fields)
+        if local_df.empty:
+            local_df = None
+        else:
+            batch_df = batch_df[~batch_df["raw_text"].isin(local_df["raw_text"])]
+            if not fields:
+                logger.info("批次字段已全部由本地模型完成分类，跳过LLM调用")
+                return local_df
+    
+    logger.info("准备发送请求到LLM服务")
+    
+    # 调用LLM（重试、预算和熔断由统一重试策略处理）
+    BATCHES_IN_FLIGHT.inc()
+    request_started = time.perf_counter()
+    try:
+        content = request_llm_completion(fields, prompt_template, usage)
+    except LLMError as e:
+        error_msg = f"LLM调用失败！错误：{type(e).__name__} - {str(e)}"
+        logger.error(error_msg)
+        print(error_msg)
+        return None
+    finally:
+        BATCHES_IN_FLIGHT.dec()
+        if usage is not None:
+            usage.add_request(len(fields), time.perf_counter() - request_started)
+    
+    # 解析LLM输出
+    classify_data = parse_llm_output(content)
+    if not classify_data:
+        error_msg = "LLM响应中没有可解析的分类结果"
+        logger.error(error_msg)
+        print(error_msg)
+        return None
+    
+    logger.info(f"成功解析LLM响应，获得 {len(classify_data)} 个分类结果")
+    
+    # 合并原始数据与分类结果
+    result_df = pd.merge(batch_df, pd.DataFrame(classify_data), on="raw_text", how="left")
+    if local_df is not None:
+        result_df = pd.concat([local_df, result_df], ignore_index=True)
+    
+    # 过滤掉未分类、无法识别和空分类的条目
+    filtered_df = result_df[(
+        ~result_df["category"].str.contains("未分类|无法识别", na=False) & 
+        result_df["category"].notna() & 
+        result_df["category"].str.strip() != ""
+    )].copy()
+    
+    logger.info(f"过滤掉未分类、无法识别和空分类条目，原记录数: {len(result_df)}, 过滤后记录数: {len(filtered_df)}")
+    print(f"过滤掉未分类、无法识别和空分类条目，原记录数: {len(result_df)}, 过滤后记录数: {len(filtered_df)}")
+    
+    return filtered_df
+
+def classify_single_batch(batch_file_path, prompt_template, usage=None):
     """
-    调用LLM分类单个批次（带重试机制）
+    调用LLM分类单个批次文件
     
     参数:
         batch_file_path (str): 批次文件路径
         prompt_template (str): 提示词模板
+        usage (TokenUsage): 令牌用量累加器，默认不记录
     
     返回:
         pd.DataFrame: 分类结果数据框
@@ -194,123 +491,7 @@ def classify_single_batch(batch_file_path, prompt_template):
         fields = batch_df["raw_text"].tolist()
         
         logger.info(f"批次文件包含 {len(fields)} 个字段")
-        
-        # 格式化字段为"1. 字段1\n2. 字段2"格式
-        fields_text = "\n".join([f"{i+1}. {field}" for i, field in enumerate(fields)])
-        # 填充Prompt模板
-        final_prompt = prompt_template.replace("{{fields_text}}", fields_text)
-        
-        logger.info("准备发送请求到LLM服务")
-        
-        # 执行带重试的LLM调用
-        for retry in range(MAX_RETRY_COUNT):
-            try:
-                # 在重试前添加随机延迟，避免多个请求同时重试造成的冲击
-                if retry > 0:
-                    # 指数退避策略：INITIAL_RETRY_INTERVAL * (RETRY_INTERVAL_MULTIPLIER^retry) + 随机抖动
-                    delay = INITIAL_RETRY_INTERVAL * (RETRY_INTERVAL_MULTIPLIER ** retry) + random.uniform(0, 1)
-                    logger.info(f"第{retry}次重试，等待{delay:.2f}秒...")
-                    print(f"第{retry}次重试，等待{delay:.2f}秒...")
-                    time.sleep(delay)
-                
-                # 根据配置选择不同的LLM服务
-                if LLM_SERVICE == "OPENAI":
-                    logger.info("使用OpenAI服务进行分类...")
-                    print("使用OpenAI服务进行分类...")
-                    client = OpenAI(api_key=OPENAI_API_KEY)
-                    response = client.chat.completions.create(
-                        model=OPENAI_MODEL,
-                        messages=[{"role": "user", "content": final_prompt}],
-                        temperature=TEMPERATURE,
-                        timeout=API_TIMEOUT,  # 使用配置的超时时间
-                        stream=False
-                    )
-                elif LLM_SERVICE == "DEEPSEEK":
-                    logger.info("使用DeepSeek服务进行分类...")
-                    print("使用DeepSeek服务进行分类...")
-                    client = OpenAI(
-                        api_key=DEEPSEEK_API_KEY,
-                        base_url=DEEPSEEK_BASE_URL
-                    )
-                    response = client.chat.completions.create(
-                        model=DEEPSEEK_MODEL,
-                        messages=[{"role": "user", "content": final_prompt}],
-                        temperature=TEMPERATURE,
-                        timeout=API_TIMEOUT,  # 使用配置的超时时间
-                        stream=False
-                    )
-                elif LLM_SERVICE == "LOCAL":
-                    logger.info("使用本地LLM服务进行分类...")
-                    print("使用本地LLM服务进行分类...")
-                    client = LocalLLMClient()
-                    # 使用chat方法发送请求，直接返回OpenAI格式相似的响应对象
-                    response = client.chat(user_content=final_prompt)
-                else:
-                    error_msg = f"不支持的模型服务: {LLM_SERVICE}"
-                    logger.error(error_msg)
-                    print(error_msg)
-                    return None
-                    
-                # 验证响应格式
-                if not hasattr(response, 'choices') or not response.choices or \
-                   not hasattr(response.choices[0], 'message') or not hasattr(response.choices[0].message, 'content'):
-                    raise ValueError("LLM返回的响应格式无效")
-                
-                # 解析LLM输出
-                result_lines = response.choices[0].message.content.strip().split("\n")
-                classify_data = []
-                
-                for line in result_lines:
-                    # 按"\t"分割（严格匹配输出格式）
-                    parts = line.split("\t")
-                    if len(parts) == 1:
-                        parts = line.split("\\t")
-                    if len(parts) == 4:
-                        classify_data.append({
-                            "raw_text": parts[0].strip(),
-                            "category": parts[1].strip(),
-                            "confidence": parts[2].strip(),
-                            "reason": parts[3].strip()
-                        })
-                
-                logger.info(f"成功解析LLM响应，获得 {len(classify_data)} 个分类结果")
-                
-                # 合并原始数据与分类结果
-                result_df = pd.merge(batch_df, pd.DataFrame(classify_data), on="raw_text", how="left")
-                
-                # 过滤掉未分类、无法识别和空分类的条目
-                filtered_df = result_df[(
-                    ~result_df["category"].str.contains("未分类|无法识别", na=False) & 
-                    result_df["category"].notna() & 
-                    result_df["category"].str.strip() != ""
-                )].copy()
-                
-                logger.info(f"过滤掉未分类、无法识别和空分类条目，原记录数: {len(result_df)}, 过滤后记录数: {len(filtered_df)}")
-                print(f"过滤掉未分类、无法识别和空分类条目，原记录数: {len(result_df)}, 过滤后记录数: {len(filtered_df)}")
-                
-                return filtered_df
-                
-            except Timeout as e:
-                error_msg = f"LLM调用超时（尝试 {retry+1}/{MAX_RETRY_COUNT}）！错误：{str(e)}"
-                logger.warning(error_msg)
-                print(error_msg)
-            except APIError as e:
-                error_msg = f"LLM API错误（尝试 {retry+1}/{MAX_RETRY_COUNT}）！错误：{str(e)}"
-                logger.warning(error_msg)
-                print(error_msg)
-            except Exception as e:
-                error_msg = f"LLM调用失败（尝试 {retry+1}/{MAX_RETRY_COUNT}）！错误：{type(e).__name__} - {str(e)}"
-                logger.warning(error_msg)
-                print(error_msg)
-            
-            # 判断是否是最后一次重试
-            if retry == MAX_RETRY_COUNT - 1:
-                error_msg = f"达到最大重试次数，请求失败。"
-                logger.error(error_msg)
-                print(error_msg)
-                return None
-            # 继续重试
-            continue
+        return classify_fields(fields, prompt_template, batch_df, usage)
             
     except Exception as e:
         error_msg = f"处理批次文件 {batch_file_path} 时发生错误: {str(e)}"
@@ -319,6 +500,52 @@ def classify_single_batch(batch_file_path, prompt_template):
         print(error_msg)
         return None
 
+def prepare_classify_dir():
+    """创建分类结果文件夹并清空旧文件"""
+    logger.info(f"准备创建分类结果文件夹：{CLASSIFY_SAVE_PATH}")
+    if not os.path.exists(CLASSIFY_SAVE_PATH):
+        os.makedirs(CLASSIFY_SAVE_PATH)
+        logger.info(f"已创建分类结果文件夹：{CLASSIFY_SAVE_PATH}")
+
+    logger.info(f"清理分类结果文件夹中的旧文件")
+    files_deleted = 0
+    for filename in os.listdir(CLASSIFY_SAVE_PATH):
+        file_path = os.path.join(CLASSIFY_SAVE_PATH, filename)
+        try:
+            if os.path.isfile(file_path):
+                os.unlink(file_path)
+                files_deleted += 1
+        except Exception as e:
+            logger.error(f"删除文件 {file_path} 失败！错误：{e}")
+    logger.info(f"清理完成，共删除 {files_deleted} 个旧文件")
+
+def save_batch_result(result_df, batch_file, store=None, run_id=None):
+    """
+    保存单个批次的分类结果（并写入结果库）
+    
+    参数:
+        result_df (pd.DataFrame): 分类结果
+        batch_file (str): 批次文件名（如batch_1.csv）
+        store (ResultStore): 结果库，为None时不写入
+        run_id (str): 结果库运行ID
+    
+    返回:
+        str: 结果文件名（如result_batch_1.csv），保存失败返回None
+    """
+    result_filename = f"result_{batch_file}"
+    result_filepath = os.path.join(CLASSIFY_SAVE_PATH, result_filename)
+    try:
+        result_df.to_csv(result_filepath, index=False, encoding="utf-8")
+        logger.info(f"已保存{result_filename}，包含 {len(result_df)} 条记录")
+        print(f"已保存{result_filename}")
+        if store is not None:
+            store.insert_dataframe(result_df, run_id, source_batch=result_filename)
+        return result_filename
+    except Exception as e:
+        logger.error(f"保存{result_filename}失败！错误：{e}")
+        print(f"保存{result_filename}失败！错误：{e}")
+        return None
+
 def batch_classify():
     """
     批量分类主函数
@@ -328,31 +555,16 @@ def batch_classify():
     1. 创建并清空分类结果文件夹
     2. 加载Prompt模板
     3. 获取所有批次文件
-    4. 使用线程池并行处理所有批次
-    5. 合并所有分类结果
+    4. 按估算耗时从大到小并行处理所有批次（开启流式验证时逐批验证结果；同时开启自动复核时，
+       问题字段以复核优先级插队提交到同一调度器，先于排队中的分类批次派发）
+    5. 写回复核通过的结果，合并所有分类结果
     """
     try:
         start_time = datetime.now()
         logger.info("开始批量分类处理")
         
-        # 1. 创建分类结果文件夹
-        logger.info(f"准备创建分类结果文件夹：{CLASSIFY_SAVE_PATH}")
-        if not os.path.exists(CLASSIFY_SAVE_PATH):
-            os.makedirs(CLASSIFY_SAVE_PATH)
-            logger.info(f"已创建分类结果文件夹：{CLASSIFY_SAVE_PATH}")
-
-        # 2. 删除CLASSIFY_SAVE_PATH下所有文件
-        logger.info(f"清理分类结果文件夹中的旧文件")
-        files_deleted = 0
-        for filename in os.listdir(CLASSIFY_SAVE_PATH):
-            file_path = os.path.join(CLASSIFY_SAVE_PATH, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                    files_deleted += 1
-            except Exception as e:
-                logger.error(f"删除文件 {file_path} 失败！错误：{e}")
-        logger.info(f"清理完成，共删除 {files_deleted} 个旧文件")
+        # 1-2. 创建分类结果文件夹并清空旧文件
+        prepare_classify_dir()
 
         # 3. 加载Prompt模板
         prompt_template = load_prompt_template()
@@ -371,95 +583,143 @@ def batch_classify():
         logger.info(f"共找到{len(batch_files)}个批次文件，开始分类...")
         print(f"共找到{len(batch_files)}个批次文件，开始分类...")
 
-        # 5. 定义单个批次处理函数（用于多线程）
-        def process_batch(batch_file):
-            batch_path = os.path.join(BATCH_SAVE_PATH, batch_file)
-            thread_name = os.path.basename(batch_file)
-            logger.info(f"线程 {thread_name} 开始处理...")
-            print(f"线程 {thread_name} 开始处理...")
-            
-            try:
-                # 分类当前批次
-                result_df = classify_single_batch(batch_path, prompt_template)
-                if result_df is None:
-                    logger.warning(f"跳过{batch_file}（处理失败）")
-                    print(f"跳过{batch_file}（处理失败）")
-                    return False
-                
-                # 检查数据框是否为空（只有表头没有实际数据行）
-                if len(result_df) == 0:
-                    logger.info(f"跳过{batch_file}（分类结果为空，不生成文件）")
-                    print(f"跳过{batch_file}（分类结果为空，不生成文件）")
-                    return True  # 返回True表示处理成功，只是没有生成文件
-                
-                # 保存分类结果
-                result_filename = f"result_{batch_file}"
-                result_filepath = os.path.join(CLASSIFY_SAVE_PATH, result_filename)
-                
-                try:
-                    result_df.to_csv(result_filepath, index=False, encoding="utf-8")
-                    logger.info(f"已保存{result_filename}，包含 {len(result_df)} 条记录")
-                    print(f"已保存{result_filename}")
-                    return True
-                except Exception as e:
-                    logger.error(f"保存{result_filename}失败！错误：{e}")
-                    print(f"保存{result_filename}失败！错误：{e}")
-                    return False
-            except Exception as e:
-                logger.error(f"处理{batch_file}时发生异常：{e}")
-                logger.error(traceback.format_exc())
-                print(f"处理{batch_file}时发生异常：{e}")
+        # 开启流式验证时，每个批次的结果一返回就执行验证
+        verifier = StreamingVerifier() if STREAMING_VERIFY_ENABLED else None
+        # 开启结果库时，本次运行的分类结果同时写入结果库
+        store = ResultStore() if RESULT_STORE_ENABLED else None
+        run_id = store.start_run(description=f"{len(batch_files)}个批次") if store is not None else None
+        # 逐批次记录令牌用量（与分类结果一起保存）
+        usage_log = TokenUsageLog(os.path.join(CLASSIFY_SAVE_PATH, USAGE_FILE_NAME), store, run_id)
+
+        # 各批次的分类记录数（用于统计阶段吞吐）
+        classified_records = []
+
+        # 开启流式验证和自动复核时，问题字段在分类过程中插队复核（延迟导入：reclassify依赖本模块）
+        recheck_template = None
+        if verifier is not None and RECLASSIFY_ENABLED:
+            from script.reclassify import (
+                load_reclassify_template, build_recheck_groups, reclassify_group, apply_rechecks
+            )
+            recheck_template = load_reclassify_template()
+            if not recheck_template:
+                logger.warning("无法加载复核提示词模板，本次不在分类过程中复核问题字段")
+        recheck_lock = threading.Lock()
+        problem_tables = []
+        recheck_candidates = []
+        rechecked = []
+        recheck_count = [0]
+
+        # 5. 定义批次（或拆分出的子批次）处理函数和批次完成后的保存、验证函数（在调度线程中执行）
+        def process_batch(task):
+            if task.priority == PRIORITY_RECHECK:
+                logger.info(f"线程 {threading.current_thread().name} 开始复核 {task.name}（{len(task.frame)} 个字段）...")
+                usage = TokenUsage(LLM_SERVICE)
+                result_df = reclassify_group(task.frame["raw_text"].tolist(), task.frame["hint"].tolist(),
+                                             recheck_template, usage)
+                usage_log.record(usage, "reclassify")
+                return result_df
+            logger.info(f"线程 {threading.current_thread().name} 开始处理 {task.name}（{len(task.frame)} 个字段）...")
+            print(f"开始处理 {task.name}...")
+            # 分类当前批次，子批次的令牌用量记在所属批次名下
+            usage = TokenUsage(LLM_SERVICE)
+            result_df = classify_fields(task.frame["raw_text"].tolist(), prompt_template, task.frame, usage)
+            usage_log.record(usage, task.root.name)
+            return result_df
+
+        def complete_batch(task, result_df):
+            batch_file = task.name
+            if task.priority == PRIORITY_RECHECK:
+                # 复核失败的字段留给人工处理，不计为批次失败
+                if result_df is not None and not result_df.empty:
+                    with recheck_lock:
+                        rechecked.append(result_df)
+                return True
+            if result_df is None:
+                logger.warning(f"跳过{batch_file}（处理失败）")
+                print(f"跳过{batch_file}（处理失败）")
+                return False
+
+            # 检查数据框是否为空（只有表头没有实际数据行）
+            if len(result_df) == 0:
+                logger.info(f"跳过{batch_file}（分类结果为空，不生成文件）")
+                print(f"跳过{batch_file}（分类结果为空，不生成文件）")
+                return True  # 返回True表示处理成功，只是没有生成文件
+
+            classified_records.append(len(result_df))
+            # 保存分类结果并写入结果库
+            result_filename = save_batch_result(result_df, batch_file, store, run_id)
+            if result_filename is None:
                 return False
+            if verifier is not None:
+                problems_df = verifier.check(result_df, result_filename)
+                if recheck_template and not problems_df.empty:
+                    submit_rechecks(problems_df, batch_file)
+            return True
+
+        def submit_rechecks(problems_df, batch_file):
+            candidates, groups, _ = build_recheck_groups(problems_df)
+            with recheck_lock:
+                problem_tables.append(problems_df)
+                recheck_candidates.append(candidates)
+                recheck_count[0] += len(groups)
+            for name, chunk in groups:
+                scheduler.submit(f"复核:{batch_file}:{name}", chunk, priority=PRIORITY_RECHECK)
+            if groups:
+                logger.info(f"{batch_file} 的 {len(candidates)} 个问题字段以 {len(groups)} 个复核批次插队提交")
         
-        # 6. 使用线程池并行处理所有批次
+        # 6. 按估算耗时从大到小调度所有批次，运行末尾把批次拆成子批次分给空闲线程
         # 根据配置获取当前服务的并发限制
         concurrency_limit = LLM_CONCURRENCY.get(LLM_SERVICE, 2)
         
-        # 根据CPU核心数、服务限制和批次文件数量动态调整线程数
-        max_workers = min(os.cpu_count(), concurrency_limit, len(batch_files))  # 保守设置，优先使用服务限制
+        # 线程数只取决于服务的并发限制：线程主要等待LLM响应，与CPU核心数无关；
+        # 批次数少于线程数时，空闲线程领取调度器拆分出的子批次
+        max_workers = max(1, concurrency_limit)
         
         logger.info(f"使用多线程处理，最大线程数：{max_workers}（基于{LLM_SERVICE}服务的并发限制）")
         print(f"使用多线程处理，最大线程数：{max_workers}（基于{LLM_SERVICE}服务的并发限制）")
         
-        success_count = 0
-        failed_count = 0
-        
-        # 检查是否有可用的批次文件
-        if not batch_files:
-            logger.warning("没有需要处理的批次文件")
-            print("没有需要处理的批次文件")
-            return
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务到线程池
-            future_to_batch = {executor.submit(process_batch, batch_file): batch_file for batch_file in batch_files}
-            
-            # 等待所有任务完成并获取结果
-            for future in concurrent.futures.as_completed(future_to_batch):
-                batch_file = future_to_batch[future]
-                try:
-                    result = future.result()
-                    if result:
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                except Exception as e:
-                    logger.error(f"获取{batch_file}结果时发生异常：{e}")
-                    print(f"处理{batch_file}时发生异常：{e}")
-                    failed_count += 1
+        scheduler = BatchScheduler(process_batch, complete_batch, workers=max_workers)
+        for batch_file in batch_files:
+            scheduler.submit(batch_file, path=os.path.join(BATCH_SAVE_PATH, batch_file))
+        success_count, failed_count = scheduler.run()
+        # 复核批次总是计为成功，只统计分类批次
+        success_count -= recheck_count[0]
 
         # 记录处理结果统计
         logger.info(f"多线程处理完成！成功：{success_count} 个批次，失败：{failed_count} 个批次")
         print(f"多线程处理完成！成功：{success_count} 个批次，失败：{failed_count} 个批次")
         print(f"结果保存在：{CLASSIFY_SAVE_PATH}")
+
+        # 写回复核通过的结果（随后统一合并），输出仍需人工复核的字段
+        if problem_tables:
+            problems_df = pd.concat(problem_tables, ignore_index=True)
+            resolved_count, unresolved_df = apply_rechecks(
+                problems_df, pd.concat(recheck_candidates, ignore_index=True), rechecked, store, run_id, merge=False
+            )
+            summary = (f"分类过程中复核 {recheck_count[0]} 个批次：问题字段 {len(problems_df)} 条，"
+                       f"复核通过 {resolved_count} 个字段，仍需人工复核 {len(unresolved_df)} 条")
+            logger.info(summary)
+            print(summary)
+        if store is not None:
+            logger.info(f"分类结果已写入结果库，运行ID：{run_id}")
+            print(f"分类结果已写入结果库：{store.path}（运行ID：{run_id}）")
+            store.close()
+        
+        # 输出流式验证的最终统计
+        if verifier is not None:
+            verifier.finalize()
         
         # 合并所有分类结果文件
         logger.info("开始合并所有分类结果文件")
         merge_classification_results()
+
+        # 输出令牌用量与成本报告
+        report_token_usage(CLASSIFY_SAVE_PATH)
         
         # 输出总处理时间
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
+        record_stage("classify", sum(classified_records), duration)
         logger.info(f"批量分类处理完成，总耗时：{duration:.2f} 秒")
         print(f"批量分类处理完成，总耗时：{duration:.2f} 秒")
         
@@ -471,4 +731,5 @@ def batch_classify():
 
 # 执行批量分类
 if __name__ == "__main__":
+    setup_logging("llm_classify")
     batch_classify()
\ No newline at end of file
@@ -0,0 +1,316 @@
+import pandas as pd
+import os
+import re
+import json
+import pickle
+import importlib.util
+import logging
+import threading
+import traceback
+from datetime import datetime
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    MERGED_RESULTS_PATH,
+    LOCAL_MODEL_DIR,
+    LOCAL_MODEL_MIN_PROBA,
+    LOCAL_MODEL_MIN_LABEL_CONFIDENCE,
+    LOCAL_MODEL_MIN_SAMPLES,
+    LOCAL_MODEL_MIN_CLASS_SAMPLES,
+    LOCAL_MODEL_MIN_PRECISION
+)
+
+# scikit-learn为可选依赖，未安装时本地模型功能自动关闭；导入较慢，只在训练或加载模型时导入
+SKLEARN_AVAILABLE = importlib.util.find_spec("sklearn") is not None
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 指向当前启用模型版本的索引文件
+LATEST_MODEL_INDEX = "latest.json"
+# 不参与训练的类别（LLM无法判断的结果）
+EXCLUDED_CATEGORIES = "未分类|无法识别"
+# 本地模型预分类结果的reason（训练时据此排除模型自己的预测，只用LLM的标注）
+LOCAL_MODEL_REASON = "本地模型v{version}预测"
+LOCAL_MODEL_REASON_PATTERN = r"^本地模型v\d+预测"
+# 合并结果中source_file（如result_batch_12.csv）的批次序号，用于按批次顺序去重
+BATCH_NUMBER_PATTERN = r"(\d+)\.csv$"
+
+# 已加载模型的进程内缓存（多线程分类时只加载一次）：键为(索引或元数据文件路径, 修改时间)，
+# 重新训练或模型文件出现后键随之变化，自动加载新模型
+_model_cache = {}
+_model_lock = threading.Lock()
+
+
+def _model_file_path(version):
+    """返回指定版本模型文件的路径"""
+    return os.path.join(LOCAL_MODEL_DIR, f"local_classifier_v{version:04d}.pkl")
+
+
+def _next_model_version():
+    """扫描模型目录，返回下一个可用的版本号"""
+    if not os.path.exists(LOCAL_MODEL_DIR):
+        return 1
+    versions = []
+    for filename in os.listdir(LOCAL_MODEL_DIR):
+        match = re.match(r"local_classifier_v(\d+)\.pkl$", filename)
+        if match:
+            versions.append(int(match.group(1)))
+    return max(versions) + 1 if versions else 1
+
+
+def load_training_data(merged_results_path=None):
+    """
+    从合并结果中加载训练语料
+
+    参数:
+        merged_results_path (str): 合并结果文件路径，默认使用配置中的MERGED_RESULTS_PATH
+
+    返回:
+        pd.DataFrame: 包含raw_text和category两列的训练数据，加载失败返回None
+    """
+    path = merged_results_path or MERGED_RESULTS_PATH
+    if not os.path.exists(path):
+        logger.warning(f"训练语料不存在：{path}，请先运行script/llm_classify.py生成合并结果")
+        return None
+
+    # 延迟导入：reclassify依赖llm_classify，而llm_classify导入本模块
+    from script.reclassify import RECLASSIFY_REASON_PREFIX
+
+    columns = ["raw_text", "category", "confidence", "reason", "source_file"]
+    df = pd.read_csv(path, encoding="utf-8-sig", usecols=lambda column: column in columns).reindex(columns=columns)
+    total_rows = len(df)
+
+    # 只保留LLM给出的高置信度、类别有效的标注：本地模型自己的预测和自动复核的结果不作为训练语料
+    df["confidence"] = pd.to_numeric(df["confidence"], errors="coerce")
+    reason = df["reason"].fillna("").astype(str)
+    df = df[
+        df["raw_text"].notna() &
+        df["category"].notna() &
+        ~df["category"].astype(str).str.contains(EXCLUDED_CATEGORIES, na=False) &
+        (df["confidence"] >= LOCAL_MODEL_MIN_LABEL_CONFIDENCE) &
+        ~reason.str.contains(LOCAL_MODEL_REASON_PATTERN) &
+        ~reason.str.startswith(RECLASSIFY_REASON_PREFIX)
+    ]
+    df = df.assign(raw_text=df["raw_text"].astype(str), category=df["category"].astype(str).str.strip())
+
+    # 合并结果按类别排序，先按批次序号恢复分类顺序（稳定排序，批次内保持原顺序），
+    # 同一字段多次标注时保留最后一个批次的结果
+    batch_number = pd.to_numeric(
+        df["source_file"].astype(str).str.extract(BATCH_NUMBER_PATTERN, expand=False), errors="coerce"
+    )
+    df = df.iloc[batch_number.fillna(-1).to_numpy().argsort(kind="stable")]
+    df = df.drop_duplicates(subset=["raw_text"], keep="last")
+
+    # 去掉样本过少的类别，避免校准时交叉验证折数不足
+    class_counts = df["category"].value_counts()
+    kept_classes = class_counts[class_counts >= LOCAL_MODEL_MIN_CLASS_SAMPLES].index
+    df = df[df["category"].isin(kept_classes)]
+
+    logger.info(f"训练语料加载完成 - 原始记录：{total_rows}，可用样本：{len(df)}，类别数：{len(kept_classes)}")
+    return df[["raw_text", "category"]].reset_index(drop=True)
+
+
+def _build_pipeline():
+    """构建字符n-gram + 线性分类器 + 概率校准的模型流水线"""
+    from sklearn.pipeline import Pipeline
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.calibration import CalibratedClassifierCV
+
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), lowercase=False,
+                                  sublinear_tf=True, min_df=1)),
+        ("clf", CalibratedClassifierCV(LogisticRegression(max_iter=1000, C=4.0),
+                                       method="sigmoid", cv=3)),
+    ])
+
+
+def train_local_classifier(merged_results_path=None):
+    """
+    训练本地蒸馏模型主函数
+
+    功能：使用LLM累计的标注结果训练字符n-gram线性分类器，评估留出集上的高置信预测准确率，
+    并按版本号保存到LOCAL_MODEL_DIR
+
+    参数:
+        merged_results_path (str): 训练语料路径，默认使用MERGED_RESULTS_PATH
+
+    返回:
+        dict: 新模型的元数据，训练失败返回None
+    """
+    try:
+        if not SKLEARN_AVAILABLE:
+            logger.error("未安装scikit-learn，无法训练本地模型")
+            print("未安装scikit-learn，无法训练本地模型")
+            return None
+
+        from sklearn.model_selection import train_test_split
+
+        start_time = datetime.now()
+        logger.info("开始训练本地蒸馏模型")
+
+        data = load_training_data(merged_results_path)
+        if data is None:
+            return None
+        if len(data) < LOCAL_MODEL_MIN_SAMPLES or data["category"].nunique() < 2:
+            warning_msg = f"可用样本不足（{len(data)}个，{data['category'].nunique()}个类别），至少需要{LOCAL_MODEL_MIN_SAMPLES}个样本和2个类别"
+            logger.warning(warning_msg)
+            print(warning_msg)
+            return None
+
+        # 1. 留出20%样本评估高置信预测的准确率和覆盖率
+        train_df, holdout_df = train_test_split(
+            data, test_size=0.2, random_state=42, stratify=data["category"]
+        )
+        pipeline = _build_pipeline()
+        pipeline.fit(train_df["raw_text"], train_df["category"])
+
+        proba = pipeline.predict_proba(holdout_df["raw_text"])
+        predicted = pipeline.classes_[proba.argmax(axis=1)]
+        confident = proba.max(axis=1) >= LOCAL_MODEL_MIN_PROBA
+        coverage = float(confident.mean())
+        precision = float((predicted[confident] == holdout_df["category"].values[confident]).mean()) if confident.any() else 0.0
+        logger.info(f"留出集评估 - 阈值：{LOCAL_MODEL_MIN_PROBA}，覆盖率：{coverage:.2%}，准确率：{precision:.2%}")
+
+        # 2. 使用全部样本重新训练最终模型
+        pipeline = _build_pipeline()
+        pipeline.fit(data["raw_text"], data["category"])
+
+        # 3. 按版本号保存模型及元数据
+        os.makedirs(LOCAL_MODEL_DIR, exist_ok=True)
+        version = _next_model_version()
+        model_path = _model_file_path(version)
+        with open(model_path, "wb") as f:
+            pickle.dump(pipeline, f)
+
+        metadata = {
+            "version": version,
+            "model_file": os.path.basename(model_path),
+            "trained_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "n_samples": int(len(data)),
+            "classes": [str(c) for c in pipeline.classes_],
+            "min_proba": LOCAL_MODEL_MIN_PROBA,
+            "holdout_coverage": coverage,
+            "holdout_precision": precision
+        }
+        with open(model_path.replace(".pkl", ".json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(LOCAL_MODEL_DIR, LATEST_MODEL_INDEX), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        # 新模型已启用，丢弃进程内缓存的旧模型
+        with _model_lock:
+            _model_cache.clear()
+
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"本地模型 v{version} 训练完成，已保存到：{model_path}，耗时：{duration:.2f} 秒")
+        print(f"本地模型 v{version} 训练完成！样本数：{len(data)}，留出集覆盖率：{coverage:.2%}，准确率：{precision:.2%}")
+        print(f"模型保存路径：{model_path}")
+        return metadata
+
+    except Exception as e:
+        error_msg = f"训练本地模型时发生未预期错误！错误：{type(e).__name__} - {str(e)}"
+        logger.critical(error_msg)
+        logger.error(traceback.format_exc())
+        print(error_msg)
+        return None
+
+
+def load_local_classifier(version=None):
+    """
+    加载本地蒸馏模型（进程内缓存）
+
+    参数:
+        version (int): 模型版本号，默认加载latest.json指向的版本
+
+    返回:
+        tuple: (模型, 元数据)，模型不存在或未达到准确率要求时返回(None, None)
+    """
+    if not SKLEARN_AVAILABLE:
+        return None, None
+
+    with _model_lock:
+        if version is None:
+            metadata_path = os.path.join(LOCAL_MODEL_DIR, LATEST_MODEL_INDEX)
+        else:
+            metadata_path = _model_file_path(version).replace(".pkl", ".json")
+        try:
+            cache_key = (metadata_path, os.stat(metadata_path).st_mtime_ns)
+        except OSError:
+            cache_key = (metadata_path, None)
+        if cache_key in _model_cache:
+            return _model_cache[cache_key]
+        # 同一路径的旧缓存（模型已更新或已删除）不再使用
+        for key in [key for key in _model_cache if key[0] == metadata_path]:
+            del _model_cache[key]
+
+        model, metadata = None, None
+        try:
+            if cache_key[1] is None and version is None:
+                logger.info("未找到本地模型，所有字段将交由LLM分类")
+                _model_cache[cache_key] = (None, None)
+                return None, None
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            version = metadata["version"]
+
+            if metadata.get("holdout_precision", 0) < LOCAL_MODEL_MIN_PRECISION:
+                logger.warning(f"本地模型 v{version} 留出集准确率 {metadata.get('holdout_precision', 0):.2%} 低于要求 {LOCAL_MODEL_MIN_PRECISION:.2%}，不启用")
+                metadata = None
+            else:
+                with open(_model_file_path(version), "rb") as f:
+                    model = pickle.load(f)
+                logger.info(f"已加载本地模型 v{version}（训练样本：{metadata['n_samples']}）")
+        except Exception as e:
+            logger.error(f"加载本地模型失败！错误：{type(e).__name__} - {str(e)}")
+            model, metadata = None, None
+
+        _model_cache[cache_key] = (model, metadata)
+        return model, metadata
+
+
+def apply_local_classifier(fields, min_proba=None):
+    """
+    使用本地模型对字段进行一次向量化预分类
+
+    参数:
+        fields (list): 待分类字段列表
+        min_proba (float): 采用本地结果的概率阈值，默认使用LOCAL_MODEL_MIN_PROBA
+
+    返回:
+        tuple: (本地分类结果DataFrame, 仍需LLM分类的字段列表)
+    """
+    empty_df = pd.DataFrame(columns=["raw_text", "category", "confidence", "reason"])
+    model, metadata = load_local_classifier()
+    if model is None or not fields:
+        return empty_df, list(fields)
+
+    threshold = min_proba if min_proba is not None else LOCAL_MODEL_MIN_PROBA
+    texts = pd.Series(fields, dtype=object).astype(str)
+    proba = model.predict_proba(texts)
+    best = proba.argmax(axis=1)
+    best_proba = proba.max(axis=1)
+    confident = best_proba >= threshold
+
+    predicted_df = pd.DataFrame({
+        "raw_text": texts[confident].values,
+        "category": model.classes_[best[confident]],
+        "confidence": (best_proba[confident] * 100).round().astype(int),
+        "reason": LOCAL_MODEL_REASON.format(version=metadata["version"])
+    })
+    remaining_fields = [field for field, skip in zip(fields, confident) if not skip]
+
+    logger.info(f"本地模型预分类 {len(fields)} 个字段，直接采用 {len(predicted_df)} 个，剩余 {len(remaining_fields)} 个交由LLM")
+    return predicted_df, remaining_fields
+
+
+# 训练本地模型
+if __name__ == "__main__":
+    setup_logging("local_classifier")
+    train_local_classifier()
@@ -1,8 +1,8 @@
 import requests
 import logging
 import time
-import backoff
-from typing import List, Dict, Optional, Any
+import concurrent.futures
+from typing import List, Dict, Optional, Any, Tuple
 
 # 使用包导入方式
 from config.config import (
@@ -10,46 +10,94 @@ from config.config import (
     LOCAL_LLM_MODEL,
     TEMPERATURE,
     LOCAL_LLM_MAX_TOKENS,
-    MAX_RETRY_COUNT,
-    INITIAL_RETRY_INTERVAL,
-    RETRY_INTERVAL_MULTIPLIER,
+    LOCAL_LLM_BATCH_MODE,
+    LOCAL_LLM_COMPLETIONS_URL,
+    LOCAL_LLM_BATCH_CONCURRENCY,
     API_TIMEOUT
 )
+from script.retry_policy import (
+    get_retry_policy,
+    RetryableLLMError,
+    LLMResponseFormatError,
+    FatalLLMError
+)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class LocalLLMClient:
     """Client class for interacting with LLM service"""
-    def __init__(self, url: str = None):
+    # Backend name used for the shared circuit breaker and retry budget
+    BACKEND = "LOCAL"
+
+    def __init__(self, url: str = None, retry_policy=None):
         """Initialize LocalLLMClient instance
         Args:
             url: LLM service endpoint URL (optional, defaults to config value)
+            retry_policy: RetryPolicy to use (optional, defaults to the shared process-wide policy)
         """
         self.url = url or LOCAL_LLM_URL
+        self.retry_policy = retry_policy or get_retry_policy()
+        self.completions_url = LOCAL_LLM_COMPLETIONS_URL or (self.url or "").replace("chat/completions", "completions")
         self.headers = {"Content-Type": "application/json"}
         self.context: List[Dict[str, str]] = []
+        # 复用HTTP连接，批量并发请求时避免重复建立连接
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(LOCAL_LLM_BATCH_CONCURRENCY, 10))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         logger.info("LocalLLMClient instance initialized with URL: %s", self.url)
         
-    @backoff.on_exception(
-        backoff.expo,
-        (requests.RequestException, requests.Timeout),
-        max_tries=MAX_RETRY_COUNT + 1,
-        initial_interval=INITIAL_RETRY_INTERVAL,
-        factor=RETRY_INTERVAL_MULTIPLIER
-    )
-    def _send_request(self, messages: List[Dict[str, str]]) -> str:
-        """Send request to LLM service with retry mechanism
+    def _post(self, url: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """POST one request and map failures to typed LLM errors
+        
+        Timeouts, connection errors, HTTP 429 and 5xx are retryable; other HTTP
+        errors are fatal; a non-JSON or non-dict body is a response format error.
+        
+        Args:
+            url: Endpoint URL
+            data: JSON request body
+            
+        Returns:
+            Decoded JSON response
+        """
+        try:
+            response = self.session.post(url, headers=self.headers, json=data, timeout=API_TIMEOUT)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            logger.error("HTTP error in LLM request: %s", str(e))
+            raise RetryableLLMError(f"LLM request failed: {e}", backend=self.BACKEND) from e
+        except requests.RequestException as e:
+            logger.error("HTTP error in LLM request: %s", str(e))
+            raise FatalLLMError(f"LLM request failed: {e}", backend=self.BACKEND) from e
+        
+        if response.status_code == 429 or response.status_code >= 500:
+            logger.error("LLM service returned HTTP %d", response.status_code)
+            raise RetryableLLMError(f"LLM service returned HTTP {response.status_code}", backend=self.BACKEND)
+        if response.status_code >= 400:
+            logger.error("LLM service returned HTTP %d", response.status_code)
+            raise FatalLLMError(f"LLM service returned HTTP {response.status_code}: {response.text[:200]}", backend=self.BACKEND)
+        
+        try:
+            response_json = response.json()
+        except ValueError as e:
+            raise LLMResponseFormatError("Invalid response format: body is not JSON", backend=self.BACKEND) from e
+        if not isinstance(response_json, dict):
+            raise LLMResponseFormatError("Invalid response format: not a dictionary", backend=self.BACKEND)
+        return response_json
+
+    def _send_request(self, messages: List[Dict[str, str]],
+                      max_tokens: Optional[int] = None) -> Tuple[str, Optional[dict]]:
+        """Send a single chat request to LLM service (one attempt, no retry)
         
         Args:
             messages: List of message dictionaries
+            max_tokens: Optional response token limit (defaults to LOCAL_LLM_MAX_TOKENS)
             
         Returns:
-            Response text from LLM
+            Tuple of (response text, ``usage`` block or None if the server omits it)
             
         Raises:
-            Exception: If request fails after retries
+            LLMError: Typed error describing whether the failure is retryable
         """
         data = {
             "model": LOCAL_LLM_MODEL,
@@ -57,54 +105,88 @@ class LocalLLMClient:
             "temperature": TEMPERATURE,
             "top_p": 0.8,  # 核采样参数，控制生成的多样性（0.7-0.9效果较好）
             "repetition_penalty": 1.05,  # 重复惩罚系数，减少重复内容生成（1.0-1.2）
-            "max_tokens": LOCAL_LLM_MAX_TOKENS
+            "max_tokens": max_tokens or LOCAL_LLM_MAX_TOKENS
         }
         
-        try:
-            logger.debug("Sending request to LLM service with data: %s", data)
-            start_time = time.time()
-            response = requests.post(self.url, headers=self.headers, json=data, timeout=API_TIMEOUT)
-            response.raise_for_status()
-            end_time = time.time()
-            process_time = end_time - start_time
-            logger.info("LLM request completed in %.2f seconds", process_time)
+        logger.debug("Sending request to LLM service with data: %s", data)
+        start_time = time.time()
+        response_json = self._post(self.url, data)
+        process_time = time.time() - start_time
+        logger.info("LLM request completed in %.2f seconds", process_time)
+        
+        # Validate response format
+        if "choices" not in response_json:
+            raise LLMResponseFormatError("Invalid response format: 'choices' key missing", backend=self.BACKEND)
+        if not response_json["choices"]:
+            raise LLMResponseFormatError("Invalid response format: 'choices' is empty", backend=self.BACKEND)
+        if "message" not in response_json["choices"][0]:
+            raise LLMResponseFormatError("Invalid response format: 'message' key missing", backend=self.BACKEND)
+        if "content" not in response_json["choices"][0]["message"]:
+            raise LLMResponseFormatError("Invalid response format: 'content' key missing", backend=self.BACKEND)
+        
+        result = response_json["choices"][0]["message"]["content"]
+        logger.debug("Received valid response from LLM service")
+        return result, response_json.get("usage")
+
+    def _send_completions_request(self, prompts: List[str],
+                                  max_tokens: Optional[int] = None) -> Tuple[List[str], Optional[dict]]:
+        """Send one multi-prompt request to the completions endpoint
+        
+        Servers such as vLLM accept a list of prompts and batch them internally;
+        choices are demultiplexed back to prompt order by their ``index``.
+        
+        Args:
+            prompts: List of prompt strings
+            max_tokens: Optional per-prompt response token limit
             
-            # Validate response format
-            response_json = response.json()
-            if not isinstance(response_json, dict):
-                raise ValueError("Invalid response format: not a dictionary")
-            if "choices" not in response_json:
-                raise ValueError("Invalid response format: 'choices' key missing")
-            if not response_json["choices"]:
-                raise ValueError("Invalid response format: 'choices' is empty")
-            if "message" not in response_json["choices"][0]:
-                raise ValueError("Invalid response format: 'message' key missing")
-            if "content" not in response_json["choices"][0]["message"]:
-                raise ValueError("Invalid response format: 'content' key missing")
+        Returns:
+            Tuple of (response texts in the same order as ``prompts``, ``usage`` block or None)
             
-            result = response_json["choices"][0]["message"]["content"]
-            logger.debug("Received valid response from LLM service")
-            return result
-        except requests.RequestException as e:
-            logger.error("HTTP error in LLM request: %s", str(e))
-            raise
-        except ValueError as e:
-            logger.error("Response validation error: %s", str(e))
-            raise
-        except Exception as e:
-            logger.error("Unexpected error in LLM request: %s", str(e))
-            raise
+        Raises:
+            LLMError: Typed error describing whether the failure is retryable
+        """
+        data = {
+            "model": LOCAL_LLM_MODEL,
+            "prompt": prompts,
+            "temperature": TEMPERATURE,
+            "top_p": 0.8,
+            "repetition_penalty": 1.05,
+            "max_tokens": max_tokens or LOCAL_LLM_MAX_TOKENS
+        }
+        
+        start_time = time.time()
+        response_json = self._post(self.completions_url, data)
+        logger.info("LLM completions request with %d prompts completed in %.2f seconds", len(prompts), time.time() - start_time)
+        
+        if not response_json.get("choices"):
+            raise LLMResponseFormatError("Invalid response format: 'choices' key missing or empty", backend=self.BACKEND)
+        
+        results = [None] * len(prompts)
+        for position, choice in enumerate(response_json["choices"]):
+            index = choice.get("index", position)
+            if not 0 <= index < len(prompts) or "text" not in choice:
+                raise LLMResponseFormatError(f"Invalid response format: unexpected choice {index}", backend=self.BACKEND)
+            results[index] = choice["text"]
+        if any(result is None for result in results):
+            raise LLMResponseFormatError("Invalid response format: missing choices for some prompts", backend=self.BACKEND)
+        return results, response_json.get("usage")
 
-    def chat(self, user_content: str, assistant_content: Optional[str] = None, system_content: Optional[str] = None) -> Dict[str, Any]:
+    def chat(self, user_content: str, assistant_content: Optional[str] = None, system_content: Optional[str] = None,
+             max_tokens: Optional[int] = None) -> Dict[str, Any]:
         """Single-turn conversation mode (no context)
         
         Args:
             user_content: User input content
             assistant_content: Optional assistant prompt
             system_content: Optional system prompt
+            max_tokens: Optional response token limit
             
         Returns:
             Response dictionary with format similar to OpenAI API response
+            (``usage`` is passed through from the server, or None)
+            
+        Raises:
+            LLMError: If the request fails after the shared retry policy gives up
         """
         messages = []
         if system_content:
@@ -113,35 +195,65 @@ class LocalLLMClient:
             messages.append({"role": "assistant", "content": assistant_content})    
         messages.append({"role": "user", "content": user_content})
         
-        try:
-            # Get raw response text
-            response_text = self._send_request(messages)
-            
-            # Return OpenAI-like response structure as dictionary
-            return {
-                "choices": [
-                    {
-                        "message": {
-                            "role": "assistant",
-                            "content": response_text
-                        }
-                    }
-                ]
-            }
-        except Exception as e:
-            logger.error("Error in chat function: %s", str(e))
-            # Return error response in similar format
-            return {
-                "choices": [
-                    {
-                        "message": {
-                            "role": "assistant",
-                            "content": f"Error: {str(e)}"
-                        }
+        # Get raw response text; retries, retry budget and circuit breaking live in the shared policy
+        response_text, usage = self.retry_policy.call(self.BACKEND, self._send_request, messages, max_tokens=max_tokens)
+        
+        # Return OpenAI-like response structure as dictionary
+        return {
+            "choices": [
+                {
+                    "message": {
+                        "role": "assistant",
+                        "content": response_text
                     }
-                ]
-            }
-    
+                }
+            ],
+            "usage": usage
+        }
+
+    def batch_chat(self, user_contents: List[str], system_content: Optional[str] = None,
+                   max_tokens: Optional[int] = None, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Submit many single-turn prompts at once and demultiplex the responses
+        
+        In ``CONCURRENT`` mode each prompt is sent as its own chat request from a
+        thread pool, letting the server batch them continuously. In ``COMPLETIONS``
+        mode all prompts go out as one multi-prompt completions request.
+        
+        Args:
+            user_contents: List of user prompts
+            system_content: Optional system prompt shared by all prompts (chat mode only)
+            max_tokens: Optional per-prompt response token limit
+            mode: "CONCURRENT" or "COMPLETIONS" (defaults to LOCAL_LLM_BATCH_MODE)
+            
+        Returns:
+            List of OpenAI-like response dictionaries, in the same order as ``user_contents``.
+            In ``COMPLETIONS`` mode the server reports one ``usage`` for the whole request; it is
+            attached to the first response and the others carry zero usage, so sums stay exact.
+            
+        Raises:
+            LLMError: If any prompt fails after the shared retry policy gives up
+        """
+        mode = (mode or LOCAL_LLM_BATCH_MODE).upper()
+        if not user_contents:
+            return []
+        
+        if mode == "COMPLETIONS":
+            texts, usage = self.retry_policy.call(self.BACKEND, self._send_completions_request, user_contents, max_tokens=max_tokens)
+            empty_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0} if usage else None
+            return [
+                {"choices": [{"message": {"role": "assistant", "content": text}}],
+                 "usage": usage if index == 0 else empty_usage}
+                for index, text in enumerate(texts)
+            ]
+        
+        max_workers = min(LOCAL_LLM_BATCH_CONCURRENCY, len(user_contents))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.chat, content, None, system_content, max_tokens)
+                for content in user_contents
+            ]
+            return [future.result() for future in futures]
+
 if __name__ == "__main__":
     """Test cases for LocalLLMClient class"""
     
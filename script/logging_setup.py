@@ -0,0 +1,48 @@
+import os
+import sys
+import logging
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import PROJECT_ROOT
+
+# 日志格式（各模块共用）
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_configured = False
+_setup_lock = threading.Lock()
+
+
+def setup_logging(log_name="sens_finder", level=logging.INFO):
+    """
+    配置全局日志（进程内只生效一次）
+
+    模块导入时不再配置日志、也不打开日志文件；由命令行入口或模块的__main__在启动时调用一次，
+    之后各模块通过logging.getLogger(__name__)获取的日志器统一输出到logs/<log_name>.log和控制台
+
+    参数:
+        log_name (str): 日志文件名（不含扩展名）
+        level (int): 日志级别
+
+    返回:
+        str: 日志文件路径，已配置过时返回None
+    """
+    global _configured
+    with _setup_lock:
+        if _configured:
+            return None
+        logs_dir = os.path.join(PROJECT_ROOT, 'logs')
+        os.makedirs(logs_dir, exist_ok=True)
+        log_path = os.path.join(logs_dir, f'{log_name}.log')
+        logging.basicConfig(
+            level=level,
+            format=LOG_FORMAT,
+            handlers=[
+                logging.FileHandler(log_path, encoding='utf-8'),
+                logging.StreamHandler()
+            ]
+        )
+        _configured = True
+        return log_path
@@ -0,0 +1,356 @@
+import os
+import sys
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    METRICS_TEXTFILE_PATH,
+    METRICS_HTTP_HOST,
+    METRICS_HTTP_PORT
+)
+
+logger = logging.getLogger(__name__)
+
+# 指标名前缀
+METRIC_PREFIX = "sensfinder_"
+# 默认直方图分桶（秒），覆盖本地模型的毫秒级到远程LLM的分钟级耗时
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "bucket_counts", "sum", "count", "_lock")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.bucket_counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    """
+    指标基类：按标签值缓存子指标
+
+    热点循环中应先调用labels()取得子指标并保存在局部变量中，或在循环外累加后一次性inc()，
+    每次inc/observe只有一次加锁，不做字符串处理
+    """
+    metric_type = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        # 无标签指标立即创建，未发生时也输出0值样本
+        if not self.labelnames:
+            self.labels()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *labelvalues):
+        """返回指定标签值对应的子指标（首次访问时创建）"""
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际传入 {labelvalues}")
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labelvalues, child in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    metric_type = "counter"
+    child_class = _CounterChild
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def value(self, *labelvalues):
+        return self.labels(*labelvalues).value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+    metric_type = "gauge"
+    child_class = _GaugeChild
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def value(self, *labelvalues):
+        return self.labels(*labelvalues).value
+
+
+class Histogram(_Metric):
+    """分桶直方图（输出_bucket、_sum、_count）"""
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labelvalues, child in self._samples():
+            with child._lock:
+                bucket_counts = list(child.bucket_counts)
+                total, count = child.sum, child.count
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.upper_bounds + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(float(upper_bound)))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(float(total))}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表：按注册顺序输出Prometheus文本格式"""
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"指标 {metric.name} 已注册")
+            self._metrics.append(metric)
+
+    def render(self):
+        """返回Prometheus文本格式的全部指标"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 进程内默认注册表
+REGISTRY = MetricsRegistry()
+
+# -------------------------- 预处理 --------------------------
+FILES_READ = Counter("files_read_total", "已读取的原始文件数", ["status"])
+BYTES_INGESTED = Counter("bytes_ingested_total", "已读取的原始文件字节数")
+FIELDS_SEEN = Counter("fields_seen_total", "原始文件中切分出的字段数")
+FIELDS_FILTERED = Counter("fields_filtered_total", "预处理中被过滤的字段数", ["reason"])
+DEDUP_RATIO = Gauge("dedup_ratio", "有效字段中重复字段的比例")
+
+# -------------------------- 分类 --------------------------
+BATCHES_IN_FLIGHT = Gauge("batches_in_flight", "正在调用LLM分类的批次数")
+LLM_REQUEST_SECONDS = Histogram("llm_request_seconds", "单次LLM请求耗时（每次重试单独计一次）", ["backend"])
+LLM_RETRIES = Counter("llm_retries_total", "LLM请求重试次数", ["backend"])
+LLM_FAILURES = Counter("llm_failures_total", "LLM请求失败次数（按错误类型）", ["backend", "error"])
+LLM_TOKENS = Counter("llm_tokens_total", "LLM令牌用量（服务未返回用量时为估算值）", ["backend", "kind"])
+PARSE_FAILURE_LINES = Counter("parse_failure_lines_total", "LLM响应中无法解析的非空行数")
+
+# -------------------------- 各阶段吞吐 --------------------------
+STAGE_RECORDS = Counter("stage_records_total", "各阶段处理的记录数", ["stage"])
+STAGE_SECONDS = Counter("stage_seconds_total", "各阶段累计耗时（秒）", ["stage"])
+STAGE_RECORDS_PER_SECOND = Gauge("stage_records_per_second", "各阶段最近一次运行的吞吐（记录数/秒）", ["stage"])
+
+# -------------------------- 在线分类服务 --------------------------
+SERVICE_LOOKUPS = Counter("service_lookups_total", "分类服务查询的字段数（按结果来源：memory、store、llm、coalesced、error）",
+                          ["source"])
+SERVICE_BATCH_FIELDS = Histogram("service_batch_fields", "分类服务发送给LLM的微批次字段数",
+                                 buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+SERVICE_REQUEST_SECONDS = Histogram("service_request_seconds", "分类服务单次HTTP请求耗时",
+                                    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0))
+
+
+def record_stage(stage, records, seconds):
+    """
+    记录一个阶段的处理量和耗时，并更新该阶段的吞吐
+
+    参数:
+        stage (str): 阶段名称（preprocess、classify、verify等）
+        records (int): 处理的记录数
+        seconds (float): 耗时（秒）
+    """
+    STAGE_RECORDS.labels(stage).inc(records)
+    STAGE_SECONDS.labels(stage).inc(seconds)
+    STAGE_RECORDS_PER_SECOND.labels(stage).set(records / seconds if seconds > 0 else 0.0)
+
+
+def write_textfile(path=None, registry=None):
+    """
+    将指标以Prometheus文本格式写入文件（供node_exporter的textfile collector采集）
+
+    先写临时文件再原子替换，采集方不会读到写了一半的文件
+
+    参数:
+        path (str): 输出路径，默认METRICS_TEXTFILE_PATH（为空时不写入）
+
+    返回:
+        str: 写入的文件路径，未配置或写入失败时返回None
+    """
+    path = path or METRICS_TEXTFILE_PATH
+    if not path:
+        return None
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write((registry or REGISTRY).render())
+        os.replace(temp_path, path)
+        logger.info(f"运行指标已写入：{path}")
+        return path
+    except OSError as e:
+        logger.error(f"写入运行指标文件失败：{e}")
+        return None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s - %s", self.address_string(), format % args)
+
+
+def start_http_server(port=None, host=None, registry=None):
+    """
+    在后台线程启动HTTP服务，GET /metrics 返回Prometheus文本格式的指标
+
+    参数:
+        port (int): 监听端口，默认METRICS_HTTP_PORT（为0时不启动）
+        host (str): 监听地址，默认METRICS_HTTP_HOST
+
+    返回:
+        ThreadingHTTPServer: 服务实例（调用shutdown()停止），未启动时返回None
+    """
+    port = METRICS_HTTP_PORT if port is None else port
+    if not port:
+        return None
+    host = host or METRICS_HTTP_HOST
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.error(f"启动指标HTTP服务失败（{host}:{port}）：{e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"指标HTTP服务已启动：http://{host}:{server.server_address[1]}/metrics")
+    print(f"指标HTTP服务已启动：http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+class Timer:
+    """上下文管理器：退出时把耗时（秒）记入直方图子指标"""
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+# 打印当前进程的指标（仅用于检查输出格式）
+if __name__ == "__main__":
+    print(REGISTRY.render(), end="")
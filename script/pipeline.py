@@ -0,0 +1,304 @@
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+import traceback
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    RAW_FILES_PATH,
+    BATCH_SAVE_PATH,
+    CLASSIFY_SAVE_PATH,
+    BATCH_SIZE,
+    LLM_SERVICE,
+    LLM_CONCURRENCY,
+    PIPELINE_QUEUE_SIZE,
+    RESULT_STORE_ENABLED
+)
+
+from script.data_preprocess import (
+    iter_field_batches,
+    new_preprocess_stats,
+    prepare_batch_dir,
+    build_batch_frame,
+    save_batch,
+    log_preprocess_stats
+)
+from script.llm_classify import (
+    load_prompt_template,
+    classify_fields,
+    prepare_classify_dir,
+    save_batch_result,
+    merge_classification_results
+)
+from script.bloom_filter import open_known_checker
+from script.provenance_index import new_index_builder, save_index
+from script.result_verify import StreamingVerifier
+from script.result_store import ResultStore
+from script.metrics import record_stage
+from script.token_usage import TokenUsage, TokenUsageLog, USAGE_FILE_NAME, report_token_usage
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_DONE = object()
+
+
+class StageStats:
+    """线程安全的阶段统计：各阶段忙碌时间（不含在队列上等待的时间）、墙钟时间跨度及批次计数"""
+    def __init__(self):
+        self.values = {}
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, key):
+        with self._lock:
+            return self.values.get(key, 0)
+
+    def mark(self, key, started, ended):
+        """记录一段处理的起止时间（多个线程的处理合并为从最早开始到最晚结束的跨度）"""
+        with self._lock:
+            first, last = self.spans.get(key, (started, ended))
+            self.spans[key] = (min(first, started), max(last, ended))
+
+    def elapsed(self, key):
+        """阶段的墙钟耗时：最早开始到最晚结束（多线程阶段不按线程累计）"""
+        with self._lock:
+            first, last = self.spans.get(key, (0.0, 0.0))
+            return last - first
+
+
+def _produce_batches(batch_queue, worker_count, stats, timer, stop_event, sources=None):
+    """
+    预处理阶段：流式读取原始文件（或sources中的字段），批次填满后写出批次文件并放入队列（队列满时阻塞，形成背压）；
+    使用sources时批次带source、offset来源列，随批次数据框进入分类结果；开启PROVENANCE_INDEX_ENABLED时
+    全部字段读取完成后保存来源索引
+    """
+    batches_created = 0
+    provenance = {} if sources is not None else None
+    known = None
+    index = new_index_builder()
+    try:
+        known = open_known_checker()
+        batches = iter_field_batches(BATCH_SIZE, stats, sources, provenance, known, index)
+        while not stop_event.is_set():
+            started = time.perf_counter()
+            batch_fields = next(batches, None)
+            if batch_fields is None:
+                if index is not None:
+                    save_index(index)
+                timer.add("预处理", time.perf_counter() - started)
+                break
+            batch_df = build_batch_frame(batch_fields, provenance) if provenance is not None else None
+            batch_file = save_batch(batch_fields, batches_created + 1, batch_df)
+            batches_created += 1
+            timer.add("预处理", time.perf_counter() - started)
+            logger.info(f"预处理产出 {batch_file}：{len(batch_fields)} 个字段")
+            batch_queue.put((batch_file, batch_fields, batch_df))
+    except Exception as e:
+        logger.critical(f"预处理阶段发生未预期错误！错误：{type(e).__name__} - {str(e)}")
+        logger.error(traceback.format_exc())
+        stop_event.set()
+    finally:
+        stats["batches_created"] = batches_created
+        if known is not None:
+            logger.info(f"已分类字段过滤：跳过 {stats['known_fields']} 个字段（过滤器命中 {known.positives} 个，"
+                        f"结果库确认 {known.confirmed} 个）")
+            known.store.close()
+        for _ in range(worker_count):
+            batch_queue.put(_DONE)
+
+
+def _classify_batches(batch_queue, result_queue, prompt_template, store, run_id, usage_log, counters, timer,
+                      stop_event):
+    """
+    分类阶段：从队列取出批次调用LLM分类，保存结果后放入验证队列
+    """
+    try:
+        while True:
+            item = batch_queue.get()
+            if item is _DONE:
+                break
+            if stop_event.is_set():
+                continue
+            batch_file, batch_fields, batch_df = item
+            started = time.perf_counter()
+            try:
+                logger.info(f"开始分类 {batch_file}（{len(batch_fields)} 个字段）")
+                usage = TokenUsage(LLM_SERVICE)
+                result_df = classify_fields(batch_fields, prompt_template, batch_df, usage=usage)
+                usage_log.record(usage, batch_file)
+                if result_df is None:
+                    logger.warning(f"跳过{batch_file}（处理失败）")
+                    print(f"跳过{batch_file}（处理失败）")
+                    counters.add("失败批次", 1)
+                    continue
+                counters.add("成功批次", 1)
+                counters.add("分类记录数", len(result_df))
+                if len(result_df) == 0:
+                    logger.info(f"跳过{batch_file}（分类结果为空，不生成文件）")
+                    continue
+                result_filename = save_batch_result(result_df, batch_file, store, run_id)
+                if result_filename is not None:
+                    result_queue.put((result_df, result_filename))
+            except Exception as e:
+                logger.error(f"处理{batch_file}时发生异常：{e}")
+                logger.error(traceback.format_exc())
+                counters.add("失败批次", 1)
+            finally:
+                ended = time.perf_counter()
+                timer.add("分类", ended - started)
+                timer.mark("分类", started, ended)
+    finally:
+        result_queue.put(_DONE)
+
+
+def _verify_results(result_queue, verifier, worker_count, timer):
+    """
+    验证阶段：分类结果一落地就执行验证规则
+    """
+    finished_workers = 0
+    while finished_workers < worker_count:
+        item = result_queue.get()
+        if item is _DONE:
+            finished_workers += 1
+            continue
+        result_df, result_filename = item
+        started = time.perf_counter()
+        try:
+            verifier.process(result_df, result_filename)
+        except Exception as e:
+            logger.error(f"验证{result_filename}时发生异常：{e}")
+            logger.error(traceback.format_exc())
+        finally:
+            timer.add("验证", time.perf_counter() - started)
+
+
+def run_pipeline(sources=None, description="流水线模式"):
+    """
+    流水线模式主函数
+
+    功能：预处理、分类、验证三个阶段通过有界队列连接并同时运行——预处理每填满一个批次就交给分类线程，
+    分类结果一落地就交给验证线程；队列已满时上游阻塞等待，内存占用与输入规模无关，
+    总耗时接近最慢阶段的耗时而不是三个阶段之和
+
+    参数:
+        sources (iterable): 同进程内直接传入的字段来源，逐个产出(source, fields, offsets)（如二进制字符串提取结果），
+            不再读取RAW_FILES_PATH；批次和分类结果带source、offset来源列
+        description (str): 结果库中的运行描述
+    处理流程：
+    1. 清空批次和分类结果文件夹，加载Prompt模板
+    2. 启动预处理线程、分类线程池和验证线程
+    3. 等待全部阶段结束
+    4. 合并分类结果并输出各阶段耗时
+    """
+    try:
+        start_time = datetime.now()
+        wall_started = time.perf_counter()
+        if sources is None:
+            logger.info(f"开始流水线处理，原始文件路径：{RAW_FILES_PATH}")
+        else:
+            logger.info("开始流水线处理，字段由调用方直接传入")
+
+        # 1. 准备输出目录和提示词模板
+        if sources is None and not os.path.exists(RAW_FILES_PATH):
+            error_msg = f"错误：目录 {RAW_FILES_PATH} 不存在"
+            logger.error(error_msg)
+            print(error_msg)
+            return
+        prepare_batch_dir()
+        prepare_classify_dir()
+        prompt_template = load_prompt_template()
+        if not prompt_template:
+            logger.error("无法加载提示词模板，终止处理")
+            return
+
+        verifier = StreamingVerifier()
+        store = ResultStore() if RESULT_STORE_ENABLED else None
+        run_id = store.start_run(description=description) if store is not None else None
+        usage_log = TokenUsageLog(os.path.join(CLASSIFY_SAVE_PATH, USAGE_FILE_NAME), store, run_id)
+
+        # LLM调用以等待网络为主，线程数只受服务并发限制约束
+        worker_count = max(1, LLM_CONCURRENCY.get(LLM_SERVICE, 2))
+        batch_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        result_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        stats = new_preprocess_stats()
+        counters = StageStats()
+        timer = StageStats()
+        stop_event = threading.Event()
+
+        logger.info(f"流水线启动：分类线程数 {worker_count}，队列容量 {PIPELINE_QUEUE_SIZE} 个批次")
+        print(f"流水线启动：分类线程数 {worker_count}，队列容量 {PIPELINE_QUEUE_SIZE} 个批次")
+
+        # 2. 启动各阶段线程
+        threads = [threading.Thread(target=_produce_batches, name="preprocess",
+                                    args=(batch_queue, worker_count, stats, timer, stop_event, sources))]
+        threads += [
+            threading.Thread(target=_classify_batches, name=f"classify-{index}",
+                             args=(batch_queue, result_queue, prompt_template, store, run_id, usage_log, counters, timer,
+                                   stop_event))
+            for index in range(worker_count)
+        ]
+        threads.append(threading.Thread(target=_verify_results, name="verify",
+                                        args=(result_queue, verifier, worker_count, timer)))
+        for thread in threads:
+            thread.start()
+
+        # 3. 等待全部阶段结束
+        for thread in threads:
+            thread.join()
+
+        log_preprocess_stats(stats, stats.get("batches_created", 0), timer.get("预处理"))
+        success_count = counters.get("成功批次")
+        failed_count = counters.get("失败批次")
+        logger.info(f"分类完成！成功：{success_count} 个批次，失败：{failed_count} 个批次")
+        print(f"分类完成！成功：{success_count} 个批次，失败：{failed_count} 个批次")
+        print(f"批次文件保存在：{BATCH_SAVE_PATH}，分类结果保存在：{CLASSIFY_SAVE_PATH}")
+        if store is not None:
+            logger.info(f"分类结果已写入结果库，运行ID：{run_id}")
+            store.close()
+        verifier.finalize()
+
+        # 4. 合并分类结果，输出令牌用量报告和各阶段耗时
+        merge_classification_results()
+        report_token_usage(CLASSIFY_SAVE_PATH)
+
+        wall_time = time.perf_counter() - wall_started
+        print(f"\n流水线各阶段耗时（分类为{worker_count}个线程累计）：")
+        for stage in ("预处理", "分类", "验证"):
+            print(f"  {stage}: {timer.get(stage):.2f} 秒")
+            logger.info(f"流水线阶段 {stage} 耗时：{timer.get(stage):.2f} 秒")
+        print(f"  分类墙钟耗时: {timer.elapsed('分类'):.2f} 秒")
+        logger.info(f"流水线阶段 分类 墙钟耗时：{timer.elapsed('分类'):.2f} 秒")
+        record_stage("preprocess", stats["raw_fields"], timer.get("预处理"))
+        # 分类由多个线程并行执行，吞吐按墙钟耗时计算（线程累计的忙碌时间会把吞吐低估为约1/线程数）
+        record_stage("classify", counters.get("分类记录数"), timer.elapsed("分类"))
+        record_stage("verify", verifier.total_processed, timer.get("验证"))
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"流水线处理完成，总耗时：{duration:.2f} 秒（流水线部分 {wall_time:.2f} 秒）")
+        print(f"流水线处理完成，总耗时：{duration:.2f} 秒")
+
+    except Exception as e:
+        error_msg = f"流水线处理过程中发生未预期错误！错误：{type(e).__name__} - {str(e)}"
+        logger.critical(error_msg)
+        logger.error(traceback.format_exc())
+        print(error_msg)
+
+
+# 执行流水线
+if __name__ == "__main__":
+    setup_logging("pipeline")
+    run_pipeline()
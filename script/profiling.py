@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    PROFILE_OUTPUT_PATH,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+# 各阶段耗时汇总文件
+SUMMARY_FILE_NAME = "profile_summary.csv"
+# cProfile文本报告中列出的函数数
+CPROFILE_TOP_FUNCTIONS = 40
+
+
+def _thread_cpu_clock(ident):
+    """返回线程的CPU时钟ID（平台不支持时返回None）"""
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    低开销栈采样器：后台线程按固定间隔抓取所有线程的调用栈，汇总为折叠栈（folded stacks）
+
+    折叠栈每行为"线程名;外层函数;...;内层函数 样本数"，可直接交给flamegraph.pl、speedscope、inferno等工具生成火焰图。
+    支持线程CPU时钟的平台上，同时比较相邻两次采样之间各线程的CPU时间增量，
+    区分"在CPU上运行"与"等待（I/O、LLM响应、锁、队列）"的样本
+    """
+    def __init__(self, interval=None):
+        self.interval = interval or PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self.state_samples = Counter()
+        self.samples = 0
+        self._last_cpu = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _thread_state(self, ident):
+        clock = _thread_cpu_clock(ident)
+        if clock is None:
+            return None
+        try:
+            cpu = time.clock_gettime(clock)
+        except OSError:
+            return None
+        previous = self._last_cpu.get(ident)
+        self._last_cpu[ident] = cpu
+        if previous is None:
+            return None
+        return "cpu" if cpu - previous >= self.interval / 2 else "wait"
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, f"thread-{ident}").replace(";", ":"))
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+                state = self._thread_state(ident)
+                if state is not None:
+                    self.state_samples[state] += 1
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def cpu_share(self):
+        """采样中处于CPU运行状态的比例（无法判断时返回None）"""
+        classified = self.state_samples["cpu"] + self.state_samples["wait"]
+        return self.state_samples["cpu"] / classified if classified else None
+
+
+class ThreadedProfile:
+    """
+    覆盖阶段内所有线程的cProfile分析
+
+    Python 3.12之前cProfile.Profile只分析调用enable的线程，而分类在调度器线程中执行、流水线各阶段各有线程，
+    因此通过threading.setprofile在阶段内启动的每个线程中各创建一个Profile，结束时用pstats合并；
+    Python 3.12起cProfile基于sys.monitoring，一个Profile即覆盖全部线程
+    """
+    def __init__(self):
+        self.profiles = [cProfile.Profile()]
+        self._per_thread = sys.version_info < (3, 12)
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg):
+        # 新线程的第一个事件：换成该线程自己的Profile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def enable(self):
+        if self._per_thread:
+            threading.setprofile(self._start_thread)
+        self.profiles[0].enable()
+
+    def disable(self):
+        self.profiles[0].disable()
+        if self._per_thread:
+            threading.setprofile(None)
+
+    @property
+    def thread_count(self):
+        with self._lock:
+            return len(self.profiles)
+
+    def stats(self, stream=None):
+        """合并所有线程的分析结果"""
+        with self._lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(profiles[0], stream=stream)
+        for profile in profiles[1:]:
+            try:
+                stats.add(profile)
+            except TypeError:
+                # 线程没有产生任何调用记录
+                continue
+        return stats
+
+
+class ProfileSession:
+    """
+    一次命令行运行的性能分析会话：每个阶段单独输出分析文件，并汇总墙钟时间与CPU时间
+
+    - sample模式：StackSampler覆盖所有线程（分类线程池、流水线各阶段线程），输出<阶段>.folded
+    - cprofile模式：确定性分析阶段调用线程及阶段内启动的所有线程（合并为一份结果），
+      输出<阶段>.prof（可用snakeviz、flameprof、gprof2dot查看）和<阶段>.txt
+    """
+    def __init__(self, mode=None, output_dir=None, interval=None):
+        self.mode = mode or PROFILE_MODE
+        if self.mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的性能分析方式：{self.mode}（可选：{', '.join(PROFILE_MODES)}）")
+        self.interval = interval
+        self.output_dir = output_dir or os.path.join(PROFILE_OUTPUT_PATH, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        """分析一个阶段：with session.stage("classify"): ..."""
+        sampler = StackSampler(self.interval).start() if self.mode == "sample" else None
+        profiler = ThreadedProfile() if self.mode == "cprofile" else None
+        cpu_started = os.times()
+        wall_started = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - wall_started
+            cpu_finished = os.times()
+            user = cpu_finished.user - cpu_started.user
+            system = cpu_finished.system - cpu_started.system
+            if sampler is not None:
+                sampler.stop()
+            self._save_stage(name, wall, user, system, sampler, profiler)
+
+    def _save_stage(self, name, wall, user, system, sampler, profiler):
+        cpu = user + system
+        record = {
+            "stage": name, "mode": self.mode, "wall_seconds": round(wall, 3),
+            "cpu_user_seconds": round(user, 3), "cpu_system_seconds": round(system, 3),
+            # 进程CPU时间包含所有线程，多线程阶段可能超过墙钟时间
+            "non_cpu_seconds": round(max(0.0, wall - cpu), 3),
+            "cpu_utilization": round(cpu / wall, 3) if wall > 0 else None,
+            "samples": None, "sample_cpu_share": None, "profile_file": None
+        }
+        try:
+            if sampler is not None:
+                path = os.path.join(self.output_dir, f"{name}.folded")
+                sampler.write_folded(path)
+                share = sampler.cpu_share()
+                record.update(samples=sampler.samples, profile_file=path,
+                              sample_cpu_share=round(share, 3) if share is not None else None)
+            if profiler is not None:
+                path = os.path.join(self.output_dir, f"{name}.prof")
+                profiler.stats().dump_stats(path)
+                with open(os.path.join(self.output_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+                    profiler.stats(stream=f).sort_stats("cumulative").print_stats(CPROFILE_TOP_FUNCTIONS)
+                record["profile_file"] = path
+                logger.info(f"阶段 {name} 的cProfile结果合并了 {profiler.thread_count} 个线程")
+        except OSError as e:
+            logger.error(f"保存阶段 {name} 的性能分析文件失败：{e}")
+        self.records.append(record)
+        logger.info(f"性能分析 - 阶段 {name}：墙钟 {record['wall_seconds']} 秒，CPU {round(cpu, 3)} 秒"
+                    f"（用户 {record['cpu_user_seconds']}，系统 {record['cpu_system_seconds']}），"
+                    f"非CPU {record['non_cpu_seconds']} 秒")
+
+    def report(self):
+        """输出各阶段墙钟/CPU时间对比，并保存profile_summary.csv"""
+        if not self.records:
+            return None
+        import pandas as pd
+
+        summary = pd.DataFrame(self.records)
+        summary_path = os.path.join(self.output_dir, SUMMARY_FILE_NAME)
+        summary.to_csv(summary_path, index=False, encoding="utf-8-sig")
+
+        print(f"\n性能分析（{self.mode}）各阶段耗时：")
+        print(f"{'阶段':<24}{'墙钟(秒)':>10}{'CPU(秒)':>10}{'非CPU(秒)':>12}{'CPU利用率':>10}{'采样CPU占比':>12}")
+        for record in self.records:
+            cpu = record["cpu_user_seconds"] + record["cpu_system_seconds"]
+            utilization = f"{record['cpu_utilization']:.0%}" if record["cpu_utilization"] is not None else "-"
+            share = f"{record['sample_cpu_share']:.0%}" if record["sample_cpu_share"] is not None else "-"
+            print(f"{record['stage']:<24}{record['wall_seconds']:>10.2f}{cpu:>10.2f}"
+                  f"{record['non_cpu_seconds']:>12.2f}{utilization:>10}{share:>12}")
+        print(f"性能分析文件保存在：{self.output_dir}")
+        if self.mode == "sample":
+            print("火焰图：flamegraph.pl <阶段>.folded > <阶段>.svg，或将.folded文件拖入 https://www.speedscope.app")
+        else:
+            print("查看：snakeviz <阶段>.prof，或 flameprof <阶段>.prof > <阶段>.svg")
+        logger.info(f"性能分析汇总已保存到：{summary_path}")
+        return summary
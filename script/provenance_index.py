@@ -0,0 +1,441 @@
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+from array import array
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    PROBLEM_SAVE_PATH,
+    MERGED_RESULTS_PATH,
+    MERGE_CHUNK_SIZE,
+    PROVENANCE_INDEX_ENABLED,
+    PROVENANCE_INDEX_PATH,
+    PROVENANCE_REPORT_PATH,
+    PROVENANCE_REPORT_MAX_LOCATIONS
+)
+
+from script.field_store import FieldStore, StringArena
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 字段来源倒排索引：字段 -> 按(来源ID, 偏移)排序的位置列表。每个位置编码为两个LEB128变长整数：
+# 来源ID与上一位置的差（首个位置为来源ID+1，大于0表示换了来源），换来源时第二个数为偏移+1（0表示偏移未知），
+# 同一来源内为与上一偏移的差。同一字段集中在少数文件的相邻位置，多数位置只占2~4个字节
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    field TEXT PRIMARY KEY,
+    occurrences INTEGER NOT NULL,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+# 写入索引时每个事务插入的字段数
+INSERT_CHUNK_SIZE = 100000
+# 批量查询时每条SQL的字段数（低于SQLite默认的参数个数上限）
+LOOKUP_CHUNK_SIZE = 500
+# 来源报告的输出列
+REPORT_COLUMNS = ["finding", "raw_text", "category", "confidence", "problem_type", "occurrences", "source", "offset"]
+
+
+def encode_varints(values):
+    """
+    向量化LEB128编码
+
+    参数:
+        values (np.ndarray): uint64数组
+
+    返回:
+        tuple: (编码后的uint8数组, 每个值编码起始位置的int64数组)
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    encoded = np.empty(int(ends[-1]) if len(ends) else 0, dtype=np.uint8)
+    for byte_index in range(int(lengths.max()) if len(lengths) else 0):
+        mask = lengths > byte_index
+        chunk = (values[mask] >> np.uint64(7 * byte_index)) & np.uint64(0x7F)
+        more = (lengths[mask] > byte_index + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[mask] + byte_index] = (chunk | more).astype(np.uint8)
+    return encoded, starts
+
+
+def decode_postings(data, limit=None):
+    """
+    解码一个字段的位置列表
+
+    参数:
+        data (bytes): postings表中的data
+        limit (int): 最多解码的位置数，默认全部
+
+    返回:
+        list: [(来源ID, 偏移), ...]，偏移未知时为None
+    """
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+        if limit is not None and len(values) >= 2 * limit:
+            break
+    postings = []
+    source_id, offset = -1, None
+    for source_delta, offset_code in zip(values[0::2], values[1::2]):
+        if source_delta:
+            source_id += source_delta
+            offset = offset_code - 1 if offset_code else None
+        elif offset is not None:
+            offset += offset_code
+        postings.append((source_id, offset))
+    return postings
+
+
+class ProvenanceIndexBuilder:
+    """
+    在预处理读取字段时构建来源索引：字段和来源名称存放在紧凑存储中，位置先追加到三个平行数组，
+    save时一次性排序、去重并增量编码写入SQLite；非线程安全
+    """
+
+    def __init__(self):
+        self.fields = FieldStore()
+        self.sources = StringArena()
+        self._field_ids = array("I")
+        self._source_ids = array("I")
+        self._offsets = array("q")
+
+    def add(self, source, fields, offsets=None):
+        """
+        记录一个来源中的字段位置
+
+        参数:
+            source (str): 来源名称（文件路径或"归档路径!/成员路径"）
+            fields (list): 字段列表（可重复）
+            offsets (list): 与fields一一对应的字节偏移，None表示偏移未知
+        """
+        source_id = self.sources.append(source)
+        field_ids = self.fields.append_many(fields)
+        self._field_ids.extend(field_ids)
+        self._source_ids.extend(array("I", [source_id]) * len(field_ids))
+        if offsets is None:
+            self._offsets.extend(array("q", [-1]) * len(field_ids))
+        else:
+            self._offsets.extend(-1 if offset is None else offset for offset in offsets)
+
+    def __len__(self):
+        """已记录的位置数"""
+        return len(self._field_ids)
+
+    @property
+    def nbytes(self):
+        """占用的字节数（字段、来源名称和位置数组）"""
+        return self.fields.nbytes + self.sources.nbytes + sum(
+            values.itemsize * len(values) for values in (self._field_ids, self._source_ids, self._offsets))
+
+    def _encode(self):
+        """排序、去重并编码，返回(字段ID数组, 每个字段的位置数, 编码数据, 每个字段编码的起止位置)"""
+        field_ids = np.frombuffer(self._field_ids, dtype=np.uint32)
+        source_ids = np.frombuffer(self._source_ids, dtype=np.uint32).astype(np.int64)
+        offsets = np.frombuffer(self._offsets, dtype=np.int64)
+        order = np.lexsort((offsets, source_ids, field_ids))
+        field_ids, source_ids, offsets = field_ids[order], source_ids[order], offsets[order]
+        # 同一字段在同一来源同一偏移只保留一次
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = (field_ids[1:] != field_ids[:-1]) | (source_ids[1:] != source_ids[:-1]) | (offsets[1:] != offsets[:-1])
+        field_ids, source_ids, offsets = field_ids[keep], source_ids[keep], offsets[keep]
+
+        new_field = np.ones(len(field_ids), dtype=bool)
+        new_field[1:] = field_ids[1:] != field_ids[:-1]
+        new_source = new_field.copy()
+        new_source[1:] |= source_ids[1:] != source_ids[:-1]
+        previous_sources = np.concatenate(([-1], source_ids[:-1]))
+        previous_offsets = np.concatenate(([-1], offsets[:-1]))
+        values = np.empty(2 * len(field_ids), dtype=np.uint64)
+        values[0::2] = np.where(new_field, source_ids + 1, source_ids - previous_sources)
+        values[1::2] = np.where(new_source, offsets + 1, offsets - previous_offsets)
+        encoded, starts = encode_varints(values)
+
+        field_starts = np.flatnonzero(new_field)
+        counts = np.diff(np.append(field_starts, len(field_ids)))
+        byte_starts = starts[2 * field_starts] if len(field_starts) else starts
+        byte_ends = np.append(byte_starts[1:], len(encoded))
+        return field_ids[field_starts], counts, encoded, byte_starts, byte_ends
+
+    def save(self, path=None):
+        """
+        写入索引文件（先写临时文件再替换，查询方不会读到写了一半的索引）
+
+        参数:
+            path (str): 索引文件路径，默认PROVENANCE_INDEX_PATH
+
+        返回:
+            int: 索引中的字段数
+        """
+        path = path or PROVENANCE_INDEX_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        field_ids, counts, encoded, byte_starts, byte_ends = self._encode()
+        encoded = encoded.tobytes()
+        occurrences = int(counts.sum())
+        conn = sqlite3.connect(temp_path)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.executescript(SCHEMA)
+            with conn:
+                conn.executemany("INSERT INTO sources (id, source) VALUES (?, ?)", enumerate(self.sources))
+            # 按字段文本顺序插入（与主键B树顺序一致，比按首次出现顺序随机插入快数倍）
+            fields = [self.fields[field_id] for field_id in field_ids.tolist()]
+            order = sorted(range(len(fields)), key=fields.__getitem__)
+            counts, byte_starts, byte_ends = counts.tolist(), byte_starts.tolist(), byte_ends.tolist()
+            for start in range(0, len(order), INSERT_CHUNK_SIZE):
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO postings (field, occurrences, data) VALUES (?, ?, ?)",
+                        ((fields[position], counts[position], encoded[byte_starts[position]:byte_ends[position]])
+                         for position in order[start:start + INSERT_CHUNK_SIZE])
+                    )
+            with conn:
+                conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                    ("created_at", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                    ("fields", str(len(field_ids))),
+                    ("sources", str(len(self.sources))),
+                    ("occurrences", str(occurrences)),
+                ])
+        finally:
+            conn.close()
+        os.replace(temp_path, path)
+        logger.info(f"来源索引已保存到 {path}：{len(field_ids)} 个字段，{len(self.sources)} 个来源，"
+                    f"{occurrences} 个位置，编码后 {len(encoded) / 1024 / 1024:.1f} MB")
+        return len(field_ids)
+
+
+class ProvenanceIndex:
+    """
+    来源索引查询：字段 -> 出现的来源和偏移（按字段主键查询，单个字段毫秒级返回）
+    """
+
+    def __init__(self, path=None):
+        """
+        参数:
+            path (str): 索引文件路径，默认PROVENANCE_INDEX_PATH
+        """
+        self.path = path or PROVENANCE_INDEX_PATH
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"来源索引 {self.path} 不存在，请开启PROVENANCE_INDEX_ENABLED后重新运行预处理")
+        self._conn = sqlite3.connect(self.path)
+        self._source_names = {}
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _resolve_sources(self, source_ids):
+        """来源ID -> 来源名称（查询过的来源缓存在内存中）"""
+        missing = list({source_id for source_id in source_ids if source_id not in self._source_names})
+        for start in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+            chunk = missing[start:start + LOOKUP_CHUNK_SIZE]
+            rows = self._conn.execute(
+                f"SELECT id, source FROM sources WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            self._source_names.update(rows)
+        return self._source_names
+
+    def locate_many(self, fields, limit=None):
+        """
+        批量查询字段的出现位置
+
+        参数:
+            fields (iterable): 字段列表
+            limit (int): 每个字段最多返回的位置数，默认全部
+
+        返回:
+            dict: 字段 -> (出现次数, [(来源, 偏移), ...])，索引中没有的字段不包含在内
+        """
+        found = {}
+        fields = list(dict.fromkeys(fields))
+        for start in range(0, len(fields), LOOKUP_CHUNK_SIZE):
+            chunk = fields[start:start + LOOKUP_CHUNK_SIZE]
+            rows = self._conn.execute(
+                f"SELECT field, occurrences, data FROM postings WHERE field IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for field, occurrences, data in rows:
+                found[field] = (occurrences, decode_postings(data, limit))
+        names = self._resolve_sources({source_id for _, postings in found.values() for source_id, _ in postings})
+        return {field: (occurrences, [(names[source_id], offset) for source_id, offset in postings])
+                for field, (occurrences, postings) in found.items()}
+
+    def locate(self, field, limit=None):
+        """
+        查询单个字段出现的位置
+
+        返回:
+            list: [(来源, 偏移), ...]，偏移未知时为None；索引中没有该字段时为空列表
+        """
+        return self.locate_many([field], limit).get(field, (0, []))[1]
+
+    def stats(self):
+        """返回索引的元信息（创建时间、字段数、来源数、位置数）"""
+        return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+
+def new_index_builder():
+    """PROVENANCE_INDEX_ENABLED时返回新的索引构建器，否则返回None"""
+    return ProvenanceIndexBuilder() if PROVENANCE_INDEX_ENABLED else None
+
+
+def save_index(builder, path=None):
+    """保存预处理期间构建的来源索引，失败时只记录错误，不影响预处理结果"""
+    try:
+        return builder.save(path)
+    except Exception as e:
+        logger.error(f"保存来源索引失败！错误：{e}")
+        return None
+
+
+def _report_rows(index, findings, max_locations):
+    """把一组发现（含raw_text、category、confidence、problem_type、finding列）与其出现位置连接成报告行"""
+    locations = index.locate_many(findings["raw_text"], max_locations)
+    rows = []
+    for finding in findings.itertuples(index=False):
+        occurrences, postings = locations.get(finding.raw_text, (0, [(None, None)]))
+        for source, offset in postings:
+            rows.append((finding.finding, finding.raw_text, finding.category, finding.confidence,
+                         finding.problem_type, occurrences, source, offset))
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS).astype({"offset": "Int64"})
+
+
+def build_provenance_report(output_path=None, index_path=None, max_locations=None):
+    """
+    来源报告：把问题字段（验证阶段的all_problems.csv）和敏感字段（merged_results.csv中类别为敏感信息的字段）
+    与其在原始文件中的出现位置连接，每个位置一行；索引中没有的字段保留一行，来源为空
+
+    参数:
+        output_path (str): 报告路径，默认PROVENANCE_REPORT_PATH
+        index_path (str): 来源索引路径，默认PROVENANCE_INDEX_PATH
+        max_locations (int): 每个字段最多列出的位置数，默认PROVENANCE_REPORT_MAX_LOCATIONS
+
+    返回:
+        int: 报告行数，索引不存在时返回None
+    """
+    # 问题字段文件名和敏感类别判断规则与验证阶段、分类服务保持一致
+    from script.result_verify import PROBLEM_FILE_NAME
+    from script.classify_service import NON_SENSITIVE_CATEGORIES
+
+    output_path = output_path or PROVENANCE_REPORT_PATH
+    max_locations = max_locations or PROVENANCE_REPORT_MAX_LOCATIONS
+    try:
+        index = ProvenanceIndex(index_path)
+    except FileNotFoundError as e:
+        logger.error(str(e))
+        print(str(e))
+        return None
+
+    def iter_findings():
+        problem_path = os.path.join(PROBLEM_SAVE_PATH, PROBLEM_FILE_NAME)
+        if os.path.exists(problem_path):
+            for chunk in pd.read_csv(problem_path, dtype=str, chunksize=MERGE_CHUNK_SIZE, encoding="utf-8-sig"):
+                yield chunk.reindex(columns=REPORT_COLUMNS[1:5]).assign(finding="问题字段")
+        else:
+            logger.warning(f"问题字段文件 {problem_path} 不存在，报告中不含问题字段")
+        if os.path.exists(MERGED_RESULTS_PATH):
+            for chunk in pd.read_csv(MERGED_RESULTS_PATH, dtype=str, chunksize=MERGE_CHUNK_SIZE, encoding="utf-8-sig"):
+                category = chunk["category"].fillna("").str.strip()
+                sensitive = category.ne("")
+                for name in NON_SENSITIVE_CATEGORIES:
+                    sensitive &= ~category.str.contains(name, regex=False)
+                yield chunk[sensitive].reindex(columns=REPORT_COLUMNS[1:5]).assign(finding="敏感字段")
+        else:
+            logger.warning(f"合并结果文件 {MERGED_RESULTS_PATH} 不存在，报告中不含敏感字段")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    written = located = 0
+    with index, open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+        pd.DataFrame(columns=REPORT_COLUMNS).to_csv(f, index=False)
+        for findings in iter_findings():
+            findings = findings.dropna(subset=["raw_text"])
+            if findings.empty:
+                continue
+            report = _report_rows(index, findings, max_locations)
+            report.to_csv(f, index=False, header=False)
+            written += len(report)
+            located += int(report["source"].notna().sum())
+    logger.info(f"来源报告已保存到 {output_path}：{written} 行，其中 {located} 行找到出现位置")
+    print(f"来源报告已保存到 {output_path}：{written} 行，其中 {located} 行找到出现位置")
+    return written
+
+
+def main(argv=None):
+    """来源索引命令行：查询字段出现位置、生成来源报告、查看索引信息"""
+    parser = argparse.ArgumentParser(description="查询字段在原始文件中的出现位置")
+    parser.add_argument("--index", default=PROVENANCE_INDEX_PATH, help="来源索引路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    locate_parser = subparsers.add_parser("locate", help="查询字段出现的来源和偏移")
+    locate_parser.add_argument("fields", nargs="+", help="待查询的字段")
+    locate_parser.add_argument("--limit", type=int, default=100, help="每个字段最多显示的位置数（0表示不限制）")
+    report_parser = subparsers.add_parser("report", help="生成问题字段和敏感字段的来源报告")
+    report_parser.add_argument("--output", default=PROVENANCE_REPORT_PATH, help="报告路径")
+    report_parser.add_argument("--max-locations", type=int, default=PROVENANCE_REPORT_MAX_LOCATIONS,
+                               help="每个字段最多列出的位置数")
+    subparsers.add_parser("stats", help="查看索引信息")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        build_provenance_report(args.output, args.index, args.max_locations)
+        return
+    try:
+        index = ProvenanceIndex(args.index)
+    except FileNotFoundError as e:
+        print(str(e))
+        return
+    with index:
+        if args.command == "stats":
+            for key, value in index.stats().items():
+                print(f"{key}: {value}")
+            return
+        found = index.locate_many(args.fields, args.limit or None)
+        for field in dict.fromkeys(args.fields):
+            occurrences, postings = found.get(field, (0, []))
+            print(f"{field}：出现 {occurrences} 次")
+            for source, offset in postings:
+                print(f"  {source}" + (f" @ {offset}" if offset is not None else ""))
+            if occurrences > len(postings):
+                print(f"  ……（另有 {occurrences - len(postings)} 处）")
+
+
+# 命令行查询来源索引
+if __name__ == "__main__":
+    setup_logging("provenance_index")
+    main()
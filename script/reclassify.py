@@ -0,0 +1,415 @@
+import pandas as pd
+import os
+import re
+import time
+import logging
+import traceback
+from datetime import datetime
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    CLASSIFY_SAVE_PATH,
+    PROBLEM_SAVE_PATH,
+    RECLASSIFY_PROMPT_PATH,
+    RECLASSIFY_BATCH_SIZE,
+    RECLASSIFY_SKIP_PROBLEM_TYPES,
+    LLM_SERVICE,
+    LLM_CONCURRENCY,
+    RESULT_STORE_ENABLED
+)
+
+# 复用分类阶段的提示词构建、LLM调用、输出解析和结果合并
+from script.llm_classify import (
+    load_prompt_template,
+    request_llm_completion,
+    parse_llm_output,
+    merge_classification_results
+)
+from script.retry_policy import LLMError
+from script.token_usage import TokenUsage, TokenUsageLog, USAGE_FILE_NAME
+from script.result_store import ResultStore
+from script.batch_scheduler import BatchScheduler, LatencyHistory, PRIORITY_RECHECK
+# 复核结果使用与验证阶段相同的规则判断是否已解决
+from script.result_verify import (
+    evaluate_problems,
+    PROBLEM_FILE_NAME,
+    PROBLEM_TYPE_SEPARATOR,
+    RESULT_COLUMNS
+)
+from script.verify_rules import (
+    get_rules_engine,
+    load_rule_keywords,
+    RULE_KEYWORD,
+    RULE_REGEX,
+    RULE_CONFIDENCE_FLOOR,
+    RULE_CATEGORY_REGEX,
+    RULE_LENGTH
+)
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 仍需人工复核的字段文件名
+UNRESOLVED_FILE_NAME = "unresolved_problems.csv"
+# 自动复核通过的字段明细（便于抽查）
+RECLASSIFIED_FILE_NAME = "reclassified_fields.csv"
+# 复核提示在字段后的标记（解析LLM输出时据此去掉模型可能回显的提示）
+HINT_MARKER = "（复核提示："
+# 写回分类结果时在判断依据前添加的标记
+RECLASSIFY_REASON_PREFIX = "[自动复核] "
+# 提示中最多列出的命中关键词数
+MAX_HINT_KEYWORDS = 3
+
+
+def load_reclassify_template():
+    """
+    加载复核提示词：复核说明 + 分类提示词模板（类别定义与输出格式保持一致）
+
+    返回:
+        str: 复核提示词模板，加载失败返回None
+    """
+    prompt_template = load_prompt_template()
+    if not prompt_template:
+        return None
+    try:
+        with open(RECLASSIFY_PROMPT_PATH, "r", encoding="utf-8") as f:
+            preamble = f.read().strip()
+    except FileNotFoundError:
+        logger.warning(f"复核说明文件不存在：{RECLASSIFY_PROMPT_PATH}，仅使用分类提示词模板")
+        return prompt_template
+    return f"{preamble}\n\n{prompt_template}"
+
+
+def _rule_hint(rule, text, keywords):
+    """
+    根据单条验证规则生成复核提示片段
+
+    参数:
+        rule (dict): 验证规则声明
+        text (str): 字段原文
+        keywords (list): 关键词规则的(关键词, 匹配用关键词)列表
+
+    返回:
+        str: 提示片段，无需提示时返回None
+    """
+    rule_type = rule["type"]
+    if rule_type == RULE_KEYWORD:
+        text = text if rule.get("case_sensitive") else text.lower()
+        matched = [keyword for keyword, key in keywords if key in text][:MAX_HINT_KEYWORDS]
+        return f"包含关键词{'、'.join(matched)}" if matched else None
+    if rule_type == RULE_CONFIDENCE_FLOOR:
+        return "置信度偏低"
+    if rule_type == RULE_CATEGORY_REGEX:
+        return "上次未能确定类别"
+    if rule_type == RULE_REGEX and rule.get("negate"):
+        return "内容格式与该类别不符"
+    if rule_type == RULE_LENGTH:
+        return None
+    return f"命中校验规则「{rule['name']}」"
+
+
+def build_hints(problems_df):
+    """
+    为每个问题字段生成复核提示（如"上次分类为人名，置信度70；包含关键词Inc"）
+
+    参数:
+        problems_df (pd.DataFrame): 问题字段表（含category、confidence、problem_type列）
+
+    返回:
+        pd.Series: 与problems_df对齐的提示文本
+    """
+    rules = {rule["name"]: rule for rule in get_rules_engine().rules}
+    rule_keywords = {
+        name: [(keyword, keyword if rule.get("case_sensitive") else keyword.lower())
+               for keyword in load_rule_keywords(rule)]
+        for name, rule in rules.items() if rule["type"] == RULE_KEYWORD
+    }
+
+    hints = []
+    for row in problems_df.itertuples(index=False):
+        parts = []
+        for name in str(row.problem_type).split(PROBLEM_TYPE_SEPARATOR):
+            rule = rules.get(name)
+            if rule is None:
+                continue
+            hint = _rule_hint(rule, row.raw_text, rule_keywords.get(name, []))
+            if hint and hint not in parts:
+                parts.append(hint)
+        # 上次分类有效时附上类别和置信度，帮助模型判断是否需要修正
+        if "上次未能确定类别" not in parts and isinstance(row.category, str) and row.category.strip():
+            parts.insert(0, f"上次分类为{row.category}，置信度{row.confidence}")
+        hints.append("；".join(parts))
+    return pd.Series(hints, index=problems_df.index, dtype=object)
+
+
+def _strip_hint(text):
+    """去掉模型回显的复核提示，还原字段原文"""
+    index = text.find(HINT_MARKER)
+    return text[:index].strip() if index >= 0 else text
+
+
+def reclassify_group(fields, hints, prompt_template, usage=None):
+    """
+    对一组问题字段附带提示重新调用LLM
+
+    参数:
+        fields (list): 字段原文列表
+        hints (list): 与fields对齐的复核提示
+        prompt_template (str): 复核提示词模板
+        usage (TokenUsage): 令牌用量累加器，默认不记录
+
+    返回:
+        pd.DataFrame: 复核结果（raw_text、category、confidence、reason），调用失败返回None
+    """
+    annotated = [f"{field}{HINT_MARKER}{hint}）" if hint else field for field, hint in zip(fields, hints)]
+    request_started = time.perf_counter()
+    try:
+        content = request_llm_completion(annotated, prompt_template, usage)
+        if usage is not None:
+            usage.add_request(len(fields), time.perf_counter() - request_started)
+    except LLMError as e:
+        error_msg = f"复核请求失败！错误：{type(e).__name__} - {str(e)}"
+        logger.error(error_msg)
+        print(error_msg)
+        return None
+
+    classify_data = parse_llm_output(content)
+    if not classify_data:
+        logger.warning("复核响应中没有可解析的分类结果")
+        return None
+
+    result_df = pd.DataFrame(classify_data)
+    result_df["raw_text"] = result_df["raw_text"].map(_strip_hint)
+    # 只保留本组请求的字段，同一字段多次输出时取最后一次
+    result_df = result_df[result_df["raw_text"].isin(set(fields))]
+    return result_df.drop_duplicates(subset=["raw_text"], keep="last")
+
+
+def write_back_results(resolved_df, problems_df):
+    """
+    将复核通过的结果写回对应的分类结果文件（只改写包含这些字段的批次文件）
+
+    参数:
+        resolved_df (pd.DataFrame): 复核通过的结果（按raw_text去重）
+        problems_df (pd.DataFrame): 问题字段表（用source_batch定位批次文件）
+
+    返回:
+        int: 更新的记录数
+    """
+    updates = resolved_df.set_index("raw_text")
+    affected = problems_df[problems_df["raw_text"].isin(updates.index)]
+    updated_rows = 0
+    for source_batch, batch_problems in affected.groupby("source_batch", observed=True):
+        result_path = os.path.join(CLASSIFY_SAVE_PATH, str(source_batch))
+        if not os.path.exists(result_path):
+            logger.warning(f"分类结果文件不存在，跳过写回：{result_path}")
+            continue
+        try:
+            result_df = pd.read_csv(result_path, encoding="utf-8", dtype=str)
+            rows = result_df["raw_text"].isin(set(batch_problems["raw_text"]))
+            matched = result_df.loc[rows, "raw_text"]
+            for column in ["category", "confidence", "reason"]:
+                result_df.loc[rows, column] = matched.map(updates[column]).values
+            result_df.to_csv(result_path, index=False, encoding="utf-8")
+            updated_rows += int(rows.sum())
+            logger.info(f"已写回 {source_batch}，更新 {int(rows.sum())} 条记录")
+        except Exception as e:
+            error_msg = f"写回分类结果文件 {source_batch} 失败！错误：{type(e).__name__} - {str(e)}"
+            logger.error(error_msg)
+            print(error_msg)
+    return updated_rows
+
+
+def build_recheck_groups(problems_df):
+    """
+    跳过不适合自动复核的问题类型（如格式异常），为其余字段生成复核提示，按问题类型拆分为小批次
+
+    参数:
+        problems_df (pd.DataFrame): 问题字段表（含raw_text、category、confidence、problem_type列）
+
+    返回:
+        tuple: (待复核字段表（含hint列，按raw_text去重）, [(批次名称, 含raw_text和hint列的数据框), ...], 跳过的条数)
+    """
+    skip_pattern = "|".join(re.escape(name) for name in RECLASSIFY_SKIP_PROBLEM_TYPES)
+    skipped = problems_df["problem_type"].str.contains(skip_pattern, na=False) if skip_pattern else \
+        pd.Series(False, index=problems_df.index)
+    candidates = problems_df[~skipped].drop_duplicates(subset=["raw_text"])
+    candidates = candidates.assign(hint=build_hints(candidates))
+    groups = []
+    for problem_type, group in candidates.groupby("problem_type", sort=True):
+        for i in range(0, len(group), RECLASSIFY_BATCH_SIZE):
+            groups.append((f"{problem_type}#{i // RECLASSIFY_BATCH_SIZE + 1}",
+                           group.iloc[i:i + RECLASSIFY_BATCH_SIZE][["raw_text", "hint"]]))
+    return candidates, groups, int(skipped.sum())
+
+
+def resolve_rechecks(rechecked):
+    """
+    复核结果重新执行验证规则，全部通过才视为已解决
+
+    参数:
+        rechecked (list): reclassify_group返回的复核结果数据框列表
+
+    返回:
+        tuple: (全部复核结果, 复核通过的结果（reason带RECLASSIFY_REASON_PREFIX）)
+    """
+    if rechecked:
+        rechecked_df = pd.concat(rechecked, ignore_index=True).drop_duplicates(subset=["raw_text"], keep="last")
+        mask = evaluate_problems(rechecked_df.reindex(columns=RESULT_COLUMNS))
+        resolved_df = rechecked_df[mask == 0].copy()
+    else:
+        rechecked_df = pd.DataFrame(columns=RESULT_COLUMNS)
+        resolved_df = rechecked_df.copy()
+    resolved_df["reason"] = RECLASSIFY_REASON_PREFIX + resolved_df["reason"].astype(str)
+    return rechecked_df, resolved_df
+
+
+def apply_rechecks(problems_df, candidates, rechecked, store=None, run_id=None, merge=True):
+    """
+    写回复核通过的结果，输出复核明细和仍需人工复核的字段
+
+    参数:
+        problems_df (pd.DataFrame): 全部问题字段表（含source_batch列）
+        candidates (pd.DataFrame): build_recheck_groups返回的待复核字段表
+        rechecked (list): 复核结果数据框列表
+        store (ResultStore): 结果库，默认在RESULT_STORE_ENABLED时打开并更新最近一次运行
+        run_id (str): 要更新的结果库运行，默认最近一次运行
+        merge (bool): 写回后是否重新合并分类结果（调用方随后会自行合并时传False）
+
+    返回:
+        tuple: (复核通过的字段数, 仍需人工复核的字段表)
+    """
+    rechecked_df, resolved_df = resolve_rechecks(rechecked)
+    resolved_fields = set(resolved_df["raw_text"])
+
+    # 写回分类结果并重新合并
+    if resolved_fields:
+        updated_rows = write_back_results(resolved_df, problems_df)
+        logger.info(f"复核通过 {len(resolved_fields)} 个字段，已更新 {updated_rows} 条分类结果")
+        if store is not None:
+            run_id = run_id or store.latest_run_id()
+            store_rows = store.update_results(resolved_df, run_id) if run_id is not None else 0
+            logger.info(f"已更新结果库运行 {run_id} 中的 {store_rows} 条记录")
+        elif RESULT_STORE_ENABLED:
+            with ResultStore() as own_store:
+                run_id = run_id or own_store.latest_run_id()
+                if run_id is not None:
+                    store_rows = own_store.update_results(resolved_df, run_id)
+                    logger.info(f"已更新结果库运行 {run_id} 中的 {store_rows} 条记录")
+        if merge:
+            merge_classification_results()
+
+        previous = candidates.set_index("raw_text")
+        audit_df = resolved_df.assign(
+            previous_category=resolved_df["raw_text"].map(previous["category"]),
+            previous_confidence=resolved_df["raw_text"].map(previous["confidence"]),
+            problem_type=resolved_df["raw_text"].map(previous["problem_type"])
+        )
+        audit_df.to_csv(os.path.join(PROBLEM_SAVE_PATH, RECLASSIFIED_FILE_NAME), index=False, encoding="utf-8-sig")
+
+    # 未解决字段附带本次复核结果，留给人工处理
+    unresolved_df = problems_df[~problems_df["raw_text"].isin(resolved_fields)]
+    recheck = rechecked_df.set_index("raw_text")
+    unresolved_df = unresolved_df.assign(
+        recheck_category=unresolved_df["raw_text"].map(recheck["category"]),
+        recheck_confidence=unresolved_df["raw_text"].map(recheck["confidence"]),
+        recheck_reason=unresolved_df["raw_text"].map(recheck["reason"])
+    )
+    unresolved_df.to_csv(os.path.join(PROBLEM_SAVE_PATH, UNRESOLVED_FILE_NAME), index=False, encoding="utf-8-sig")
+    return len(resolved_fields), unresolved_df
+
+
+def reclassify_problems():
+    """
+    问题字段自动复核主函数（分类与验证结束后单独执行；开启流式验证的批量分类已在分类过程中插队复核）
+
+    功能：读取验证阶段输出的问题字段，按问题类型分组、附带复核提示以小批次重新调用LLM，
+    复核结果通过全部验证规则的写回分类结果并重新合并，其余字段留给人工处理
+    处理流程：
+    1. 读取all_problems.csv，跳过不适合自动复核的问题类型（如格式异常）
+    2. 为每个字段生成复核提示，按问题类型分组拆分小批次
+    3. 并行调用LLM复核
+    4. 使用验证规则检查复核结果，通过的视为已解决
+    5. 写回分类结果文件并重新生成merged_results.csv
+    6. 输出仍未解决的字段到unresolved_problems.csv
+    """
+    try:
+        start_time = datetime.now()
+        logger.info("开始自动复核问题字段")
+
+        # 1. 读取问题字段
+        problem_path = os.path.join(PROBLEM_SAVE_PATH, PROBLEM_FILE_NAME)
+        if not os.path.exists(problem_path):
+            warning_msg = f"未找到问题字段文件：{problem_path}，请先运行script/result_verify.py"
+            logger.warning(warning_msg)
+            print(warning_msg)
+            return
+        problems_df = pd.read_csv(problem_path, encoding="utf-8-sig", dtype=str)
+        problems_df = problems_df[problems_df["raw_text"].notna()]
+        if problems_df.empty:
+            logger.info("没有需要复核的问题字段")
+            print("没有需要复核的问题字段")
+            return
+
+        prompt_template = load_reclassify_template()
+        if not prompt_template:
+            logger.error("无法加载提示词模板，终止复核")
+            return
+
+        # 2. 按问题类型分组，拆分为小批次
+        candidates, groups, skipped = build_recheck_groups(problems_df)
+        logger.info(f"问题字段 {len(problems_df)} 条，待复核字段 {len(candidates)} 个，跳过 {skipped} 条")
+        print(f"问题字段 {len(problems_df)} 条，待复核字段 {len(candidates)} 个，跳过 {skipped} 条")
+
+        # 3. 并行复核
+        rechecked = []
+        usage = TokenUsage(LLM_SERVICE)
+        if groups:
+            max_workers = min(LLM_CONCURRENCY.get(LLM_SERVICE, 2), len(groups))
+            logger.info(f"共 {len(groups)} 个复核批次，最大线程数：{max_workers}")
+            print(f"共 {len(groups)} 个复核批次，最大线程数：{max_workers}")
+            def recheck(task):
+                return reclassify_group(task.frame["raw_text"].tolist(), task.frame["hint"].tolist(),
+                                        prompt_template, usage)
+
+            def collect(task, result_df):
+                if result_df is not None and not result_df.empty:
+                    rechecked.append(result_df)
+
+            # 单独复核时队列中只有复核批次；已是小批次，不再拆分，复核提示词较长，耗时历史与分类批次分开记录
+            scheduler = BatchScheduler(recheck, collect, workers=max_workers, split=False,
+                                       history=LatencyHistory(f"{LLM_SERVICE}_reclassify"))
+            for name, chunk in groups:
+                scheduler.submit(name, chunk, priority=PRIORITY_RECHECK)
+            scheduler.run()
+            # 复核的令牌用量与分类阶段记录在同一用量文件中
+            if TokenUsageLog(os.path.join(CLASSIFY_SAVE_PATH, USAGE_FILE_NAME)).record(usage, "reclassify"):
+                logger.info(f"复核令牌用量：输入 {usage.prompt_tokens}，输出 {usage.completion_tokens}")
+
+        # 4-6. 验证复核结果，写回通过的结果并重新合并，输出仍需人工复核的字段
+        resolved_count, unresolved_df = apply_rechecks(problems_df, candidates, rechecked)
+
+        duration = (datetime.now() - start_time).total_seconds()
+        summary = (f"自动复核完成！问题字段：{len(problems_df)} 条，复核通过：{resolved_count} 个字段，"
+                   f"仍需人工复核：{len(unresolved_df)} 条，耗时：{duration:.2f} 秒")
+        logger.info(summary)
+        print(f"\n{summary}")
+        print(f"待人工复核字段已保存到：{os.path.join(PROBLEM_SAVE_PATH, UNRESOLVED_FILE_NAME)}")
+
+    except Exception as e:
+        error_msg = f"自动复核过程中发生未预期错误！错误：{type(e).__name__} - {str(e)}"
+        logger.critical(error_msg)
+        logger.error(traceback.format_exc())
+        print(error_msg)
+
+
+# 执行自动复核
+if __name__ == "__main__":
+    setup_logging("reclassify")
+    reclassify_problems()
@@ -0,0 +1,432 @@
+import pandas as pd
+import os
+import sys
+import uuid
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    RESULT_STORE_PATH,
+    LLM_SERVICE
+)
+
+logger = logging.getLogger(__name__)
+
+# 分类结果列
+RESULT_COLUMNS = ["raw_text", "category", "confidence", "reason"]
+# 查询结果列
+QUERY_COLUMNS = ["run_id", "source_batch", "raw_text", "category", "confidence", "reason", "classified_at"]
+# 前缀查询的上界后缀（按BINARY排序大于任何以前缀开头的字符串，可走raw_text索引）
+PREFIX_UPPER_SUFFIX = "\U0010ffff"
+# 导出CSV时每次读取的行数
+EXPORT_CHUNK_SIZE = 100000
+# 批量查询时每条SQL的字段数（低于SQLite默认的参数个数上限）
+LOOKUP_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    llm_service TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    source_batch TEXT,
+    raw_text TEXT NOT NULL,
+    category TEXT,
+    confidence REAL,
+    reason TEXT,
+    classified_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_raw_text ON results(raw_text);
+CREATE INDEX IF NOT EXISTS idx_results_category_confidence ON results(category, confidence);
+CREATE INDEX IF NOT EXISTS idx_results_confidence ON results(confidence);
+CREATE INDEX IF NOT EXISTS idx_results_run_id ON results(run_id, source_batch);
+CREATE TABLE IF NOT EXISTS token_usage (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    source_batch TEXT,
+    backend TEXT,
+    prompts INTEGER,
+    fields INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    template_tokens INTEGER,
+    estimated_prompts INTEGER,
+    seconds REAL
+);
+CREATE INDEX IF NOT EXISTS idx_token_usage_run_id ON token_usage(run_id);
+"""
+# 令牌用量列
+TOKEN_USAGE_COLUMNS = ["source_batch", "backend", "prompts", "fields", "prompt_tokens", "completion_tokens",
+                       "template_tokens", "estimated_prompts", "seconds"]
+
+
+class ResultStore:
+    """
+    基于SQLite的分类结果库
+
+    每次分类运行对应一个run_id，结果按字段、类别、置信度和run_id建立索引；
+    写入使用单事务批量插入，连接可在多个分类线程间共享（写入加锁）
+    """
+    def __init__(self, path=None):
+        """
+        参数:
+            path (str): 数据库文件路径，默认使用RESULT_STORE_PATH
+        """
+        self.path = path or RESULT_STORE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL模式下读写互不阻塞，验证阶段可在分类写入时读取
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # -------------------------- 写入 --------------------------
+    def start_run(self, run_id=None, description=None):
+        """
+        登记一次新的分类运行
+
+        返回:
+            str: run_id（默认按"时间戳_随机后缀"生成）
+        """
+        run_id = run_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, started_at, llm_service, description) VALUES (?, ?, ?, ?)",
+                (run_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), LLM_SERVICE, description)
+            )
+        logger.info(f"结果库登记分类运行：{run_id}")
+        return run_id
+
+    def insert_dataframe(self, result_df, run_id, source_batch=None):
+        """
+        批量写入分类结果（单事务executemany）
+
+        参数:
+            result_df (pd.DataFrame): 分类结果（需含raw_text，可含category、confidence、reason、source_batch列）
+            run_id (str): 所属运行
+            source_batch (str): 来源批次文件名（result_df中无source_batch列时使用）
+
+        返回:
+            int: 写入的记录数
+        """
+        if result_df is None or result_df.empty:
+            return 0
+        df = result_df.reindex(columns=RESULT_COLUMNS)
+        df = df[df["raw_text"].notna()]
+        confidence = pd.to_numeric(df["confidence"], errors="coerce")
+        batches = result_df["source_batch"].astype(str) if "source_batch" in result_df.columns else None
+        classified_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (run_id, batch, raw_text, category, conf, reason, classified_at)
+            for raw_text, category, conf, reason, batch in zip(
+                df["raw_text"].astype(str),
+                df["category"].where(df["category"].notna(), None),
+                confidence.astype(object).where(confidence.notna(), None),
+                df["reason"].where(df["reason"].notna(), None),
+                batches.loc[df.index] if batches is not None else [source_batch] * len(df)
+            )
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO results (run_id, source_batch, raw_text, category, confidence, reason, classified_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def update_results(self, updates_df, run_id):
+        """
+        按字段更新指定运行中的分类结果（如自动复核通过的字段）
+
+        参数:
+            updates_df (pd.DataFrame): 含raw_text、category、confidence、reason列
+            run_id (str): 要更新的运行
+
+        返回:
+            int: 更新的记录数
+        """
+        if updates_df is None or updates_df.empty:
+            return 0
+        confidence = pd.to_numeric(updates_df["confidence"], errors="coerce")
+        rows = [
+            (category, conf, reason, run_id, raw_text)
+            for raw_text, category, conf, reason in zip(
+                updates_df["raw_text"].astype(str),
+                updates_df["category"],
+                confidence.astype(object).where(confidence.notna(), None),
+                updates_df["reason"]
+            )
+        ]
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "UPDATE results SET category = ?, confidence = ?, reason = ? WHERE run_id = ? AND raw_text = ?",
+                rows
+            )
+            return cursor.rowcount
+
+    def insert_token_usage(self, usage_row, run_id):
+        """
+        写入一个批次的令牌用量
+
+        参数:
+            usage_row (dict): 含TOKEN_USAGE_COLUMNS各列
+            run_id (str): 所属运行
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO token_usage (run_id, {', '.join(TOKEN_USAGE_COLUMNS)}) "
+                f"VALUES (?{', ?' * len(TOKEN_USAGE_COLUMNS)})",
+                [run_id] + [usage_row.get(column) for column in TOKEN_USAGE_COLUMNS]
+            )
+
+    # -------------------------- 查询 --------------------------
+    def latest_run_id(self):
+        """返回最近一次分类运行的run_id，没有运行记录时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT run_id FROM runs ORDER BY started_at DESC, rowid DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def list_runs(self):
+        """返回所有运行及其结果数"""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT r.run_id, r.started_at, r.llm_service, r.description, COUNT(s.id) AS results "
+                "FROM runs r LEFT JOIN results s ON s.run_id = r.run_id "
+                "GROUP BY r.run_id ORDER BY r.started_at, r.rowid",
+                self._conn
+            )
+
+    def load_token_usage(self, run_id=None):
+        """
+        读取指定运行（默认最近一次运行）的逐批次令牌用量
+
+        返回:
+            pd.DataFrame: 令牌用量（TOKEN_USAGE_COLUMNS）
+        """
+        run_id = run_id or self.latest_run_id()
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(TOKEN_USAGE_COLUMNS)} FROM token_usage WHERE run_id = ? ORDER BY id",
+                self._conn, params=(run_id,)
+            )
+
+    def _build_query(self, field=None, prefix=None, category=None, min_confidence=None, max_confidence=None,
+                     run_id=None):
+        """根据过滤条件拼接WHERE子句和参数"""
+        conditions, params = [], []
+        if field is not None:
+            conditions.append("raw_text = ?")
+            params.append(field)
+        if prefix:
+            conditions.append("raw_text >= ? AND raw_text < ?")
+            params.extend([prefix, prefix + PREFIX_UPPER_SUFFIX])
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if min_confidence is not None:
+            conditions.append("confidence >= ?")
+            params.append(float(min_confidence))
+        if max_confidence is not None:
+            conditions.append("confidence <= ?")
+            params.append(float(max_confidence))
+        if run_id is not None:
+            conditions.append("run_id = ?")
+            params.append(run_id)
+        sql = f"SELECT {', '.join(QUERY_COLUMNS)} FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql, params
+
+    def query(self, field=None, prefix=None, category=None, min_confidence=None, max_confidence=None,
+              run_id=None, limit=None):
+        """
+        按条件查询分类结果（条件之间为AND关系）
+
+        参数:
+            field (str): 字段全文精确匹配
+            prefix (str): 字段前缀
+            category (str): 类别
+            min_confidence (float): 最低置信度（含）
+            max_confidence (float): 最高置信度（含）
+            run_id (str): 运行ID
+            limit (int): 最多返回的记录数
+
+        返回:
+            pd.DataFrame: 查询结果，按写入顺序排列
+        """
+        sql, params = self._build_query(field, prefix, category, min_confidence, max_confidence, run_id)
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def lookup(self, fields):
+        """
+        批量查询字段最近一次的分类结果（所有运行中写入最晚的一条，走raw_text索引）
+
+        参数:
+            fields (list): 字段列表
+
+        返回:
+            dict: 字段 -> (category, confidence, reason)，结果库中没有的字段不包含在内
+        """
+        found = {}
+        fields = list(fields)
+        with self._lock:
+            for start in range(0, len(fields), LOOKUP_CHUNK_SIZE):
+                chunk = fields[start:start + LOOKUP_CHUNK_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT raw_text, category, confidence, reason FROM results "
+                    f"WHERE raw_text IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+                    chunk
+                ).fetchall()
+                # 按写入顺序覆盖，保留最近一次结果
+                for raw_text, category, confidence, reason in rows:
+                    found[raw_text] = (category, confidence, reason)
+        return found
+
+    def count_distinct_fields(self):
+        """返回所有运行中不同字段的个数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT raw_text) FROM results").fetchone()[0]
+
+    def iter_distinct_fields(self, chunk_size=None):
+        """
+        按字段顺序分块读取所有运行中的不同字段（走raw_text索引，每块单独加锁，读取期间不阻塞写入）
+
+        返回:
+            generator: 逐块产出字段列表
+        """
+        chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+        last = None
+        while True:
+            with self._lock:
+                if last is None:
+                    rows = self._conn.execute(
+                        "SELECT DISTINCT raw_text FROM results ORDER BY raw_text LIMIT ?", (chunk_size,)
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        "SELECT DISTINCT raw_text FROM results WHERE raw_text > ? ORDER BY raw_text LIMIT ?",
+                        (last, chunk_size)
+                    ).fetchall()
+            if not rows:
+                return
+            yield [row[0] for row in rows]
+            last = rows[-1][0]
+
+    def load_run(self, run_id=None):
+        """
+        读取一次运行的全部分类结果（供结果验证使用）
+
+        参数:
+            run_id (str): 运行ID，默认最近一次运行
+
+        返回:
+            pd.DataFrame: 含raw_text、category、confidence、reason和source_batch（分类类型）列
+        """
+        run_id = run_id or self.latest_run_id()
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT raw_text, category, confidence, reason, source_batch FROM results WHERE run_id = ? ORDER BY id",
+                self._conn, params=[run_id]
+            )
+        # 与读取CSV的结果保持一致：置信度为文本，整数置信度不带小数（取值种类少，先建查找表再映射）
+        lookup = {value: str(int(value)) if float(value).is_integer() else str(value)
+                  for value in df["confidence"].dropna().unique()}
+        df["confidence"] = df["confidence"].map(lookup)
+        df["source_batch"] = df["source_batch"].astype("category")
+        return df
+
+    def export_csv(self, output_path, **filters):
+        """
+        按条件分块导出为CSV（兼容原有基于CSV的下游流程）
+
+        参数:
+            output_path (str): 输出文件路径
+            **filters: 与query相同的过滤条件
+
+        返回:
+            int: 导出的记录数
+        """
+        sql, params = self._build_query(**filters)
+        sql += " ORDER BY id"
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        exported = 0
+        with self._lock, open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+            pd.DataFrame(columns=QUERY_COLUMNS).to_csv(f, index=False)
+            for chunk in pd.read_sql_query(sql, self._conn, params=params, chunksize=EXPORT_CHUNK_SIZE):
+                chunk.to_csv(f, index=False, header=False)
+                exported += len(chunk)
+        logger.info(f"已导出 {exported} 条结果到：{output_path}")
+        return exported
+
+
+def main(argv=None):
+    """结果库命令行：查询、导出和查看运行记录"""
+    parser = argparse.ArgumentParser(description="查询分类结果库")
+    parser.add_argument("--db", default=RESULT_STORE_PATH, help="结果库路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    filter_parser = argparse.ArgumentParser(add_help=False)
+    filter_parser.add_argument("--field", help="字段全文精确匹配")
+    filter_parser.add_argument("--prefix", help="字段前缀")
+    filter_parser.add_argument("--category", help="类别")
+    filter_parser.add_argument("--min-confidence", type=float, help="最低置信度（含）")
+    filter_parser.add_argument("--max-confidence", type=float, help="最高置信度（含）")
+    filter_parser.add_argument("--run-id", help="运行ID")
+
+    query_parser = subparsers.add_parser("query", parents=[filter_parser], help="按条件查询分类结果")
+    query_parser.add_argument("--limit", type=int, default=100, help="最多显示的记录数（0表示不限制）")
+    export_parser = subparsers.add_parser("export", parents=[filter_parser], help="按条件导出为CSV")
+    export_parser.add_argument("output", help="输出CSV路径")
+    subparsers.add_parser("runs", help="列出所有分类运行")
+
+    args = parser.parse_args(argv)
+    filters = {}
+    if args.command in ("query", "export"):
+        filters = dict(field=args.field, prefix=args.prefix, category=args.category,
+                       min_confidence=args.min_confidence, max_confidence=args.max_confidence, run_id=args.run_id)
+
+    with ResultStore(args.db) as store:
+        if args.command == "runs":
+            print(store.list_runs().to_string(index=False))
+        elif args.command == "query":
+            df = store.query(limit=args.limit or None, **filters)
+            if df.empty:
+                print("没有符合条件的结果")
+            else:
+                print(df.to_string(index=False))
+        elif args.command == "export":
+            exported = store.export_csv(args.output, **filters)
+            print(f"已导出 {exported} 条结果到：{args.output}")
+
+
+# 命令行查询结果库
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import pandas as pd
+import numpy as np
 import os
-import re
 import logging
+import threading
 import traceback
 from datetime import datetime
 import sys
@@ -13,31 +14,342 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import (
     CLASSIFY_SAVE_PATH,
     PROBLEM_SAVE_PATH,
-    LOW_CONFIDENCE_THRESHOLD,
-    COMPANY_NAME_KEYWORDS,
-    PROJECT_ROOT
+    RESULT_STORE_ENABLED
 )
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(PROJECT_ROOT, 'logs/result_verify.log')),
-        logging.StreamHandler()
-    ]
-)
+# 导入验证规则引擎（规则在配置VERIFY_RULES中声明）
+from script.verify_rules import get_rules_engine
+# 导入结果库（开启时优先读取最近一次运行的结果）
+from script.result_store import ResultStore
+# 导入运行指标
+from script.metrics import record_stage
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
 logger = logging.getLogger(__name__)
 
+# 问题类型名称之间的分隔符
+PROBLEM_TYPE_SEPARATOR = ";"
+# 验证所需的列
+RESULT_COLUMNS = ["raw_text", "category", "confidence", "reason"]
+# 问题字段文件的输出列（便于人工复核）
+PROBLEM_OUTPUT_COLUMNS = ["source_batch", "raw_text", "category", "confidence", "reason", "problem_type", "problem_mask"]
+# 问题字段文件名
+PROBLEM_FILE_NAME = "all_problems.csv"
+
+# 规则耗时统计文件名
+RULE_TIMINGS_FILE_NAME = "rule_timings.csv"
+
+
+def get_problem_types():
+    """返回当前规则引擎的问题类型列表 [(位掩码, 名称), ...]"""
+    return get_rules_engine().problem_types
+
+
+def load_results(result_paths):
+    """
+    一次性读取所有分类结果文件，合并为一个列式DataFrame
+
+    参数:
+        result_paths (list): 分类结果文件路径列表
+
+    返回:
+        pd.DataFrame: 含raw_text、category、confidence、reason和source_batch（分类类型）列
+    """
+    frames = []
+    batch_names = []
+    for result_path in result_paths:
+        try:
+            df = pd.read_csv(result_path, encoding="utf-8", dtype=str,
+                             usecols=lambda column: column in RESULT_COLUMNS)
+        except Exception as e:
+            error_msg = f"读取文件 {os.path.basename(result_path)} 时发生错误：{str(e)}"
+            logger.error(error_msg)
+            print(error_msg)
+            continue
+        frames.append(df.reindex(columns=RESULT_COLUMNS))
+        batch_names.append(os.path.basename(result_path))
+
+    if not frames:
+        return pd.DataFrame(columns=RESULT_COLUMNS + ["source_batch"])
+
+    # 来源批次用分类编码存储，千万行时也只占每行一个整数
+    codes = np.repeat(np.arange(len(frames), dtype=np.int32), [len(df) for df in frames])
+    combined = pd.concat(frames, ignore_index=True, copy=False)
+    combined["source_batch"] = pd.Categorical.from_codes(codes, categories=batch_names)
+    return combined
+
+
+def evaluate_problems(result_df):
+    """
+    对分类结果向量化地执行全部验证规则（规则引擎按数据量自动决定是否多进程并行）
+
+    参数:
+        result_df (pd.DataFrame): 分类结果（需含raw_text、category、confidence列）
+
+    返回:
+        np.ndarray: 每行的问题类型位掩码（0表示无问题）
+    """
+    return get_rules_engine().evaluate(result_df)
+
+
+def problem_mask_to_types(mask):
+    """将问题位掩码转换为问题类型名称列表字符串（如"公司关键词冲突;低置信度"）"""
+    return PROBLEM_TYPE_SEPARATOR.join(name for bit, name in get_problem_types() if int(mask) & bit)
+
+
+def build_problem_table(result_df, mask):
+    """
+    根据位掩码提取问题字段，每个字段一行
+
+    参数:
+        result_df (pd.DataFrame): 分类结果
+        mask (np.ndarray): evaluate_problems返回的位掩码
+
+    返回:
+        pd.DataFrame: 问题字段表（含problem_type和problem_mask列）
+    """
+    problems = result_df[mask != 0].copy()
+    problems["problem_mask"] = mask[mask != 0]
+    problems = problems.drop_duplicates(subset=["source_batch", "raw_text"])
+    # 掩码取值种类远少于行数，先建查找表再映射
+    type_lookup = {value: problem_mask_to_types(value) for value in np.unique(problems["problem_mask"])}
+    problems["problem_type"] = problems["problem_mask"].map(type_lookup)
+    return problems
+
+
+def summarize_problems(problems_df):
+    """
+    统计问题字段表中各问题类型的数量及其类别分布（一个字段可计入多种问题类型）
+
+    参数:
+        problems_df (pd.DataFrame): build_problem_table返回的问题字段表
+
+    返回:
+        tuple: (各问题类型计数Series, 问题类型×类别计数DataFrame)
+    """
+    problem_mask = problems_df["problem_mask"].to_numpy(dtype=np.uint64)
+    category = problems_df["category"].fillna("未分类")
+    problem_types = get_problem_types()
+    problem_stats = pd.Series({
+        name: int(np.count_nonzero(problem_mask & np.uint64(bit))) for bit, name in problem_types
+    }, name="count", dtype=np.int64)
+    category_stats = pd.DataFrame({
+        name: category[(problem_mask & np.uint64(bit)) != 0].value_counts() for bit, name in problem_types
+    }).fillna(0).astype(np.int64).T
+    category_stats.index.name = "problem_type"
+    return problem_stats, category_stats
+
+
+def report_problem_stats(problem_stats, category_stats, total_processed, total_problems, problem_dir=None):
+    """
+    输出问题统计信息，并保存问题字段分类统计
+
+    参数:
+        problem_stats (pd.Series): 各问题类型计数
+        category_stats (pd.DataFrame): 问题类型×类别计数
+        total_processed (int): 验证的记录总数
+        total_problems (int): 问题字段总数
+        problem_dir (str): 统计文件保存目录，默认PROBLEM_SAVE_PATH
+    """
+    problem_dir = problem_dir or PROBLEM_SAVE_PATH
+    print(f"总计问题字段数：{total_problems}")
+
+    # 按问题类型统计
+    problem_stats = problem_stats[problem_stats > 0].sort_values(ascending=False)
+    logger.info(f"问题类型统计：\n{problem_stats}")
+    print(f"\n问题类型统计：")
+    print(problem_stats)
+
+    # 计算问题率
+    if total_processed > 0:
+        problem_rate = (total_problems / total_processed) * 100
+        logger.info(f"总处理记录数：{total_processed}，问题率：{problem_rate:.2f}%")
+        print(f"\n总处理记录数：{total_processed}")
+        print(f"问题率：{problem_rate:.2f}%")
+
+    # 保存问题字段分类统计
+    category_stats = category_stats[category_stats.sum(axis=1) > 0]
+    if not category_stats.empty:
+        category_stats.to_csv(
+            os.path.join(problem_dir, "problem_category_stats.csv"),
+            encoding="utf-8-sig"
+        )
+        logger.info("问题字段分类统计已保存")
+
+
+def report_rule_timings(problem_dir=None):
+    """
+    输出各验证规则的累计耗时，并保存到rule_timings.csv，便于定位耗时规则
+
+    参数:
+        problem_dir (str): 统计文件保存目录，默认PROBLEM_SAVE_PATH
+    """
+    problem_dir = problem_dir or PROBLEM_SAVE_PATH
+    timing_report = get_rules_engine().timing_report()
+    if timing_report.empty:
+        return
+    logger.info(f"验证规则耗时统计：\n{timing_report.to_string(index=False)}")
+    try:
+        timing_report.to_csv(os.path.join(problem_dir, RULE_TIMINGS_FILE_NAME), index=False, encoding="utf-8-sig")
+    except Exception as e:
+        logger.error(f"保存规则耗时统计失败：{str(e)}")
+
+
+def prepare_problem_dir(problem_dir=None):
+    """
+    创建问题字段文件夹并清空其中的旧文件
+
+    参数:
+        problem_dir (str): 问题字段文件夹，默认PROBLEM_SAVE_PATH
+
+    返回:
+        bool: 文件夹是否准备成功
+    """
+    problem_dir = problem_dir or PROBLEM_SAVE_PATH
+
+    # 1. 创建问题字段保存文件夹
+    logger.info(f"准备创建问题字段文件夹：{problem_dir}")
+    if not os.path.exists(problem_dir):
+        try:
+            os.makedirs(problem_dir)
+            logger.info(f"已创建问题字段文件夹：{problem_dir}")
+            print(f"已创建问题字段文件夹：{problem_dir}")
+        except Exception as e:
+            error_msg = f"创建问题字段文件夹失败：{str(e)}"
+            logger.error(error_msg)
+            print(error_msg)
+            return False
+
+    # 2. 删除文件夹下所有文件
+    logger.info(f"清理问题字段文件夹中的旧文件")
+    files_deleted = 0
+    for filename in os.listdir(problem_dir):
+        file_path = os.path.join(problem_dir, filename)
+        try:
+            if os.path.isfile(file_path):
+                os.unlink(file_path)
+                files_deleted += 1
+        except Exception as e:
+            logger.error(f"删除文件 {file_path} 失败：{str(e)}")
+    logger.info(f"清理完成，共删除 {files_deleted} 个旧文件")
+    return True
+
+
+class StreamingVerifier:
+    """
+    流式验证器：在分类过程中逐批验证结果
+
+    每个批次的分类结果一返回就执行全部验证规则，问题字段追加写入问题文件，
+    运行统计保存在内存中，可随时查询，分类结束后无需再重新读取结果文件
+    """
+    def __init__(self, problem_dir=None):
+        """
+        参数:
+            problem_dir (str): 问题字段保存目录，默认PROBLEM_SAVE_PATH（初始化时会清空旧文件）
+        """
+        self.problem_dir = problem_dir or PROBLEM_SAVE_PATH
+        self.problem_path = os.path.join(self.problem_dir, PROBLEM_FILE_NAME)
+        self.total_processed = 0
+        self.total_problems = 0
+        self.batches_verified = 0
+        self.problem_stats = pd.Series(0, index=[name for _, name in get_problem_types()], name="count", dtype=np.int64)
+        self.category_stats = pd.DataFrame(dtype=np.int64)
+        self._header_written = False
+        self._lock = threading.Lock()
+        self.ready = prepare_problem_dir(self.problem_dir)
+
+    def process(self, result_df, source_batch):
+        """
+        验证一个批次的分类结果，问题字段追加写入问题文件
+
+        参数:
+            result_df (pd.DataFrame): 批次分类结果
+            source_batch (str): 来源批次名称（如result_batch_1.csv）
+
+        返回:
+            int: 该批次发现的问题字段数
+        """
+        return len(self.check(result_df, source_batch))
+
+    def check(self, result_df, source_batch):
+        """
+        与process相同，返回该批次的问题字段表（供分类过程中立即复核问题字段）
+
+        返回:
+            pd.DataFrame: 问题字段表（PROBLEM_OUTPUT_COLUMNS列），没有问题字段时为空表
+        """
+        if not self.ready or result_df is None or result_df.empty:
+            return pd.DataFrame(columns=PROBLEM_OUTPUT_COLUMNS)
+
+        batch_df = result_df.reindex(columns=RESULT_COLUMNS).assign(source_batch=source_batch)
+        problems_df = build_problem_table(batch_df, evaluate_problems(batch_df))
+        batch_problem_stats, batch_category_stats = summarize_problems(problems_df)
+
+        with self._lock:
+            if not problems_df.empty:
+                # 首次写入带表头和BOM，之后只追加数据行
+                problems_df[PROBLEM_OUTPUT_COLUMNS].to_csv(
+                    self.problem_path,
+                    mode="a" if self._header_written else "w",
+                    header=not self._header_written,
+                    index=False,
+                    encoding="utf-8" if self._header_written else "utf-8-sig"
+                )
+                self._header_written = True
+            self.total_processed += len(batch_df)
+            self.total_problems += len(problems_df)
+            self.batches_verified += 1
+            self.problem_stats = self.problem_stats.add(batch_problem_stats, fill_value=0).astype(np.int64)
+            self.category_stats = self.category_stats.add(batch_category_stats, fill_value=0).fillna(0).astype(np.int64)
+
+        logger.info(f"{source_batch} 流式验证完成，发现 {len(problems_df)} 个问题字段（累计 {self.total_problems}/{self.total_processed}）")
+        print(f"  {source_batch} 发现{len(problems_df)}个问题字段（累计：{self.total_problems}）")
+        return problems_df[PROBLEM_OUTPUT_COLUMNS]
+
+    def snapshot(self):
+        """
+        返回当前的运行统计
+
+        返回:
+            dict: 已验证批次数、记录数、问题字段数和各问题类型计数
+        """
+        with self._lock:
+            return {
+                "batches_verified": self.batches_verified,
+                "total_processed": self.total_processed,
+                "total_problems": self.total_problems,
+                "problem_stats": self.problem_stats.to_dict()
+            }
+
+    def finalize(self):
+        """输出最终统计并保存问题字段分类统计（直接使用内存中的统计，不重新读取文件）"""
+        with self._lock:
+            if self.total_problems > 0:
+                logger.info(f"所有问题字段已保存到：{self.problem_path}")
+                print(f"\n所有问题字段已保存：{self.problem_path}")
+                report_problem_stats(self.problem_stats, self.category_stats.copy(),
+                                     self.total_processed, self.total_problems, self.problem_dir)
+            else:
+                logger.info("未发现问题字段！分类结果质量良好")
+                print("\n未发现问题字段！分类结果质量良好")
+        report_rule_timings(self.problem_dir)
+
+
 def verify_results():
     """
     验证分类结果主函数
     
-    功能：验证所有分类结果，检测以下问题：
+    功能：按配置VERIFY_RULES验证所有分类结果，默认检测以下问题：
     1. 规则冲突：含公司关键词但分类不是公司名的字段
     2. 低置信度：置信度低于阈值的字段
     3. 空值/无效值：缺少类别或置信度的字段
     4. 异常格式：格式异常的字段
+    5. 类别与格式不符：分类为邮箱/电话但格式不匹配的字段
+    
+    所有结果文件一次读入，规则以向量化布尔掩码在合并数据上统一执行（大数据量时多进程并行）；
+    每个问题字段输出一行，problem_type列出命中的全部问题类型，problem_mask为对应位掩码
     
     结果保存到问题字段目录
     """
@@ -45,181 +357,58 @@ def verify_results():
         start_time = datetime.now()
         logger.info("开始验证分类结果")
         
-        # 1. 创建问题字段保存文件夹
-        logger.info(f"准备创建问题字段文件夹：{PROBLEM_SAVE_PATH}")
-        if not os.path.exists(PROBLEM_SAVE_PATH):
-            try:
-                os.makedirs(PROBLEM_SAVE_PATH)
-                logger.info(f"已创建问题字段文件夹：{PROBLEM_SAVE_PATH}")
-                print(f"已创建问题字段文件夹：{PROBLEM_SAVE_PATH}")
-            except Exception as e:
-                error_msg = f"创建问题字段文件夹失败：{str(e)}"
-                logger.error(error_msg)
-                print(error_msg)
-                return
-
-        # 2. 删除PROBLEM_SAVE_PATH下所有文件
-        logger.info(f"清理问题字段文件夹中的旧文件")
-        files_deleted = 0
-        for filename in os.listdir(PROBLEM_SAVE_PATH):
-            file_path = os.path.join(PROBLEM_SAVE_PATH, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                    files_deleted += 1
-            except Exception as e:
-                logger.error(f"删除文件 {file_path} 失败：{str(e)}")
-        logger.info(f"清理完成，共删除 {files_deleted} 个旧文件")
-
-        # 3. 获取所有分类结果文件
-        result_files = [f for f in os.listdir(CLASSIFY_SAVE_PATH) 
-                       if f.startswith("result_") and f.endswith(".csv")]
-        if not result_files:
-            warning_msg = f"未找到分类结果文件！请先运行script/llm_classify.py"
-            logger.warning(warning_msg)
-            print(warning_msg)
+        # 1. 创建问题字段保存文件夹并清空旧文件
+        if not prepare_problem_dir(PROBLEM_SAVE_PATH):
             return
-        
-        logger.info(f"共找到{len(result_files)}个分类结果文件，开始验证...")
-        print(f"共找到{len(result_files)}个分类结果文件，开始验证...")
 
-        # 4. 逐个文件验证
-        all_problems = []
-        total_processed = 0
-        
-        for result_file in result_files:
-            result_path = os.path.join(CLASSIFY_SAVE_PATH, result_file)
-            logger.info(f"正在验证：{result_file}")
-            print(f"正在验证：{result_file}")
+        # 2. 优先从结果库读取最近一次运行的结果，否则读取所有分类结果文件
+        result_df = None
+        if RESULT_STORE_ENABLED:
+            with ResultStore() as store:
+                run_id = store.latest_run_id()
+                if run_id is not None:
+                    logger.info(f"从结果库读取运行 {run_id} 的分类结果")
+                    print(f"从结果库读取运行 {run_id} 的分类结果，开始验证...")
+                    result_df = store.load_run(run_id)
+
+        if result_df is None:
+            result_files = sorted(f for f in os.listdir(CLASSIFY_SAVE_PATH)
+                                  if f.startswith("result_") and f.endswith(".csv"))
+            if not result_files:
+                warning_msg = f"未找到分类结果文件！请先运行script/llm_classify.py"
+                logger.warning(warning_msg)
+                print(warning_msg)
+                return
             
-            try:
-                # 读取分类结果
-                result_df = pd.read_csv(result_path, encoding="utf-8")
-                logger.info(f"{result_file} 包含 {len(result_df)} 条记录")
-                total_processed += len(result_df)
-                
-                # 填充空值（避免处理报错）
-                result_df = result_df.fillna({
-                    "category": "未分类", 
-                    "confidence": 0, 
-                    "reason": "无"
-                })
-
-                # -------------------------- 验证1：规则冲突（公司名关键词vs分类结果） --------------------------
-                # 检查含公司关键词但分类不是"公司名"的字段
-                if COMPANY_NAME_KEYWORDS and len(COMPANY_NAME_KEYWORDS) > 0:
-                    company_keyword_pattern = "|".join([re.escape(keyword) for keyword in COMPANY_NAME_KEYWORDS])
-                    try:
-                        result_df["has_company_keyword"] = result_df["raw_text"].str.contains(
-                            company_keyword_pattern, case=False, na=False
-                        )
-                        conflict_company = result_df[
-                            (result_df["has_company_keyword"]) & 
-                            (~result_df["category"].str.contains("公司名", na=False))
-                        ].copy()
-                        conflict_company["problem_type"] = "公司关键词冲突"
-                        logger.info(f"{result_file} 发现 {len(conflict_company)} 个公司关键词冲突字段")
-                    except Exception as e:
-                        logger.error(f"{result_file} 公司关键词冲突检测失败：{str(e)}")
-                        conflict_company = pd.DataFrame()
-                else:
-                    conflict_company = pd.DataFrame()
-
-                # -------------------------- 验证2：低置信度（＜LOW_CONFIDENCE_THRESHOLD） --------------------------
-                # 转换置信度为整数（处理可能的字符串格式）
-                try:
-                    result_df["confidence_int"] = pd.to_numeric(result_df["confidence"], errors="coerce").fillna(0)
-                    low_conf = result_df[result_df["confidence_int"] < LOW_CONFIDENCE_THRESHOLD].copy()
-                    low_conf["problem_type"] = "低置信度"
-                    logger.info(f"{result_file} 发现 {len(low_conf)} 个低置信度字段")
-                except Exception as e:
-                    logger.error(f"{result_file} 低置信度检测失败：{str(e)}")
-                    low_conf = pd.DataFrame()
-
-                # -------------------------- 验证3：空值/无效值检测 --------------------------
-                try:
-                    # 检测空分类或无效分类
-                    invalid_category = result_df[
-                        (result_df["category"].str.strip() == "") | 
-                        (result_df["category"].str.contains("未分类|无法识别", na=False))
-                    ].copy()
-                    invalid_category["problem_type"] = "无效分类"
-                    logger.info(f"{result_file} 发现 {len(invalid_category)} 个无效分类字段")
-                except Exception as e:
-                    logger.error(f"{result_file} 无效分类检测失败：{str(e)}")
-                    invalid_category = pd.DataFrame()
-                
-                # -------------------------- 验证4：异常格式检测 --------------------------
-                try:
-                    # 检测格式异常的字段
-                    format_error = result_df[
-                        (result_df["raw_text"].str.len() > 500) |  # 过长字段
-                        (result_df["raw_text"].str.count("\\n") > 5)  # 多行字段
-                    ].copy()
-                    format_error["problem_type"] = "格式异常"
-                    logger.info(f"{result_file} 发现 {len(format_error)} 个格式异常字段")
-                except Exception as e:
-                    logger.error(f"{result_file} 格式异常检测失败：{str(e)}")
-                    format_error = pd.DataFrame()
-
-                # -------------------------- 收集问题字段 --------------------------
-                batch_problems = pd.concat(
-                    [conflict_company, low_conf, invalid_category, format_error], 
-                    ignore_index=True
-                ).drop_duplicates(subset=["raw_text"])
-                
-                if not batch_problems.empty:
-                    # 添加批次信息
-                    batch_problems["source_batch"] = result_file
-                    all_problems.append(batch_problems)
-                    logger.info(f"{result_file} 总计发现 {len(batch_problems)} 个问题字段")
-                    print(f"  该批次发现{len(batch_problems)}个问题字段")
-                else:
-                    logger.info(f"{result_file} 未发现问题字段")
-                    print(f"  该批次未发现问题字段")
-            except Exception as e:
-                error_msg = f"处理文件 {result_file} 时发生错误：{str(e)}"
-                logger.error(error_msg)
-                logger.error(traceback.format_exc())
-                print(error_msg)
+            logger.info(f"共找到{len(result_files)}个分类结果文件，开始验证...")
+            print(f"共找到{len(result_files)}个分类结果文件，开始验证...")
 
-        # 5. 保存所有问题字段
-        if all_problems:
-            all_problems_df = pd.concat(all_problems, ignore_index=True)
-            # 只保留关键列（便于人工复核）
-            output_columns = ["source_batch", "raw_text", "category", "confidence", "reason", "problem_type"]
-            output_path = os.path.join(PROBLEM_SAVE_PATH, "all_problems.csv")
+            # 3. 一次性读取所有结果，对合并后的数据统一执行向量化验证
+            result_df = load_results([os.path.join(CLASSIFY_SAVE_PATH, f) for f in result_files])
+
+        total_processed = len(result_df)
+        logger.info(f"共读取 {total_processed} 条分类记录")
+        print(f"共读取 {total_processed} 条分类记录")
+
+        mask = evaluate_problems(result_df)
+        problems_df = build_problem_table(result_df, mask)
+        for bit, name in get_problem_types():
+            logger.info(f"发现 {int(np.count_nonzero(mask & np.uint64(bit)))} 个{name}字段")
+
+        # 4. 保存所有问题字段
+        if not problems_df.empty:
+            output_path = os.path.join(PROBLEM_SAVE_PATH, PROBLEM_FILE_NAME)
             
             try:
-                all_problems_df[output_columns].to_csv(
+                problems_df[PROBLEM_OUTPUT_COLUMNS].to_csv(
                     output_path, 
                     index=False, encoding="utf-8-sig"
                 )
                 logger.info(f"所有问题字段已保存到：{output_path}")
                 print(f"\n所有问题字段已保存：{output_path}")
-                print(f"总计问题字段数：{len(all_problems_df)}")
                 
-                # 按问题类型统计
-                problem_stats = all_problems_df["problem_type"].value_counts()
-                logger.info(f"问题类型统计：\n{problem_stats}")
-                print(f"\n问题类型统计：")
-                print(problem_stats)
-                
-                # 计算问题率
-                if total_processed > 0:
-                    problem_rate = (len(all_problems_df) / total_processed) * 100
-                    logger.info(f"总处理记录数：{total_processed}，问题率：{problem_rate:.2f}%")
-                    print(f"\n总处理记录数：{total_processed}")
-                    print(f"问题率：{problem_rate:.2f}%")
-                
-                # 保存问题字段分类统计
-                if not all_problems_df.empty:
-                    category_stats = all_problems_df.groupby(["problem_type", "category"]).size().unstack(fill_value=0)
-                    category_stats.to_csv(
-                        os.path.join(PROBLEM_SAVE_PATH, "problem_category_stats.csv"),
-                        encoding="utf-8-sig"
-                    )
-                    logger.info("问题字段分类统计已保存")
+                problem_stats, category_stats = summarize_problems(problems_df)
+                report_problem_stats(problem_stats, category_stats, total_processed, len(problems_df))
                     
             except Exception as e:
                 error_msg = f"保存问题字段文件失败：{str(e)}"
@@ -229,9 +418,13 @@ def verify_results():
             logger.info("未发现问题字段！分类结果质量良好")
             print("\n未发现问题字段！分类结果质量良好")
         
+        # 输出各规则耗时
+        report_rule_timings(PROBLEM_SAVE_PATH)
+        
         # 输出总处理时间
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
+        record_stage("verify", total_processed, duration)
         logger.info(f"结果验证完成，总耗时：{duration:.2f} 秒")
         print(f"\n结果验证完成，总耗时：{duration:.2f} 秒")
         
@@ -243,4 +436,5 @@ def verify_results():
 
 # 执行验证
 if __name__ == "__main__":
+    setup_logging("result_verify")
     verify_results()
\ No newline at end of file
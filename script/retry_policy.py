@@ -0,0 +1,248 @@
+import os
+import time
+import random
+import logging
+import threading
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    MAX_RETRY_COUNT,
+    INITIAL_RETRY_INTERVAL,
+    RETRY_INTERVAL_MULTIPLIER,
+    MAX_RETRY_INTERVAL,
+    RETRY_BUDGET_RATIO,
+    RETRY_BUDGET_MIN_RETRIES_PER_SECOND,
+    RETRY_BUDGET_MAX_TOKENS,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT
+)
+
+from script.metrics import Timer, LLM_REQUEST_SECONDS, LLM_RETRIES, LLM_FAILURES
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------- 错误类型 --------------------------
+class LLMError(Exception):
+    """LLM调用错误基类，backend记录出错的服务名称"""
+    def __init__(self, message, backend=None):
+        super().__init__(message)
+        self.backend = backend
+
+
+class RetryableLLMError(LLMError):
+    """可重试错误：超时、连接失败、限流、服务端5xx等暂时性故障"""
+
+
+class LLMResponseFormatError(RetryableLLMError):
+    """响应格式无效或无法解析（模型输出不稳定，重试可能恢复）"""
+
+
+class FatalLLMError(LLMError):
+    """不可重试错误：鉴权失败、请求参数错误等，重试不会改变结果"""
+
+
+class CircuitOpenError(LLMError):
+    """熔断器处于打开状态，请求被快速拒绝"""
+
+
+class RetryBudgetExhaustedError(LLMError):
+    """全局重试预算已耗尽，放弃本次重试"""
+
+
+# -------------------------- 重试预算 --------------------------
+class RetryBudget:
+    """
+    全局重试预算（令牌桶）
+
+    每个首次请求存入ratio个令牌，每次重试消耗1个令牌，因此重试量不会超过基础请求量的ratio倍；
+    另按min_retries_per_second持续补充少量令牌，保证低流量时仍可重试
+    """
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_retries_per_second=RETRY_BUDGET_MIN_RETRIES_PER_SECOND,
+                 max_tokens=RETRY_BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last_refill) * self.min_retries_per_second)
+        self._last_refill = now
+
+    def record_request(self):
+        """记录一次首次请求，存入ratio个令牌"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_acquire(self):
+        """尝试为一次重试扣除令牌，预算不足时返回False"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# -------------------------- 熔断器 --------------------------
+class CircuitBreaker:
+    """
+    单个后端的熔断器
+
+    状态：CLOSED（正常）-> 连续失败达到阈值 -> OPEN（快速失败）-> 超过reset_timeout ->
+    HALF_OPEN（只放行一个探测请求，成功则恢复CLOSED，失败则重新OPEN）
+    """
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, backend, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.backend = backend
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """请求前检查熔断状态，打开状态下抛出CircuitOpenError"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.backend} 服务熔断中，请求被拒绝", backend=self.backend)
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"{self.backend} 熔断器进入半开状态，发送探测请求")
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError(f"{self.backend} 服务探测中，请求被拒绝", backend=self.backend)
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.backend} 探测请求成功，熔断器恢复关闭状态")
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failure_count += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"{self.backend} 连续失败 {self.failure_count} 次，熔断器打开 {self.reset_timeout} 秒")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """请求以非故障原因结束（如不可重试错误）时释放探测名额"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+# -------------------------- 重试策略 --------------------------
+class RetryPolicy:
+    """
+    统一重试策略：指数退避 + 抖动、全局重试预算、按后端熔断
+
+    只对RetryableLLMError重试；FatalLLMError、CircuitOpenError、RetryBudgetExhaustedError直接抛出，
+    调用方无需再叠加自己的重试循环
+    """
+    def __init__(self, max_retries=MAX_RETRY_COUNT, initial_interval=INITIAL_RETRY_INTERVAL,
+                 multiplier=RETRY_INTERVAL_MULTIPLIER, max_interval=MAX_RETRY_INTERVAL, budget=None):
+        self.max_retries = max_retries
+        self.initial_interval = initial_interval
+        self.multiplier = multiplier
+        self.max_interval = max_interval
+        self.budget = budget or RetryBudget()
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get_breaker(self, backend):
+        """获取（或创建）指定后端的熔断器"""
+        with self._lock:
+            if backend not in self._breakers:
+                self._breakers[backend] = CircuitBreaker(backend)
+            return self._breakers[backend]
+
+    def _backoff_delay(self, retry):
+        delay = min(self.max_interval, self.initial_interval * (self.multiplier ** retry))
+        return random.uniform(delay / 2, delay)
+
+    def call(self, backend, func, *args, **kwargs):
+        """
+        按统一策略调用func
+
+        参数:
+            backend (str): 后端名称（用于熔断器区分）
+            func (callable): 实际发起请求的函数，失败时应抛出LLMError子类
+
+        返回:
+            func的返回值
+
+        异常:
+            LLMError: 重试用尽、预算耗尽、熔断或不可重试错误
+        """
+        breaker = self.get_breaker(backend)
+        self.budget.record_request()
+        latency = LLM_REQUEST_SECONDS.labels(backend)
+        retry = 0
+        while True:
+            breaker.before_call()
+            try:
+                with Timer(latency):
+                    result = func(*args, **kwargs)
+            except RetryableLLMError as e:
+                LLM_FAILURES.labels(backend, type(e).__name__).inc()
+                breaker.record_failure()
+                e.backend = e.backend or backend
+                if breaker.state == CircuitBreaker.OPEN:
+                    raise CircuitOpenError(f"{backend} 服务已熔断，停止重试：{e}", backend=backend) from e
+                if retry >= self.max_retries:
+                    logger.error(f"{backend} 请求失败，已达到最大重试次数 {self.max_retries}：{e}")
+                    raise
+                if not self.budget.try_acquire():
+                    logger.error(f"{backend} 请求失败，全局重试预算已耗尽：{e}")
+                    raise RetryBudgetExhaustedError(f"重试预算已耗尽：{e}", backend=backend) from e
+                retry += 1
+                LLM_RETRIES.labels(backend).inc()
+                delay = self._backoff_delay(retry)
+                logger.warning(f"{backend} 请求失败（第{retry}/{self.max_retries}次重试，等待{delay:.2f}秒）：{e}")
+                time.sleep(delay)
+                continue
+            except LLMError as e:
+                LLM_FAILURES.labels(backend, type(e).__name__).inc()
+                breaker.release_probe()
+                e.backend = e.backend or backend
+                raise
+            except Exception:
+                breaker.release_probe()
+                raise
+            breaker.record_success()
+            return result
+
+
+# 进程内共享的默认重试策略（所有LLM调用共用同一预算和熔断器）
+_default_policy = None
+_default_policy_lock = threading.Lock()
+
+
+def get_retry_policy():
+    """返回进程内共享的默认重试策略"""
+    global _default_policy
+    with _default_policy_lock:
+        if _default_policy is None:
+            _default_policy = RetryPolicy()
+        return _default_policy
@@ -1,7 +1,9 @@
 import os
 import time
 import logging
+import importlib
 from datetime import datetime
+import argparse
 import traceback
 
 # 添加项目根目录到Python路径，确保能正确导入config等模块
@@ -10,27 +12,31 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 导入配置模块
 from config.config import (
-    PROJECT_ROOT,
     BATCH_SAVE_PATH,
     CLASSIFY_SAVE_PATH,
-    PROBLEM_SAVE_PATH
+    PROBLEM_SAVE_PATH,
+    STREAMING_VERIFY_ENABLED,
+    RECLASSIFY_ENABLED,
+    PIPELINE_ENABLED,
+    PROFILE_MODE
 )
 
-# 配置日志前确保logs目录存在
-logs_dir = os.path.join(PROJECT_ROOT, 'logs')
-os.makedirs(logs_dir, exist_ok=True)
+# 日志在命令行启动时统一配置一次；各阶段模块（及其依赖的pandas、openai等）在执行到对应子命令时才导入
+from script.logging_setup import setup_logging
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(logs_dir, 'sens_finder.log')),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# 可单独执行的阶段：子命令 -> (script包内模块名, 函数名, 说明)
+STAGES = {
+    "preprocess": ("data_preprocess", "preprocess_data", "数据预处理：清洗、去重、分批次"),
+    "classify": ("llm_classify", "batch_classify", "LLM分类（开启流式验证时逐批验证）"),
+    "verify": ("result_verify", "verify_results", "结果验证：检测问题字段并生成报告"),
+    "reclassify": ("reclassify", "reclassify_problems", "自动复核问题字段"),
+    "merge": ("llm_classify", "merge_classification_results", "合并分类结果到merged_results.csv"),
+    "train": ("local_classifier", "train_local_classifier", "训练本地蒸馏模型"),
+    "usage": ("token_usage", "report_token_usage", "令牌用量与成本报告"),
+}
+
 def print_separator(title):
     """打印分隔线，用于区分不同阶段，并添加时间戳"""
     separator = f"\n{'-' * 60}"
@@ -40,17 +46,28 @@ def print_separator(title):
     print(separator)
     logger.info(f"阶段开始: {title}")
 
-def run_script(module_name, function_name):
-    """运行指定模块中的指定函数，包含异常捕获和详细日志记录"""
+def run_script(module_name, function_name, profiler=None):
+    """
+    运行指定模块中的指定函数，包含异常捕获和详细日志记录
+    
+    参数:
+        module_name (str): script包内模块名
+        function_name (str): 函数名
+        profiler (ProfileSession): 性能分析会话，不为None时该阶段单独输出分析文件
+    """
     start_time = time.time()
     print(f"开始执行: {module_name}")
     logger.info(f"开始执行模块: {module_name}")
     
     try:
-        # 使用动态导入方式
-        module = __import__(module_name, fromlist=[function_name])
+        # 按包路径动态导入，不依赖sys.path中的script目录
+        module = importlib.import_module(f"script.{module_name}")
         # 执行函数
-        getattr(module, function_name)()
+        if profiler is not None:
+            with profiler.stage(module_name):
+                getattr(module, function_name)()
+        else:
+            getattr(module, function_name)()
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -64,23 +81,40 @@ def run_script(module_name, function_name):
         logger.error(traceback.format_exc())
         return False
 
-def main():
-    """主函数，定义执行顺序并控制整个处理流程"""
-    print_separator("开始敏感数据处理流程")
+def main(pipeline=None, profiler=None):
+    """
+    主函数，定义执行顺序并控制整个处理流程
+    
+    参数:
+        pipeline (bool): 是否以流水线模式运行（预处理、分类、验证同时进行），默认使用PIPELINE_ENABLED
+        profiler (ProfileSession): 性能分析会话，默认不分析
+    """
+    pipeline = PIPELINE_ENABLED if pipeline is None else pipeline
+    print_separator("开始敏感数据处理流程" + ("（流水线模式）" if pipeline else ""))
     
     # 定义要执行的模块和对应的主要函数
-    scripts_to_run = [
-        ("data_preprocess", "preprocess_data"),
-        ("llm_classify", "batch_classify"),
-        ("result_verify", "verify_results")
-    ]
+    if pipeline:
+        # 流水线模式下三个阶段通过有界队列衔接，同时运行
+        scripts_to_run = [("pipeline", "run_pipeline")]
+    else:
+        scripts_to_run = [
+            ("data_preprocess", "preprocess_data"),
+            ("llm_classify", "batch_classify")
+        ]
+        # 开启流式验证时，分类阶段已逐批完成验证，无需再重新读取结果文件
+        if not STREAMING_VERIFY_ENABLED:
+            scripts_to_run.append(("result_verify", "verify_results"))
+    # 自动复核问题字段，仅剩无法解决的字段留给人工处理；
+    # 非流水线模式且开启流式验证时，批量分类已在分类过程中插队复核，无需单独执行
+    if RECLASSIFY_ENABLED and (pipeline or not STREAMING_VERIFY_ENABLED):
+        scripts_to_run.append(("reclassify", "reclassify_problems"))
     
     # 按顺序执行每个模块
     for module_name, main_function in scripts_to_run:
         print_separator(f"执行 {module_name}")
         # 增加异常捕获，确保单个模块失败不会影响日志记录
         try:
-            if not run_script(module_name, main_function):
+            if not run_script(module_name, main_function, profiler):
                 print_separator("敏感数据处理流程中断！")
                 logger.critical("敏感数据处理流程因模块失败而中断")
                 return
@@ -101,12 +135,115 @@ def main():
     print(f"1. 数据预处理结果位于: {BATCH_SAVE_PATH}")
     print(f"2. LLM分类结果位于: {CLASSIFY_SAVE_PATH}")
     print(f"3. 验证问题字段位于: {PROBLEM_SAVE_PATH}")
+    if RECLASSIFY_ENABLED:
+        print(f"4. 待人工复核字段位于: {os.path.join(PROBLEM_SAVE_PATH, 'unresolved_problems.csv')}")
     
     logger.info(f"处理结果汇总: 预处理结果位于 {BATCH_SAVE_PATH}, 分类结果位于 {CLASSIFY_SAVE_PATH}, 问题字段位于 {PROBLEM_SAVE_PATH}")
 
-if __name__ == "__main__":
+def build_parser():
+    """构建命令行解析器：run执行完整流程，其余子命令单独执行对应阶段"""
+    parser = argparse.ArgumentParser(description="敏感数据处理流程")
+    subparsers = parser.add_subparsers(dest="command", metavar="命令")
+
+    # 各阶段子命令共用的性能分析选项
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    profile_parser.add_argument("--profile", nargs="?", const=PROFILE_MODE, choices=["sample", "cprofile"],
+                                help=f"逐阶段性能分析并输出火焰图文件（默认{PROFILE_MODE}）")
+
+    run_parser = subparsers.add_parser("run", parents=[profile_parser], help="执行完整流程（默认）")
+    run_parser.add_argument("--pipeline", action="store_true", default=None,
+                            help="以流水线模式运行（预处理、分类、验证同时进行）")
+    for command, (_, _, description) in STAGES.items():
+        subparsers.add_parser(command, parents=[profile_parser], help=description)
+    subparsers.add_parser("store", help="查询结果库（参数同script/result_store.py）")
+    subparsers.add_parser("locate", help="查询字段出现的来源文件和偏移、生成来源报告（参数同script/provenance_index.py）")
+
+    worker_parser = subparsers.add_parser("worker", help="作为工作节点领取共享队列中的批次进行分类")
+    worker_parser.add_argument("--worker-id", help="工作节点ID，默认为主机名-进程号-随机后缀")
+    worker_parser.add_argument("--no-wait", action="store_true",
+                               help="没有可领取的批次时立即退出，不等待回收其他节点的过期租约")
+    distributed_parser = subparsers.add_parser("distributed", parents=[profile_parser], help="分布式分类：协调工作队列并汇总、验证结果")
+    distributed_parser.add_argument("--workers", type=int, default=None,
+                                    help="本地工作进程数（默认CPU核心数，0表示只协调）")
+    serve_parser = subparsers.add_parser("serve", help="启动在线分类服务（先查缓存，未命中的字段合并成微批次分类）")
+    serve_parser.add_argument("--host", help="监听地址，默认SERVICE_HOST")
+    serve_parser.add_argument("--port", type=int, help="监听端口，默认SERVICE_PORT")
+    ingest_parser = subparsers.add_parser("ingest", help="流式读取归档文件（不解压到磁盘）并以流水线模式分类")
+    ingest_parser.add_argument("paths", nargs="+", help="归档文件、普通文件或目录")
+    ingest_parser.add_argument("--concurrency", type=int, default=None, help="同时读取的归档数，默认ARCHIVE_CONCURRENCY")
+    ingest_parser.add_argument("--binary-only", action="store_true", help="只提取可执行文件中的字符串，忽略文本成员")
+    return parser
+
+def cli(argv=None):
+    """
+    命令行入口
+    
+    示例：
+        python script/sens_finder.py                  # 执行完整流程
+        python script/sens_finder.py run --pipeline   # 流水线模式
+        python script/sens_finder.py verify           # 只执行结果验证
+        python script/sens_finder.py --profile        # 逐阶段性能分析（输出到logs/profiles/）
+        python script/sens_finder.py store query --field Nvidia
+        python script/sens_finder.py locate locate Nvidia  # 查询字段出现的文件和偏移
+        python script/sens_finder.py distributed --workers 4
+        python script/sens_finder.py worker           # 在其他主机上加入分布式分类
+        python script/sens_finder.py serve --port 8600  # 在线分类服务
+        python script/sens_finder.py ingest firmware.tar.xz  # 直接读取归档成员并分类
+    """
+    # 兼容旧用法：不带子命令时直接接受--pipeline
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "run")
+    # 结果库查询的参数原样交给result_store的命令行解析
+    if argv[0] == "store":
+        from script.result_store import main as store_main
+        store_main(argv[1:])
+        return
+    # 来源索引查询的参数原样交给provenance_index的命令行解析
+    if argv[0] == "locate":
+        from script.provenance_index import main as locate_main
+        locate_main(argv[1:])
+        return
+    args = build_parser().parse_args(argv)
+
+    setup_logging("sens_finder")
+    # 运行指标：配置端口时运行期间提供/metrics接口，结束时写出textfile
+    from script import metrics
+    metrics.start_http_server()
+    profiler = None
+    if getattr(args, "profile", None):
+        from script.profiling import ProfileSession
+        profiler = ProfileSession(args.profile)
     try:
-        main()
+        if args.command == "run":
+            main(pipeline=args.pipeline, profiler=profiler)
+        elif args.command == "worker":
+            from script.work_queue import run_worker
+            run_worker(worker_id=args.worker_id, wait=not args.no_wait)
+        elif args.command == "serve":
+            from script.classify_service import serve
+            serve(host=args.host, port=args.port)
+        elif args.command == "ingest":
+            from script.archive_ingest import MEMBER_KINDS, ingest
+            print_separator("归档读取与分类")
+            kinds = ("binary",) if args.binary_only else MEMBER_KINDS
+            if args.concurrency is None:
+                ingest(args.paths, kinds)
+            else:
+                ingest(args.paths, kinds, args.concurrency)
+        elif args.command == "distributed":
+            from script.work_queue import run_distributed
+            print_separator("分布式分类")
+            if profiler is not None:
+                with profiler.stage("distributed"):
+                    run_distributed(workers=args.workers)
+            else:
+                run_distributed(workers=args.workers)
+        else:
+            module_name, function_name, description = STAGES[args.command]
+            print_separator(description)
+            if not run_script(module_name, function_name, profiler):
+                sys.exit(1)
     except KeyboardInterrupt:
         print("\n用户中断操作，处理流程已终止！")
         logger.warning("用户中断操作，处理流程已终止")
@@ -116,6 +253,11 @@ if __name__ == "__main__":
         logger.critical(error_msg)
         logger.error(traceback.format_exc())
     finally:
+        if profiler is not None:
+            profiler.report()
+        metrics.write_textfile()
         # 确保日志文件正确关闭
-        for handler in logger.handlers:
-            handler.close()
\ No newline at end of file
+        logging.shutdown()
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,263 @@
+import pandas as pd
+import os
+import sys
+import glob
+import logging
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    CLASSIFY_SAVE_PATH,
+    TOKEN_PRICES
+)
+
+from script.metrics import LLM_TOKENS
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 逐批次令牌用量文件（分布式模式下每个工作节点写入token_usage_<节点ID>.csv）
+USAGE_FILE_NAME = "token_usage.csv"
+USAGE_FILE_PATTERN = "token_usage*.csv"
+# 运行结束时的用量与成本报告
+USAGE_REPORT_FILE_NAME = "token_usage_report.csv"
+USAGE_COLUMNS = ["source_batch", "backend", "prompts", "fields", "prompt_tokens", "completion_tokens",
+                 "template_tokens", "estimated_prompts", "seconds"]
+
+
+def estimate_tokens(text):
+    """
+    粗略估算文本的令牌数（服务未返回usage时使用）：中文等非ASCII字符约1个令牌，ASCII约4个字符1个令牌
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def _usage_value(usage, key):
+    """从usage字典或SDK对象中读取令牌数"""
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return int(value) if value is not None else None
+
+
+class TokenUsage:
+    """
+    一组LLM请求（通常是一个批次）的令牌用量，可在多个线程中累加
+
+    prompts按发送的提示词个数计数（本地服务子批次各算一个）；template_tokens为提示词令牌中模板本身所占的部分，
+    按模板与完整提示词估算令牌数的比例折算，不受估算方法整体偏差的影响
+    """
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.prompts = 0
+        self.fields = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.template_tokens = 0
+        self.estimated_prompts = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, usage, prompt=None, completion=None, backend=None, prompt_template=None):
+        """
+        累加一次请求的用量
+
+        参数:
+            usage: 服务返回的usage（字典或SDK对象），为None时按prompt和completion文本估算
+            prompt (str): 提示词文本
+            completion (str): 响应文本（仅在需要估算时使用）
+            backend (str): 服务名称，默认使用初始化时的名称
+            prompt_template (str): 生成prompt的模板（用于折算模板开销），默认不统计
+        """
+        prompt_tokens = _usage_value(usage, "prompt_tokens") if usage is not None else None
+        completion_tokens = _usage_value(usage, "completion_tokens") if usage is not None else None
+        estimated = prompt_tokens is None or completion_tokens is None
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(prompt)
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(completion)
+        template_tokens = 0
+        if prompt_template and prompt:
+            template_tokens = round(prompt_tokens * min(1.0, template_overhead_tokens(prompt_template) /
+                                                        max(1, estimate_tokens(prompt))))
+        backend = backend or self.backend
+        with self._lock:
+            self.backend = self.backend or backend
+            self.prompts += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.template_tokens += template_tokens
+            self.estimated_prompts += int(estimated)
+        LLM_TOKENS.labels(backend, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(backend, "completion").inc(completion_tokens)
+
+    def add_request(self, fields, seconds):
+        """累加一次分类调用覆盖的字段数和耗时"""
+        with self._lock:
+            self.fields += fields
+            self.seconds += seconds
+
+    def to_row(self, source_batch):
+        with self._lock:
+            return {
+                "source_batch": source_batch, "backend": self.backend, "prompts": self.prompts, "fields": self.fields,
+                "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+                "template_tokens": self.template_tokens, "estimated_prompts": self.estimated_prompts, "seconds": round(self.seconds, 3)
+            }
+
+
+class TokenUsageLog:
+    """逐批次追加写入令牌用量CSV（线程安全），同时可写入结果库"""
+    def __init__(self, path=None, store=None, run_id=None):
+        self.path = path or os.path.join(CLASSIFY_SAVE_PATH, USAGE_FILE_NAME)
+        self.store = store
+        self.run_id = run_id
+        self._lock = threading.Lock()
+
+    def record(self, usage, source_batch):
+        """
+        记录一个批次的用量（未调用LLM的批次不记录）
+
+        返回:
+            bool: 是否写入
+        """
+        if usage is None or usage.prompts == 0:
+            return False
+        row = usage.to_row(source_batch)
+        try:
+            with self._lock:
+                write_header = not os.path.exists(self.path)
+                pd.DataFrame([row], columns=USAGE_COLUMNS).to_csv(
+                    self.path, mode="a", header=write_header, index=False, encoding="utf-8"
+                )
+            if self.store is not None:
+                self.store.insert_token_usage(row, self.run_id)
+            return True
+        except Exception as e:
+            logger.error(f"记录 {source_batch} 的令牌用量失败：{e}")
+            return False
+
+
+def load_usage(directory=None):
+    """
+    读取目录下全部逐批次用量文件
+
+    返回:
+        pd.DataFrame: 用量记录（USAGE_COLUMNS），没有记录时返回空数据框
+    """
+    directory = directory or CLASSIFY_SAVE_PATH
+    paths = sorted(path for path in glob.glob(os.path.join(directory, USAGE_FILE_PATTERN))
+                   if os.path.basename(path) != USAGE_REPORT_FILE_NAME)
+    frames = [pd.read_csv(path, encoding="utf-8") for path in paths]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=USAGE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def template_overhead_tokens(prompt_template):
+    """估算提示词模板本身（不含字段）的令牌数"""
+    if not prompt_template:
+        return 0
+    return estimate_tokens(prompt_template.replace("{{fields_text}}", ""))
+
+
+def build_usage_report(usage_df):
+    """
+    按服务汇总用量：令牌/秒、每千令牌字段数、模板开销占比、预估成本
+
+    参数:
+        usage_df (pd.DataFrame): 逐批次用量
+
+    返回:
+        pd.DataFrame: 每个服务一行，另附"合计"行
+    """
+    count_columns = ["prompts", "fields", "prompt_tokens", "completion_tokens", "template_tokens", "estimated_prompts"]
+    usage_df = usage_df.reindex(columns=USAGE_COLUMNS)
+    usage_df[count_columns] = usage_df[count_columns].fillna(0).astype("int64")
+    report = usage_df.groupby("backend")[count_columns + ["seconds"]].sum()
+    report.insert(0, "batches", usage_df.groupby("backend").size())
+    report.loc["合计"] = report.sum()
+    report[["batches"] + count_columns] = report[["batches"] + count_columns].astype("int64")
+
+    total_tokens = report["prompt_tokens"] + report["completion_tokens"]
+    report["total_tokens"] = total_tokens
+    # 耗时为各批次LLM调用耗时之和（并发时为单连接吞吐）
+    report["tokens_per_second"] = (total_tokens / report["seconds"].where(report["seconds"] > 0)).round(1)
+    report["fields_per_1k_tokens"] = (report["fields"] * 1000 / total_tokens.where(total_tokens > 0)).round(2)
+    report["prompt_tokens_per_field"] = (report["prompt_tokens"] / report["fields"].where(report["fields"] > 0)).round(2)
+    report["template_overhead_share"] = (
+        report["template_tokens"] / report["prompt_tokens"].where(report["prompt_tokens"] > 0)
+    ).round(4)
+
+    costs = {}
+    for backend, row in report.drop(index="合计").iterrows():
+        prices = TOKEN_PRICES.get(backend, {})
+        costs[backend] = (row["prompt_tokens"] / 1e6 * prices.get("input", 0.0)
+                          + row["completion_tokens"] / 1e6 * prices.get("output", 0.0))
+    costs["合计"] = sum(costs.values())
+    report["estimated_cost"] = pd.Series(costs).round(6)
+    return report.reset_index()
+
+
+def report_token_usage(directory=None):
+    """
+    令牌用量与成本报告主函数
+
+    功能：汇总本次运行逐批次记录的令牌用量，输出令牌/秒、每千令牌字段数、模板开销占比和各服务预估成本，
+    并保存到分类结果目录下的token_usage_report.csv
+
+    参数:
+        directory (str): 用量文件所在目录，默认CLASSIFY_SAVE_PATH
+
+    返回:
+        pd.DataFrame: 报告，没有用量记录时返回None
+    """
+    try:
+        directory = directory or CLASSIFY_SAVE_PATH
+        usage_df = load_usage(directory)
+        if usage_df.empty:
+            logger.info("本次运行没有令牌用量记录（未调用LLM）")
+            print("本次运行没有令牌用量记录（未调用LLM）")
+            return None
+        report = build_usage_report(usage_df)
+        report_path = os.path.join(directory, USAGE_REPORT_FILE_NAME)
+        report.to_csv(report_path, index=False, encoding="utf-8-sig")
+
+        print("\n令牌用量与成本报告：")
+        for _, row in report.iterrows():
+            overhead = row["template_overhead_share"]
+            overhead_text = f"{overhead:.1%}" if pd.notna(overhead) else "未知"
+            summary = (f"{row['backend']}：{int(row['prompts'])}次请求，{int(row['fields'])}个字段，"
+                       f"输入{int(row['prompt_tokens'])}/输出{int(row['completion_tokens'])}令牌，"
+                       f"{row['tokens_per_second']}令牌/秒，每千令牌{row['fields_per_1k_tokens']}个字段，"
+                       f"模板开销占比{overhead_text}，预估成本${row['estimated_cost']:.4f}")
+            print(f"  {summary}")
+            logger.info(f"令牌用量 - {summary}")
+        estimated = int(report.loc[report["backend"] == "合计", "estimated_prompts"].iloc[0])
+        if estimated:
+            print(f"  （{estimated}次请求的服务未返回用量，按文本长度估算）")
+        print(f"令牌用量报告已保存到：{report_path}")
+        logger.info(f"令牌用量报告已保存到：{report_path}")
+        return report
+    except Exception as e:
+        error_msg = f"生成令牌用量报告失败：{type(e).__name__} - {str(e)}"
+        logger.error(error_msg)
+        print(error_msg)
+        return None
+
+
+# 输出最近一次运行的令牌用量报告
+if __name__ == "__main__":
+    setup_logging("token_usage")
+    report_token_usage()
@@ -0,0 +1,370 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import time
+import logging
+import threading
+import concurrent.futures
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    VERIFY_RULES,
+    VERIFY_WORKERS,
+    VERIFY_CHUNK_SIZE,
+    VERIFY_RULE_PROFILING
+)
+
+logger = logging.getLogger(__name__)
+
+# 规则类型
+RULE_KEYWORD = "keyword"                    # 字段包含关键词列表中任一关键词
+RULE_REGEX = "regex"                        # 字段匹配正则表达式
+RULE_CONFIDENCE_FLOOR = "confidence_floor"  # 置信度低于阈值（可按类别单独设置）
+RULE_CATEGORY_REGEX = "category_regex"      # 类别匹配正则（如无效分类）
+RULE_LENGTH = "length"                      # 字段过长或行数过多
+RULE_TYPES = (RULE_KEYWORD, RULE_REGEX, RULE_CONFIDENCE_FLOOR, RULE_CATEGORY_REGEX, RULE_LENGTH)
+
+# 位掩码为uint64，最多支持64条规则
+MAX_RULES = 64
+
+
+def _trie_pattern(words):
+    """
+    将关键词列表编译为前缀树形式的正则（如 Co|Corp|Company -> Co(?:rp|mpany)?）
+
+    Python的re对普通多选分支逐个回溯尝试，数千个关键词时非常慢；前缀树形式在每个位置只需沿一条路径匹配
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # 当前节点本身是关键词结尾时后续部分可选；贪婪匹配保证优先命中最长关键词
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    多关键词匹配器：把多条关键词规则的全部关键词编译成一个前缀树正则，一次扫描得出每个字段命中的规则位
+    """
+    def __init__(self, keyword_bits, case_sensitive=False):
+        """
+        参数:
+            keyword_bits (dict): 关键词 -> 规则位掩码
+            case_sensitive (bool): 是否区分大小写
+        """
+        self.case_sensitive = case_sensitive
+        self.lookup = {}
+        for keyword, bits in keyword_bits.items():
+            key = keyword if case_sensitive else keyword.lower()
+            self.lookup[key] = self.lookup.get(key, 0) | bits
+        # 前缀闭包：同一位置命中长关键词时，它的前缀关键词也必然命中
+        for key in list(self.lookup):
+            for length in range(1, len(key)):
+                prefix_bits = self.lookup.get(key[:length])
+                if prefix_bits:
+                    self.lookup[key] |= prefix_bits
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        trie = _trie_pattern(sorted(self.lookup))
+        self.any_pattern = re.compile(trie, flags)
+        # 零宽前瞻让每个起始位置都尝试匹配，重叠的关键词也不会漏掉
+        self.scan_pattern = re.compile(f"(?=({trie}))", flags)
+
+    def match(self, texts):
+        """
+        参数:
+            texts (pd.Series): 待匹配字符串（通常为去重后的唯一值）
+
+        返回:
+            np.ndarray: 每个字符串命中的规则位掩码（uint64）
+        """
+        result = np.zeros(len(texts), dtype=np.uint64)
+        # 先用C实现的整体匹配筛出命中行，只对少量命中行逐个提取关键词
+        hit = texts.str.contains(self.any_pattern, na=False).to_numpy()
+        lookup = self.lookup
+        for index, text in zip(np.flatnonzero(hit), texts[hit]):
+            bits = 0
+            for keyword in self.scan_pattern.findall(text):
+                bits |= lookup.get(keyword if self.case_sensitive else keyword.lower(), 0)
+            result[index] = bits
+        return result
+
+
+class RegexMatcher:
+    """
+    多正则匹配器：把同一列上的多条正则规则合并为一个带命名分组的正则，每个字段只匹配一次
+    """
+    def __init__(self, pattern_bits):
+        """
+        参数:
+            pattern_bits (list): (正则, 是否忽略大小写, 规则位掩码) 列表
+        """
+        self.group_bits = {}
+        parts = []
+        for index, (pattern, ignore_case, bits) in enumerate(pattern_bits):
+            # 先单独编译一次，尽早暴露配置中的正则错误
+            re.compile(pattern)
+            group = f"r{index}"
+            self.group_bits[group] = bits
+            scoped = f"(?i:{pattern})" if ignore_case else f"(?:{pattern})"
+            parts.append(f"(?:(?=[\\s\\S]*?(?P<{group}>{scoped})))?")
+        self.pattern = re.compile("".join(parts))
+
+    def match(self, texts):
+        """
+        参数:
+            texts (pd.Series): 待匹配字符串（通常为去重后的唯一值）
+
+        返回:
+            np.ndarray: 每个字符串命中的规则位掩码（uint64）
+        """
+        result = np.zeros(len(texts), dtype=np.uint64)
+        if len(texts) == 0:
+            return result
+        groups = texts.str.extract(self.pattern)
+        for group, bits in self.group_bits.items():
+            result[groups[group].notna().to_numpy()] |= np.uint64(bits)
+        return result
+
+
+def load_rule_keywords(rule):
+    """读取关键词规则的关键词（keywords列表和/或keywords_file文件，每行一个）"""
+    keywords = list(rule.get("keywords") or [])
+    keywords_file = rule.get("keywords_file")
+    if keywords_file:
+        with open(keywords_file, "r", encoding="utf-8") as f:
+            keywords.extend(line.strip() for line in f)
+    return [keyword for keyword in keywords if keyword]
+
+
+class RulesEngine:
+    """
+    声明式验证规则引擎
+
+    规则在配置VERIFY_RULES中以字典声明，按顺序分配位掩码（第i条规则对应1<<i）。
+    所有关键词规则编译为一个多关键词匹配器，所有正则规则编译为一个多正则匹配器；
+    大数据量时按块分发到多个进程并行执行，并记录每条规则（及匹配器）的耗时
+    """
+    def __init__(self, rules=None, shared_matchers=None):
+        """
+        参数:
+            rules (list): 规则声明列表，默认使用VERIFY_RULES
+            shared_matchers (bool): 是否合并关键词/正则规则为共享匹配器；
+                为False时每条规则单独编译，用于精确统计单条规则耗时，默认取VERIFY_RULE_PROFILING的反
+        """
+        self.rules = [dict(rule) for rule in (VERIFY_RULES if rules is None else rules)]
+        self.shared_matchers = (not VERIFY_RULE_PROFILING) if shared_matchers is None else shared_matchers
+        if len(self.rules) > MAX_RULES:
+            raise ValueError(f"验证规则最多支持 {MAX_RULES} 条，当前 {len(self.rules)} 条")
+        for rule in self.rules:
+            if not rule.get("name"):
+                raise ValueError(f"验证规则缺少name：{rule}")
+            if rule.get("type") not in RULE_TYPES:
+                raise ValueError(f"验证规则 {rule['name']} 的类型无效：{rule.get('type')}，可选：{RULE_TYPES}")
+        self.problem_types = [(1 << index, rule["name"]) for index, rule in enumerate(self.rules)]
+        self.timings = {}
+        self._timings_lock = threading.Lock()
+        self._compile()
+
+    def _compile(self):
+        """编译关键词和正则规则为（共享的）多模式匹配器"""
+        keyword_groups = {}
+        regex_groups = {}
+        for index, rule in enumerate(self.rules):
+            bit = 1 << index
+            column = rule.get("column", "raw_text")
+            if rule["type"] == RULE_KEYWORD:
+                case_sensitive = bool(rule.get("case_sensitive", False))
+                key = ("关键词匹配器", column, case_sensitive) if self.shared_matchers else (rule["name"], column, case_sensitive)
+                keyword_bits = keyword_groups.setdefault(key, {})
+                for keyword in load_rule_keywords(rule):
+                    keyword_bits[keyword] = keyword_bits.get(keyword, 0) | bit
+            elif rule["type"] == RULE_REGEX:
+                key = ("正则匹配器", column) if self.shared_matchers else (rule["name"], column)
+                regex_groups.setdefault(key, []).append((rule["pattern"], bool(rule.get("ignore_case", False)), bit))
+
+        self.matchers = []
+        for (label, column, case_sensitive), keyword_bits in keyword_groups.items():
+            if keyword_bits:
+                self.matchers.append((f"[{label}] {column}", column, KeywordMatcher(keyword_bits, case_sensitive)))
+        for (label, column), pattern_bits in regex_groups.items():
+            self.matchers.append((f"[{label}] {column}", column, RegexMatcher(pattern_bits)))
+
+        # 类别过滤条件预编译
+        self._category_filters = [
+            (re.compile(rule["only_category"]) if rule.get("only_category") else None,
+             re.compile(rule["unless_category"]) if rule.get("unless_category") else None)
+            for rule in self.rules
+        ]
+
+    def _record_timings(self, timings):
+        with self._timings_lock:
+            for name, seconds in timings.items():
+                self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def evaluate_frame(self, df):
+        """
+        在当前进程中对一个DataFrame执行全部规则
+
+        参数:
+            df (pd.DataFrame): 分类结果（需含raw_text、category、confidence列）
+
+        返回:
+            tuple: (每行的问题位掩码np.ndarray[uint64], 各规则耗时dict)
+        """
+        timings = {}
+        mask = np.zeros(len(df), dtype=np.uint64)
+        if len(df) == 0:
+            return mask, timings
+
+        # 字符串列先去重，规则只在唯一值上求值再按编码展开
+        columns = {}
+
+        def factorized(column, fill_value=""):
+            if column not in columns:
+                codes, uniques = pd.factorize(df[column].fillna(fill_value).astype(str))
+                columns[column] = (codes, pd.Series(uniques, dtype=object))
+            return columns[column]
+
+        category_codes, categories = factorized("category", "未分类")
+        confidence = pd.to_numeric(df["confidence"], errors="coerce").fillna(0).to_numpy()
+
+        # 1. 多模式匹配器（一次扫描得出所有关键词/正则规则的命中位）
+        matcher_bits = np.zeros(len(df), dtype=np.uint64)
+        for label, column, matcher in self.matchers:
+            start = time.perf_counter()
+            codes, uniques = factorized(column)
+            matcher_bits |= matcher.match(uniques)[codes]
+            timings[label] = timings.get(label, 0.0) + time.perf_counter() - start
+
+        # 2. 逐条规则生成布尔掩码
+        for index, rule in enumerate(self.rules):
+            start = time.perf_counter()
+            bit = np.uint64(1 << index)
+            rule_type = rule["type"]
+            if rule_type in (RULE_KEYWORD, RULE_REGEX):
+                flagged = (matcher_bits & bit) != 0
+            elif rule_type == RULE_CONFIDENCE_FLOOR:
+                per_category = rule.get("per_category") or {}
+                floors = categories.map(per_category).fillna(rule.get("threshold", 0)).to_numpy(dtype=float)
+                flagged = confidence < floors[category_codes]
+            elif rule_type == RULE_CATEGORY_REGEX:
+                matched = categories.str.contains(rule["pattern"], na=False)
+                if rule.get("match_empty", True):
+                    matched |= categories.str.strip() == ""
+                flagged = matched.to_numpy()[category_codes]
+            else:  # RULE_LENGTH
+                codes, uniques = factorized(rule.get("column", "raw_text"))
+                # pandas 3的to_numpy可能返回只读视图，需要复制后才能原地修改
+                too_long = (uniques.str.len() > rule.get("max_length", 500)).to_numpy(copy=True)
+                if "max_lines" in rule:
+                    multiline = uniques.str.contains("\n", regex=False).to_numpy()
+                    if multiline.any():
+                        too_long[multiline] |= (uniques[multiline].str.count("\n") > rule["max_lines"]).to_numpy()
+                flagged = too_long[codes]
+
+            if rule.get("negate"):
+                flagged = ~flagged
+            only_category, unless_category = self._category_filters[index]
+            if only_category is not None:
+                flagged = flagged & categories.str.contains(only_category, na=False).to_numpy()[category_codes]
+            if unless_category is not None:
+                flagged = flagged & ~categories.str.contains(unless_category, na=False).to_numpy()[category_codes]
+
+            mask[flagged] |= bit
+            timings[rule["name"]] = timings.get(rule["name"], 0.0) + time.perf_counter() - start
+
+        return mask, timings
+
+    def evaluate(self, df, workers=None, chunk_size=None):
+        """
+        执行全部规则；数据量超过一个块时按块分发到多个进程并行执行
+
+        参数:
+            df (pd.DataFrame): 分类结果
+            workers (int): 并行进程数，默认VERIFY_WORKERS（0表示使用全部CPU核心）
+            chunk_size (int): 每块行数，默认VERIFY_CHUNK_SIZE
+
+        返回:
+            np.ndarray: 每行的问题位掩码（uint64）
+        """
+        workers = VERIFY_WORKERS if workers is None else workers
+        workers = workers or os.cpu_count() or 1
+        chunk_size = chunk_size or VERIFY_CHUNK_SIZE
+
+        if workers <= 1 or len(df) <= chunk_size:
+            mask, timings = self.evaluate_frame(df)
+            self._record_timings(timings)
+            return mask
+
+        frame = df[["raw_text", "category", "confidence"] +
+                   sorted({rule.get("column", "raw_text") for rule in self.rules} - {"raw_text", "category", "confidence"})]
+        chunks = [frame.iloc[start:start + chunk_size] for start in range(0, len(frame), chunk_size)]
+        logger.info(f"验证规则分为 {len(chunks)} 块，使用 {min(workers, len(chunks))} 个进程并行执行")
+
+        masks = []
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            initializer=_init_worker,
+            initargs=(self.rules, self.shared_matchers)
+        ) as executor:
+            for mask, timings in executor.map(_evaluate_chunk, chunks):
+                masks.append(mask)
+                self._record_timings(timings)
+        return np.concatenate(masks)
+
+    def timing_report(self):
+        """
+        返回累计的规则耗时（所有进程的耗时之和），按耗时降序
+
+        返回:
+            pd.DataFrame: rule、seconds、share三列
+        """
+        with self._timings_lock:
+            report = pd.DataFrame(sorted(self.timings.items(), key=lambda item: -item[1]), columns=["rule", "seconds"])
+        total = report["seconds"].sum()
+        report["share"] = report["seconds"] / total if total > 0 else 0.0
+        return report
+
+
+# 子进程中的规则引擎（每个进程只编译一次）
+_worker_engine = None
+
+
+def _init_worker(rules, shared_matchers):
+    global _worker_engine
+    _worker_engine = RulesEngine(rules, shared_matchers=shared_matchers)
+
+
+def _evaluate_chunk(chunk):
+    return _worker_engine.evaluate_frame(chunk)
+
+
+# 进程内共享的默认规则引擎
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_rules_engine():
+    """返回按VERIFY_RULES编译的进程内共享规则引擎"""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = RulesEngine()
+        return _default_engine
+
@@ -0,0 +1,501 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import logging
+import threading
+import traceback
+import multiprocessing
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 从config.config正确导入配置
+from config.config import (
+    BATCH_SAVE_PATH,
+    CLASSIFY_SAVE_PATH,
+    WORK_QUEUE_PATH,
+    WORK_QUEUE_LEASE_TIMEOUT,
+    WORK_QUEUE_HEARTBEAT_INTERVAL,
+    WORK_QUEUE_POLL_INTERVAL,
+    WORK_QUEUE_MAX_ATTEMPTS,
+    RESULT_STORE_ENABLED,
+    LLM_SERVICE
+)
+
+from script.metrics import record_stage
+
+# 日志由入口统一配置，导入模块时不打开日志文件
+from script.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 队列目录下的子目录：租约、完成标记、失败记录
+LEASE_DIR = "leases"
+DONE_DIR = "done"
+ATTEMPT_DIR = "attempts"
+LEASE_SUFFIX = ".lease"
+DONE_SUFFIX = ".done"
+
+
+def new_worker_id():
+    """生成工作节点ID（主机名-进程号-随机后缀），便于在租约文件中定位节点"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _create_exclusive(path, payload):
+    """
+    原子地创建文件并写入JSON（文件已存在时抛出FileExistsError）
+
+    O_CREAT | O_EXCL 在本地文件系统和NFSv3+上都是原子操作，用于租约和完成标记的互斥
+    """
+    fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+
+
+def _read_json(path):
+    """读取JSON文件，文件不存在或内容不完整时返回None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class Lease:
+    """
+    批次租约：持有期间由后台线程定期更新租约文件的修改时间（心跳）
+
+    心跳前会核对租约文件中的token，发现租约已被其他节点回收时标记lost，持有者随后放弃提交结果
+    """
+    def __init__(self, task, path, worker_id, token, heartbeat_interval):
+        self.task = task
+        self.path = path
+        self.worker_id = worker_id
+        self.token = token
+        self.heartbeat_interval = heartbeat_interval
+        self.lost = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{task}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def is_owner(self):
+        """租约文件仍存在且token一致时返回True"""
+        payload = _read_json(self.path)
+        return payload is not None and payload.get("token") == self.token
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                if not self.is_owner():
+                    raise FileNotFoundError(self.path)
+                os.utime(self.path)
+            except OSError:
+                logger.warning(f"{self.worker_id} 失去批次 {self.task} 的租约（已被其他节点回收）")
+                self.lost.set()
+                return
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+class WorkQueue:
+    """
+    基于共享文件系统的批次工作队列
+
+    - 任务：BATCH_SAVE_PATH下的每个批次文件
+    - 领取：以O_EXCL创建leases/<批次>.lease，内容记录节点ID和随机token
+    - 心跳：持有者定期更新租约文件修改时间；超过lease_timeout未更新的租约可被任意节点回收
+      （先把租约文件原子重命名为只属于自己的名字，保证同一时刻只有一个节点回收成功）
+    - 提交：结果先写入临时文件，再用os.link硬链接为result_<批次>（目标已存在时失败），
+      因此即使失效节点恢复后继续执行，每个批次的结果文件也只会写入一次；随后创建done/<批次>.done
+    """
+    def __init__(self, queue_dir=None, batch_dir=None, result_dir=None, lease_timeout=None,
+                 heartbeat_interval=None, max_attempts=None, poll_interval=None):
+        self.queue_dir = queue_dir or WORK_QUEUE_PATH
+        self.batch_dir = batch_dir or BATCH_SAVE_PATH
+        self.result_dir = result_dir or CLASSIFY_SAVE_PATH
+        self.lease_timeout = WORK_QUEUE_LEASE_TIMEOUT if lease_timeout is None else lease_timeout
+        self.heartbeat_interval = WORK_QUEUE_HEARTBEAT_INTERVAL if heartbeat_interval is None else heartbeat_interval
+        self.max_attempts = WORK_QUEUE_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.poll_interval = WORK_QUEUE_POLL_INTERVAL if poll_interval is None else poll_interval
+        for sub_dir in (LEASE_DIR, DONE_DIR, ATTEMPT_DIR):
+            os.makedirs(os.path.join(self.queue_dir, sub_dir), exist_ok=True)
+        os.makedirs(self.result_dir, exist_ok=True)
+
+    # -------------------------- 路径 --------------------------
+    def _lease_path(self, task):
+        return os.path.join(self.queue_dir, LEASE_DIR, task + LEASE_SUFFIX)
+
+    def _done_path(self, task):
+        return os.path.join(self.queue_dir, DONE_DIR, task + DONE_SUFFIX)
+
+    def result_path(self, task):
+        return os.path.join(self.result_dir, f"result_{task}")
+
+    # -------------------------- 队列状态 --------------------------
+    def reset(self):
+        """清空租约、完成标记和失败记录（开始新一轮分类前由协调节点调用）"""
+        for sub_dir in (LEASE_DIR, DONE_DIR, ATTEMPT_DIR):
+            directory = os.path.join(self.queue_dir, sub_dir)
+            for filename in os.listdir(directory):
+                try:
+                    os.unlink(os.path.join(directory, filename))
+                except FileNotFoundError:
+                    pass
+
+    def tasks(self):
+        """返回全部批次文件名"""
+        if not os.path.exists(self.batch_dir):
+            return []
+        return sorted(f for f in os.listdir(self.batch_dir) if f.endswith(".csv"))
+
+    def is_done(self, task):
+        return os.path.exists(self._done_path(task))
+
+    def pending_tasks(self):
+        """返回尚未完成的批次"""
+        return [task for task in self.tasks() if not self.is_done(task)]
+
+    def status(self):
+        """返回队列统计：总数、已完成、失败、持有中、待领取"""
+        tasks = self.tasks()
+        done = [task for task in tasks if self.is_done(task)]
+        failed = sum(1 for task in done if (_read_json(self._done_path(task)) or {}).get("status") == "failed")
+        leased = sum(1 for task in tasks if task not in done and os.path.exists(self._lease_path(task)))
+        return {"total": len(tasks), "done": len(done), "failed": failed, "leased": leased,
+                "pending": len(tasks) - len(done) - leased}
+
+    # -------------------------- 领取与回收 --------------------------
+    def _is_stale(self, lease_path):
+        try:
+            return time.time() - os.stat(lease_path).st_mtime > self.lease_timeout
+        except FileNotFoundError:
+            return False
+
+    def _reclaim(self, task, worker_id):
+        """回收过期租约：重命名为本节点专属文件名（只有一个节点能成功），再删除"""
+        lease_path = self._lease_path(task)
+        claimed_path = f"{lease_path}.reclaim.{worker_id}"
+        try:
+            os.rename(lease_path, claimed_path)
+        except FileNotFoundError:
+            return
+        # 重命名与心跳之间存在竞争：重命名后再次确认租约确实已过期，否则还原
+        if time.time() - os.stat(claimed_path).st_mtime <= self.lease_timeout:
+            try:
+                os.link(claimed_path, lease_path)
+            except FileExistsError:
+                pass
+            os.unlink(claimed_path)
+            return
+        previous = _read_json(claimed_path) or {}
+        os.unlink(claimed_path)
+        logger.warning(f"{worker_id} 回收批次 {task} 的过期租约（原持有者：{previous.get('worker_id', '未知')}）")
+
+    def try_acquire(self, task, worker_id):
+        """
+        尝试领取批次
+
+        返回:
+            Lease: 领取成功时返回已启动心跳的租约，否则返回None
+        """
+        lease_path = self._lease_path(task)
+        for _ in range(2):
+            token = uuid.uuid4().hex
+            try:
+                _create_exclusive(lease_path, {
+                    "worker_id": worker_id, "token": token, "task": task,
+                    "acquired_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                })
+            except FileExistsError:
+                if not self._is_stale(lease_path):
+                    return None
+                self._reclaim(task, worker_id)
+                continue
+            # 列出任务与领取之间，其他节点可能已完成该批次
+            if self.is_done(task):
+                os.unlink(lease_path)
+                return None
+            return Lease(task, lease_path, worker_id, token, self.heartbeat_interval).start()
+        return None
+
+    def release(self, lease):
+        """停止心跳并删除租约文件（租约已被回收时不删除他人的租约）"""
+        lease.stop()
+        if lease.is_owner():
+            try:
+                os.unlink(lease.path)
+            except FileNotFoundError:
+                pass
+
+    # -------------------------- 提交 --------------------------
+    def _mark_done(self, task, payload):
+        try:
+            _create_exclusive(self._done_path(task), payload)
+            return True
+        except FileExistsError:
+            return False
+
+    def commit(self, lease, result_df):
+        """
+        提交批次结果（每个批次只会成功提交一次）
+
+        参数:
+            lease (Lease): 批次租约
+            result_df (pd.DataFrame): 分类结果（为空时只写完成标记）
+
+        返回:
+            bool: 本节点成功提交返回True；租约已丢失或其他节点已提交返回False
+        """
+        if lease.lost.is_set() or not lease.is_owner():
+            logger.warning(f"{lease.worker_id} 的批次 {lease.task} 租约已失效，放弃提交")
+            return False
+
+        rows = 0 if result_df is None else len(result_df)
+        committed = True
+        if rows:
+            final_path = self.result_path(lease.task)
+            temp_path = os.path.join(self.result_dir, f".{os.path.basename(final_path)}.{lease.token}.tmp")
+            result_df.to_csv(temp_path, index=False, encoding="utf-8")
+            try:
+                os.link(temp_path, final_path)
+            except FileExistsError:
+                committed = False
+            finally:
+                os.unlink(temp_path)
+
+        marked = self._mark_done(lease.task, {
+            "worker_id": lease.worker_id, "status": "ok", "rows": rows,
+            "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        if not committed:
+            logger.warning(f"批次 {lease.task} 的结果已由其他节点提交，丢弃 {lease.worker_id} 的结果")
+        return committed and (marked or rows > 0)
+
+    def record_failure(self, lease, error=None):
+        """
+        记录一次分类失败；达到最大尝试次数后标记批次为失败，不再领取
+
+        返回:
+            int: 该批次累计失败次数
+        """
+        attempt_dir = os.path.join(self.queue_dir, ATTEMPT_DIR)
+        _create_exclusive(os.path.join(attempt_dir, f"{lease.task}.{lease.token}"),
+                          {"worker_id": lease.worker_id, "error": str(error) if error else None})
+        attempts = sum(1 for f in os.listdir(attempt_dir) if f.startswith(lease.task + "."))
+        if attempts >= self.max_attempts:
+            self._mark_done(lease.task, {
+                "worker_id": lease.worker_id, "status": "failed", "attempts": attempts,
+                "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+            logger.error(f"批次 {lease.task} 已失败 {attempts} 次，标记为失败")
+        return attempts
+
+
+def run_worker(worker_id=None, wait=True, queue=None, classify=None):
+    """
+    工作节点主循环：反复领取未完成的批次，分类后提交，直到所有批次完成
+
+    参数:
+        worker_id (str): 节点ID，默认自动生成
+        wait (bool): 暂无可领取批次（均被其他节点持有）时是否等待，以便回收失效节点的批次
+        queue (WorkQueue): 工作队列，默认使用配置中的目录
+        classify (callable): 批次分类函数classify(batch_path, usage)，返回分类结果DataFrame，失败时返回None；
+            默认用提示词模板调用LLM分类（多进程模式下需为模块级函数，以便传给子进程）
+
+    返回:
+        dict: 本节点的处理统计
+    """
+    from script.token_usage import TokenUsage, TokenUsageLog
+
+    worker_id = worker_id or new_worker_id()
+    queue = queue or WorkQueue()
+    stats = {"worker_id": worker_id, "committed": 0, "failed": 0, "discarded": 0, "records": 0}
+    started = time.perf_counter()
+    if classify is None:
+        from script.llm_classify import load_prompt_template, classify_single_batch
+
+        prompt_template = load_prompt_template()
+        if not prompt_template:
+            logger.error("无法加载提示词模板，工作节点退出")
+            return stats
+
+        def classify(batch_path, usage):
+            return classify_single_batch(batch_path, prompt_template, usage)
+    # 每个节点写入自己的用量文件，避免多个进程追加同一个文件
+    usage_log = TokenUsageLog(os.path.join(queue.result_dir, f"token_usage_{worker_id}.csv"))
+
+    logger.info(f"工作节点 {worker_id} 启动，队列目录：{queue.queue_dir}")
+    print(f"工作节点 {worker_id} 启动")
+    while True:
+        pending = queue.pending_tasks()
+        if not pending:
+            break
+        # 打乱领取顺序，减少多个节点争抢同一批次
+        random.shuffle(pending)
+        lease = None
+        for task in pending:
+            lease = queue.try_acquire(task, worker_id)
+            if lease is not None:
+                break
+        if lease is None:
+            if not wait:
+                break
+            time.sleep(queue.poll_interval)
+            continue
+
+        try:
+            logger.info(f"{worker_id} 领取批次 {lease.task}")
+            usage = TokenUsage(LLM_SERVICE)
+            result_df = classify(os.path.join(queue.batch_dir, lease.task), usage)
+            # 租约丢失时结果会被丢弃，但令牌已消耗，用量照常记录
+            usage_log.record(usage, lease.task)
+            if result_df is None:
+                queue.record_failure(lease, "分类失败")
+                stats["failed"] += 1
+            elif queue.commit(lease, result_df):
+                stats["committed"] += 1
+                stats["records"] += len(result_df)
+                logger.info(f"{worker_id} 提交批次 {lease.task}，{len(result_df)} 条记录")
+                print(f"{worker_id} 完成批次 {lease.task}")
+            else:
+                stats["discarded"] += 1
+        except Exception as e:
+            logger.error(f"{worker_id} 处理批次 {lease.task} 时发生异常：{e}")
+            logger.error(traceback.format_exc())
+            queue.record_failure(lease, e)
+            stats["failed"] += 1
+        finally:
+            queue.release(lease)
+
+    record_stage("classify", stats["records"], time.perf_counter() - started)
+    logger.info(f"工作节点 {worker_id} 退出：{stats}")
+    print(f"工作节点 {worker_id} 退出，提交 {stats['committed']} 个批次，失败 {stats['failed']} 次")
+    return stats
+
+
+def _worker_process(worker_id, queue=None, classify=None):
+    """本地多进程模式下子进程的入口"""
+    setup_logging("work_queue")
+    run_worker(worker_id, queue=queue, classify=classify)
+
+
+def collect_results(queue):
+    """
+    分类结束后汇总：结果和各节点的令牌用量写入结果库（新的运行ID）、合并分类结果并输出用量报告
+
+    参数:
+        queue (WorkQueue): 工作队列
+    """
+    import pandas as pd
+    from script.llm_classify import merge_classification_results
+    from script.token_usage import load_usage, report_token_usage
+
+    if RESULT_STORE_ENABLED:
+        from script.result_store import ResultStore
+
+        with ResultStore() as store:
+            run_id = store.start_run(description=f"分布式模式 {len(queue.tasks())}个批次")
+            for task in queue.tasks():
+                result_path = queue.result_path(task)
+                if os.path.exists(result_path):
+                    store.insert_dataframe(pd.read_csv(result_path, encoding="utf-8", dtype=str), run_id,
+                                           source_batch=os.path.basename(result_path))
+            for usage_row in load_usage(queue.result_dir).to_dict("records"):
+                store.insert_token_usage(usage_row, run_id)
+            logger.info(f"分布式分类结果已写入结果库，运行ID：{run_id}")
+    merge_classification_results()
+    report_token_usage(directory=queue.result_dir)
+
+
+def run_distributed(workers=None, wait_timeout=None, classify=None):
+    """
+    分布式分类主函数（协调节点）
+
+    功能：清空上一轮的队列状态和分类结果，启动workers个本地工作进程（其他主机可同时运行
+    `sens_finder.py worker`加入），等待所有批次完成后汇总结果并执行验证
+    处理流程：
+    1. 重置工作队列和分类结果目录
+    2. 启动本地工作进程
+    3. 等待全部批次完成（失效节点的批次在租约过期后被回收）
+    4. 结果写入结果库、合并并验证
+
+    参数:
+        workers (int): 本地工作进程数，默认为CPU核心数；为0时只协调，由其他主机上的工作节点处理
+        wait_timeout (float): 等待全部批次完成的最长时间（秒），默认不限制
+        classify (callable): 批次分类函数，见run_worker；须为模块级函数，以便传给spawn子进程
+    """
+    try:
+        from script.llm_classify import prepare_classify_dir
+        from script.result_verify import verify_results
+
+        start_time = datetime.now()
+        workers = os.cpu_count() if workers is None else workers
+
+        # 1. 重置工作队列和分类结果目录
+        prepare_classify_dir()
+        queue = WorkQueue()
+        queue.reset()
+        if not queue.tasks():
+            warning_msg = "未找到批次文件！请先运行script/data_preprocess.py"
+            logger.warning(warning_msg)
+            print(warning_msg)
+            return
+        logger.info(f"分布式分类开始：{len(queue.tasks())} 个批次，本地工作进程 {workers} 个")
+        print(f"分布式分类开始：{len(queue.tasks())} 个批次，本地工作进程 {workers} 个，队列目录：{queue.queue_dir}")
+
+        # 2. 启动本地工作进程（spawn方式，子进程不继承父进程的线程和连接）
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_worker_process, args=(new_worker_id(), queue, classify)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+
+        # 3. 等待全部批次完成
+        deadline = time.monotonic() + wait_timeout if wait_timeout else None
+        while queue.pending_tasks():
+            if deadline is not None and time.monotonic() > deadline:
+                logger.error(f"等待超时，仍有 {len(queue.pending_tasks())} 个批次未完成")
+                break
+            # 本地进程全部退出但仍有未完成批次（如进程异常终止）时，由协调节点自己接手
+            if processes and not any(process.is_alive() for process in processes):
+                logger.warning("本地工作进程已全部退出，协调节点继续处理剩余批次")
+                run_worker(queue=queue, classify=classify)
+                continue
+            time.sleep(min(queue.poll_interval, 1.0))
+        for process in processes:
+            process.join()
+
+        status = queue.status()
+        logger.info(f"分布式分类完成：{status}")
+        print(f"分布式分类完成！成功：{status['done'] - status['failed']} 个批次，失败：{status['failed']} 个批次")
+
+        # 4. 汇总、合并并验证
+        collect_results(queue)
+        verify_results()
+
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"分布式分类处理完成，总耗时：{duration:.2f} 秒")
+        print(f"分布式分类处理完成，总耗时：{duration:.2f} 秒")
+
+    except Exception as e:
+        error_msg = f"分布式分类过程中发生未预期错误！错误：{type(e).__name__} - {str(e)}"
+        logger.critical(error_msg)
+        logger.error(traceback.format_exc())
+        print(error_msg)
+
+
+# 启动一个工作节点
+if __name__ == "__main__":
+    setup_logging("work_queue")
+    run_worker()
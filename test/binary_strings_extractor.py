@@ -3,8 +3,12 @@ import os
 import sys
 import re
 import shutil
+import sqlite3
+import hashlib
+import argparse
 import subprocess
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 # Add project root to path to import config
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,6 +16,12 @@ sys.path.insert(0, project_root)
 
 # Import configuration from config module
 from config.config import RAW_FILES_PATH
+# Native extraction (format detection, section parsing, printable runs) lives in script.binary_strings
+from script.binary_strings import (
+    DEFAULT_MIN_STRING_LENGTH, is_binary_native, extract_strings_native, extract_strings_with_offsets,
+)
+# Archives (.zip, .tar.gz, .tar.xz, nested) found in the tree are read member by member without unpacking
+from script.archive_ingest import is_archive, iter_archive_sources
 
 def is_binary(file_path):
     """Check if the file is a binary file"""
@@ -23,25 +33,34 @@ def is_binary(file_path):
     except:
         return False
 
+NON_ALPHA_PATTERN = re.compile(r'[^a-zA-Z]')
+REPEATED_CHAR_PATTERN = re.compile(r'(.)\1{2,}')
+
+def clean_string_line(line):
+    """Clean one line of strings output and return the words worth keeping"""
+    # Trim whitespace and tabs from start and end
+    trimmed = line.strip(' \t')
+    # Replace non-alphabetic characters with spaces
+    alpha_only = NON_ALPHA_PATTERN.sub(' ', trimmed)
+
+    # Replace sequences of 3 or more consecutive identical letters with spaces
+    alpha_only = REPEATED_CHAR_PATTERN.sub(' ', alpha_only)
+
+    parts = []
+    # Split alpha_only by spaces and add each non-empty part
+    for part in alpha_only.split(' '):
+        part = part.strip()
+        # Only add if part is not empty, has length > 2, and contains more than one unique character
+        if part and len(part) > 1 and len(set(part)) > 1:
+            parts.append(part)
+    return parts
+
 def process_string_output(stdout_content):
     """Process the output from strings command to extract and clean strings"""
-    processed_lines = []
+    processed_lines = set()
     for line in stdout_content.strip().split('\n'):
-        # Trim whitespace and tabs from start and end
-        trimmed = line.strip(' \t')
-        # Replace non-alphabetic characters with spaces
-        alpha_only = re.sub(r'[^a-zA-Z]', ' ', trimmed)
-        
-        # Replace sequences of 3 or more consecutive identical letters with spaces
-        alpha_only = re.sub(r'(.)\1{2,}', ' ', alpha_only)
-        
-        # Split alpha_only by spaces and add each non-empty part
-        for part in alpha_only.split(' '):
-            part = part.strip()
-            # Only add if part is not empty, has length > 2, and contains more than one unique character
-            if part and len(part) > 1 and len(set(part)) > 1:
-                processed_lines.append(part)
-    return set(processed_lines)
+        processed_lines.update(clean_string_line(line))
+    return processed_lines
 
 def extract_strings_from_binary(binary_path):
     """Extract strings from binary file"""
@@ -74,7 +93,255 @@ def extract_strings_from_binary(binary_path):
         except:
             return set()
 
-def binary_strings_extractor(target_path, output_filename):
+# Parallel scan: files are hashed in chunks, extracted strings are cached per content hash
+HASH_CHUNK_SIZE = 1 << 20
+# Bump when the extraction/cleanup output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = 1
+DEFAULT_CACHE_FILENAME = 'binary_strings_cache.db'
+
+def iter_binary_sources(target_path, sections=None, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    Walk target_path and yield (binary_path, strings, offsets) for every executable, the source
+    format expected by run_pipeline(sources=...) and iter_field_batches
+    """
+    binary_count = 0
+    for root, _, files in os.walk(target_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if os.path.islink(file_path):
+                continue
+            if is_archive(file_path):
+                print(f"Processing archive: {file_path}")
+                # Damaged archives and unreadable members are logged and skipped inside iter_archive_sources
+                yield from iter_archive_sources(file_path, ("binary",), min_length)
+                continue
+            if not is_binary_native(file_path):
+                continue
+            binary_count += 1
+            print(f"Processing binary file ({binary_count}): {file_path}")
+            offsets = extract_strings_with_offsets(file_path, sections, min_length)
+            yield file_path, list(offsets), list(offsets.values())
+
+def stream_to_pipeline(target_path, sections=None, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    Stream extracted strings straight into the preprocessing/classification pipeline in this process,
+    without writing, copying and re-reading a strings file. Batches and classification results
+    carry source (binary path) and offset columns for every string
+    """
+    if not os.path.isdir(target_path):
+        print(f"Error: {target_path} is not a valid directory path")
+        sys.exit(1)
+
+    # Imported here so the plain extractor does not need the pipeline dependencies (pandas, openai)
+    from script.pipeline import run_pipeline
+
+    print(f"Starting to scan directory: {target_path} (streaming into the pipeline)")
+    run_pipeline(iter_binary_sources(target_path, sections, min_length),
+                 description=f"二进制字符串提取：{os.path.abspath(target_path)}")
+
+def file_digest(file_path):
+    """Return the sha256 hex digest of a file's content, or None if it cannot be read"""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def extraction_options_key(sections=None, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """Cache key part for the options that change extract_strings_native output"""
+    section_key = ','.join(sorted(sections)) if sections else '*'
+    return f"v{EXTRACTOR_VERSION}|{section_key}|{min_length}"
+
+class StringsCache:
+    """
+    Persistent sqlite cache for the parallel scan:
+      file_digests maps (path, size, mtime) to a content hash, so unchanged files are not re-hashed
+      strings maps (content hash, extraction options) to the extracted strings, so a binary that
+      was seen before (in this tree or an earlier firmware version) is never extracted again
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_digests ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS strings ("
+            "digest TEXT NOT NULL, options TEXT NOT NULL, content TEXT NOT NULL, PRIMARY KEY (digest, options))"
+        )
+        self.conn.commit()
+
+    def get_digest(self, file_path, size, mtime_ns):
+        row = self.conn.execute(
+            "SELECT digest FROM file_digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (file_path, size, mtime_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_digests(self, rows):
+        """rows: iterable of (path, size, mtime_ns, digest)"""
+        self.conn.executemany("INSERT OR REPLACE INTO file_digests VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def cached_digests(self, digests, options):
+        """Return the subset of digests that already have strings for these options"""
+        digests = list(digests)
+        found = set()
+        for i in range(0, len(digests), 500):
+            chunk = digests[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(row[0] for row in self.conn.execute(
+                f"SELECT digest FROM strings WHERE options = ? AND digest IN ({placeholders})",
+                [options, *chunk],
+            ))
+        return found
+
+    def get_strings(self, digest, options):
+        row = self.conn.execute(
+            "SELECT content FROM strings WHERE digest = ? AND options = ?", (digest, options)
+        ).fetchone()
+        if row is None:
+            return None
+        return set(row[0].split('\n')) if row[0] else set()
+
+    def put_strings(self, digest, options, strings):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO strings VALUES (?, ?, ?)", (digest, options, '\n'.join(sorted(strings)))
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def _hash_job(file_path):
+    # Runs in a worker process
+    return file_path, file_digest(file_path)
+
+def archive_binary_strings(file_path, min_length=DEFAULT_MIN_STRING_LENGTH):
+    """Strings of every executable inside an archive (nested archives included), read without unpacking"""
+    strings = set()
+    for _, member_strings, _ in iter_archive_sources(file_path, ("binary",), min_length):
+        strings.update(member_strings)
+    return strings
+
+def _extract_job(args):
+    # Runs in a worker process; sections only applies to files on disk, as in binary_strings_extractor
+    digest, file_path, sections, min_length = args
+    if is_archive(file_path):
+        return digest, archive_binary_strings(file_path, min_length)
+    return digest, extract_strings_native(file_path, sections, min_length)
+
+def parallel_binary_strings_extractor(target_path, output_filename, workers=None, sections=None,
+                                      min_length=DEFAULT_MIN_STRING_LENGTH, cache_path=None):
+    """
+    Parallel, hash-deduplicated version of binary_strings_extractor (in-process extractor only)
+
+    Executables are hashed and extracted in a process pool; identical copies (same content hash)
+    are extracted only once. Archives are hashed as a whole and their executables read in a worker
+    without unpacking. With cache_path, hashes and extracted strings persist across runs,
+    so rescanning a new firmware version only extracts binaries whose content changed
+
+    Args:
+        workers: number of worker processes, default os.cpu_count()
+        cache_path: sqlite cache file, None disables the persistent cache
+    """
+    if not os.path.isdir(target_path):
+        print(f"Error: {target_path} is not a valid directory path")
+        sys.exit(1)
+
+    workers = workers or os.cpu_count() or 1
+    options = extraction_options_key(sections, min_length)
+    cache = StringsCache(cache_path) if cache_path else None
+
+    # Detection only reads the header, so it stays in the main process
+    print(f"Starting to scan directory: {target_path} ({workers} workers)")
+    binaries = []
+    for root, _, files in os.walk(target_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if not os.path.islink(file_path) and (is_archive(file_path) or is_binary_native(file_path)):
+                binaries.append(file_path)
+
+    # Content hash per binary, reusing cached hashes of files whose size and mtime are unchanged
+    digests = {}
+    to_hash = []
+    stats = {}
+    for file_path in binaries:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        stats[file_path] = (st.st_size, st.st_mtime_ns)
+        digest = cache.get_digest(os.path.abspath(file_path), *stats[file_path]) if cache else None
+        if digest:
+            digests[file_path] = digest
+        else:
+            to_hash.append(file_path)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            new_digests = []
+            for file_path, digest in executor.map(_hash_job, to_hash, chunksize=16):
+                if digest is None:
+                    continue
+                digests[file_path] = digest
+                new_digests.append((os.path.abspath(file_path), *stats[file_path], digest))
+            if cache and new_digests:
+                cache.put_digests(new_digests)
+
+            # One representative path per unique content hash
+            unique = {}
+            for file_path, digest in digests.items():
+                unique.setdefault(digest, file_path)
+            cached = cache.cached_digests(unique, options) if cache else set()
+            jobs = [(digest, file_path, sections, min_length)
+                    for digest, file_path in unique.items() if digest not in cached]
+
+            all_strings = set()
+            for done, (digest, strings) in enumerate(executor.map(_extract_job, jobs), 1):
+                print(f"Processing binary file ({done}/{len(jobs)}): {unique[digest]}")
+                all_strings.update(strings)
+                if cache:
+                    cache.put_strings(digest, options, strings)
+    finally:
+        if cache:
+            cache.commit()
+
+    for digest in cached:
+        all_strings.update(cache.get_strings(digest, options))
+    if cache:
+        cache.close()
+
+    sorted_strings = sorted(all_strings)
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(sorted_strings))
+
+    print(f"Processing complete!")
+    print(f"Total of {len(digests)} binary files and archives found, {len(unique)} unique by content hash "
+          f"({len(digests) - len(unique)} duplicates skipped)")
+    print(f"Extracted {len(jobs)} binaries, {len(cached)} served from cache")
+    print(f"Total of {len(all_strings)} unique strings extracted")
+    print(f"Results saved to: {output_filename}")
+
+def binary_strings_extractor(target_path, output_filename, use_binutils=False, sections=None,
+                             min_length=DEFAULT_MIN_STRING_LENGTH):
+    """
+    Extract strings from every executable under target_path and save the sorted unique set
+
+    By default files are detected and scanned in-process (extract_strings_native);
+    use_binutils=True uses the file/strip/strings commands instead.
+    In-process mode also reads executables inside archives (see script.archive_ingest) without
+    unpacking them; sections only applies to files on disk
+    """
     if not os.path.isdir(target_path):
         print(f"Error: {target_path} is not a valid directory path")
         sys.exit(1)
@@ -88,11 +355,26 @@ def binary_strings_extractor(target_path, output_filename):
         for file in files:
             file_path = os.path.join(root, file)
             # Check if the file is binary
-            if is_binary(file_path):
-                binary_count += 1
-                print(f"Processing binary file ({binary_count}): {file_path}")
-                # Extract strings and add to total set
+            if use_binutils:
+                if not is_binary(file_path):
+                    continue
+            elif os.path.islink(file_path):
+                continue
+            elif is_archive(file_path):
+                print(f"Processing archive: {file_path}")
+                for _, member_strings, _ in iter_archive_sources(file_path, ("binary",), min_length):
+                    binary_count += 1
+                    all_strings.update(member_strings)
+                continue
+            elif not is_binary_native(file_path):
+                continue
+            binary_count += 1
+            print(f"Processing binary file ({binary_count}): {file_path}")
+            # Extract strings and add to total set
+            if use_binutils:
                 all_strings.update(extract_strings_from_binary(file_path))
+            else:
+                all_strings.update(extract_strings_native(file_path, sections, min_length))
     
     # Sort the strings
     sorted_strings = sorted(all_strings)
@@ -107,15 +389,44 @@ def binary_strings_extractor(target_path, output_filename):
     print(f"Results saved to: {output_filename}")
 
 if __name__ == "__main__":
-    # Get the passed path parameter and optional output filename
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
-        print(f"Usage: {sys.argv[0]} <target_path> [output_filename]")
-        sys.exit(1)
-    
-    target_path = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Extract strings from all executables under a directory")
+    parser.add_argument("target_path", help="directory to scan recursively")
     # Default output filename if not provided
-    output_filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strings_all_binary.txt') if len(sys.argv) == 2 else sys.argv[2]
-    binary_strings_extractor(target_path, output_filename)
+    parser.add_argument("output_filename", nargs="?",
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strings_all_binary.txt'))
+    parser.add_argument("--sections", help="only scan these sections, comma separated (e.g. .rodata,.data)")
+    parser.add_argument("--min-length", type=int, default=DEFAULT_MIN_STRING_LENGTH,
+                        help="minimum printable run length, same as strings -n")
+    parser.add_argument("--binutils", action="store_true",
+                        help="use the file/strip/strings commands instead of the in-process extractor")
+    parser.add_argument("--parallel", type=int, nargs="?", const=0, metavar="WORKERS",
+                        help="scan in a process pool (default one worker per CPU), extracting each unique binary once")
+    parser.add_argument("--cache", metavar="PATH",
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_CACHE_FILENAME),
+                        help="hash-to-strings cache used by --parallel, kept across runs")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the persistent cache with --parallel")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="stream strings with their source binary and offset directly into the pipeline "
+                             "instead of writing output_filename and running sens_finder.py")
+    args = parser.parse_args()
+
+    output_filename = args.output_filename
+    sections = [name.strip() for name in args.sections.split(",") if name.strip()] if args.sections else None
+    if args.pipeline:
+        if args.binutils or args.parallel is not None:
+            parser.error("--pipeline uses the in-process extractor and cannot be combined with --binutils/--parallel")
+        from script.logging_setup import setup_logging
+        setup_logging("binary_strings_extractor")
+        stream_to_pipeline(args.target_path, sections, args.min_length)
+        sys.exit(0)
+
+    if args.parallel is not None:
+        if args.binutils:
+            parser.error("--parallel uses the in-process extractor and cannot be combined with --binutils")
+        parallel_binary_strings_extractor(args.target_path, output_filename, args.parallel or None, sections,
+                                          args.min_length, None if args.no_cache else args.cache)
+    else:
+        binary_strings_extractor(args.target_path, output_filename, args.binutils, sections, args.min_length)
 
     #如果output_filename存在拷贝到RAW_FILES_PATH
     if os.path.exists(output_filename):
@@ -0,0 +1,58 @@
+"""Tests for script.batch_scheduler dispatch order (no LLM: handlers are plain functions)"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script.batch_scheduler import BatchScheduler, LatencyHistory, PRIORITY_RECHECK
+
+
+def _frame(size):
+    return pd.DataFrame({"raw_text": [f"field{i}" for i in range(size)]})
+
+
+def _scheduler(tmp_path, handler, on_complete=None, workers=1, split=False):
+    history = LatencyHistory("test", path=str(tmp_path / "history.json"))
+    return BatchScheduler(handler, on_complete, workers=workers, history=history, split=split)
+
+
+def test_longest_batches_dispatch_first(tmp_path):
+    order = []
+    scheduler = _scheduler(tmp_path, lambda task: order.append(task.name) or task.frame)
+    for name, size in [("small", 5), ("large", 50), ("medium", 20)]:
+        scheduler.submit(name, _frame(size))
+    assert scheduler.run() == (3, 0)
+    assert order == ["large", "medium", "small"]
+
+
+def test_recheck_submitted_during_run_overtakes_queued_batches(tmp_path):
+    order = []
+
+    def handler(task):
+        order.append(task.name)
+        return task.frame
+
+    def on_complete(task, result):
+        # the first finished classification batch submits a re-check while others are still queued
+        if task.name == "batch_large":
+            scheduler.submit("recheck", _frame(3), priority=PRIORITY_RECHECK)
+
+    scheduler = _scheduler(tmp_path, handler, on_complete)
+    for name, size in [("batch_large", 50), ("batch_medium", 20), ("batch_small", 5)]:
+        scheduler.submit(name, _frame(size))
+    assert scheduler.run() == (4, 0)
+    assert order == ["batch_large", "recheck", "batch_medium", "batch_small"]
+
+
+def test_straggler_is_split_for_idle_workers(tmp_path):
+    results = {}
+    scheduler = _scheduler(tmp_path, lambda task: task.frame, lambda task, result: results.update({task.name: result}),
+                           workers=3, split=True)
+    scheduler.min_split_size = 10
+    scheduler.submit("only", _frame(90))
+    assert scheduler.run() == (1, 0)
+    assert scheduler.splits == 1
+    # sub-batch results are reassembled in the original order
+    assert results["only"]["raw_text"].tolist() == _frame(90)["raw_text"].tolist()
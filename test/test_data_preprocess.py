@@ -0,0 +1,27 @@
+"""Tests for field byte offsets in script.data_preprocess"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script.data_preprocess import _split_lines_with_offsets, read_file_fields
+
+
+def test_offsets_point_at_fields_in_non_ascii_lines():
+    data = ("héllo wörld 名字 x\tÿ end\n" * 3 + "plain ascii line\n\n  trailing  \n").encode("utf-8")
+    fields, offsets = _split_lines_with_offsets(io.BytesIO(data).readlines(), "utf-8")
+    assert fields == data.decode("utf-8").split()
+    for field, offset in zip(fields, offsets):
+        encoded = field.encode("utf-8")
+        assert data[offset:offset + len(encoded)] == encoded
+
+
+def test_long_non_ascii_line_offsets(tmp_path):
+    line = "数据 field " * 20000 + "\n"
+    path = tmp_path / "long.txt"
+    path.write_bytes(line.encode("utf-8"))
+    fields, offsets = read_file_fields(str(path), with_offsets=True)
+    assert len(fields) == 40000
+    # "数据" is 6 bytes in UTF-8, so the first "field" starts at byte 7; the last one ends the line
+    assert offsets[1] == 7 and offsets[-1] == len(line.encode("utf-8")) - len("field \n")
@@ -0,0 +1,69 @@
+"""Tests for LLM response handling in script.llm_classify (no network: the OpenAI client is stubbed)"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openai
+import script.llm_classify as llm_classify
+from script.retry_policy import LLMResponseFormatError, RetryPolicy
+
+
+class _StubCompletions:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+
+def _response(content):
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def stub_openai(monkeypatch):
+    """Route OPENAI requests to a stub client and use a retry policy without backoff delays"""
+    completions = _StubCompletions([SimpleNamespace(choices=[], usage=None)])
+
+    class StubOpenAI:
+        def __init__(self, **kwargs):
+            self.chat = SimpleNamespace(completions=completions)
+
+    monkeypatch.setattr(openai, "OpenAI", StubOpenAI)
+    monkeypatch.setattr(llm_classify, "LLM_SERVICE", "OPENAI")
+    monkeypatch.setattr(llm_classify, "LOCAL_MODEL_ENABLED", False)
+    policy = RetryPolicy(max_retries=2, initial_interval=0, max_interval=0)
+    monkeypatch.setattr(llm_classify, "get_retry_policy", lambda: policy)
+    return completions
+
+
+@pytest.mark.parametrize("response", [
+    {"choices": []},
+    {"choices": [{"message": {}}]},
+    {"choices": [{"message": {"content": None}}]},
+    SimpleNamespace(choices=[]),
+])
+def test_extract_response_content_raises_typed_error(response):
+    with pytest.raises(LLMResponseFormatError):
+        llm_classify.extract_response_content(response)
+
+
+def test_malformed_response_is_retried_then_reported_as_failure(stub_openai):
+    result = llm_classify.classify_fields(["alice"], "{{fields_text}}")
+    assert result is None
+    # one attempt plus max_retries retries
+    assert stub_openai.calls == 3
+
+
+def test_malformed_response_recovers_on_retry(stub_openai):
+    stub_openai.responses = [SimpleNamespace(choices=[], usage=None), _response("alice\t人名\t90\t依据")]
+    result = llm_classify.classify_fields(["alice"], "{{fields_text}}")
+    assert stub_openai.calls == 2
+    assert result["category"].tolist() == ["人名"]
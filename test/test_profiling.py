@@ -0,0 +1,37 @@
+"""Tests for script.profiling stage profiles"""
+import os
+import pstats
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script.profiling import ProfileSession
+
+
+def _worker_only_function():
+    return sum(i * i for i in range(20000))
+
+
+def _stage_thread_function():
+    return sorted(range(20000), reverse=True)
+
+
+def test_cprofile_stage_covers_worker_threads(tmp_path):
+    session = ProfileSession(mode="cprofile", output_dir=str(tmp_path))
+    with session.stage("threaded"):
+        # like the classification scheduler and the pipeline: work runs in threads started inside the stage
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda _: _worker_only_function(), range(4)))
+        thread = threading.Thread(target=_stage_thread_function)
+        thread.start()
+        thread.join()
+
+    stats = pstats.Stats(str(tmp_path / "threaded.prof"))
+    profiled = {function for _, _, function in stats.stats}
+    assert "_worker_only_function" in profiled
+    assert "_stage_thread_function" in profiled
+    assert "_worker_only_function" in (tmp_path / "threaded.txt").read_text(encoding="utf-8")
+    # the thread hook is removed once the stage ends
+    assert threading.getprofile() is None
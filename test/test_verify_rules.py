@@ -0,0 +1,88 @@
+"""Tests for the declarative verification rules in script.verify_rules"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script.verify_rules import RulesEngine
+
+RULES = [
+    {"name": "关键词", "type": "keyword", "keywords": ["pass", "password", "secret"]},
+    {"name": "区分大小写关键词", "type": "keyword", "keywords": ["API"], "case_sensitive": True},
+    {"name": "正则", "type": "regex", "pattern": r"^\d{11}$"},
+    {"name": "忽略大小写正则", "type": "regex", "pattern": r"token_[a-z]+", "ignore_case": True,
+     "unless_category": "密钥"},
+    {"name": "过长", "type": "length", "max_length": 20},
+    {"name": "多行", "type": "length", "max_length": 500, "max_lines": 1},
+    {"name": "低置信度", "type": "confidence_floor", "threshold": 60, "per_category": {"人名": 80}},
+    {"name": "无效分类", "type": "category_regex", "pattern": "^未知$"},
+]
+
+SAMPLE = pd.DataFrame([
+    ("MyPassword", "其他", 90),                   # 0: keyword (case-insensitive, overlapping keywords)
+    ("api_key", "其他", 90),                      # 1: nothing, "API" is case-sensitive
+    ("read API", "其他", 90),                     # 2: case-sensitive keyword
+    ("13800138000", "手机号", 90),                # 3: regex
+    ("TOKEN_abc", "其他", 90),                    # 4: ignore-case regex
+    ("token_abc", "密钥", 90),                    # 5: ignore-case regex suppressed by unless_category
+    ("x" * 21, "其他", 90),                       # 6: max_length
+    ("a\nb", "其他", 90),                         # 7: one line break is allowed
+    ("a\nb\nc", "其他", 90),                      # 8: max_lines
+    ("alice", "人名", 70),                        # 9: per-category confidence floor
+    ("bob", "其他", 70),                          # 10: above the default floor
+    ("carol", "未知", 95),                        # 11: category regex
+    (None, None, None),                           # 12: missing values are treated as empty/0
+], columns=["raw_text", "category", "confidence"])
+
+EXPECTED = {
+    0: ["关键词"], 1: [], 2: ["区分大小写关键词"], 3: ["正则"], 4: ["忽略大小写正则"], 5: [],
+    6: ["过长"], 7: [], 8: ["多行"], 9: ["低置信度"], 10: [], 11: ["无效分类"], 12: ["低置信度"],
+}
+
+
+def _flagged_rules(engine, mask):
+    return [[name for bit, name in engine.problem_types if int(value) & bit] for value in mask]
+
+
+@pytest.mark.parametrize("shared_matchers", [True, False])
+def test_each_rule_type_flags_expected_rows(shared_matchers):
+    engine = RulesEngine(RULES, shared_matchers=shared_matchers)
+    mask, timings = engine.evaluate_frame(SAMPLE)
+    assert _flagged_rules(engine, mask) == [EXPECTED[index] for index in range(len(SAMPLE))]
+    assert {rule["name"] for rule in RULES} <= set(timings)
+
+
+def test_keywords_file_and_negate(tmp_path):
+    keywords_file = tmp_path / "keywords.txt"
+    keywords_file.write_text("secret\n\nhidden\n", encoding="utf-8")
+    engine = RulesEngine([
+        {"name": "文件关键词", "type": "keyword", "keywords_file": str(keywords_file)},
+        {"name": "非手机号", "type": "regex", "pattern": r"^\d{11}$", "negate": True, "only_category": "手机号"},
+    ])
+    frame = pd.DataFrame({"raw_text": ["top_secret", "HIDDEN", "plain", "123", "13800138000"],
+                          "category": ["其他", "其他", "其他", "手机号", "手机号"],
+                          "confidence": [90] * 5})
+    assert _flagged_rules(engine, engine.evaluate_frame(frame)[0]) == [
+        ["文件关键词"], ["文件关键词"], [], ["非手机号"], []]
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RulesEngine([{"name": "坏规则", "type": "unknown"}])
+    with pytest.raises(ValueError):
+        RulesEngine([{"type": "keyword", "keywords": ["a"]}])
+
+
+def test_process_pool_matches_serial_evaluation():
+    frame = pd.concat([SAMPLE] * 40, ignore_index=True)
+    engine = RulesEngine(RULES)
+    serial, _ = engine.evaluate_frame(frame)
+    parallel = engine.evaluate(frame, workers=2, chunk_size=50)
+    assert parallel.dtype == np.uint64
+    assert np.array_equal(parallel, serial)
+    # timings from the worker processes are accumulated in the parent engine
+    assert engine.timings["关键词"] > 0
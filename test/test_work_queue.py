@@ -0,0 +1,103 @@
+"""Tests for script.work_queue with several worker processes (no LLM: classification is injected)"""
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script.work_queue import LEASE_DIR, WorkQueue, run_worker
+
+BATCH_COUNT = 6
+
+
+# classify callables are module-level so they can be passed to spawned worker processes
+def _fake_classify(batch_path, usage):
+    time.sleep(0.2)
+    frame = pd.read_csv(batch_path, dtype=str)
+    return frame.assign(category="人名", confidence="90", worker_pid=str(os.getpid()))
+
+
+def _hang_classify(batch_path, usage):
+    time.sleep(600)
+
+
+def _make_queue(tmp_path):
+    batch_dir = tmp_path / "batches"
+    batch_dir.mkdir()
+    for index in range(BATCH_COUNT):
+        pd.DataFrame({"raw_text": [f"field{index}_{row}" for row in range(5)]}).to_csv(
+            batch_dir / f"batch_{index}.csv", index=False)
+    return WorkQueue(queue_dir=str(tmp_path / "queue"), batch_dir=str(batch_dir), result_dir=str(tmp_path / "results"),
+                     lease_timeout=1.5, heartbeat_interval=0.2, max_attempts=3, poll_interval=0.1)
+
+
+def _lease_holder(queue, worker_id):
+    """Return the task whose lease file is held by worker_id, or None"""
+    lease_dir = os.path.join(queue.queue_dir, LEASE_DIR)
+    for filename in os.listdir(lease_dir):
+        try:
+            with open(os.path.join(lease_dir, filename), encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if payload.get("worker_id") == worker_id:
+            return payload["task"]
+    return None
+
+
+def _wait_for(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError("timed out")
+
+
+def test_processes_commit_each_batch_once_and_reclaim_dead_leases(tmp_path):
+    queue = _make_queue(tmp_path)
+    context = multiprocessing.get_context("spawn")
+
+    # a worker that stalls while holding batch_0: its heartbeat stops but it commits later
+    stalled = queue.try_acquire("batch_0.csv", "stalled")
+    stalled.stop()
+
+    # a worker process that is killed in the middle of a batch
+    doomed = context.Process(target=run_worker, kwargs={"worker_id": "doomed", "queue": queue,
+                                                        "classify": _hang_classify})
+    doomed.start()
+    doomed_task = _wait_for(lambda: _lease_holder(queue, "doomed"))
+    doomed.kill()
+    doomed.join()
+
+    workers = [context.Process(target=run_worker, kwargs={"worker_id": f"worker{index}", "queue": queue,
+                                                          "classify": _fake_classify})
+               for index in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+
+    tasks = queue.tasks()
+    status = queue.status()
+    assert status["done"] == BATCH_COUNT and status["failed"] == 0 and queue.pending_tasks() == []
+    # exactly one result file per batch, and no temporary files left behind
+    assert sorted(f for f in os.listdir(queue.result_dir) if not f.startswith("token_usage_")) == \
+        sorted(f"result_{task}" for task in tasks)
+
+    # both dead leases were reclaimed and their batches committed by live workers
+    for task in ("batch_0.csv", doomed_task):
+        with open(os.path.join(queue.queue_dir, "done", task + ".done"), encoding="utf-8") as f:
+            assert json.load(f)["worker_id"].startswith("worker")
+
+    # the stalled worker's late commit is rejected and does not touch the committed result
+    committed = pd.read_csv(queue.result_path("batch_0.csv"), dtype=str)
+    late = committed.assign(worker_pid="stalled")
+    assert queue.commit(stalled, late) is False
+    assert pd.read_csv(queue.result_path("batch_0.csv"), dtype=str).equals(committed)